@@ -0,0 +1,252 @@
+"""
+Scoring of competitions which run several arenas in parallel.
+
+Each arena's sheets live in their own directory (`league/<arena>/` and so on)
+and are scored independently of every other arena's, so the state here is
+partitioned by arena: each partition remembers the sheets it has scored and
+only rescores those which have changed since. The arenas with changes are
+scored concurrently in a pool of worker processes.
+
+Results are merged into a single `LeagueTable` in (arena, match number)
+order, regardless of the order the workers finish in, so the merged table
+is the same however the work was split up.
+"""
+
+from __future__ import annotations
+
+import argparse
+import concurrent.futures
+import dataclasses
+import time
+from pathlib import Path
+from typing import Iterable, Mapping, Sequence
+
+import yaml
+from sr.comp.types import ArenaName, GamePoints, MatchId, TLA
+
+from sheets import (
+    calculate_scores,
+    COMPSTATE_ROOT,
+    find_sheets,
+    load_sheet,
+    match_id,
+)
+from standings import disqualified_teams, LeagueTable
+
+
+@dataclasses.dataclass(frozen=True)
+class MatchResult:
+    key: MatchId
+    game_points: dict[TLA, GamePoints]
+    disqualified: tuple[TLA, ...]
+
+
+def load_arenas(root: Path = COMPSTATE_ROOT) -> list[ArenaName]:
+    """
+    The arenas in the given compstate, in the order they're defined.
+    """
+    with (root / 'arenas.yaml').open() as f:
+        return [ArenaName(x) for x in yaml.safe_load(f)['arenas']]
+
+
+def find_arena_sheets(
+    root: Path = COMPSTATE_ROOT,
+    kinds: tuple[str, ...] = ('league',),
+) -> dict[ArenaName, list[Path]]:
+    """
+    Find the score sheets in the given compstate, partitioned by arena.
+
+    Every arena is included, even those without any sheets yet.
+    """
+    arenas = load_arenas(root)
+    partitioned: dict[ArenaName, list[Path]] = {x: [] for x in arenas}
+    for _, path in find_sheets(root, kinds):
+        arena = ArenaName(path.parent.name)
+        if arena not in partitioned:
+            raise ValueError(
+                f"{path} is in a directory for arena {arena!r}, which isn't "
+                f"one of the arenas ({', '.join(arenas)})",
+            )
+        partitioned[arena].append(path)
+    return partitioned
+
+
+def score_sheets(arena: ArenaName, paths: Sequence[Path]) -> list[MatchResult]:
+    """
+    Score the given sheets from an arena. This is run in the worker processes.
+    """
+    results = []
+    for path in paths:
+        sheet = load_sheet(path)
+        key = match_id(sheet)
+        if key[0] != arena:
+            raise ValueError(
+                f"{path} is for arena {key[0]!r} but is in the directory for "
+                f"arena {arena!r}",
+            )
+        results.append(MatchResult(
+            key,
+            calculate_scores(sheet),
+            tuple(disqualified_teams(sheet)),
+        ))
+    return results
+
+
+class ArenaPartition:
+    """
+    The scored sheets of a single arena.
+    """
+
+    def __init__(self, arena: ArenaName) -> None:
+        self.arena = arena
+        self._mtimes: dict[Path, float] = {}
+        self.results: dict[Path, MatchResult] = {}
+
+    def stale(self, paths: Iterable[Path]) -> tuple[dict[Path, float], list[Path]]:
+        """
+        Compare the sheets which exist against those already scored, returning
+        the modification times of those which need scoring and the paths of
+        those which have been removed.
+        """
+        mtimes = {path: path.stat().st_mtime for path in paths}
+        changed = {
+            path: mtime
+            for path, mtime in mtimes.items()
+            if self._mtimes.get(path) != mtime
+        }
+        removed = sorted(self._mtimes.keys() - mtimes.keys())
+        return changed, removed
+
+    def update(
+        self,
+        mtimes: Mapping[Path, float],
+        results: Iterable[MatchResult],
+        removed: Iterable[Path],
+    ) -> tuple[list[MatchResult], list[MatchResult]]:
+        """
+        Record newly scored sheets, returning the results which were replaced
+        or removed and the results which are new.
+        """
+        old = []
+        for path in removed:
+            del self._mtimes[path]
+            old.append(self.results.pop(path))
+
+        new = []
+        for (path, mtime), result in zip(mtimes.items(), results, strict=True):
+            if path in self.results:
+                old.append(self.results[path])
+            self._mtimes[path] = mtime
+            self.results[path] = result
+            new.append(result)
+        return old, new
+
+
+class MultiArenaScorer:
+    """
+    League scores from all the arenas in a compstate, kept up to date by
+    rescoring the changed sheets in each arena concurrently.
+    """
+
+    def __init__(self, root: Path = COMPSTATE_ROOT) -> None:
+        self.root = root
+        self.partitions = {x: ArenaPartition(x) for x in load_arenas(root)}
+        self.table = LeagueTable.for_compstate(root)
+
+    def refresh(self, executor: concurrent.futures.Executor) -> list[ArenaName]:
+        """
+        Rescore the sheets which have changed since the last refresh, using
+        the given executor to score each arena's sheets. Returns the arenas
+        which had changes.
+        """
+        futures = {}
+        pending = {}
+        for arena, paths in find_arena_sheets(self.root).items():
+            partition = self.partitions.setdefault(arena, ArenaPartition(arena))
+            # The times are taken before scoring, so a sheet which is written
+            # while being scored is picked up next time
+            mtimes, removed = partition.stale(paths)
+            if not mtimes and not removed:
+                continue
+            pending[arena] = mtimes, removed
+            futures[arena] = executor.submit(score_sheets, arena, list(mtimes))
+
+        # Every arena's results are collected before any are recorded, so that
+        # if one arena fails nothing is recorded and every arena's changed
+        # sheets are rescored next time
+        scored = {arena: futures[arena].result() for arena in sorted(futures)}
+
+        old: list[MatchResult] = []
+        new: list[MatchResult] = []
+        # Merge in arena order rather than completion order
+        for arena, results in scored.items():
+            mtimes, removed = pending[arena]
+            replaced, added = self.partitions[arena].update(mtimes, results, removed)
+            old += replaced
+            new += added
+
+        new_keys = {x.key for x in new}
+        for result in sorted(old, key=lambda x: x.key):
+            if result.key not in new_keys:
+                self.table.remove_match(result.key)
+        for result in sorted(new, key=lambda x: x.key):
+            self.table.set_match(result.key, result.game_points, result.disqualified)
+
+        return sorted(futures)
+
+    def results(self) -> list[MatchResult]:
+        """
+        The results of every scored match, in (arena, match number) order.
+        """
+        return sorted(
+            (
+                result
+                for partition in self.partitions.values()
+                for result in partition.results.values()
+            ),
+            key=lambda x: x.key,
+        )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Score the league sheets from every arena concurrently.",
+    )
+    parser.add_argument(
+        '--compstate',
+        type=Path,
+        default=COMPSTATE_ROOT,
+        help="competition state repository (default: %(default)s)",
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=None,
+        help="number of worker processes (default: one per CPU)",
+    )
+    return parser.parse_args()
+
+
+def main(args: argparse.Namespace) -> None:
+    scorer = MultiArenaScorer(args.compstate)
+
+    start = time.perf_counter()
+    with concurrent.futures.ProcessPoolExecutor(args.workers) as executor:
+        scorer.refresh(executor)
+    elapsed = time.perf_counter() - start
+
+    for arena, partition in scorer.partitions.items():
+        print(f"{arena}: {len(partition.results)} matches")
+    print(f"Scored in {elapsed:.2f}s")
+    print()
+
+    for tla, position in scorer.table.positions.items():
+        totals = scorer.table.totals(tla)
+        print(
+            f"{position:>3}  {tla:<6} {totals.league_points:>4} league "
+            f"{totals.game_points:>5} game",
+        )
+
+
+if __name__ == '__main__':
+    main(parse_args())
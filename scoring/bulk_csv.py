@@ -0,0 +1,298 @@
+"""
+Bulk import and export of score sheets as CSV.
+
+For use when the Scorer UI is unavailable and scores have been collected on
+paper or in a spreadsheet. Each CSV row is one match; the columns use the same
+keys as the Scorer UI's form (see `Converter`), so a row is converted to a
+sheet exactly as a form submission would be.
+
+Boolean columns (`present_N`, `disqualified_N`, `left_starting_zone_N`) accept
+any of 1/true/yes/y/x (case insensitive) as true; anything else, including
+blank, is false. Blank pallet counts are zero.
+
+Rows are processed one at a time and each valid sheet is staged to a temporary
+file next to its destination, so memory use does not grow with the size of
+the input. Sheets are only moved into place once every row has been checked,
+so a CSV with any errors writes nothing.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import dataclasses
+import os
+import sys
+import tempfile
+from pathlib import Path
+from typing import Iterable, Iterator, Mapping, TextIO
+
+import yaml
+from sr.comp.comp import SRComp
+from sr.comp.match_period import Match
+from sr.comp.raw_compstate import RawCompstate
+from sr.comp.scorer.converter import InputForm
+from sr.comp.types import ArenaName, MatchId, MatchNumber, ScoreData
+
+from converter import Converter, InvalidFormError
+from sheets import COMPSTATE_ROOT, find_sheets, load_sheet
+from sr2025 import DISTRICTS, ZONE_COLOURS
+
+NUM_ZONES = len(ZONE_COLOURS)
+
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 'x'}
+
+TEAM_FLAGS = ('present', 'disqualified', 'left_starting_zone')
+
+
+def fieldnames() -> list[str]:
+    names = ['arena_id', 'match_number']
+    for zone_id in range(NUM_ZONES):
+        names.append(f'tla_{zone_id}')
+        names += [f'{flag}_{zone_id}' for flag in TEAM_FLAGS]
+    for name in DISTRICTS:
+        names.append(f'district_{name}_highest')
+        names += [f'district_{name}_pallets_{x}' for x in ZONE_COLOURS]
+    return names
+
+
+BOOLEAN_FIELDS = frozenset(
+    f'{flag}_{zone_id}'
+    for flag in TEAM_FLAGS
+    for zone_id in range(NUM_ZONES)
+)
+
+
+@dataclasses.dataclass(frozen=True)
+class RowError:
+    line: int
+    message: str
+    code: str | None = None
+
+    def __str__(self) -> str:
+        code = f" [{self.code}]" if self.code else ""
+        return f"Line {self.line}{code}: {self.message}"
+
+
+@dataclasses.dataclass
+class ImportResult:
+    written: list[Path] = dataclasses.field(default_factory=list)
+    errors: list[RowError] = dataclasses.field(default_factory=list)
+
+
+def row_to_form(row: Mapping[str, str | None]) -> InputForm:
+    """
+    Convert a CSV row to the form a browser would submit for it.
+
+    Browsers omit unchecked checkboxes entirely, which is how `Converter`
+    distinguishes true from false.
+    """
+    form = {}
+    for key, value in row.items():
+        if key is None or key in ('arena_id', 'match_number'):
+            continue
+        value = (value or '').strip()
+        if key in BOOLEAN_FIELDS:
+            if value.lower() in TRUE_VALUES:
+                form[key] = 'on'
+        else:
+            form[key] = value
+    return InputForm(form)
+
+
+def score_to_row(converter: Converter, score: ScoreData) -> dict[str, object]:
+    row: dict[str, object] = {
+        'arena_id': score['arena_id'],
+        'match_number': score['match_number'],
+    }
+    for key, value in converter.score_to_form(score).items():
+        if key in BOOLEAN_FIELDS:
+            value = 'true' if value else ''
+        row[key] = '' if value is None else value
+    return row
+
+
+def parse_rows(
+    rows: Iterable[Mapping[str, str | None]],
+    matches: Mapping[MatchId, Match],
+    converter: Converter,
+) -> Iterator[tuple[int, Match, ScoreData] | RowError]:
+    """
+    Convert and validate CSV rows, yielding either the match and sheet for
+    each row or an error describing why it could not be used.
+
+    Line numbers account for the CSV header row.
+    """
+    for line, row in enumerate(rows, start=2):
+        try:
+            match_id = (
+                ArenaName((row.get('arena_id') or 'main').strip()),
+                MatchNumber(int(row.get('match_number') or '')),
+            )
+        except ValueError:
+            yield RowError(line, f"Invalid match number {row.get('match_number')!r}")
+            continue
+
+        match = matches.get(match_id)
+        if match is None:
+            yield RowError(line, "No such match {1} in arena {0}".format(*match_id))
+            continue
+
+        form = row_to_form(row)
+
+        expected = [x or '' for x in match.teams]
+        actual = [form.get(f'tla_{x}', '') for x in range(len(match.teams))]
+        if expected != actual:
+            yield RowError(
+                line,
+                f"Teams {actual} do not match the schedule for match {match.num} "
+                f"({expected})",
+            )
+            continue
+
+        try:
+            score = converter.form_to_score(match, form)
+        except InvalidFormError as e:
+            yield RowError(line, str(e), code=e.code)
+            continue
+        except ValueError as e:
+            yield RowError(line, f"Invalid value: {e}")
+            continue
+
+        yield line, match, score
+
+
+def import_csv(
+    stream: TextIO,
+    compstate: RawCompstate,
+    matches: Mapping[MatchId, Match],
+    *,
+    overwrite: bool = False,
+) -> ImportResult:
+    """
+    Import the sheets from a CSV stream into the compstate.
+
+    Nothing is written unless every row is valid.
+    """
+    converter = Converter()
+    result = ImportResult()
+    staged: list[tuple[Path, Path]] = []
+    seen: set[Path] = set()
+
+    try:
+        for item in parse_rows(csv.DictReader(stream), matches, converter):
+            if isinstance(item, RowError):
+                result.errors.append(item)
+                continue
+
+            line, match, score = item
+            path = Path(compstate.get_score_path(match))
+            if path in seen:
+                result.errors.append(RowError(line, f"Duplicate row for match {match.num}"))
+                continue
+            seen.add(path)
+            if path.exists() and not overwrite:
+                result.errors.append(
+                    RowError(line, f"{path} already exists (use --overwrite to replace it)"),
+                )
+                continue
+            if result.errors:
+                # No point staging once we know nothing will be written.
+                continue
+
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix='.yaml.tmp')
+            with os.fdopen(fd, mode='w') as f:
+                yaml.safe_dump(score, f, default_flow_style=False)
+            staged.append((Path(tmp_name), path))
+
+        if not result.errors:
+            for tmp_path, path in staged:
+                os.replace(tmp_path, path)
+                result.written.append(path)
+            staged.clear()
+    finally:
+        for tmp_path, _ in staged:
+            tmp_path.unlink()
+
+    return result
+
+
+def export_csv(root: Path, stream: TextIO) -> int:
+    """
+    Write every sheet in the compstate to a CSV stream, one row per match.
+    Returns the number of rows written.
+    """
+    converter = Converter()
+    writer = csv.DictWriter(stream, fieldnames(), lineterminator='\n')
+    writer.writeheader()
+
+    count = 0
+    for _, path in find_sheets(root):
+        writer.writerow(score_to_row(converter, load_sheet(path)))
+        count += 1
+    return count
+
+
+def load_matches(comp: SRComp) -> dict[MatchId, Match]:
+    return {
+        (match.arena, match.num): match
+        for slot in comp.schedule.matches
+        for match in slot.values()
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Bulk import or export score sheets as CSV.")
+    parser.add_argument(
+        '--compstate',
+        type=Path,
+        default=COMPSTATE_ROOT,
+        help="competition state repository (default: %(default)s)",
+    )
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = subparsers.add_parser('import', help="import sheets from a CSV file")
+    import_parser.add_argument('csv', type=argparse.FileType('r'))
+    import_parser.add_argument(
+        '--overwrite',
+        action='store_true',
+        help="replace existing score sheets",
+    )
+
+    export_parser = subparsers.add_parser('export', help="export all sheets to CSV")
+    export_parser.add_argument(
+        'csv',
+        type=argparse.FileType('w'),
+        nargs='?',
+        default=sys.stdout,
+    )
+
+    return parser.parse_args()
+
+
+def main(args: argparse.Namespace) -> int:
+    if args.command == 'export':
+        export_csv(args.compstate, args.csv)
+        return 0
+
+    compstate = RawCompstate(args.compstate, local_only=True)
+    result = import_csv(
+        args.csv,
+        compstate,
+        load_matches(compstate.load()),
+        overwrite=args.overwrite,
+    )
+
+    for error in result.errors:
+        print(error, file=sys.stderr)
+    if result.errors:
+        print(f"{len(result.errors)} errors, nothing written.", file=sys.stderr)
+        return 1
+
+    print(f"Wrote {len(result.written)} score sheets.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(parse_args()))
@@ -0,0 +1,295 @@
+"""
+Columnar store of every score sheet, for analytics.
+
+All the sheets in a compstate are packed into fixed-width columns and written
+to a single file which readers open via `mmap`. The columns are exposed as
+zero-copy `memoryview`s over the mapping, so any number of processes can share
+one copy of the data in the page cache rather than each parsing the YAML.
+Writing and reading the store needs only the standard library, so it can be
+built wherever the compstate is checked out; `as_numpy` wraps the same memory
+for aggregating over whole columns where NumPy is installed.
+
+Columns are indexed by match row (`m`), zone (`z`), district (`d`) and pallet
+colour (`c`) in the orders given by the store's `districts` and `colours`:
+
+    match_number        int32   [m]
+    kind                uint8   [m]         index into `SHEET_KINDS`
+    arena               uint8   [m]         index into the store's `arenas`
+    tla                 4 bytes [m, z]      ASCII, NUL padded; empty if no team
+    present             uint8   [m, z]
+    disqualified        uint8   [m, z]
+    left_starting_zone  uint8   [m, z]
+    pallets             uint8   [m, d, c]
+    highest             int8    [m, d]      colour index, -1 if none
+
+The file starts with a magic string, then a length-prefixed JSON header
+describing the columns, then the column data, each aligned to 8 bytes. Data
+are stored in the byte order of the machine which built the store.
+"""
+
+from __future__ import annotations
+
+import argparse
+import array
+import dataclasses
+import json
+import mmap
+import os
+import struct
+import sys
+from pathlib import Path
+from typing import Any, Iterable
+
+from sheets import COMPSTATE_ROOT, find_sheets, load_sheet, SHEET_KINDS
+from sr2025 import DISTRICTS, ZONE_COLOURS
+
+MAGIC = b'SR25COL\x01'
+HEADER_LENGTH = struct.Struct('<I')
+ALIGNMENT = 8
+TLA_WIDTH = 4
+# Counts are stored as uint8; valid sheets are far below this
+MAX_PALLETS = 255
+
+NUM_ZONES = len(ZONE_COLOURS)
+
+
+@dataclasses.dataclass(frozen=True)
+class ColumnSpec:
+    name: str
+    # `array`/`memoryview` format character
+    typecode: str
+    # Dimensions beyond the match row
+    shape: tuple[int, ...]
+
+
+COLUMNS = (
+    ColumnSpec('match_number', 'i', ()),
+    ColumnSpec('kind', 'B', ()),
+    ColumnSpec('arena', 'B', ()),
+    ColumnSpec('tla', 'B', (NUM_ZONES, TLA_WIDTH)),
+    ColumnSpec('present', 'B', (NUM_ZONES,)),
+    ColumnSpec('disqualified', 'B', (NUM_ZONES,)),
+    ColumnSpec('left_starting_zone', 'B', (NUM_ZONES,)),
+    ColumnSpec('pallets', 'B', (len(DISTRICTS), len(ZONE_COLOURS))),
+    ColumnSpec('highest', 'b', (len(DISTRICTS),)),
+)
+
+_NUMPY_DTYPES = {'i': 'int32', 'B': 'uint8', 'b': 'int8'}
+
+
+class InvalidStoreException(Exception):
+    pass
+
+
+def _align(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def _pack_sheets(sheets: Iterable[tuple[str, dict[str, Any]]]) -> tuple[
+    dict[str, array.array[int]],
+    list[str],
+]:
+    columns = {spec.name: array.array(spec.typecode) for spec in COLUMNS}
+    arenas: list[str] = []
+
+    for kind, sheet in sheets:
+        arena = sheet['arena_id']
+        if arena not in arenas:
+            arenas.append(arena)
+
+        columns['match_number'].append(sheet['match_number'])
+        columns['kind'].append(SHEET_KINDS.index(kind))
+        columns['arena'].append(arenas.index(arena))
+
+        by_zone = {info['zone']: (tla, info) for tla, info in sheet['teams'].items()}
+        for zone in range(NUM_ZONES):
+            # Teams are present unless marked otherwise (as SRComp assumes),
+            # but an empty zone isn't
+            tla, info = by_zone.get(zone, ('', {'present': False}))
+            encoded = tla.encode('ascii')
+            if len(encoded) > TLA_WIDTH:
+                raise ValueError(
+                    f"Can't store TLA {tla!r} (more than {TLA_WIDTH} characters) in "
+                    f"{kind} match {sheet['match_number']} in arena {arena}",
+                )
+            columns['tla'].extend(encoded.ljust(TLA_WIDTH, b'\0'))
+            columns['present'].append(bool(info.get('present', True)))
+            columns['disqualified'].append(bool(info.get('disqualified', False)))
+            columns['left_starting_zone'].append(
+                bool(info.get('left_starting_zone', False)),
+            )
+
+        districts = sheet['arena_zones']['other']['districts']
+        for name in DISTRICTS:
+            district = districts[name]
+            for colour in ZONE_COLOURS:
+                count = district['pallets'].get(colour, 0)
+                if not 0 <= count <= MAX_PALLETS:
+                    raise ValueError(
+                        f"Can't store {count} {colour} pallets in district {name} of "
+                        f"{kind} match {sheet['match_number']} in arena {arena}",
+                    )
+                columns['pallets'].append(count)
+            highest = district['highest'].strip()
+            columns['highest'].append(
+                ZONE_COLOURS.index(highest) if highest else -1,
+            )
+
+    return columns, arenas
+
+
+def write_store(sheets: Iterable[tuple[str, dict[str, Any]]], path: Path) -> int:
+    """
+    Pack the given `(kind, sheet)` pairs into a store at the given path,
+    returning the number of matches written.
+
+    The file is replaced atomically so that existing readers keep their (now
+    stale) mapping of the old data.
+    """
+    columns, arenas = _pack_sheets(sheets)
+    num_matches = len(columns['match_number'])
+
+    layout = []
+    header = {
+        'byteorder': sys.byteorder,
+        'num_matches': num_matches,
+        'arenas': arenas,
+        'districts': list(DISTRICTS),
+        'colours': list(ZONE_COLOURS),
+        'columns': layout,
+    }
+
+    # The header's own size determines where the data start, so repeat until
+    # the layout settles.
+    data_start = -1
+    encoded_start = 0
+    while data_start != encoded_start:
+        data_start = encoded_start
+        layout.clear()
+        offset = data_start
+        for spec in COLUMNS:
+            column = columns[spec.name]
+            layout.append({
+                'name': spec.name,
+                'typecode': spec.typecode,
+                'shape': [num_matches, *spec.shape],
+                'offset': offset,
+                'nbytes': len(column) * column.itemsize,
+            })
+            offset = _align(offset + len(column) * column.itemsize)
+        encoded = json.dumps(header).encode('utf-8')
+        encoded_start = _align(len(MAGIC) + HEADER_LENGTH.size + len(encoded))
+
+    tmp_path = path.with_name(path.name + '.tmp')
+    with tmp_path.open('wb') as f:
+        f.write(MAGIC)
+        f.write(HEADER_LENGTH.pack(len(encoded)))
+        f.write(encoded)
+        for spec, info in zip(COLUMNS, layout):
+            f.write(b'\0' * (info['offset'] - f.tell()))
+            columns[spec.name].tofile(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+    return num_matches
+
+
+def build_store(root: Path, path: Path) -> int:
+    """
+    Pack all the sheets in the given compstate into a store at the given path.
+    """
+    return write_store(
+        ((kind, load_sheet(sheet_path)) for kind, sheet_path in find_sheets(root)),
+        path,
+    )
+
+
+class ColumnarStore:
+    """
+    Read-only view of a columnar store file.
+    """
+
+    def __init__(self, path: Path) -> None:
+        with path.open('rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            raise InvalidStoreException(f"{path} is not a columnar score store")
+
+        start = len(MAGIC) + HEADER_LENGTH.size
+        (length,) = HEADER_LENGTH.unpack_from(self._mmap, len(MAGIC))
+        header = json.loads(self._mmap[start:start + length])
+
+        if header['byteorder'] != sys.byteorder:
+            raise InvalidStoreException(
+                f"{path} was built on a {header['byteorder']}-endian machine",
+            )
+        if header['districts'] != list(DISTRICTS) or header['colours'] != list(ZONE_COLOURS):
+            raise InvalidStoreException(f"{path} was built for a different game")
+
+        self.num_matches: int = header['num_matches']
+        self.arenas: list[str] = header['arenas']
+        self.districts: list[str] = header['districts']
+        self.colours: list[str] = header['colours']
+        self._layout = {x['name']: x for x in header['columns']}
+
+    def __enter__(self) -> ColumnarStore:
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._mmap.close()
+
+    def column(self, name: str) -> memoryview:
+        """
+        A zero-copy view of the named column, shaped as documented above.
+        """
+        info = self._layout[name]
+        raw = memoryview(self._mmap)[info['offset']:info['offset'] + info['nbytes']]
+        if not info['nbytes']:
+            # memoryview can't reshape empty buffers.
+            return raw.cast(info['typecode'])
+        return raw.cast(info['typecode'], shape=info['shape'])
+
+    def as_numpy(self, name: str) -> Any:
+        """
+        A zero-copy NumPy array over the named column.
+
+        Requires numpy, which is only imported here.
+        """
+        import numpy
+
+        info = self._layout[name]
+        dtype = numpy.dtype(_NUMPY_DTYPES[info['typecode']])
+        return numpy.frombuffer(
+            self._mmap,
+            dtype=dtype,
+            count=info['nbytes'] // dtype.itemsize,
+            offset=info['offset'],
+        ).reshape(info['shape'])
+
+    def tla(self, row: int, zone: int) -> str | None:
+        start = self._layout['tla']['offset'] + (row * NUM_ZONES + zone) * TLA_WIDTH
+        value = self._mmap[start:start + TLA_WIDTH].rstrip(b'\0').decode('ascii')
+        return value or None
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('output', type=Path, help="path to write the store to")
+    parser.add_argument(
+        '--compstate',
+        type=Path,
+        default=COMPSTATE_ROOT,
+        help="competition state repository (default: %(default)s)",
+    )
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    count = build_store(args.compstate, args.output)
+    print(f"Wrote {count} matches to {args.output}")
@@ -10,6 +10,9 @@ for simple cases.
 
 from __future__ import annotations
 
+import collections
+from typing import Mapping, Sequence
+
 from sr.comp.match_period import Match
 from sr.comp.scorer.converter import (
     Converter as BaseConverter,
@@ -21,6 +24,9 @@ from sr.comp.scorer.converter import (
 )
 from sr.comp.types import ScoreArenaZonesData, ScoreData, ScoreTeamData, TLA
 
+from score import InvalidScoresheetException, TOKENS_PER_ZONE
+from sheet_schema import check_sheet
+from sheets import calculate_scores
 from sr2025 import DISTRICTS, RawDistrict, ZONE_COLOURS
 
 
@@ -28,6 +34,100 @@ class SR2025ScoreTeamData(ScoreTeamData):
     left_starting_zone: bool
 
 
+class InvalidFormError(ValueError):
+    """
+    The submitted form doesn't describe a valid score sheet.
+
+    This is a `ValueError` so that the Scorer UI shows it against the form
+    rather than failing the request. `errors` maps the form keys at fault to
+    what's wrong with them; problems which can't be pinned on a single field
+    are under `None`.
+    """
+
+    def __init__(self, errors: Mapping[str | None, Sequence[str]], *, code: str) -> None:
+        self.errors = {key: list(messages) for key, messages in errors.items()}
+        self.code = code
+        super().__init__('\n'.join(
+            message if key is None else f"{key}: {message}"
+            for key, messages in self.errors.items()
+            for message in messages
+        ))
+
+
+def _count_errors(form: InputForm) -> dict[str | None, list[str]]:
+    """
+    Problems with the pallet counts in a form, which must be whole numbers.
+    """
+    errors: dict[str | None, list[str]] = {}
+    for name in DISTRICTS:
+        for x in ZONE_COLOURS:
+            key = f'district_{name}_pallets_{x}'
+            try:
+                count = parse_int(form.get(key))
+            except ValueError:
+                errors[key] = ["must be a whole number"]
+                continue
+            if count < 0:
+                errors[key] = ["must not be negative"]
+    return errors
+
+
+def _field_errors(
+    score: ScoreData,
+    zones: Mapping[TLA, ZoneId],
+    districts: Mapping[str, RawDistrict],
+    error: InvalidScoresheetException,
+) -> dict[str | None, list[str]]:
+    """
+    The form keys responsible for a sheet failing validation.
+    """
+    errors: dict[str | None, list[str]] = collections.defaultdict(list)
+
+    if error.code == 'invalid_structure':
+        for sheet_error in check_sheet(score):
+            match sheet_error.path:
+                case ('teams', tla, field) if tla in zones:
+                    errors[f'{field}_{zones[tla]}'].append(sheet_error.message)
+                case ('arena_zones', 'other', 'districts', name, 'highest'):
+                    errors[f'district_{name}_highest'].append(sheet_error.message)
+                case ('arena_zones', 'other', 'districts', name, 'pallets', x):
+                    errors[f'district_{name}_pallets_{x}'].append(sheet_error.message)
+                case _:
+                    errors[None].append(str(sheet_error))
+
+    elif error.code == 'invalid_highest_pallet':
+        for name, district in districts.items():
+            highest = district['highest'].replace(' ', '')
+            if highest and highest not in ZONE_COLOURS:
+                errors[f'district_{name}_highest'].append(
+                    f"must be one of {', '.join(ZONE_COLOURS)}",
+                )
+
+    elif error.code == 'impossible_highest_pallet':
+        for name, district in districts.items():
+            highest = district['highest'].replace(' ', '')
+            if highest and not district['pallets'].get(highest):
+                errors[f'district_{name}_highest'].append(
+                    f"there are no {highest} pallets in this district",
+                )
+
+    elif error.code == 'too_many_pallets':
+        totals: collections.Counter[str] = collections.Counter()
+        for district in districts.values():
+            totals.update(district['pallets'])
+        for name, district in districts.items():
+            for x, count in district['pallets'].items():
+                if count and totals[x] > TOKENS_PER_ZONE:
+                    errors[f'district_{name}_pallets_{x}'].append(
+                        f"there are {totals[x]} {x} pallets in total, but only "
+                        f"{TOKENS_PER_ZONE} in the arena",
+                    )
+
+    if not errors:
+        errors[None].append(str(error))
+    return dict(errors)
+
+
 class Converter(BaseConverter):
     """
     Base class for converting between representations of a match's score.
@@ -63,31 +163,62 @@ class Converter(BaseConverter):
 
         This method is used to convert the submitted information for storage as
         YAML in the compstate.
+
+        The sheet is validated as the compstate's validation would, raising an
+        `InvalidFormError` naming the form fields at fault, so that mistakes
+        are caught at entry rather than once the sheet has been committed.
+
+        A form submitted with the Scorer UI's "Save anyway" (`force`) is only
+        rejected if it can't be turned into a sheet at all, so that the head
+        judge can still record a sheet which breaks the rules.
         """
+        errors = _count_errors(form)
+        if errors:
+            raise InvalidFormError(errors, code='invalid_count')
+
         zone_ids = range(len(match.teams))
 
         teams: dict[TLA, ScoreTeamData] = {}
         for zone_id in zone_ids:
             tla = form.get(f'tla_{zone_id}', None)
             if tla:
+                if tla not in match.teams:
+                    errors[f'tla_{zone_id}'] = ["is not one of the teams in this match"]
                 teams[TLA(tla)] = self.form_team_to_score(form, zone_id)
+        if errors:
+            raise InvalidFormError(errors, code='unknown_team')
 
+        districts = {
+            district: self.form_district_to_score(form, district)
+            for district in DISTRICTS
+        }
         arena = ScoreArenaZonesData({
             'other': {
-                'districts': {
-                    district: self.form_district_to_score(form, district)
-                    for district in DISTRICTS
-                },
+                'districts': districts,
             },
         })
 
-        return ScoreData({
+        score = ScoreData({
             'arena_id': match.arena,
             'match_number': match.num,
             'teams': teams,
             'arena_zones': arena,
         })
 
+        if form.get('force'):
+            return score
+
+        try:
+            calculate_scores(score)  # type: ignore[arg-type]
+        except InvalidScoresheetException as e:
+            zones = {tla: info['zone'] for tla, info in teams.items()}
+            raise InvalidFormError(
+                _field_errors(score, zones, districts, e),
+                code=e.code,
+            ) from e
+
+        return score
+
     def score_team_to_form(self, tla: TLA, info: ScoreTeamData) -> OutputForm:
         zone_id = info['zone']
         return OutputForm({
@@ -0,0 +1,412 @@
+"""
+Time-compressed replay of a whole competition, as a load test of the scoring
+pipeline.
+
+Every match in the compstate's schedule (the league from `league.yaml`, the
+static knockout and the `delays`, as SRComp schedules them) has its score
+saved at the end of its slot, in order, with time running some number of
+times faster than real time. Each save goes through the same steps as during
+the event:
+
+- `convert`: the sheet is rendered to the Scorer UI's form and back through
+  the `Converter`, which validates it;
+- `score`: the sheet is scored by the `Scorer`;
+- `rank`: league matches are added to the league table and the positions
+  recomputed with the `Ranker`;
+- `seed`: the knockout seeds are updated from the league table and applied
+  to the knockout;
+- `knockout`: knockout matches are ranked and the matches which follow on
+  from them resolved.
+
+The committed sheets are used where they fit, otherwise (or with
+`--synthesise`) sheets are generated at random for the teams actually in the
+match. The latency of each save is measured from when it was due to when
+the standings reflect it, so it includes any time spent waiting behind
+earlier saves: a pipeline which can't keep up shows as a growing latency.
+
+Gaps between matches longer than a match slot (overnight, lunch) are cut to
+a single slot so that a replay doesn't spend most of its time idle.
+Nothing is written to the compstate and no network access is needed.
+"""
+
+from __future__ import annotations
+
+import argparse
+import dataclasses
+import datetime
+import random
+import statistics
+import time
+from pathlib import Path
+from typing import Any, Callable, Iterable, Mapping, Sequence
+
+from sr.comp.comp import SRComp
+from sr.comp.knockout_scheduler import UNKNOWABLE_TEAM
+from sr.comp.match_period import Match, MatchType
+from sr.comp.scorer.converter import InputForm
+from sr.comp.types import MatchId, MatchNumber, TLA
+
+from converter import Converter
+from knockout_progress import KnockoutResolver, load_team_refs
+from score import TOKENS_PER_ZONE
+from seeding import KnockoutSeeding
+from sheets import (
+    calculate_scores,
+    COMPSTATE_ROOT,
+    find_sheets,
+    load_sheet,
+    match_id,
+)
+from sr2025 import DISTRICTS, ZONE_COLOURS
+from standings import disqualified_teams, LeagueTable
+
+STAGES = ('convert', 'score', 'rank', 'seed', 'knockout')
+
+
+@dataclasses.dataclass(frozen=True)
+class Save:
+    match: Match
+    # When the sheet is saved, in competition time
+    at: datetime.datetime
+    # The committed sheet, if there is one
+    sheet: dict[str, Any] | None
+
+
+@dataclasses.dataclass(frozen=True)
+class Sample:
+    key: MatchId
+    type: MatchType
+    # Seconds from when the save was due to when the standings reflected it
+    latency: float
+    # Seconds spent in each stage
+    stages: dict[str, float]
+    synthesised: bool
+
+
+def synthesise_sheet(match: Match, rng: random.Random) -> dict[str, Any]:
+    """
+    Generate a valid sheet for the teams in a match at random.
+    """
+    districts: dict[str, Any] = {
+        name: {'highest': '', 'pallets': {x: 0 for x in ZONE_COLOURS}}
+        for name in DISTRICTS
+    }
+    sheet_teams = {}
+    for zone, tla in enumerate(match.teams):
+        if tla is None:
+            continue
+        if tla == UNKNOWABLE_TEAM:
+            raise ValueError(f"The teams in {match.display_name} aren't known yet")
+        present = rng.random() > 0.05
+        sheet_teams[tla] = {
+            'zone': zone,
+            'present': present,
+            'disqualified': False,
+            'left_starting_zone': present and rng.random() > 0.2,
+        }
+        if not present:
+            continue
+        colour = ZONE_COLOURS[zone]
+        for _ in range(rng.randint(0, TOKENS_PER_ZONE)):
+            districts[rng.choice(list(DISTRICTS))]['pallets'][colour] += 1
+
+    for district in districts.values():
+        colours = [x for x, count in district['pallets'].items() if count]
+        if colours and rng.random() > 0.5:
+            district['highest'] = rng.choice(colours)
+
+    return {
+        'arena_id': match.arena,
+        'match_number': match.num,
+        'teams': sheet_teams,
+        'arena_zones': {'other': {'districts': districts}},
+    }
+
+
+def _sheet_teams(sheet: Mapping[str, Any]) -> list[TLA | None]:
+    teams: list[TLA | None] = [None] * len(ZONE_COLOURS)
+    for tla, info in sheet['teams'].items():
+        teams[info['zone']] = tla
+    return teams
+
+
+def _time_compressor(
+    times: Iterable[datetime.datetime],
+    max_gap: datetime.timedelta,
+) -> dict[datetime.datetime, float]:
+    """
+    Map competition times to seconds since the first, with gaps longer than
+    `max_gap` cut down to it.
+    """
+    offsets = {}
+    offset = 0.0
+    previous = None
+    for when in sorted(set(times)):
+        if previous is not None:
+            offset += min(when - previous, max_gap).total_seconds()
+        offsets[when] = offset
+        previous = when
+    return offsets
+
+
+class DayReplay:
+    """
+    The state of the scoring pipeline through a replayed competition.
+    """
+
+    def __init__(
+        self,
+        saves: Sequence[Save],
+        table: LeagueTable,
+        seeding: KnockoutSeeding,
+        resolver: KnockoutResolver,
+        *,
+        max_gap: datetime.timedelta,
+        seed: int = 0,
+    ) -> None:
+        self.saves = sorted(saves, key=lambda x: (x.at, x.match.arena, x.match.num))
+        self.table = table
+        self.seeding = seeding
+        self.resolver = resolver
+        self._rng = random.Random(seed)
+        self._converter = Converter()
+        self._offsets = _time_compressor((x.at for x in self.saves), max_gap)
+
+    @classmethod
+    def load(
+        cls,
+        root: Path = COMPSTATE_ROOT,
+        *,
+        synthesise: bool = False,
+        seed: int = 0,
+    ) -> DayReplay:
+        """
+        Set up a replay of the given compstate's schedule, starting from no
+        results at all.
+        """
+        comp = SRComp(root)
+
+        sheets = {}
+        if not synthesise:
+            for _, path in find_sheets(root):
+                sheet = load_sheet(path)
+                sheets[match_id(sheet)] = sheet
+
+        saves = [
+            Save(match, match.end_time, sheets.get((match.arena, match.num)))
+            for slot in comp.schedule.matches
+            for match in slot.values()
+        ]
+
+        first_knockout_match = MatchNumber(comp.schedule.n_league_matches)
+        table = LeagueTable.for_compstate(root)
+        seeding = KnockoutSeeding(
+            table,
+            [
+                tla
+                for tla, team in comp.teams.items()
+                if team.is_still_around(first_knockout_match)
+            ],
+            [
+                (save.match.arena, save.match.num)
+                for save in saves
+                if save.match.type == MatchType.league
+            ],
+        )
+        resolver = KnockoutResolver(
+            comp.schedule.knockout_rounds,
+            load_team_refs(root),
+            seeding.seeds,
+            table.positions,
+        )
+        return cls(
+            saves,
+            table,
+            seeding,
+            resolver,
+            max_gap=comp.schedule.match_duration,
+            seed=seed,
+        )
+
+    def due(self, save: Save) -> float:
+        """
+        Seconds of (compressed) competition time from the first save to the
+        given one.
+        """
+        return self._offsets[save.at]
+
+    def _sheet(self, save: Save) -> tuple[Match, dict[str, Any], bool]:
+        match = save.match
+        if match.type == MatchType.knockout:
+            match = self.resolver.match(match.num)
+        if (
+            save.sheet is not None
+            and set(_sheet_teams(save.sheet)) - {None} == set(match.teams) - {None}
+        ):
+            return match, save.sheet, False
+        return match, synthesise_sheet(match, self._rng), True
+
+    def process(self, save: Save) -> tuple[dict[str, float], bool]:
+        """
+        Push a single save through the pipeline, returning the time spent in
+        each stage and whether the sheet was synthesised.
+        """
+        stages = dict.fromkeys(STAGES, 0.0)
+        match, sheet, synthesised = self._sheet(save)
+
+        start = time.perf_counter()
+        form = InputForm({
+            key: str(value)
+            for key, value in self._converter.score_to_form(sheet).items()
+            if value not in (False, None)
+        })
+        score = self._converter.form_to_score(match, form)
+        stages['convert'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        # Already validated by the converter, as the Scorer UI's are
+        game_points = calculate_scores(score, validate=False)
+        stages['score'] = time.perf_counter() - start
+
+        if match.type == MatchType.league:
+            start = time.perf_counter()
+            self.table.set_match(
+                (match.arena, match.num),
+                game_points,
+                disqualified_teams(score),
+            )
+            # Positions are computed lazily, so make sure they're counted
+            self.table.positions
+            stages['rank'] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            if self.seeding.update():
+                self.resolver.set_seeds(self.seeding.seeds, self.table.positions)
+            stages['seed'] = time.perf_counter() - start
+        else:
+            start = time.perf_counter()
+            self.resolver.add_sheet(score, game_points=game_points)
+            stages['knockout'] = time.perf_counter() - start
+
+        return stages, synthesised
+
+    def run(
+        self,
+        speed: float,
+        *,
+        clock: Callable[[], float] = time.perf_counter,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> list[Sample]:
+        """
+        Replay every save, `speed` times faster than real time.
+        """
+        samples = []
+        start = clock()
+        for save in self.saves:
+            due = start + self.due(save) / speed
+            wait = due - clock()
+            if wait > 0:
+                sleep(wait)
+
+            stages, synthesised = self.process(save)
+            samples.append(Sample(
+                (save.match.arena, save.match.num),
+                save.match.type,
+                clock() - due,
+                stages,
+                synthesised,
+            ))
+        return samples
+
+
+def percentiles(values: Sequence[float]) -> dict[str, float]:
+    """
+    The median, 95th and 99th percentiles and maximum of some values.
+    """
+    if len(values) < 2:
+        # `statistics.quantiles` needs at least two values
+        value = values[0] if values else 0
+        return {'p50': value, 'p95': value, 'p99': value, 'max': value}
+    quantiles = statistics.quantiles(values, n=100, method='inclusive')
+    return {
+        'p50': quantiles[49],
+        'p95': quantiles[94],
+        'p99': quantiles[98],
+        'max': max(values),
+    }
+
+
+def _format_percentiles(values: Sequence[float]) -> str:
+    return ', '.join(
+        f"{name} {value * 1000:.2f}ms"
+        for name, value in percentiles(values).items()
+    )
+
+
+def format_report(samples: Sequence[Sample], elapsed: float) -> str:
+    lines = []
+    synthesised = sum(x.synthesised for x in samples)
+    lines.append(
+        f"Replayed {len(samples)} saves ({synthesised} synthesised) in {elapsed:.2f}s",
+    )
+
+    for match_type in MatchType:
+        of_type = [x for x in samples if x.type == match_type]
+        if not of_type:
+            continue
+        lines.append(
+            f"{match_type.value.title()} latency: "
+            f"{_format_percentiles([x.latency for x in of_type])}",
+        )
+
+    lines.append("Time per stage:")
+    for stage in STAGES:
+        times = [x.stages[stage] for x in samples if x.stages[stage]]
+        if times:
+            lines.append(f"  {stage:<8} {_format_percentiles(times)}")
+    return '\n'.join(lines)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Load test the scoring pipeline by replaying a whole competition.",
+    )
+    parser.add_argument(
+        '--compstate',
+        type=Path,
+        default=COMPSTATE_ROOT,
+        help="competition state repository (default: %(default)s)",
+    )
+    parser.add_argument(
+        '--speed',
+        type=float,
+        default=100,
+        help="how many times faster than real time to run (default: %(default)s)",
+    )
+    parser.add_argument(
+        '--synthesise',
+        action='store_true',
+        help="generate every sheet rather than using the committed ones",
+    )
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    if args.speed <= 0:
+        parser.error("--speed must be positive")
+    return args
+
+
+def main(args: argparse.Namespace) -> None:
+    replay = DayReplay.load(args.compstate, synthesise=args.synthesise, seed=args.seed)
+    duration = replay.due(replay.saves[-1]) / args.speed
+    print(f"Replaying {len(replay.saves)} matches over {duration:.1f}s")
+
+    start = time.perf_counter()
+    samples = replay.run(args.speed)
+    print(format_report(samples, time.perf_counter() - start))
+
+
+if __name__ == '__main__':
+    try:
+        main(parse_args())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,415 @@
+"""
+Preview the effect of a delay on the rest of the competition.
+
+Recording a delay (`srcomp add-delay`, or `scripts/delay-knockouts.py` for
+the static knockout) changes the schedule straight away. This instead
+projects what a candidate delay would do, so that several options can be
+compared before committing to one:
+
+- League matches are rescheduled by SRComp's own scheduler with the delay
+  added, so matches which would be pushed into a later period (or out of the
+  league altogether) are shown as they would really happen. Whether a match
+  moves into the next period depends on where every earlier match landed, so
+  this isn't a shift which could be applied to all the slots at once, and
+  reusing the scheduler keeps the projection exact.
+- Knockout matches are shifted as `delay-knockouts.py` would shift them,
+  either by the whole delay or absorbing it into the slack between matches
+  (`--squash-slack`). Each match's shift is the delay less all the slack
+  before it, so the shifts are computed in a single pass as a running total
+  of the absorbed slack. A delay during the league only affects the
+  knockouts if the league would run into them.
+
+Each projection flags matches which would start after the end of their period
+and teams left with less than the minimum rest between matches which weren't
+already.
+
+The command line interface requires sr.comp.cli.
+"""
+
+from __future__ import annotations
+
+import argparse
+import dataclasses
+import datetime
+import itertools
+from pathlib import Path
+from typing import Any, Iterable, Sequence
+
+from sr.comp import yaml_loader
+from sr.comp.comp import SRComp
+from sr.comp.knockout_scheduler import UNKNOWABLE_TEAM
+from sr.comp.match_period import Match, MatchType
+from sr.comp.matches import MatchSchedule
+from sr.comp.types import TLA
+
+from sheets import COMPSTATE_ROOT
+
+DEFAULT_ROUND_SPACING = datetime.timedelta(minutes=5)
+DEFAULT_MIN_REST = datetime.timedelta(minutes=5)
+
+
+@dataclasses.dataclass(frozen=True)
+class ProjectedMatch:
+    num: int
+    type: MatchType
+    teams: tuple[TLA, ...]
+    start_time: datetime.datetime
+    end_time: datetime.datetime
+    # The end of the period the match was scheduled in
+    period_end: datetime.datetime
+
+    @property
+    def overruns(self) -> bool:
+        return self.start_time > self.period_end
+
+
+@dataclasses.dataclass(frozen=True)
+class RestViolation:
+    tla: TLA
+    # The match numbers either side of the gap
+    before: int
+    after: int
+    gap: datetime.timedelta
+
+
+@dataclasses.dataclass(frozen=True)
+class Projection:
+    delay: datetime.timedelta
+    squash_slack: bool
+    matches: list[ProjectedMatch]
+    # League matches which would no longer fit in any period
+    dropped: list[int]
+    # Rest violations which the delay would introduce
+    rest_violations: list[RestViolation]
+
+    @property
+    def overruns(self) -> list[ProjectedMatch]:
+        return [x for x in self.matches if x.overruns]
+
+    @property
+    def last_start(self) -> datetime.datetime:
+        return self.matches[-1].start_time
+
+
+def shift_knockouts(
+    start_times: Sequence[datetime.datetime],
+    round_starts: Sequence[bool],
+    delay: datetime.timedelta,
+    *,
+    slot_duration: datetime.timedelta,
+    squash_slack: bool,
+    round_spacing: datetime.timedelta = DEFAULT_ROUND_SPACING,
+) -> list[datetime.timedelta]:
+    """
+    Compute how far each of a run of knockout matches would be shifted by a
+    delay starting at the first of them, as `delay-knockouts.py` does.
+
+    When squashing slack, any time between matches beyond a slot (and the
+    spacing kept at the start of each round) absorbs some of the delay.
+    """
+    zero = datetime.timedelta(0)
+    if not squash_slack:
+        return [delay] * len(start_times)
+
+    absorbed = [
+        max(zero, spacing - (round_spacing if round_start else zero))
+        for spacing, round_start in zip(
+            (
+                start - previous - slot_duration
+                for previous, start in zip(
+                    itertools.chain(start_times[:1], start_times),
+                    start_times,
+                )
+            ),
+            round_starts,
+        )
+    ]
+    return [
+        max(zero, delay - total)
+        for total in itertools.accumulate(absorbed)
+    ]
+
+
+def find_rest_violations(
+    matches: Iterable[ProjectedMatch],
+    min_rest: datetime.timedelta,
+) -> list[RestViolation]:
+    """
+    Find every pair of consecutive matches for a team with too short a gap
+    between them.
+    """
+    last_match: dict[TLA, ProjectedMatch] = {}
+    violations = []
+    for match in sorted(matches, key=lambda x: x.num):
+        for tla in match.teams:
+            previous = last_match.get(tla)
+            if previous is not None:
+                gap = match.start_time - previous.end_time
+                if gap < min_rest:
+                    violations.append(RestViolation(tla, previous.num, match.num, gap))
+            last_match[tla] = match
+    return violations
+
+
+class DelayProjector:
+    """
+    The schedule of a compstate, ready to project delays onto.
+    """
+
+    def __init__(self, root: Path = COMPSTATE_ROOT) -> None:
+        comp = SRComp(root)
+        self._config = yaml_loader.load(root / 'schedule.yaml')
+        self._league = yaml_loader.load(root / 'league.yaml')['matches']
+        self._teams = comp.teams
+        self._num_teams_per_arena = comp.num_teams_per_arena
+        self._slot_duration = comp.schedule.match_duration
+
+        knockout_period, = (
+            x for x in comp.schedule.match_periods if x.type == MatchType.knockout
+        )
+        self._knockouts: list[tuple[Match, bool]] = [
+            (match, index == 0)
+            for knockout_round in comp.schedule.knockout_rounds
+            for index, match in enumerate(knockout_round)
+        ]
+        self._knockout_start = knockout_period.start_time
+        self._knockout_end = knockout_period.end_time
+
+        self._baselines: dict[datetime.timedelta, set[tuple[TLA, int, int]]] = {}
+
+    def _league_matches(
+        self,
+        delay: datetime.timedelta,
+        when: datetime.datetime,
+    ) -> tuple[list[ProjectedMatch], list[int]]:
+        config = dict(self._config)
+        if delay:
+            config['delays'] = [
+                *(config.get('delays') or []),
+                {'delay': delay.total_seconds(), 'time': when},
+            ]
+        schedule = MatchSchedule(
+            config,
+            self._league,
+            self._teams,
+            self._num_teams_per_arena,
+        )
+
+        matches = [
+            _project(match, match.start_time, period.end_time)
+            for period in schedule.match_periods
+            for slot in period.matches
+            for match in slot.values()
+        ]
+        dropped = list(range(schedule.n_league_matches, schedule.n_planned_league_matches))
+        return matches, dropped
+
+    def _knockout_matches(
+        self,
+        delay: datetime.timedelta,
+        when: datetime.datetime,
+        squash_slack: bool,
+        round_spacing: datetime.timedelta,
+    ) -> list[ProjectedMatch]:
+        first = next(
+            (i for i, (match, _) in enumerate(self._knockouts) if match.start_time >= when),
+            len(self._knockouts),
+        )
+        affected = self._knockouts[first:]
+        shifts = [datetime.timedelta(0)] * first + shift_knockouts(
+            [match.start_time for match, _ in affected],
+            [round_start for _, round_start in affected],
+            delay,
+            slot_duration=self._slot_duration,
+            squash_slack=squash_slack,
+            round_spacing=round_spacing,
+        )
+        return [
+            _project(match, match.start_time + shift, self._knockout_end)
+            for (match, _), shift in zip(self._knockouts, shifts)
+        ]
+
+    def project(
+        self,
+        delay: datetime.timedelta,
+        when: datetime.datetime,
+        *,
+        squash_slack: bool = False,
+        round_spacing: datetime.timedelta = DEFAULT_ROUND_SPACING,
+        min_rest: datetime.timedelta = DEFAULT_MIN_REST,
+    ) -> Projection:
+        """
+        Project the schedule as it would be after a delay at the given time.
+        """
+        league, dropped = self._league_matches(delay, when)
+
+        # The knockout times are fixed, so a delay before the knockouts only
+        # affects them if it pushes the league into them.
+        knockout_delay = delay
+        if when < self._knockout_start and self._knockouts:
+            overlap = league[-1].end_time - self._knockouts[0][0].start_time
+            knockout_delay = max(datetime.timedelta(0), overlap)
+
+        matches = league + self._knockout_matches(
+            knockout_delay,
+            when,
+            squash_slack,
+            round_spacing,
+        )
+
+        # A zero delay leaves the schedule as it is, whenever it happens
+        if min_rest not in self._baselines:
+            zero = datetime.timedelta(0)
+            self._baselines[min_rest] = {
+                (x.tla, x.before, x.after)
+                for x in find_rest_violations(
+                    self._league_matches(zero, when)[0]
+                    + self._knockout_matches(zero, when, False, round_spacing),
+                    min_rest,
+                )
+            }
+        baseline = self._baselines[min_rest]
+
+        return Projection(
+            delay,
+            squash_slack,
+            matches,
+            dropped,
+            [
+                x
+                for x in find_rest_violations(matches, min_rest)
+                if (x.tla, x.before, x.after) not in baseline
+            ],
+        )
+
+    def compare(
+        self,
+        delays: Iterable[datetime.timedelta],
+        when: datetime.datetime,
+        **kwargs: Any,
+    ) -> list[Projection]:
+        """
+        Project each of the given delays, both with and without squashing.
+        """
+        return [
+            self.project(delay, when, squash_slack=squash_slack, **kwargs)
+            for delay in delays
+            for squash_slack in (False, True)
+        ]
+
+
+def _project(
+    match: Match,
+    start_time: datetime.datetime,
+    period_end: datetime.datetime,
+) -> ProjectedMatch:
+    return ProjectedMatch(
+        match.num,
+        match.type,
+        tuple(x for x in match.teams if x is not None and x != UNKNOWABLE_TEAM),
+        start_time,
+        start_time + (match.end_time - match.start_time),
+        period_end,
+    )
+
+
+def format_comparison(projections: Sequence[Projection]) -> str:
+    def overrun(projection: Projection) -> str:
+        if not projection.overruns:
+            return '-'
+        worst = max(x.start_time - x.period_end for x in projection.overruns)
+        return f"{len(projection.overruns)} (up to {worst})"
+
+    rows = [('Delay', 'Mode', 'Last start', 'Overruns', 'Dropped', 'New rest gaps')]
+    rows += [
+        (
+            str(x.delay),
+            'squash' if x.squash_slack else 'shift',
+            x.last_start.strftime('%a %H:%M'),
+            overrun(x),
+            str(len(x.dropped)),
+            str(len(x.rest_violations)),
+        )
+        for x in projections
+    ]
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    lines = [
+        '  '.join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip()
+        for row in rows
+    ]
+
+    for projection in projections:
+        mode = 'squash' if projection.squash_slack else 'shift'
+        details = [
+            f"  Match {x.num} starts {x.start_time - x.period_end} after its period ends"
+            for x in projection.overruns
+        ] + [
+            f"  {x.tla} has {x.gap} between matches {x.before} and {x.after}"
+            for x in projection.rest_violations
+        ]
+        if projection.dropped:
+            details.append("  League matches no longer scheduled: " + ', '.join(
+                str(x) for x in projection.dropped
+            ))
+        if details:
+            lines += ['', f"{projection.delay} ({mode}):", *details]
+
+    return '\n'.join(lines)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Compare the effect of candidate delays on the schedule.",
+    )
+    parser.add_argument(
+        '--compstate',
+        type=Path,
+        default=COMPSTATE_ROOT,
+        help="competition state repository (default: %(default)s)",
+    )
+    parser.add_argument(
+        'delays',
+        nargs='+',
+        help="candidate delays, as a number of seconds or a string of the form 1m30s",
+    )
+    parser.add_argument(
+        '--when',
+        default='now',
+        help=(
+            "when the delay would occur, in any form accepted by `srcomp add-delay` "
+            "(default: %(default)s)"
+        ),
+    )
+    parser.add_argument(
+        '--round-spacing',
+        type=int,
+        default=int(DEFAULT_ROUND_SPACING.total_seconds()),
+        help=(
+            "time kept before each knockout round when squashing slack, in seconds "
+            "(default: %(default)s)"
+        ),
+    )
+    parser.add_argument(
+        '--min-rest',
+        type=int,
+        default=int(DEFAULT_MIN_REST.total_seconds()),
+        help="minimum time between a team's matches, in seconds (default: %(default)s)",
+    )
+    return parser.parse_args()
+
+
+def main(args: argparse.Namespace) -> None:
+    from sr.comp.cli.add_delay import parse_duration, parse_time
+
+    projector = DelayProjector(args.compstate)
+    projections = projector.compare(
+        [parse_duration(x) for x in args.delays],
+        parse_time(args.compstate, args.when),
+        round_spacing=datetime.timedelta(seconds=args.round_spacing),
+        min_rest=datetime.timedelta(seconds=args.min_rest),
+    )
+    print(format_comparison(projections))
+
+
+if __name__ == '__main__':
+    main(parse_args())
@@ -0,0 +1,425 @@
+"""
+Differential testing of alternative scoring engines against the `Scorer`.
+
+The reference is exactly what SRComp does with a sheet
+(`sr.comp.scores.get_validated_scores`): `Scorer.calculate_scores` followed by
+`Scorer.validate`. A candidate engine is any function with the contract of
+`sheets.calculate_scores`: given a sheet, return the game points for each team
+or raise `InvalidScoresheetException` with a `code`.
+
+Each sheet's outcome is one of:
+
+- the scores, which the candidate must match exactly;
+- the validation error code, which the candidate must match exactly;
+- a crash (any other exception). The sheet is then outside what the
+  reference handles, so a candidate may reject it however it likes, though it
+  mustn't score it.
+
+The sheets are every committed sheet (and the template) followed by any
+number of randomly generated sheets, most of which are then mutated towards
+the edge cases the `Scorer` checks for. Generated sheets are derived from the
+seed and their index alone, so the work can be sharded across a pool of
+processes and any sheet regenerated later. Mismatches are shrunk to a
+minimal sheet which still shows the difference.
+"""
+
+from __future__ import annotations
+
+import argparse
+import concurrent.futures
+import dataclasses
+import importlib
+import json
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+import yaml
+from sr.comp.scores import get_validated_scores
+
+from score import InvalidScoresheetException, Scorer, TOKENS_PER_ZONE
+from sheets import COMPSTATE_ROOT, find_sheets, load_sheet
+from sr2025 import DISTRICTS, ZONE_COLOURS
+
+Engine = Callable[[dict[str, Any]], dict[str, int]]
+
+# ('scores', {tla: points}), ('invalid', code) or ('crash', exception type)
+Outcome = tuple[str, Any]
+
+# Short names for the engines which are part of the compstate
+ENGINES = {
+    'sheets': 'sheets:calculate_scores',
+}
+
+DEFAULT_SHARD_SIZE = 10_000
+
+_TLAS = ['AAA', 'BBB', 'CCC', 'DDD']
+
+
+def _copy(value: Any) -> Any:
+    # Much quicker than `copy.deepcopy` for the plain data in sheets
+    if isinstance(value, dict):
+        return {k: _copy(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_copy(x) for x in value]
+    return value
+
+
+def reference(sheet: dict[str, Any]) -> dict[str, int]:
+    return dict(get_validated_scores(Scorer, sheet))
+
+
+def load_engine(name: str) -> Engine:
+    """
+    Load an engine by short name or as `module:function`.
+    """
+    module_name, _, function = ENGINES.get(name, name).partition(':')
+    if not function:
+        raise ValueError(f"Engine {name!r} should be a short name or module:function")
+    return getattr(importlib.import_module(module_name), function)
+
+
+def outcome(engine: Engine, sheet: dict[str, Any]) -> Outcome:
+    try:
+        # The Scorer normalises the districts in place, and a candidate might
+        # do likewise
+        return 'scores', engine(_copy(sheet))
+    except InvalidScoresheetException as e:
+        return 'invalid', e.code
+    except Exception as e:
+        return 'crash', type(e).__name__
+
+
+def agrees(expected: Outcome, actual: Outcome) -> bool:
+    if expected[0] == 'crash':
+        return actual[0] != 'scores'
+    return expected == actual
+
+
+def random_sheet(rng: random.Random) -> dict[str, Any]:
+    """
+    Generate a valid sheet at random.
+    """
+    zones = rng.sample(range(len(ZONE_COLOURS)), rng.randint(1, len(ZONE_COLOURS)))
+    teams = {}
+    for zone in sorted(zones):
+        teams[_TLAS[zone]] = {
+            'zone': zone,
+            'present': rng.random() > 0.1,
+            'disqualified': rng.random() < 0.05,
+            'left_starting_zone': rng.random() > 0.3,
+        }
+
+    districts: dict[str, Any] = {
+        name: {'highest': '', 'pallets': {x: 0 for x in ZONE_COLOURS}}
+        for name in DISTRICTS
+    }
+    for colour in ZONE_COLOURS:
+        for _ in range(rng.randint(0, TOKENS_PER_ZONE)):
+            districts[rng.choice(list(DISTRICTS))]['pallets'][colour] += 1
+    for district in districts.values():
+        colours = [x for x, count in district['pallets'].items() if count]
+        if colours and rng.random() > 0.4:
+            district['highest'] = rng.choice(colours)
+
+    return {
+        'arena_id': 'main',
+        'match_number': rng.randint(0, 150),
+        'teams': teams,
+        'arena_zones': {'other': {'districts': districts}},
+    }
+
+
+def _mutate(sheet: dict[str, Any], rng: random.Random) -> None:
+    districts = sheet['arena_zones']['other']['districts']
+    name = rng.choice(sorted(districts)) if districts else None
+    district = districts[name] if name else None
+    team = sheet['teams'][rng.choice(sorted(sheet['teams']))] if sheet['teams'] else None
+
+    kind = rng.randrange(12)
+    if kind == 0 and district:
+        district['highest'] = rng.choice(['X', 'g', 'GO', ' O ', ' ', '', *ZONE_COLOURS])
+    elif kind == 1 and district:
+        district['pallets'][rng.choice(['X', 'g', 'GG'])] = rng.randint(0, 2)
+    elif kind == 2 and district:
+        colour = rng.choice(ZONE_COLOURS)
+        district['pallets'][colour] = rng.randint(1, TOKENS_PER_ZONE + 2)
+    elif kind == 3 and name:
+        del districts[name]
+    elif kind == 4 and district:
+        districts[rng.choice(['bees', 'Central', name + '_'])] = _copy(district)
+    elif kind == 5 and district:
+        district['pallets'][rng.choice(ZONE_COLOURS)] = rng.randint(-2, -1)
+    elif kind == 6 and district:
+        del district['pallets'][rng.choice(sorted(district['pallets']))]
+    elif kind == 7 and team:
+        team.pop(rng.choice(['present', 'disqualified', 'left_starting_zone']), None)
+    elif kind == 8 and team:
+        team['zone'] = rng.choice([-1, len(ZONE_COLOURS), '1'])
+    elif kind == 9 and district:
+        value = rng.choice([None, 1, ['G']])
+        if rng.random() < 0.5:
+            district['highest'] = value
+        else:
+            district['pallets'][rng.choice(ZONE_COLOURS)] = value
+    elif kind == 10:
+        sheet['other'] = rng.choice([None, {}, {'notes': 'x'}])
+    elif kind == 11 and district:
+        district['highest'] = rng.choice(ZONE_COLOURS)
+
+
+def generated_sheet(seed: int, index: int) -> dict[str, Any]:
+    """
+    The generated sheet with the given index, for the given seed.
+    """
+    rng = random.Random(seed * 1_000_003 + index)
+    sheet = random_sheet(rng)
+    for _ in range(rng.choice([0, 1, 1, 2, 3])):
+        _mutate(sheet, rng)
+    return sheet
+
+
+@dataclasses.dataclass(frozen=True)
+class Mismatch:
+    # A path for committed sheets, otherwise the generated sheet's index
+    source: str
+    sheet: dict[str, Any]
+    expected: Outcome
+    actual: Outcome
+
+
+def check_sheet(candidate: Engine, source: str, sheet: dict[str, Any]) -> Mismatch | None:
+    expected = outcome(reference, sheet)
+    actual = outcome(candidate, sheet)
+    if agrees(expected, actual):
+        return None
+    return Mismatch(source, sheet, expected, actual)
+
+
+def check_shard(
+    engine: str,
+    seed: int,
+    start: int,
+    count: int,
+    limit: int,
+) -> tuple[int, list[Mismatch]]:
+    """
+    Check a range of generated sheets. This is run in the worker processes.
+
+    Returns the number of mismatches and (up to `limit` of) the mismatches
+    themselves.
+    """
+    candidate = load_engine(engine)
+    found = 0
+    mismatches = []
+    for index in range(start, start + count):
+        mismatch = check_sheet(candidate, str(index), generated_sheet(seed, index))
+        if mismatch is not None:
+            found += 1
+            if len(mismatches) < limit:
+                mismatches.append(mismatch)
+    return found, mismatches
+
+
+def _simplifications(sheet: dict[str, Any]) -> Iterator[dict[str, Any]]:
+    """
+    Sheets which are one step simpler than the given one, simplest first.
+    """
+    def variant(edit: Callable[[dict[str, Any]], None]) -> dict[str, Any]:
+        simpler = _copy(sheet)
+        edit(simpler)
+        return simpler
+
+    if 'other' in sheet:
+        yield variant(lambda x: x.pop('other'))
+
+    for tla in sorted(sheet.get('teams', {})):
+        yield variant(lambda x: x['teams'].pop(tla))
+        for key in sorted(sheet['teams'][tla]):
+            if key != 'zone':
+                yield variant(lambda x: x['teams'][tla].pop(key))
+
+    districts = sheet.get('arena_zones', {}).get('other', {}).get('districts', {})
+    for name in sorted(districts):
+        yield variant(lambda x: x['arena_zones']['other']['districts'].pop(name))
+    for name, district in sorted(districts.items()):
+        if not isinstance(district, dict):
+            continue
+        if district.get('highest'):
+            yield variant(lambda x: x['arena_zones']['other']['districts'][name].update(
+                highest='',
+            ))
+        pallets = district.get('pallets')
+        if not isinstance(pallets, dict):
+            continue
+        for colour, count in sorted(pallets.items()):
+            path = ('arena_zones', 'other', 'districts', name, 'pallets')
+            yield variant(lambda x: _get(x, path).pop(colour))
+            if isinstance(count, int) and count > 1:
+                yield variant(lambda x: _get(x, path).update({colour: 1}))
+
+
+def _get(data: Any, path: tuple[str, ...]) -> Any:
+    for key in path:
+        data = data[key]
+    return data
+
+
+def _kind(mismatch: Mismatch) -> tuple[Any, ...]:
+    # Scores change as the sheet is simplified, codes and crashes shouldn't
+    return tuple(
+        x[0] if x[0] == 'scores' else x
+        for x in (mismatch.expected, mismatch.actual)
+    )
+
+
+def shrink(candidate: Engine, mismatch: Mismatch) -> Mismatch:
+    """
+    Reduce a mismatching sheet to one where no single simplification still
+    mismatches in the same way.
+    """
+    sheet = mismatch.sheet
+    kind = _kind(mismatch)
+    while True:
+        for simpler in _simplifications(sheet):
+            found = check_sheet(candidate, mismatch.source, simpler)
+            if found is not None and _kind(found) == kind:
+                sheet = simpler
+                mismatch = found
+                break
+        else:
+            return mismatch
+
+
+def committed_sheets(root: Path = COMPSTATE_ROOT) -> Iterator[tuple[str, dict[str, Any]]]:
+    yield 'template.yaml', load_sheet(root / 'scoring' / 'template.yaml')
+    for _, path in find_sheets(root):
+        yield str(path.relative_to(root)), load_sheet(path)
+
+
+def run(
+    engine: str,
+    executor: concurrent.futures.Executor,
+    *,
+    root: Path = COMPSTATE_ROOT,
+    count: int,
+    seed: int = 0,
+    shard_size: int = DEFAULT_SHARD_SIZE,
+    limit: int = 10,
+) -> tuple[int, int, list[Mismatch]]:
+    """
+    Compare the given engine against the reference over the committed sheets
+    and `count` generated ones, returning the number of sheets checked, the
+    number of mismatches and (up to `limit` of) the mismatches, shrunk.
+    """
+    candidate = load_engine(engine)
+
+    found = 0
+    mismatches = []
+    checked = 0
+    for source, sheet in committed_sheets(root):
+        checked += 1
+        mismatch = check_sheet(candidate, source, sheet)
+        if mismatch is not None:
+            found += 1
+            mismatches.append(mismatch)
+
+    futures = [
+        executor.submit(
+            check_shard,
+            engine,
+            seed,
+            start,
+            min(shard_size, count - start),
+            limit,
+        )
+        for start in range(0, count, shard_size)
+    ]
+    for future in futures:
+        shard_found, shard_mismatches = future.result()
+        found += shard_found
+        mismatches += shard_mismatches
+    checked += count
+
+    return checked, found, [shrink(candidate, x) for x in mismatches[:limit]]
+
+
+def format_mismatch(mismatch: Mismatch) -> str:
+    return '\n'.join([
+        f"Mismatch for sheet {mismatch.source}:",
+        f"  reference: {json.dumps(mismatch.expected)}",
+        f"  candidate: {json.dumps(mismatch.actual)}",
+        "  minimal sheet:",
+        *(
+            f"    {line}"
+            for line in yaml.safe_dump(mismatch.sheet, sort_keys=True).splitlines()
+        ),
+    ])
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Check a scoring engine agrees exactly with the Scorer.",
+    )
+    parser.add_argument(
+        'engine',
+        help=(
+            f"engine to check: one of {', '.join(ENGINES)}, or any function "
+            "as module:function"
+        ),
+    )
+    parser.add_argument(
+        '--compstate',
+        type=Path,
+        default=COMPSTATE_ROOT,
+        help="competition state repository (default: %(default)s)",
+    )
+    parser.add_argument(
+        '--count',
+        type=int,
+        default=100_000,
+        help="number of generated sheets (default: %(default)s)",
+    )
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=None,
+        help="number of worker processes (default: one per CPU)",
+    )
+    parser.add_argument(
+        '--limit',
+        type=int,
+        default=10,
+        help="maximum number of mismatches to shrink and show (default: %(default)s)",
+    )
+    return parser.parse_args()
+
+
+def main(args: argparse.Namespace) -> int:
+    start = time.perf_counter()
+    with concurrent.futures.ProcessPoolExecutor(args.workers) as executor:
+        checked, found, mismatches = run(
+            args.engine,
+            executor,
+            root=args.compstate,
+            count=args.count,
+            seed=args.seed,
+            limit=args.limit,
+        )
+    elapsed = time.perf_counter() - start
+
+    for mismatch in mismatches:
+        print(format_mismatch(mismatch))
+        print()
+    print(
+        f"Checked {checked} sheets in {elapsed:.1f}s "
+        f"({checked / elapsed:,.0f}/s): {found} mismatches",
+    )
+    return 1 if found else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(parse_args()))
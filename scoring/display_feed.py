@@ -0,0 +1,544 @@
+"""
+Push feed of changes to the derived competition state, for displays.
+
+Rather than each screen re-fetching the whole state and working out for itself
+what changed, this keeps the state derived by `rebuild` and, each time the
+compstate changes, sends subscribers only the entries which changed. The state
+is a set of sections, each mapping keys to values:
+
+    standings   league table row of each team, by TLA
+    matches     times and teams of each match, by `<arena>:<num>`
+    scores      game and ranked points of each scored match, by `<arena>:<num>`
+    call_lists  which teams each shepherd fetches, by `<arena>:<num>`
+
+so a score being entered changes one entry of `scores` and a handful of
+`standings` rows, and a delay changes the `matches` (and `call_lists`) entries
+of the matches it moves.
+
+The feed speaks newline-delimited JSON over a local TCP socket. A client sends
+`{"op": "subscribe"}` and is sent a `snapshot` of the whole state, followed by
+a `delta` each time it changes. Deltas give the new value of each changed
+entry under `set`, and the keys of the entries which went away under `remove`.
+Every message carries the `feed` it's from (which changes when the feed is
+restarted) and a `seq` number which goes up by one with each delta, so a
+client which sees a gap knows to subscribe again. A client which quotes the
+`feed` and `seq` of the last message it saw when subscribing is sent just the
+deltas it missed, if they're recent enough, rather than a new snapshot.
+
+Subscribers which fall too far behind are disconnected rather than queued for
+without limit; they catch up when they reconnect.
+
+A client which follows the feed, keeping a copy of the state, is included.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import contextlib
+import datetime
+import json
+import secrets
+import sys
+import threading
+from pathlib import Path
+from typing import Any, Callable, Mapping
+
+from rebuild import (
+    Artifact,
+    ARTIFACTS,
+    BuildContext,
+    DEFAULT_DEBOUNCE,
+    DEFAULT_OUTPUT,
+    make_watcher,
+    Pipeline,
+    wait_for_changes,
+    Watcher,
+)
+from sheets import COMPSTATE_ROOT
+
+DEFAULT_PORT = 5126
+# Number of recent deltas kept for clients resuming a subscription
+DEFAULT_HISTORY = 256
+# Number of messages a subscriber may be behind before it's disconnected
+DEFAULT_BACKLOG = 64
+# Snapshots are well beyond asyncio's default limit on the length of a line
+READ_LIMIT = 16 * 1024 * 1024
+
+# Section -> key -> value
+State = dict[str, dict[str, Any]]
+
+
+def build_scores(context: BuildContext) -> Any:
+    scores = context.comp.scores
+    return [
+        {
+            'arena': arena,
+            'num': num,
+            'type': match_type,
+            'game_points': type_scores.game_points[arena, num],
+            'ranked_points': type_scores.ranked_points[arena, num],
+        }
+        for match_type, type_scores in (
+            ('league', scores.league),
+            ('knockout', scores.knockout),
+        )
+        for arena, num in type_scores.game_points
+    ]
+
+
+FEED_ARTIFACTS = (
+    *ARTIFACTS,
+    Artifact(
+        'scores',
+        (
+            'league/*/*.yaml',
+            'knockout/*/*.yaml',
+            'teams.yaml',
+            'scoring/score.py',
+            'scoring/sr2025.py',
+            'scoring/ranker.py',
+        ),
+        (),
+        build_scores,
+    ),
+)
+
+
+def _match_key(entry: Mapping[str, Any]) -> str:
+    return f"{entry['arena']}:{entry['num']}"
+
+
+# Section -> the artifact it's from, and the key of each entry
+SECTIONS: dict[str, tuple[str, Callable[[Mapping[str, Any]], str]]] = {
+    'standings': ('standings', lambda x: x['tla']),
+    'matches': ('timeline', _match_key),
+    'scores': ('scores', _match_key),
+    'call_lists': ('call_lists', _match_key),
+}
+
+
+def feed_state(results: Mapping[str, Any]) -> State:
+    """
+    The sections of the feed's state, from whichever of the artifacts they're
+    from have been built.
+    """
+    return {
+        section: {key(entry): entry for entry in results[artifact]}
+        for section, (artifact, key) in SECTIONS.items()
+        if artifact in results
+    }
+
+
+def diff(
+    old: Mapping[str, Any],
+    new: Mapping[str, Any],
+) -> tuple[dict[str, Any], list[str]]:
+    """
+    The entries which were added or changed, and the keys of those which were
+    removed.
+    """
+    changed = {
+        key: value
+        for key, value in new.items()
+        if key not in old or old[key] != value
+    }
+    removed = [key for key in old if key not in new]
+    return changed, removed
+
+
+def _encode(message: Mapping[str, Any]) -> bytes:
+    return json.dumps(message, separators=(',', ':')).encode() + b'\n'
+
+
+class FeedPublisher:
+    """
+    The feed's state, and the subscribers to send changes to it to.
+
+    Not thread safe: `publish` should be called from the event loop the
+    subscribers are served on.
+    """
+
+    def __init__(
+        self,
+        *,
+        history: int = DEFAULT_HISTORY,
+        backlog: int = DEFAULT_BACKLOG,
+        feed_id: str | None = None,
+    ) -> None:
+        self.feed_id = feed_id or secrets.token_hex(4)
+        self.seq = 0
+        self.state: State = {}
+        self.backlog = backlog
+
+        # Messages are encoded once, however many subscribers they're sent to
+        self._history: collections.deque[tuple[int, bytes]] = collections.deque(
+            maxlen=history,
+        )
+        self._snapshot: tuple[int, bytes] | None = None
+        # A subscriber's queue ends with `None` if it's disconnected
+        self._subscribers: set[asyncio.Queue[bytes | None]] = set()
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            'type': 'snapshot',
+            'feed': self.feed_id,
+            'seq': self.seq,
+            'state': self.state,
+        }
+
+    def _encoded_snapshot(self) -> bytes:
+        if self._snapshot is None or self._snapshot[0] != self.seq:
+            self._snapshot = (self.seq, _encode(self.snapshot()))
+        return self._snapshot[1]
+
+    def publish(self, sections: Mapping[str, Mapping[str, Any]]) -> dict[str, Any] | None:
+        """
+        Update the given sections (leaving any others as they are), sending
+        the changes to the subscribers. Returns the delta sent, if anything
+        changed.
+        """
+        changes: dict[str, dict[str, Any]] = {}
+        removals: dict[str, list[str]] = {}
+        for section, entries in sections.items():
+            changed, removed = diff(self.state.get(section, {}), entries)
+            if changed:
+                changes[section] = changed
+            if removed:
+                removals[section] = removed
+            # Replaced rather than updated, so that snapshots already taken
+            # don't change
+            self.state = {**self.state, section: dict(entries)}
+
+        if not changes and not removals:
+            return None
+
+        self.seq += 1
+        delta = {
+            'type': 'delta',
+            'feed': self.feed_id,
+            'seq': self.seq,
+            'set': changes,
+            'remove': removals,
+        }
+        line = _encode(delta)
+        self._history.append((self.seq, line))
+
+        for queue in list(self._subscribers):
+            if queue.qsize() >= self.backlog:
+                # It'll be told to catch up once it's reconnected
+                queue.put_nowait(None)
+                self._subscribers.discard(queue)
+            else:
+                queue.put_nowait(line)
+        return delta
+
+    def _missed(self, seq: int) -> list[bytes] | None:
+        if seq == self.seq:
+            return []
+        if seq < self.seq and self._history and self._history[0][0] <= seq + 1:
+            return [line for x, line in self._history if x > seq]
+        return None
+
+    def subscribe(
+        self,
+        feed_id: str | None = None,
+        seq: int | None = None,
+    ) -> tuple[list[bytes], asyncio.Queue[bytes | None]]:
+        """
+        Add a subscriber, returning the messages to bring it up to date and
+        the queue of those to follow. A subscriber which has seen up to `seq`
+        of this feed is sent the deltas since, if they're still known, rather
+        than a snapshot.
+        """
+        catch_up = None
+        if feed_id == self.feed_id and seq is not None:
+            catch_up = self._missed(seq)
+        if catch_up is None:
+            catch_up = [self._encoded_snapshot()]
+
+        queue: asyncio.Queue[bytes | None] = asyncio.Queue()
+        self._subscribers.add(queue)
+        return catch_up, queue
+
+    def unsubscribe(self, queue: asyncio.Queue[bytes | None]) -> None:
+        self._subscribers.discard(queue)
+
+    async def handle_connection(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+    ) -> None:
+        try:
+            try:
+                request = json.loads(await reader.readline())
+                if request['op'] != 'subscribe':
+                    raise ValueError(f"Unknown operation {request['op']!r}")
+                feed_id = request.get('feed')
+                seq = request.get('seq')
+                if seq is not None:
+                    seq = int(seq)
+            except (KeyError, TypeError, ValueError) as e:
+                writer.write(_encode({
+                    'type': 'error',
+                    'error': 'bad_request',
+                    'message': str(e),
+                }))
+                return
+
+            catch_up, queue = self.subscribe(feed_id, seq)
+            try:
+                writer.writelines(catch_up)
+                await writer.drain()
+                while (line := await queue.get()) is not None:
+                    writer.write(line)
+                    await writer.drain()
+            finally:
+                self.unsubscribe(queue)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+class FeedMirror:
+    """
+    A copy of the feed's state, kept up to date from its messages.
+    """
+
+    def __init__(self) -> None:
+        self.feed_id: str | None = None
+        self.seq: int | None = None
+        self.state: State = {}
+
+    def subscription(self) -> dict[str, Any]:
+        """
+        The request to (re)subscribe with, resuming from the last message seen.
+        """
+        return {'op': 'subscribe', 'feed': self.feed_id, 'seq': self.seq}
+
+    def apply(self, message: Mapping[str, Any]) -> bool:
+        """
+        Apply a message from the feed, returning whether it followed on from
+        the last. If it didn't, nothing is changed and the client should
+        subscribe again.
+        """
+        if message['type'] == 'snapshot':
+            self.state = {
+                section: dict(entries)
+                for section, entries in message['state'].items()
+            }
+        elif message['feed'] != self.feed_id or message['seq'] != self.seq + 1:
+            return False
+        else:
+            for section, entries in message['set'].items():
+                self.state.setdefault(section, {}).update(entries)
+            for section, keys in message['remove'].items():
+                for key in keys:
+                    self.state[section].pop(key, None)
+
+        self.feed_id = message['feed']
+        self.seq = message['seq']
+        return True
+
+
+def _log(message: str) -> None:
+    print(f"{datetime.datetime.now():%H:%M:%S} {message}", file=sys.stderr)
+
+
+def watch(
+    pipeline: Pipeline,
+    watcher: Watcher,
+    executor: concurrent.futures.Executor,
+    debounce: float,
+    publish: Callable[[State], None],
+) -> None:
+    """
+    Rebuild the artifacts as the compstate changes, publishing the state
+    after each rebuild.
+    """
+    while True:
+        changed = wait_for_changes(watcher, debounce)
+        affected = pipeline.affected(changed)
+        if not affected:
+            continue
+        # Anything which failed last time is retried too
+        affected |= pipeline.artifacts.keys() - pipeline.results.keys()
+        try:
+            pipeline.rebuild(affected, executor)
+        except Exception as e:
+            # A half-written sheet shouldn't stop the feed; whatever was
+            # rebuilt is still sent
+            _log(f"Rebuild failed: {e!r}")
+        publish(feed_state(pipeline.results))
+
+
+def _publish(publisher: FeedPublisher, state: State) -> None:
+    delta = publisher.publish(state)
+    if delta is not None:
+        changes = sum(len(x) for x in delta['set'].values())
+        removals = sum(len(x) for x in delta['remove'].values())
+        _log(
+            f"Sent delta {delta['seq']} ({changes} changed, {removals} removed, "
+            f"{len(_encode(delta))} bytes) to {publisher.subscribers} subscribers",
+        )
+
+
+async def serve(
+    publisher: FeedPublisher,
+    port: int,
+    pipeline: Pipeline,
+    watcher: Watcher,
+    executor: concurrent.futures.Executor,
+    debounce: float,
+) -> None:
+    loop = asyncio.get_running_loop()
+    # Watching blocks, so happens on its own thread
+    threading.Thread(
+        target=watch,
+        args=(
+            pipeline,
+            watcher,
+            executor,
+            debounce,
+            lambda state: loop.call_soon_threadsafe(_publish, publisher, state),
+        ),
+        daemon=True,
+    ).start()
+
+    server = await asyncio.start_server(publisher.handle_connection, '127.0.0.1', port)
+    print(f"Listening on 127.0.0.1:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+async def follow(port: int, *, retry_delay: float = 1) -> None:
+    """
+    Follow the feed, reporting each message, and subscribing again whenever
+    the connection drops or a message is missed.
+    """
+    mirror = FeedMirror()
+    while True:
+        try:
+            reader, writer = await asyncio.open_connection(
+                '127.0.0.1',
+                port,
+                limit=READ_LIMIT,
+            )
+        except OSError as e:
+            _log(f"Can't connect: {e}")
+            await asyncio.sleep(retry_delay)
+            continue
+
+        try:
+            writer.write(_encode(mirror.subscription()))
+            await writer.drain()
+            while line := await reader.readline():
+                message = json.loads(line)
+                if message['type'] == 'error':
+                    raise ValueError(message['message'])
+                if not mirror.apply(message):
+                    _log(f"Missed messages before {message['seq']}, resubscribing")
+                    break
+                if message['type'] == 'snapshot':
+                    _log(
+                        f"Snapshot {message['seq']} of feed {message['feed']} "
+                        f"({len(line)} bytes)",
+                    )
+                else:
+                    sections = sorted(message['set'].keys() | message['remove'].keys())
+                    _log(
+                        f"Delta {message['seq']} to {', '.join(sections)} "
+                        f"({len(line)} bytes)",
+                    )
+        except ConnectionError as e:
+            _log(f"Disconnected: {e}")
+        finally:
+            writer.close()
+            with contextlib.suppress(ConnectionError):
+                await writer.wait_closed()
+        await asyncio.sleep(retry_delay)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Push changes to the derived competition state to displays.",
+    )
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = subparsers.add_parser('serve', help="run the feed")
+    serve_parser.add_argument(
+        '--compstate',
+        type=Path,
+        default=COMPSTATE_ROOT,
+        help="competition state repository (default: %(default)s)",
+    )
+    serve_parser.add_argument(
+        '--output',
+        type=Path,
+        default=DEFAULT_OUTPUT,
+        help="directory to write the artifacts to (default: %(default)s)",
+    )
+    serve_parser.add_argument(
+        '--debounce',
+        type=float,
+        default=DEFAULT_DEBOUNCE,
+        help="seconds without changes before rebuilding (default: %(default)s)",
+    )
+    serve_parser.add_argument(
+        '--history',
+        type=int,
+        default=DEFAULT_HISTORY,
+        help="deltas kept for resuming subscribers (default: %(default)s)",
+    )
+    serve_parser.add_argument(
+        '--backlog',
+        type=int,
+        default=DEFAULT_BACKLOG,
+        help="messages a subscriber may fall behind by (default: %(default)s)",
+    )
+
+    subparsers.add_parser('follow', help="follow a running feed, reporting each message")
+
+    return parser.parse_args()
+
+
+def main(args: argparse.Namespace) -> None:
+    if args.command == 'follow':
+        asyncio.run(follow(args.port))
+        return
+
+    root = args.compstate.resolve()
+    pipeline = Pipeline(root, args.output, FEED_ARTIFACTS)
+    publisher = FeedPublisher(history=args.history, backlog=args.backlog)
+
+    with concurrent.futures.ThreadPoolExecutor() as executor:
+        pipeline.rebuild(pipeline.artifacts, executor)
+        publisher.publish(feed_state(pipeline.results))
+
+        watcher = make_watcher(root)
+        try:
+            asyncio.run(serve(
+                publisher,
+                args.port,
+                pipeline,
+                watcher,
+                executor,
+                args.debounce,
+            ))
+        finally:
+            watcher.close()
+
+
+if __name__ == '__main__':
+    try:
+        main(parse_args())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,480 @@
+"""
+Local score-entry service, standing in for the Scorer UI's save path.
+
+Sheets are converted with the compstate's `Converter` and validated with
+`Scorer` exactly as the Scorer UI does, but saving is arranged so that many
+scorers can work at once with predictable latency:
+
+- each match has its own lock, so saves to different matches never wait on
+  each other;
+- each match carries a version number which a save must quote, so a scorer
+  working from a stale copy is told rather than silently overwriting another
+  scorer's changes;
+- saves are acknowledged once held in memory, and rapid successive saves of a
+  match are coalesced so that only the latest is written and committed. A
+  save which can't be written stays in memory (and is what's loaded) until it
+  can be, and one which was written but couldn't be committed is committed by
+  the next flush;
+- once written, sheets can also be recorded in a score journal (see
+  `journal`), kept open for the life of the service.
+
+The service speaks newline-delimited JSON over a local TCP socket. Requests
+are objects with an `op` of `load` or `save`, plus `arena` and `match`;
+`save` also takes `version` and `form` (as the Scorer UI would submit). Every
+response has an `ok` flag; failures have an `error` code and `message`, and
+invalid forms also the `fields` at fault.
+
+A load-test client which simulates many concurrent scorers is included.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import collections
+import contextlib
+import json
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Mapping
+
+from sr.comp.match_period import Match
+from sr.comp.raw_compstate import RawCompstate
+from sr.comp.scorer.converter import InputForm, OutputForm
+from sr.comp.types import ArenaName, MatchId, MatchNumber, ScoreData
+
+from bulk_csv import load_matches
+from converter import Converter, InvalidFormError
+from journal import JournalWriter
+from sheets import COMPSTATE_ROOT
+
+DEFAULT_PORT = 5125
+DEFAULT_COALESCE_DELAY = 0.5
+
+
+class ServiceError(Exception):
+    def __init__(self, message: str, *, code: str, **extra: Any) -> None:
+        super().__init__(message)
+        self.code = code
+        self.extra = extra
+
+
+class _MatchState:
+    def __init__(self) -> None:
+        self.lock = asyncio.Lock()
+        self.version = 0
+        self.pending: ScoreData | None = None
+        # Whether the score file has been written since it was last committed
+        self.uncommitted = False
+        self.flush_task: asyncio.Task[None] | None = None
+        # Set to cut short the wait for further saves
+        self.flush_now = asyncio.Event()
+
+
+class ScoreEntryService:
+    def __init__(
+        self,
+        compstate: RawCompstate,
+        matches: Mapping[MatchId, Match],
+        converter: Converter,
+        *,
+        coalesce_delay: float = DEFAULT_COALESCE_DELAY,
+        commit: bool = True,
+        journal: JournalWriter | None = None,
+    ) -> None:
+        self._compstate = compstate
+        self._matches = matches
+        self._converter = converter
+        self._coalesce_delay = coalesce_delay
+        self._commit = commit
+        self._journal = journal
+
+        self._states: dict[MatchId, _MatchState] = {}
+        # The git index is shared between all matches.
+        self._git_lock = asyncio.Lock()
+
+        self._tasks: set[asyncio.Task[None]] = set()
+
+        self.saves = 0
+        self.writes = 0
+        self.commits = 0
+        self.failures = 0
+
+    def _get_match(self, match_id: MatchId) -> tuple[Match, _MatchState]:
+        try:
+            match = self._matches[match_id]
+        except KeyError:
+            raise ServiceError(
+                "No such match {1} in arena {0}".format(*match_id),
+                code='unknown_match',
+            ) from None
+        return match, self._states.setdefault(match_id, _MatchState())
+
+    def _read_score(self, match: Match) -> ScoreData | None:
+        try:
+            return self._compstate.load_score(match)
+        except OSError:
+            return None
+
+    async def load(self, match_id: MatchId) -> tuple[int, OutputForm]:
+        """
+        Fetch the current form for a match along with its version.
+        """
+        match, state = self._get_match(match_id)
+        async with state.lock:
+            score = state.pending
+            if score is None:
+                score = await asyncio.to_thread(self._read_score, match)
+
+            if score is None:
+                form = self._converter.match_to_form(match)
+            else:
+                form = self._converter.score_to_form(score)
+            return state.version, form
+
+    async def save(self, match_id: MatchId, form: InputForm, *, version: int) -> int:
+        """
+        Save a submitted form for a match, returning the new version.
+
+        The save must quote the version it was based on; if another save has
+        happened since, a `conflict` error is raised instead.
+        """
+        match, state = self._get_match(match_id)
+        async with state.lock:
+            if version != state.version:
+                raise ServiceError(
+                    f"Match {match.num} was changed by someone else, reload it",
+                    code='conflict',
+                    version=state.version,
+                )
+
+            try:
+                score = self._converter.form_to_score(match, form)
+            except InvalidFormError as e:
+                raise ServiceError(str(e), code=e.code, fields=e.errors) from e
+            except ValueError as e:
+                raise ServiceError(str(e), code='invalid_form') from e
+
+            state.pending = score
+            state.version += 1
+            self.saves += 1
+
+            if state.flush_task is None:
+                state.flush_now = asyncio.Event()
+                state.flush_task = asyncio.create_task(
+                    self._delayed_flush(match, state, state.flush_now),
+                )
+                # The event loop only keeps weak references to tasks
+                self._tasks.add(state.flush_task)
+                state.flush_task.add_done_callback(self._tasks.discard)
+
+            return state.version
+
+    async def _delayed_flush(
+        self,
+        match: Match,
+        state: _MatchState,
+        flush_now: asyncio.Event,
+    ) -> None:
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(flush_now.wait(), self._coalesce_delay)
+        try:
+            await self._flush(match, state)
+        except Exception as e:
+            # The score is still pending or uncommitted, so is written and
+            # committed by the next save of the match or the next flush
+            self.failures += 1
+            print(
+                f"Saving match {match.num} in arena {match.arena} failed: {e!r}",
+                file=sys.stderr,
+            )
+
+    async def _flush(self, match: Match, state: _MatchState) -> None:
+        async with state.lock:
+            state.flush_task = None
+            score = state.pending
+            path = self._compstate.get_score_path(match)
+            if score is not None:
+                await asyncio.to_thread(self._compstate.save_score, match, score)
+                # Saves wait for the lock, so nothing newer can have arrived
+                state.pending = None
+                state.uncommitted = self._commit
+                self.writes += 1
+
+            if score is not None and self._journal is not None:
+                try:
+                    await asyncio.to_thread(self._journal.record, score)  # type: ignore[arg-type]  # noqa: E501
+                except OSError as e:
+                    # The score file is what counts, so carry on and commit it
+                    print(
+                        f"Journalling match {match.num} in arena {match.arena} failed: {e!r}",
+                        file=sys.stderr,
+                    )
+
+        async with self._git_lock:
+            # A commit for a later write may have included this one
+            if not state.uncommitted:
+                return
+            # Cleared first so that a write made while committing is left to
+            # be committed in turn
+            state.uncommitted = False
+            try:
+                await asyncio.to_thread(self._commit_score, match, path)
+            except BaseException:
+                state.uncommitted = True
+                raise
+        self.commits += 1
+
+    def _commit_score(self, match: Match, path: str) -> None:
+        self._compstate.stage(path)
+        self._compstate.commit(
+            f"Update {match.type.value} scores for match {match.num} in arena {match.arena}",
+            allow_empty=True,
+        )
+
+    async def flush(self) -> None:
+        """
+        Write (and commit) any pending saves immediately, including any which
+        failed to be written or committed before, raising if any still fail.
+        """
+        tasks = []
+        for state in self._states.values():
+            if state.flush_task is not None:
+                state.flush_now.set()
+                tasks.append(state.flush_task)
+        await asyncio.gather(*tasks)
+
+        for match_id, state in self._states.items():
+            if state.flush_task is None and (state.pending is not None or state.uncommitted):
+                await self._flush(self._matches[match_id], state)
+
+    async def handle_request(self, request: dict[str, Any]) -> dict[str, Any]:
+        try:
+            match_id = (ArenaName(request['arena']), MatchNumber(int(request['match'])))
+            op = request['op']
+            if op == 'load':
+                version, form = await self.load(match_id)
+                return {'ok': True, 'version': version, 'form': form}
+            if op == 'save':
+                version = await self.save(
+                    match_id,
+                    InputForm(request['form']),
+                    version=int(request['version']),
+                )
+                return {'ok': True, 'version': version}
+            raise ServiceError(f"Unknown operation {op!r}", code='bad_request')
+        except (KeyError, TypeError, ValueError) as e:
+            return {'ok': False, 'error': 'bad_request', 'message': str(e)}
+        except ServiceError as e:
+            return {'ok': False, 'error': e.code, 'message': str(e), **e.extra}
+
+    async def handle_connection(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+    ) -> None:
+        try:
+            while line := await reader.readline():
+                try:
+                    request = json.loads(line)
+                except ValueError as e:
+                    response = {'ok': False, 'error': 'bad_request', 'message': str(e)}
+                else:
+                    response = await self.handle_request(request)
+                writer.write(json.dumps(response).encode() + b'\n')
+                await writer.drain()
+        finally:
+            writer.close()
+
+
+async def serve(service: ScoreEntryService, port: int) -> None:
+    server = await asyncio.start_server(service.handle_connection, '127.0.0.1', port)
+    print(f"Listening on 127.0.0.1:{port}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.flush()
+
+
+# Load testing
+
+
+async def _request(
+    reader: asyncio.StreamReader,
+    writer: asyncio.StreamWriter,
+    request: dict[str, Any],
+) -> dict[str, Any]:
+    writer.write(json.dumps(request).encode() + b'\n')
+    await writer.drain()
+    return json.loads(await reader.readline())
+
+
+async def _simulate_scorer(
+    port: int,
+    match_ids: list[MatchId],
+    saves: int,
+    latencies: list[float],
+    outcomes: collections.Counter[str],
+    rng: random.Random,
+) -> None:
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    try:
+        for _ in range(saves):
+            arena, num = rng.choice(match_ids)
+            while True:
+                loaded = await _request(reader, writer, {
+                    'op': 'load', 'arena': arena, 'match': num,
+                })
+                form = {
+                    key: str(value)
+                    for key, value in loaded['form'].items()
+                    if value not in (False, None)
+                }
+                # Nudge a pallet count, keeping the sheet valid.
+                form['district_central_pallets_G'] = str(rng.randint(0, 3))
+                form.pop('district_central_highest', None)
+
+                start = time.perf_counter()
+                response = await _request(reader, writer, {
+                    'op': 'save',
+                    'arena': arena,
+                    'match': num,
+                    'version': loaded['version'],
+                    'form': form,
+                })
+                latencies.append(time.perf_counter() - start)
+
+                if response['ok']:
+                    outcomes['saved'] += 1
+                    break
+                outcomes[response['error']] += 1
+                if response['error'] != 'conflict':
+                    break
+    finally:
+        writer.close()
+
+
+async def load_test(
+    port: int,
+    match_ids: list[MatchId],
+    *,
+    scorers: int,
+    saves: int,
+    seed: int,
+) -> None:
+    rng = random.Random(seed)
+    latencies: list[float] = []
+    outcomes: collections.Counter[str] = collections.Counter()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        _simulate_scorer(
+            port,
+            match_ids,
+            saves,
+            latencies,
+            outcomes,
+            random.Random(rng.random()),
+        )
+        for _ in range(scorers)
+    ))
+    elapsed = time.perf_counter() - start
+
+    quantiles = statistics.quantiles(latencies, n=100)
+    print(f"{len(latencies)} save requests by {scorers} scorers in {elapsed:.2f}s")
+    for outcome, count in sorted(outcomes.items()):
+        print(f"  {outcome}: {count}")
+    print(
+        "Save latency: "
+        f"p50 {quantiles[49] * 1000:.1f}ms, "
+        f"p95 {quantiles[94] * 1000:.1f}ms, "
+        f"p99 {quantiles[98] * 1000:.1f}ms, "
+        f"max {max(latencies) * 1000:.1f}ms",
+    )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Local score-entry service.")
+    parser.add_argument(
+        '--compstate',
+        type=Path,
+        default=COMPSTATE_ROOT,
+        help="competition state repository (default: %(default)s)",
+    )
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = subparsers.add_parser('serve', help="run the service")
+    serve_parser.add_argument(
+        '--coalesce-delay',
+        type=float,
+        default=DEFAULT_COALESCE_DELAY,
+        help="seconds to wait for further saves before writing (default: %(default)s)",
+    )
+    serve_parser.add_argument(
+        '--no-commit',
+        dest='commit',
+        action='store_false',
+        help="write score files but don't commit them",
+    )
+    serve_parser.add_argument(
+        '--journal',
+        type=Path,
+        help="also record each sheet written in the score journal at this path",
+    )
+
+    load_parser = subparsers.add_parser(
+        'load-test',
+        help="simulate many concurrent scorers against a running service",
+    )
+    load_parser.add_argument('--scorers', type=int, default=20)
+    load_parser.add_argument('--saves', type=int, default=10, help="saves per scorer")
+    load_parser.add_argument(
+        '--matches',
+        type=int,
+        default=4,
+        help="number of matches to spread the saves over (default: %(default)s)",
+    )
+    load_parser.add_argument('--seed', type=int, default=0)
+
+    return parser.parse_args()
+
+
+def main(args: argparse.Namespace) -> None:
+    compstate = RawCompstate(args.compstate, local_only=True)
+    matches = load_matches(compstate.load())
+
+    if args.command == 'serve':
+        with contextlib.ExitStack() as stack:
+            journal = None
+            if args.journal is not None:
+                journal = stack.enter_context(JournalWriter(args.journal))
+            service = ScoreEntryService(
+                compstate,
+                matches,
+                Converter(),
+                coalesce_delay=args.coalesce_delay,
+                commit=args.commit,
+                journal=journal,
+            )
+            asyncio.run(serve(service, args.port))
+    else:
+        match_ids = sorted(matches)[:args.matches]
+        asyncio.run(load_test(
+            args.port,
+            match_ids,
+            scorers=args.scorers,
+            saves=args.saves,
+            seed=args.seed,
+        ))
+
+
+if __name__ == '__main__':
+    try:
+        main(parse_args())
+    except KeyboardInterrupt:
+        sys.exit(1)
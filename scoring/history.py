@@ -0,0 +1,384 @@
+"""
+Standings through the git history of the compstate.
+
+Rather than checking out each commit and reloading the whole compstate, this
+walks the first-parent history once, reads only the blobs which changed at
+each commit through a single `git cat-file --batch` process, and applies them
+to an incremental `LeagueTable`. Standings can be emitted after every commit
+which changes the league sheets, teams or external scores, or as they stood
+at chosen times.
+
+Sheets are scored with the current scorer, which may not be the one that was
+in use at the time. Sheets which the current scorer rejects (or which refer
+to teams which didn't exist at the time) are left out of the standings and
+reported.
+"""
+
+from __future__ import annotations
+
+import argparse
+import dataclasses
+import datetime
+import fnmatch
+import subprocess
+import time
+from pathlib import Path
+from typing import Any, Iterator, Mapping, Sequence
+
+import yaml
+from sr.comp.scores import LeaguePosition, load_external_scores, TeamScore
+from sr.comp.types import GamePoints, MatchId, TLA
+
+from score import InvalidScoresheetException
+from sheets import calculate_scores, COMPSTATE_ROOT, match_id
+from standings import disqualified_teams, LeagueTable
+
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader  # type: ignore[assignment]
+
+LEAGUE_SHEETS = 'league/*/*.yaml'
+EXTERNAL_SCORES = 'external/*.yaml'
+TEAMS = 'teams.yaml'
+
+NULL_SHA = '0' * 40
+
+
+class GitObjectReader:
+    """
+    Reads objects from a git repository through a long-lived
+    `git cat-file --batch` process.
+    """
+
+    def __init__(self, root: Path) -> None:
+        self._process = subprocess.Popen(
+            ['git', 'cat-file', '--batch'],
+            cwd=root,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+        )
+
+    def read(self, sha: str) -> bytes:
+        assert self._process.stdin and self._process.stdout
+        self._process.stdin.write(sha.encode('ascii') + b'\n')
+        self._process.stdin.flush()
+
+        header = self._process.stdout.readline().split()
+        if len(header) != 3:
+            raise KeyError(sha)
+        _, _, size = header
+        data = self._process.stdout.read(int(size))
+        # Each object is followed by a newline
+        self._process.stdout.read(1)
+        return data
+
+    def close(self) -> None:
+        if self._process.stdin:
+            self._process.stdin.close()
+        self._process.wait()
+
+    def __enter__(self) -> GitObjectReader:
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+
+@dataclasses.dataclass(frozen=True)
+class Commit:
+    sha: str
+    timestamp: datetime.datetime
+    subject: str
+    # Path -> blob sha of the files which changed, the null sha if removed
+    changes: dict[str, str]
+
+
+@dataclasses.dataclass(frozen=True)
+class Standings:
+    commit: str
+    timestamp: datetime.datetime
+    subject: str
+    # In ranked order
+    positions: dict[TLA, LeaguePosition]
+    totals: dict[TLA, TeamScore]
+    # Path -> why the sheet isn't included
+    problems: dict[str, str]
+
+
+def iter_commits(
+    root: Path = COMPSTATE_ROOT,
+    rev: str = 'HEAD',
+    paths: Sequence[str] = ('league', 'external', TEAMS),
+) -> Iterator[Commit]:
+    """
+    The first-parent history of the given revision which touches the given
+    paths, oldest first, with the files each commit changed.
+    """
+    output = subprocess.check_output(
+        [
+            'git', 'log', '--reverse', '--first-parent', '-m', '--raw',
+            '--no-abbrev', '--no-renames', '--format=%x01%H %ct %s',
+            rev, '--', *paths,
+        ],
+        cwd=root,
+        text=True,
+    )
+    commit = None
+    for line in output.splitlines():
+        if line.startswith('\x01'):
+            if commit is not None:
+                yield commit
+            sha, timestamp, subject = (line[1:].split(' ', 2) + [''])[:3]
+            commit = Commit(
+                sha,
+                datetime.datetime.fromtimestamp(int(timestamp), datetime.timezone.utc),
+                subject,
+                {},
+            )
+        elif line.startswith(':') and commit is not None:
+            info, path = line.split('\t', 1)
+            commit.changes[path] = info.split()[3]
+    if commit is not None:
+        yield commit
+
+
+class StandingsHistory:
+    """
+    The standings as of a commit, moved forwards one commit at a time.
+    """
+
+    def __init__(self, reader: GitObjectReader) -> None:
+        self._reader = reader
+        self._teams: list[TLA] = []
+        self._external: dict[str, list[dict[str, Any]]] = {}
+        self.table = LeagueTable([])
+
+        # Path -> blob sha of every league sheet
+        self._blobs: dict[str, str] = {}
+        # Path -> the result from the sheet at that path, for those included
+        self._sheets: dict[str, tuple[MatchId, dict[TLA, GamePoints], list[TLA]]] = {}
+        self._paths: dict[MatchId, str] = {}
+        # Blob sha -> result or problem; the same blob always scores the same
+        self._scored: dict[str, Any] = {}
+        self.problems: dict[str, str] = {}
+
+    def _load(self, sha: str) -> Any:
+        return yaml.load(self._reader.read(sha), Loader=SafeLoader)
+
+    def _score(self, sha: str) -> tuple[MatchId, dict[TLA, GamePoints], list[TLA]] | str:
+        if sha not in self._scored:
+            try:
+                sheet = self._load(sha)
+                self._scored[sha] = (
+                    match_id(sheet),
+                    calculate_scores(sheet),
+                    disqualified_teams(sheet),
+                )
+            except (InvalidScoresheetException, KeyError, TypeError, ValueError) as e:
+                self._scored[sha] = f"{type(e).__name__}: {e}"
+        return self._scored[sha]
+
+    def _set_sheet(self, path: str, sha: str) -> None:
+        old = self._sheets.pop(path, None)
+        if old is not None:
+            del self._paths[old[0]]
+            self.table.remove_match(old[0])
+        self.problems.pop(path, None)
+        if sha == NULL_SHA:
+            return
+
+        result = self._score(sha)
+        if isinstance(result, str):
+            self.problems[path] = result
+            return
+        key, game_points, _ = result
+        unknown = game_points.keys() - set(self._teams)
+        if unknown:
+            self.problems[path] = f"Unknown teams {', '.join(sorted(unknown))}"
+            return
+        if key in self._paths:
+            self.problems[path] = f"Duplicate of {self._paths[key]}"
+            return
+        self._sheets[path] = result
+        self._paths[key] = path
+        self.table.set_match(*result)
+
+    def _external_scores(self) -> dict[TLA, TeamScore]:
+        teams = set(self._teams)
+        entries = []
+        for path, data in sorted(self._external.items()):
+            self.problems.pop(path, None)
+            unknown = {x['team'] for x in data} - teams
+            if unknown:
+                self.problems[path] = f"Unknown teams {', '.join(sorted(unknown))}"
+            entries += [x for x in data if x['team'] in teams]
+        return dict(load_external_scores(entries, self._teams))
+
+    def apply(self, commit: Commit) -> None:
+        """
+        Move the standings on to the given commit, which must follow on from
+        the last one applied.
+        """
+        teams_changed = False
+        external_changed = False
+        sheets = {}
+        for path, sha in commit.changes.items():
+            if path == TEAMS:
+                teams_changed = True
+                self._teams = [] if sha == NULL_SHA else list(self._load(sha)['teams'])
+            elif fnmatch.fnmatch(path, EXTERNAL_SCORES):
+                external_changed = True
+                if sha == NULL_SHA:
+                    self._external.pop(path, None)
+                    self.problems.pop(path, None)
+                else:
+                    self._external[path] = self._load(sha)['scores']
+            elif fnmatch.fnmatch(path, LEAGUE_SHEETS):
+                sheets[path] = sha
+                if sha == NULL_SHA:
+                    self._blobs.pop(path, None)
+                else:
+                    self._blobs[path] = sha
+
+        if teams_changed:
+            # Every sheet needs re-adding to a table of the new teams
+            self._sheets.clear()
+            self._paths.clear()
+            self.problems.clear()
+            self.table = LeagueTable(self._teams, extra=self._external_scores())
+            sheets = self._blobs
+        elif external_changed:
+            self.table.set_external_scores(self._external_scores())
+
+        for path, sha in sorted(sheets.items()):
+            self._set_sheet(path, sha)
+
+    def standings(self, commit: Commit) -> Standings:
+        return Standings(
+            commit.sha,
+            commit.timestamp,
+            commit.subject,
+            dict(self.table.positions),
+            {
+                tla: TeamScore(
+                    self.table.totals(tla).league_points,
+                    self.table.totals(tla).game_points,
+                )
+                for tla in self.table.teams
+            },
+            dict(self.problems),
+        )
+
+
+def iter_standings(root: Path = COMPSTATE_ROOT, rev: str = 'HEAD') -> Iterator[Standings]:
+    """
+    The standings after each commit in the first-parent history of the given
+    revision which changes them, oldest first.
+    """
+    with GitObjectReader(root) as reader:
+        history = StandingsHistory(reader)
+        for commit in iter_commits(root, rev):
+            history.apply(commit)
+            yield history.standings(commit)
+
+
+def standings_at(
+    history: Sequence[Standings],
+    when: datetime.datetime,
+) -> Standings | None:
+    """
+    The standings as they were at the given time, or None if that's before the
+    first of them.
+
+    Commit times needn't increase along the history (clocks differ between
+    machines), so this is the last standings in history order whose commit
+    is from no later than the given time.
+    """
+    found = None
+    for standings in history:
+        if standings.timestamp <= when:
+            found = standings
+    return found
+
+
+def format_standings(standings: Standings, previous: Mapping[TLA, LeaguePosition]) -> str:
+    lines = [
+        f"{standings.commit[:10]} {standings.timestamp:%Y-%m-%d %H:%M:%S} "
+        f"{standings.subject}",
+    ]
+    for tla, position in standings.positions.items():
+        totals = standings.totals[tla]
+        old = previous.get(tla)
+        moved = '' if old is None or old == position else f" (was {old})"
+        lines.append(
+            f"{position:>4}  {tla:<6} {totals.league_points:>4} league "
+            f"{totals.game_points:>5} game{moved}",
+        )
+    for path, problem in sorted(standings.problems.items()):
+        lines.append(f"  Skipped {path}: {problem}")
+    return '\n'.join(lines)
+
+
+def parse_time(text: str) -> datetime.datetime:
+    when = datetime.datetime.fromisoformat(text)
+    if when.tzinfo is None:
+        when = when.astimezone()
+    return when
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Show how the league standings changed through the compstate's history.",
+    )
+    parser.add_argument(
+        '--compstate',
+        type=Path,
+        default=COMPSTATE_ROOT,
+        help="competition state repository (default: %(default)s)",
+    )
+    parser.add_argument(
+        '--rev',
+        default='HEAD',
+        help="revision whose history to walk (default: %(default)s)",
+    )
+    parser.add_argument(
+        '--at',
+        type=parse_time,
+        action='append',
+        help=(
+            "show the standings as they were at this time (ISO 8601, local time "
+            "unless given); may be repeated. By default the standings after "
+            "every commit which changes them are shown."
+        ),
+    )
+    return parser.parse_args()
+
+
+def main(args: argparse.Namespace) -> None:
+    start = time.perf_counter()
+    history = list(iter_standings(args.compstate, args.rev))
+    elapsed = time.perf_counter() - start
+
+    if args.at:
+        selected = []
+        for when in args.at:
+            standings = standings_at(history, when)
+            if standings is None:
+                print(f"No standings at {when.isoformat()}")
+            else:
+                selected.append(standings)
+    else:
+        selected = history
+
+    previous: Mapping[TLA, LeaguePosition] = {}
+    for standings in selected:
+        print(format_standings(standings, previous))
+        print()
+        previous = standings.positions
+
+    print(f"Replayed {len(history)} commits in {elapsed:.2f}s")
+
+
+if __name__ == '__main__':
+    main(parse_args())
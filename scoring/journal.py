@@ -0,0 +1,514 @@
+"""
+Append-only journal of score sheet events.
+
+Each time a sheet is saved an event is appended to the journal: the full sheet
+the first time a match is seen and a delta against the previous version of
+that match's sheet thereafter. Replaying the journal rebuilds the sheets (and
+from them the scores) as they were at any point in the journal's history
+without needing to parse every YAML file or walk the git history.
+
+The on-disk format is a short file header followed by a sequence of frames:
+
+    header:  MAGIC (7 bytes) | version (1 byte)
+    frame:   payload length (u32) | crc32 (u32) | timestamp (f64) | kind (u8)
+             | payload (compact JSON, UTF-8)
+
+All integers are big-endian. The checksum covers the timestamp, kind and
+payload. Frames are only ever appended and are flushed to disk before a save
+is considered recorded; a frame which was only partially written (for example
+due to a crash) is ignored on read and discarded by the next writer.
+
+Sheets are recorded once they have been written to the compstate, not when
+they're converted, so that the journal only holds what was actually saved.
+The Scorer UI commits every save, so a git `post-commit` hook records the
+sheets each commit changes. To install it in a compstate:
+
+    python scoring/journal.py --journal /path/to/scores.journal install-hook
+
+The score entry service can also record its saves directly (`--journal`).
+Recording a sheet which is unchanged is a no-op, so using both is harmless.
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import copy
+import dataclasses
+import enum
+import fcntl
+import json
+import os
+import shlex
+import struct
+import subprocess
+import sys
+import time
+import zlib
+from pathlib import Path
+from typing import Any, BinaryIO, Iterator
+
+import yaml
+
+from sheets import (
+    calculate_scores,
+    COMPSTATE_ROOT,
+    match_id,
+    MatchId,
+    SHEET_KINDS,
+)
+
+MAGIC = b'SR25JNL'
+VERSION = 1
+
+FILE_HEADER = MAGIC + bytes([VERSION])
+FRAME_HEADER = struct.Struct('>IIdB')
+_CHECKED_HEADER = struct.Struct('>dB')
+
+# Guard against reading an absurd length from a damaged frame header
+MAX_PAYLOAD_SIZE = 1 << 20
+
+
+class EventKind(enum.IntEnum):
+    FULL = 0
+    DELTA = 1
+
+
+class CorruptJournalException(Exception):
+    def __init__(self, message: str, *, offset: int) -> None:
+        super().__init__(f"{message} (at offset {offset})")
+        self.offset = offset
+
+
+@dataclasses.dataclass(frozen=True)
+class JournalEvent:
+    sequence: int
+    timestamp: float
+    kind: EventKind
+    match_id: MatchId
+    # The full sheet for FULL events, otherwise a delta as from `sheet_delta`.
+    data: dict[str, Any]
+
+
+# A path of keys into a sheet, e.g: ('teams', 'ABC', 'present')
+KeyPath = tuple[str, ...]
+
+
+def sheet_delta(old: dict[str, Any], new: dict[str, Any]) -> dict[str, Any]:
+    """
+    Compute the changes needed to turn one version of a sheet into another.
+
+    The result has a list of `(path, value)` pairs to set and a list of paths
+    to remove. Nested mappings are compared key by key so that, for example,
+    changing one pallet count results in a single entry.
+    """
+    set_: list[tuple[KeyPath, Any]] = []
+    unset: list[KeyPath] = []
+
+    def walk(path: KeyPath, a: dict[str, Any], b: dict[str, Any]) -> None:
+        for key in a.keys() - b.keys():
+            unset.append(path + (key,))
+        for key, value in b.items():
+            if key not in a:
+                set_.append((path + (key,), value))
+            elif isinstance(value, dict) and isinstance(a[key], dict):
+                walk(path + (key,), a[key], value)
+            elif a[key] != value:
+                set_.append((path + (key,), value))
+
+    walk((), old, new)
+
+    return {
+        'arena_id': new['arena_id'],
+        'match_number': new['match_number'],
+        'set': set_,
+        'unset': sorted(unset),
+    }
+
+
+def apply_delta(sheet: dict[str, Any], delta: dict[str, Any]) -> dict[str, Any]:
+    """
+    Apply a delta from `sheet_delta` to a sheet, returning the new sheet.
+    """
+    sheet = copy.deepcopy(sheet)
+
+    for *parents, key in delta['unset']:
+        target = sheet
+        for part in parents:
+            target = target[part]
+        del target[key]
+
+    for (*parents, key), value in delta['set']:
+        target = sheet
+        for part in parents:
+            target = target.setdefault(part, {})
+        target[key] = copy.deepcopy(value)
+
+    return sheet
+
+
+def _encode_frame(timestamp: float, kind: EventKind, data: dict[str, Any]) -> bytes:
+    payload = json.dumps(data, separators=(',', ':'), sort_keys=True).encode('utf-8')
+    checked = _CHECKED_HEADER.pack(timestamp, kind)
+    crc = zlib.crc32(payload, zlib.crc32(checked))
+    return FRAME_HEADER.pack(len(payload), crc, timestamp, kind) + payload
+
+
+def _read_frames(
+    stream: BinaryIO,
+    *,
+    offset: int = 0,
+    sequence: int = 0,
+) -> Iterator[tuple[JournalEvent, int]]:
+    """
+    Read the frames from a journal stream, yielding each event along with the
+    offset of the end of its frame.
+
+    By default the whole journal is read. Passing the `offset` of the end of a
+    frame (and the `sequence` of the next event) reads only the frames after
+    it.
+
+    Reading stops quietly at a partially written final frame. A complete frame
+    whose checksum does not match is an error.
+    """
+    stream.seek(offset)
+    if offset == 0:
+        header = stream.read(len(FILE_HEADER))
+        if not header:
+            return
+        if header != FILE_HEADER:
+            raise CorruptJournalException(
+                "Not a score journal (or unknown version)",
+                offset=0,
+            )
+        offset = len(FILE_HEADER)
+
+    while True:
+        raw_header = stream.read(FRAME_HEADER.size)
+        if len(raw_header) < FRAME_HEADER.size:
+            return
+
+        length, crc, timestamp, kind = FRAME_HEADER.unpack(raw_header)
+        if length > MAX_PAYLOAD_SIZE:
+            raise CorruptJournalException(f"Frame too large ({length} bytes)", offset=offset)
+
+        payload = stream.read(length)
+        if len(payload) < length:
+            return
+
+        checked = _CHECKED_HEADER.pack(timestamp, kind)
+        if zlib.crc32(payload, zlib.crc32(checked)) != crc:
+            raise CorruptJournalException("Checksum mismatch", offset=offset)
+
+        data = json.loads(payload)
+        offset += FRAME_HEADER.size + length
+        yield JournalEvent(
+            sequence=sequence,
+            timestamp=timestamp,
+            kind=EventKind(kind),
+            match_id=match_id(data),
+            data=data,
+        ), offset
+        sequence += 1
+
+
+def iter_events(path: Path) -> Iterator[JournalEvent]:
+    """
+    Stream the events from a journal, oldest first.
+    """
+    with path.open('rb') as f:
+        for event, _ in _read_frames(f):
+            yield event
+
+
+def _apply_event(sheets: dict[MatchId, dict[str, Any]], event: JournalEvent) -> None:
+    if event.kind == EventKind.FULL:
+        sheets[event.match_id] = event.data
+    else:
+        sheets[event.match_id] = apply_delta(sheets[event.match_id], event.data)
+
+
+def replay(
+    path: Path,
+    *,
+    until_sequence: int | None = None,
+    until_timestamp: float | None = None,
+) -> dict[MatchId, dict[str, Any]]:
+    """
+    Rebuild the sheets recorded in a journal.
+
+    By default the latest state is returned. Passing `until_sequence` and/or
+    `until_timestamp` returns the state as it was after the events up to the
+    given point.
+
+    Timestamps come from the clocks of whichever machines did the saving, so
+    needn't increase through the journal: events later than `until_timestamp`
+    are skipped rather than ending the replay.
+    """
+    if until_timestamp is None:
+        sheets: dict[MatchId, dict[str, Any]] = {}
+        for event in iter_events(path):
+            if until_sequence is not None and event.sequence > until_sequence:
+                break
+            _apply_event(sheets, event)
+        return sheets
+
+    # Deltas may be against skipped events, so every event is applied but
+    # only the sheets from those at or before the timestamp are kept.
+    latest: dict[MatchId, dict[str, Any]] = {}
+    visible: dict[MatchId, dict[str, Any]] = {}
+    for event in iter_events(path):
+        if until_sequence is not None and event.sequence > until_sequence:
+            break
+        _apply_event(latest, event)
+        if event.timestamp <= until_timestamp:
+            visible[event.match_id] = latest[event.match_id]
+
+    return visible
+
+
+def replay_scores(
+    path: Path,
+    *,
+    until_sequence: int | None = None,
+    until_timestamp: float | None = None,
+) -> dict[MatchId, dict[str, int]]:
+    """
+    Rebuild the game points of each match recorded in a journal.
+    """
+    sheets = replay(path, until_sequence=until_sequence, until_timestamp=until_timestamp)
+    return {
+        key: calculate_scores(sheet, validate=False)
+        for key, sheet in sheets.items()
+    }
+
+
+class JournalWriter:
+    """
+    Appends score events to a journal.
+
+    The journal is read once when the writer is opened; writers are intended
+    to be long-lived, being kept open by whatever is doing the saving. Each
+    record locks the journal so that concurrent writers serialise rather than
+    interleave their frames, catching up on any frames other writers have
+    appended since rather than re-reading the whole journal.
+    """
+
+    def __init__(self, path: Path) -> None:
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        # Unbuffered, so that what other writers append is always seen
+        self._file = os.fdopen(fd, 'r+b', buffering=0)
+
+        self._sheets: dict[MatchId, dict[str, Any]] = {}
+        self._sequence = 0
+        self._end = 0
+
+        with self._locked():
+            self._catch_up()
+
+    @contextlib.contextmanager
+    def _locked(self) -> Iterator[None]:
+        fcntl.flock(self._file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+
+    def _catch_up(self) -> None:
+        """
+        Read any frames appended since this writer last wrote or read, leaving
+        the file positioned to append. Must be called with the lock held.
+        """
+        frames = _read_frames(self._file, offset=self._end, sequence=self._sequence)
+        for event, end in frames:
+            _apply_event(self._sheets, event)
+            self._sequence = event.sequence + 1
+            self._end = end
+
+        if self._end == 0:
+            self._file.seek(0)
+            self._file.truncate()
+            self._file.write(FILE_HEADER)
+            self._end = len(FILE_HEADER)
+        else:
+            # Discard any partially written frame from an earlier crash.
+            self._file.truncate(self._end)
+        self._file.seek(self._end)
+
+    def __enter__(self) -> JournalWriter:
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._file.close()
+
+    def record(
+        self,
+        sheet: dict[str, Any],
+        *,
+        timestamp: float | None = None,
+    ) -> JournalEvent | None:
+        """
+        Record a newly saved sheet. Returns the event written, or `None` if the
+        sheet is unchanged from the last recorded version.
+        """
+        if timestamp is None:
+            timestamp = time.time()
+
+        key = match_id(sheet)
+
+        # Normalise via JSON so that what we hold matches what replay produces.
+        sheet = json.loads(json.dumps(sheet))
+
+        with self._locked():
+            self._catch_up()
+            previous = self._sheets.get(key)
+
+            if previous is None:
+                kind = EventKind.FULL
+                data = sheet
+            else:
+                kind = EventKind.DELTA
+                data = sheet_delta(previous, sheet)
+                if not data['set'] and not data['unset']:
+                    return None
+
+            frame = _encode_frame(timestamp, kind, data)
+            if self._file.write(frame) != len(frame):
+                # What was written is discarded as a partial frame next time.
+                raise OSError(f"Short write to journal {self._file.name}")
+            os.fsync(self._file.fileno())
+
+            event = JournalEvent(
+                sequence=self._sequence,
+                timestamp=timestamp,
+                kind=kind,
+                match_id=key,
+                data=json.loads(json.dumps(data)),
+            )
+            self._end += len(frame)
+            self._sequence += 1
+            self._sheets[key] = sheet
+
+        return event
+
+
+def committed_sheets(root: Path, rev: str = 'HEAD') -> tuple[float, list[str]]:
+    """
+    The time of a commit and the (relative) paths of the sheets it added or
+    changed.
+    """
+    timestamp, *paths = subprocess.check_output(
+        [
+            'git', 'diff-tree', '-r', '--root', '--no-renames', '--name-only',
+            '--diff-filter=d', '--format=%ct', rev,
+        ],
+        cwd=root,
+        text=True,
+    ).split()
+    return float(timestamp), [
+        path
+        for path in paths
+        if path.count('/') == 2
+        and path.split('/')[0] in SHEET_KINDS
+        and path.endswith('.yaml')
+    ]
+
+
+def record_commit(
+    journal: JournalWriter,
+    root: Path,
+    rev: str = 'HEAD',
+) -> list[JournalEvent]:
+    """
+    Record the sheets a commit added or changed, as of that commit.
+    """
+    timestamp, paths = committed_sheets(root, rev)
+    events = []
+    for path in paths:
+        content = subprocess.check_output(['git', 'show', f'{rev}:{path}'], cwd=root)
+        event = journal.record(yaml.safe_load(content), timestamp=timestamp)
+        if event is not None:
+            events.append(event)
+    return events
+
+
+HOOK_NAME = 'post-commit'
+# Marks the hooks we wrote, so that others aren't overwritten
+HOOK_MARKER = '# Installed by scoring/journal.py'
+
+
+def install_hook(root: Path, journal_path: Path) -> Path:
+    """
+    Install a git hook in the compstate which records the sheets in each
+    commit to the journal, returning the path to the hook.
+    """
+    hooks = Path(root, subprocess.check_output(
+        ['git', 'rev-parse', '--git-path', 'hooks'],
+        cwd=root,
+        text=True,
+    ).strip())
+    hook = hooks / HOOK_NAME
+    if hook.exists() and HOOK_MARKER not in hook.read_text():
+        raise FileExistsError(f"{hook} already exists")
+
+    command = shlex.join([
+        sys.executable,
+        str(Path(__file__).resolve()),
+        '--compstate', str(root.resolve()),
+        '--journal', str(journal_path.resolve()),
+        'record',
+    ])
+    hooks.mkdir(parents=True, exist_ok=True)
+    hook.write_text(f'#!/bin/sh\n{HOOK_MARKER}\nexec {command}\n')
+    hook.chmod(0o755)
+    return hook
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Record saved sheets in a score journal.")
+    parser.add_argument(
+        '--compstate',
+        type=Path,
+        default=COMPSTATE_ROOT,
+        help="competition state repository (default: %(default)s)",
+    )
+    parser.add_argument(
+        '--journal',
+        type=Path,
+        required=True,
+        help="path to the score journal",
+    )
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    record_parser = subparsers.add_parser(
+        'record',
+        help="record the sheets changed by a commit",
+    )
+    record_parser.add_argument('--revision', default='HEAD')
+
+    subparsers.add_parser(
+        'install-hook',
+        help=f"record every commit's sheets from a {HOOK_NAME} hook",
+    )
+
+    return parser.parse_args()
+
+
+def main(args: argparse.Namespace) -> None:
+    if args.command == 'install-hook':
+        try:
+            hook = install_hook(args.compstate, args.journal)
+        except FileExistsError as e:
+            sys.exit(f"{e}; add the journal to it by hand")
+        print(f"Installed {hook}")
+        return
+
+    with JournalWriter(args.journal) as journal:
+        record_commit(journal, args.compstate, args.revision)
+
+
+if __name__ == '__main__':
+    main(parse_args())
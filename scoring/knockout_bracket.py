@@ -0,0 +1,675 @@
+"""
+Generate a double elimination bracket for the static knockout.
+
+The `static_knockout` in `schedule.yaml` is built by hand for a particular
+range of team counts. This generates one for any number of teams and match
+size, in the same shape:
+
+- every team starts in the upper bracket, the top seeds possibly entering in
+  a later round than the rest;
+- the top half of each upper match continue in the upper bracket and the
+  rest drop into the lower bracket;
+- the top half of each lower match continue and the rest are out;
+- the winners of the single match at the end of each bracket meet in the
+  grand final.
+
+Many layouts fit a given number of teams: how many matches each upper round
+has (and so where the top seeds join) and how many lower rounds are played
+after each upper round. The layouts are searched on counts of teams alone,
+with the lower bracket searched by memoised recursion over the size of the
+pool of teams waiting in it, for the one which takes the least time and
+then has the fewest empty corners. Layouts which would need a match with
+fewer than `min_robots` robots are never considered.
+
+Rounds are played in order, each round's matches one after another in a
+single arena (as SRComp's static scheduler assumes), with the given spacing
+between rounds. A match is held back where needed to give each of its teams
+a minimum rest since their previous match, by default the shortest rest any
+team has in the existing `static_knockout`; that time counts towards the
+time a layout takes.
+"""
+
+from __future__ import annotations
+
+import argparse
+import dataclasses
+import datetime
+import functools
+import io
+import sys
+import time
+from pathlib import Path
+from typing import Any, Iterator, Mapping, Sequence
+
+from ruamel.yaml.comments import CommentedMap, CommentedSeq
+from sr.comp.cli import yaml_round_trip
+from sr.comp.knockout_scheduler.static_scheduler import (
+    parse_team_ref,
+    StaticScheduler,
+)
+
+from sheets import COMPSTATE_ROOT
+
+DEFAULT_MIN_ROBOTS = 3
+# How many upper rounds teams may join the knockout in
+DEFAULT_ENTRY_ROUNDS = 2
+
+# (round, match, position), as in `R<round>M<match>P<position>`
+Source = tuple[int, int, int]
+# Seconds, matches and empty corners
+Cost = tuple[int, int, int]
+# A seed reference or an earlier result
+Entrant = str | Source
+
+
+@dataclasses.dataclass(frozen=True)
+class BracketShape:
+    teams_per_arena: int
+    min_robots: int = DEFAULT_MIN_ROBOTS
+    entry_rounds: int = DEFAULT_ENTRY_ROUNDS
+
+    @property
+    def advancing(self) -> int:
+        """
+        How many teams from each match continue in their bracket.
+        """
+        return self.teams_per_arena // 2
+
+    def split(self, teams: int) -> list[int] | None:
+        """
+        How many robots each match of a round with the given number of teams
+        has, using as few matches as possible, or None if that would need a
+        match with too few.
+        """
+        matches = -(-teams // self.teams_per_arena)
+        if teams < self.min_robots * matches:
+            return None
+        smaller, larger = divmod(teams, matches)
+        return [smaller + 1] * larger + [smaller] * (matches - larger)
+
+
+@dataclasses.dataclass(frozen=True)
+class Layout:
+    # Matches in each upper round, first to last
+    upper: tuple[int, ...]
+    # Teams joining at each upper round, in seed order (the lowest seeds
+    # first, as they join first)
+    entering: tuple[int, ...]
+    # How many lower rounds are played after each upper round
+    lower_rounds: tuple[int, ...]
+    # Seconds from the start of the first match to the end of the last,
+    # including any time matches are held back to rest their teams
+    duration: int
+    matches: int
+    empty_corners: int
+
+
+@dataclasses.dataclass(frozen=True)
+class Round:
+    name: str
+    # Team references of each match, padded with None to the match size
+    matches: list[list[str | None]]
+
+
+@dataclasses.dataclass(frozen=True)
+class _Round:
+    name: str
+    size: int
+    # The seed references and earlier results in each match, by the order
+    # the rounds were built in
+    matches: list[list[Entrant]]
+
+
+def _upper_shapes(
+    shape: BracketShape,
+    num_teams: int,
+) -> Iterator[tuple[list[int], list[int]]]:
+    """
+    The possible upper brackets, as the matches in each round and the teams
+    joining at each, first round first.
+    """
+    size = shape.teams_per_arena
+
+    def earlier(
+        matches: list[int],
+        entering: list[int],
+        remaining: int,
+        entries: int,
+    ) -> Iterator[tuple[list[int], list[int]]]:
+        first = matches[-1]
+        # This could be the first round, taking all the teams left
+        if shape.split(remaining) is not None and -(-remaining // size) == first:
+            yield matches[::-1], [remaining, *entering[::-1]]
+
+        for previous in range(1, size * first // shape.advancing + 1):
+            joining = size * first - shape.advancing * previous
+            if remaining - joining < shape.min_robots * previous:
+                continue
+            if joining and entries + 1 >= shape.entry_rounds:
+                continue
+            yield from earlier(
+                [*matches, previous],
+                [*entering, joining],
+                remaining - joining,
+                entries + bool(joining),
+            )
+
+    # The upper bracket ends with a single match
+    yield from earlier([1], [], num_teams, 0)
+
+
+def _round_cost(matches: int, slot: int, spacing: int) -> int:
+    return matches * slot + spacing
+
+
+def search(
+    shape: BracketShape,
+    num_teams: int,
+    *,
+    slot: int,
+    spacing: int,
+    min_rest: int = 0,
+) -> Layout:
+    """
+    Find the quickest layout for the given number of teams.
+
+    The lower bracket for each upper bracket is chosen on the time its rounds
+    take; the time matches are then held back to rest their teams is added
+    before comparing the layouts.
+    """
+    if num_teams < 2 * shape.advancing:
+        raise ValueError(f"Need at least {2 * shape.advancing} teams for a knockout")
+
+    size = shape.teams_per_arena
+    best: Layout | None = None
+
+    for upper, entering in _upper_shapes(shape, num_teams):
+        # Teams dropping from each upper round
+        robots = [entering[0], *(size * x for x in upper[1:])]
+        losers = tuple(
+            count - shape.advancing * matches
+            for count, matches in zip(robots, upper)
+        )
+
+        @functools.lru_cache(maxsize=None)
+        def lower(index: int, pool: int) -> tuple[Cost, tuple[int, ...]] | None:
+            """
+            The cost of the rest of the lower bracket, from having a pool of
+            teams waiting when the losers of the given upper round join, and
+            how many lower rounds to play after each upper round.
+            """
+            pool += losers[index]
+            last = index == len(losers) - 1
+            found: tuple[Cost, tuple[int, ...]] | None = None
+            rounds = 0
+            cost = (0, 0, 0)
+            while True:
+                if last and pool == shape.advancing:
+                    # The lower bracket is done; its winners go to the final
+                    if rounds and (found is None or cost < found[0]):
+                        found = (cost, (rounds,))
+                    break
+                if not last:
+                    rest = lower(index + 1, pool)
+                    if rest is not None:
+                        (duration, matches, empty), later = rest
+                        total = (cost[0] + duration, cost[1] + matches, cost[2] + empty)
+                        if found is None or total < found[0]:
+                            found = (total, (rounds, *later))
+
+                # Play another lower round, if that would knock anyone out
+                if pool <= shape.advancing:
+                    break
+                split = shape.split(pool)
+                if split is None:
+                    break
+                rounds += 1
+                cost = (
+                    cost[0] + _round_cost(len(split), slot, spacing),
+                    cost[1] + len(split),
+                    cost[2] + size * len(split) - pool,
+                )
+                pool = shape.advancing * len(split)
+            return found
+
+        lowers = lower(0, 0)
+        if lowers is None:
+            continue
+
+        (duration, lower_matches, lower_empty), lower_rounds = lowers
+        upper_empty = size * upper[0] - entering[0]
+        # Everything but the final, which is played after the spacing
+        duration += sum(_round_cost(x, slot, spacing) for x in upper) + slot
+        layout = Layout(
+            tuple(upper),
+            tuple(entering),
+            lower_rounds,
+            duration,
+            sum(upper) + lower_matches + 1,
+            upper_empty + lower_empty + size - 2 * shape.advancing,
+        )
+        if min_rest:
+            starts = _match_starts(
+                build(shape, layout, num_teams),
+                slot=slot,
+                spacing=spacing,
+                min_rest=min_rest,
+            )
+            layout = dataclasses.replace(layout, duration=max(starts.values()) + slot)
+        if best is None or (
+            (layout.duration, layout.empty_corners) < (best.duration, best.empty_corners)
+        ):
+            best = layout
+
+    if best is None:
+        raise ValueError(
+            f"No double elimination bracket for {num_teams} teams without "
+            f"matches of fewer than {shape.min_robots} robots",
+        )
+    return best
+
+
+def _distribute(entrants: Sequence[Entrant], sizes: Sequence[int]) -> list[list[Entrant]]:
+    """
+    Share teams between matches of the given sizes, snaking through the
+    matches in order and keeping teams from the same earlier match apart
+    where possible.
+    """
+    matches: list[list[Entrant]] = [[] for _ in sizes]
+    sources: list[set[tuple[int, int]]] = [set() for _ in sizes]
+    snake = list(range(len(sizes))) + list(reversed(range(len(sizes))))
+    for i, entrant in enumerate(entrants):
+        source = None if isinstance(entrant, str) else entrant[:2]
+        target = snake[i % len(snake)]
+        index = min(
+            (x for x in range(len(sizes)) if len(matches[x]) < sizes[x]),
+            key=lambda x: (
+                source in sources[x],
+                x != target,
+                len(matches[x]) - sizes[x],
+                x,
+            ),
+        )
+        matches[index].append(entrant)
+        if source is not None:
+            sources[index].add(source)
+    return matches
+
+
+def _play_order(rounds: Sequence[_Round]) -> list[Round]:
+    """
+    Put the rounds in the order they're played, and number the references
+    to match.
+
+    Each round is played once all the matches feeding it have been, choosing
+    whichever round's teams have waited longest, so that (say) the lower
+    bracket plays while the winners of an upper round rest. Within a round,
+    the matches whose teams played longest ago go first.
+    """
+    # (build round, match) -> (round, match, place in the order of play)
+    played: dict[tuple[int, int], tuple[int, int, int]] = {}
+    ordered: list[Round] = []
+    remaining = list(range(len(rounds)))
+
+    def feeders(entrants: Sequence[Entrant]) -> list[int]:
+        return [
+            played[x[:2]][2]
+            for x in entrants
+            if not isinstance(x, str)
+        ]
+
+    def waited(index: int) -> int:
+        return max(
+            (y for x in rounds[index].matches for y in feeders(x)),
+            default=-1,
+        )
+
+    while remaining:
+        ready = [
+            x for x in remaining
+            if all(
+                y[:2] in played
+                for match in rounds[x].matches
+                for y in match
+                if not isinstance(y, str)
+            )
+        ]
+        index = min(ready, key=lambda x: (waited(x), x))
+        remaining.remove(index)
+
+        round_ = rounds[index]
+        round_num = len(ordered)
+        order = sorted(
+            range(len(round_.matches)),
+            key=lambda x: max(feeders(round_.matches[x]), default=-1),
+        )
+        refs = []
+        for match_num, build_num in enumerate(order):
+            match = round_.matches[build_num]
+            refs.append([
+                x if isinstance(x, str) else 'R{}M{}P{}'.format(*played[x[:2]][:2], x[2])
+                for x in match
+            ])
+            played[index, build_num] = (round_num, match_num, len(played))
+        ordered.append(Round(round_.name, [
+            [*match, *[None] * (round_.size - len(match))]
+            for match in refs
+        ]))
+    return ordered
+
+
+def build(shape: BracketShape, layout: Layout, num_teams: int) -> list[Round]:
+    """
+    The rounds of the given layout, in the order they're played.
+    """
+    rounds: list[_Round] = []
+
+    def add(
+        name: str,
+        entrants: Sequence[Entrant],
+        sizes: Sequence[int],
+    ) -> list[list[Source]]:
+        round_num = len(rounds)
+        matches = _distribute(entrants, sizes)
+        rounds.append(_Round(name, shape.teams_per_arena, matches))
+        return [
+            [(round_num, match_num, position) for position in range(len(match))]
+            for match_num, match in enumerate(matches)
+        ]
+
+    def continuing(results: list[list[Source]]) -> list[Source]:
+        # Winners first, by position, so they're spread between matches
+        return [
+            match[position]
+            for position in range(shape.advancing)
+            for match in results
+            if position < len(match)
+        ]
+
+    def dropping(results: list[list[Source]]) -> list[Source]:
+        return [
+            match[position]
+            for position in range(shape.advancing, shape.teams_per_arena)
+            for match in results
+            if position < len(match)
+        ]
+
+    seed = num_teams
+    upper_waiting: list[Source] = []
+    lower_waiting: list[Source] = []
+    upper_count = len(layout.upper)
+    lower_total = sum(layout.lower_rounds)
+    lower_played = 0
+
+    for index, (matches, joining) in enumerate(zip(layout.upper, layout.entering)):
+        # The top seeds are spread first
+        seeds = [f'S{x}' for x in range(seed - joining + 1, seed + 1)]
+        seed -= joining
+        if index == 0:
+            sizes = shape.split(joining)
+        else:
+            sizes = [shape.teams_per_arena] * matches
+        assert sizes is not None and len(sizes) == matches
+
+        name = 'Upper Semi Final' if index == upper_count - 1 else f'Upper Round {index + 1}'
+        results = add(name, [*seeds, *upper_waiting], sizes)
+        upper_waiting = continuing(results)
+        lower_waiting += dropping(results)
+
+        for _ in range(layout.lower_rounds[index]):
+            lower_played += 1
+            sizes = shape.split(len(lower_waiting))
+            assert sizes is not None
+            name = (
+                'Lower Semi Final'
+                if lower_played == lower_total
+                else f'Lower Round {lower_played}'
+            )
+            lower_waiting = continuing(add(name, lower_waiting, sizes))
+
+    add('Grand Final', [*upper_waiting, *lower_waiting], [2 * shape.advancing])
+    return _play_order(rounds)
+
+
+def _previous_matches(match: Sequence[str | None]) -> Iterator[tuple[int, int]]:
+    for team in match:
+        if team is not None and not team.startswith('S'):
+            previous_round, previous_match, _ = parse_team_ref(team)
+            yield previous_round, previous_match
+
+
+def _match_starts(
+    rounds: Sequence[Round],
+    *,
+    slot: int,
+    spacing: int,
+    min_rest: int,
+) -> dict[tuple[int, int], int]:
+    """
+    When each match starts, in seconds from the start of the first: one after
+    another with the spacing between rounds, holding a match back until its
+    teams have all rested for at least the given time.
+    """
+    starts: dict[tuple[int, int], int] = {}
+    when = 0
+    for round_num, round_ in enumerate(rounds):
+        if round_num:
+            when += spacing
+        for match_num, match in enumerate(round_.matches):
+            when = max(
+                [when, *(starts[x] + slot + min_rest for x in _previous_matches(match))],
+            )
+            starts[round_num, match_num] = when
+            when += slot
+    return starts
+
+
+def shortest_rest(
+    rounds: Sequence[Round],
+    *,
+    slot: int,
+    spacing: int,
+    min_rest: int = 0,
+) -> int | None:
+    """
+    The shortest time in seconds any team has between the end of one of its
+    matches and the start of its next.
+    """
+    starts = _match_starts(rounds, slot=slot, spacing=spacing, min_rest=min_rest)
+    shortest = None
+    for round_num, round_ in enumerate(rounds):
+        for match_num, match in enumerate(round_.matches):
+            for previous in _previous_matches(match):
+                rest = starts[round_num, match_num] - starts[previous] - slot
+                shortest = rest if shortest is None else min(shortest, rest)
+    return shortest
+
+
+def scheduled_rest(config: Mapping[str, Any], *, slot: int) -> int | None:
+    """
+    The shortest time in seconds any team has between its matches in an
+    existing `static_knockout` configuration.
+    """
+    rounds = StaticScheduler.modernise_config_if_needed(config)['rounds']  # type: ignore[arg-type]  # noqa: E501
+    matches = {
+        (round_num, match_num): match
+        for round_num, round_ in rounds.items()
+        for match_num, match in round_['matches'].items()
+    }
+    rests = [
+        (match['start_time'] - matches[previous]['start_time']).total_seconds() - slot
+        for match in matches.values()
+        for previous in _previous_matches(match['teams'])
+    ]
+    return int(min(rests)) if rests else None
+
+
+def to_config(
+    shape: BracketShape,
+    rounds: Sequence[Round],
+    *,
+    arena: str,
+    start: datetime.datetime,
+    slot: int,
+    spacing: int,
+    min_rest: int = 0,
+) -> CommentedMap:
+    """
+    The `static_knockout` configuration for the given rounds, formatted as
+    in the schedule.
+    """
+    starts = _match_starts(rounds, slot=slot, spacing=spacing, min_rest=min_rest)
+    matches = CommentedMap()
+    for round_num, round_ in enumerate(rounds):
+        matches[round_num] = CommentedMap()
+        matches.yaml_add_eol_comment(round_.name, round_num)
+        for match_num, refs in enumerate(round_.matches):
+            display_name = round_.name
+            if not display_name.endswith('Final'):
+                display_name += f" Match {match_num + 1}"
+            teams = CommentedSeq(refs)
+            teams.fa.set_flow_style()
+            matches[round_num][match_num] = {
+                'arena': arena,
+                'display_name': display_name,
+                # Always a new object, so that the schedule doesn't end up
+                # with an alias to the start of the knockout period
+                'start_time': start + datetime.timedelta(
+                    seconds=starts[round_num, match_num],
+                ),
+                'teams': teams,
+            }
+    return CommentedMap({
+        'teams_per_arena': shape.teams_per_arena,
+        'matches': matches,
+    })
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Generate a double elimination static knockout for a number of teams.",
+    )
+    parser.add_argument('teams', type=int, help="number of teams in the knockout")
+    parser.add_argument(
+        '--compstate',
+        type=Path,
+        default=COMPSTATE_ROOT,
+        help="competition state repository (default: %(default)s)",
+    )
+    parser.add_argument(
+        '--teams-per-arena',
+        type=int,
+        help="teams in each match (default: from the schedule)",
+    )
+    parser.add_argument(
+        '--slot',
+        type=int,
+        help="seconds between match starts (default: the schedule's match slot)",
+    )
+    parser.add_argument(
+        '--round-spacing',
+        type=int,
+        default=0,
+        help="extra seconds between rounds (default: %(default)s)",
+    )
+    parser.add_argument(
+        '--min-rest',
+        type=int,
+        help=(
+            "fewest seconds a team has between its matches (default: the "
+            "shortest in the schedule's static knockout)"
+        ),
+    )
+    parser.add_argument(
+        '--start',
+        type=datetime.datetime.fromisoformat,
+        help="start of the first match (default: the start of the knockout period)",
+    )
+    parser.add_argument(
+        '--arena',
+        default='main',
+        help="arena to play the matches in (default: %(default)s)",
+    )
+    parser.add_argument(
+        '--min-robots',
+        type=int,
+        default=DEFAULT_MIN_ROBOTS,
+        help="fewest robots allowed in a match (default: %(default)s)",
+    )
+    parser.add_argument(
+        '--entry-rounds',
+        type=int,
+        default=DEFAULT_ENTRY_ROUNDS,
+        help="how many upper rounds teams may join in (default: %(default)s)",
+    )
+    parser.add_argument(
+        '--write',
+        action='store_true',
+        help="replace the static knockout in the schedule rather than printing it",
+    )
+    return parser.parse_args()
+
+
+def main(args: argparse.Namespace) -> None:
+    schedule_path = args.compstate / 'schedule.yaml'
+    schedule = yaml_round_trip.load(schedule_path)
+
+    teams_per_arena = args.teams_per_arena or schedule['static_knockout']['teams_per_arena']
+    slot = args.slot or schedule['match_slot_lengths']['total']
+    start = args.start or schedule['match_periods']['knockout'][0]['start_time']
+    if args.min_rest is None:
+        min_rest = scheduled_rest(schedule['static_knockout'], slot=slot) or 0
+    else:
+        min_rest = args.min_rest
+    shape = BracketShape(teams_per_arena, args.min_robots, args.entry_rounds)
+
+    before = time.perf_counter()
+    try:
+        layout = search(
+            shape,
+            args.teams,
+            slot=slot,
+            spacing=args.round_spacing,
+            min_rest=min_rest,
+        )
+    except ValueError as e:
+        sys.exit(str(e))
+    rounds = build(shape, layout, args.teams)
+    elapsed = time.perf_counter() - before
+
+    config = to_config(
+        shape,
+        rounds,
+        arena=args.arena,
+        start=start,
+        slot=slot,
+        spacing=args.round_spacing,
+        min_rest=min_rest,
+    )
+
+    rest = shortest_rest(
+        rounds,
+        slot=slot,
+        spacing=args.round_spacing,
+        min_rest=min_rest,
+    ) or 0
+    print(
+        f"{args.teams} teams: {layout.matches} matches in {len(rounds)} rounds over "
+        f"{datetime.timedelta(seconds=layout.duration)}, "
+        f"{layout.empty_corners} empty corners, "
+        f"at least {datetime.timedelta(seconds=rest)} between a team's matches "
+        f"(found in {elapsed * 1000:.1f}ms)",
+        file=sys.stderr,
+    )
+
+    if args.write:
+        schedule['static_knockout'] = config
+        yaml_round_trip.dump(schedule, schedule_path)
+    else:
+        output = io.StringIO()
+        yaml_round_trip.dump({'static_knockout': config}, output)
+        print(output.getvalue(), end='')
+
+
+if __name__ == '__main__':
+    main(parse_args())
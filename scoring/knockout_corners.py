@@ -0,0 +1,234 @@
+"""
+Balanced corner assignment for the static knockout.
+
+`scripts/shuffle-knockout-corners.py` shuffles each knockout match's teams at
+random, ignoring which corners the teams have already had. This instead
+chooses the corners of each match for the teams which could play in it:
+seeded teams are known (provisionally, until the league is complete), and a
+team coming through from an earlier knockout match could be any of the teams
+which could have played in that one, having had the corners they would have
+had on the way.
+
+Each team's corner history starts from the league sheets (in which it was
+present). The cost of putting a team reference in a corner is the number of
+times the team(s) which could be there have already had that corner, averaged
+over them, so the assignment spreads every possible path through the bracket
+across the corners as evenly as it can and avoids repeating a corner from
+earlier in the knockout. A match's corners only affect the matches after it,
+so matches are assigned in order, each exactly (by trying every ordering of
+its teams). Ties are broken at random from the given seed so that the result
+is reproducible.
+"""
+
+from __future__ import annotations
+
+import argparse
+import dataclasses
+import itertools
+import random
+import time
+from fractions import Fraction
+from pathlib import Path
+from typing import Any, Iterable, Mapping, Sequence
+
+from sr.comp.cli import yaml_round_trip
+from sr.comp.comp import SRComp
+from sr.comp.knockout_scheduler.static_scheduler import parse_team_ref
+from sr.comp.types import MatchNumber, TLA
+
+from knockout_progress import KnockoutSlot, load_team_refs
+from sheets import COMPSTATE_ROOT, find_sheets, load_sheet
+from standings import LeagueTable, NUM_ZONES
+
+
+@dataclasses.dataclass(frozen=True)
+class CornerAssignment:
+    # Slot -> team references, in corner order
+    teams: dict[KnockoutSlot, list[str | None]]
+    # Slot -> how many times, on average, the teams which could be in the
+    # match have already had the corners they're given in it
+    repeats: dict[KnockoutSlot, Fraction]
+
+    @property
+    def total_repeats(self) -> Fraction:
+        return sum(self.repeats.values(), Fraction())
+
+
+def corner_history(sheets: Iterable[Mapping[str, Any]]) -> dict[TLA, list[int]]:
+    """
+    How many times each team has been in each corner in the given sheets,
+    counting only the matches the team was present for.
+    """
+    history: dict[TLA, list[int]] = {}
+    for sheet in sheets:
+        for tla, info in sheet['teams'].items():
+            counts = history.setdefault(tla, [0] * NUM_ZONES)
+            if info.get('present', True):
+                counts[info['zone']] += 1
+    return history
+
+
+def assign_corners(
+    team_refs: Mapping[KnockoutSlot, Sequence[str | None]],
+    seeds: Sequence[TLA],
+    history: Mapping[TLA, Sequence[int]],
+    *,
+    seed: int = 0,
+    optimise: bool = True,
+) -> CornerAssignment:
+    """
+    Choose the corner of each team reference in each knockout match.
+
+    Without `optimise`, the given corners are kept, which is useful to compare
+    against.
+    """
+    rng = random.Random(seed)
+
+    # Slot -> team -> the corners the team would have had in the knockout up
+    # to and including that match, for each team which could be in it
+    paths: dict[KnockoutSlot, dict[TLA, tuple[int, ...]]] = {}
+
+    def candidates(ref: str | None) -> dict[TLA, tuple[int, ...]]:
+        if ref is None:
+            return {}
+        if ref.startswith('S'):
+            index = int(ref[1:]) - 1
+            # Seeds beyond the number of teams are byes
+            return {seeds[index]: ()} if index < len(seeds) else {}
+        round_num, match_num, _ = parse_team_ref(ref)
+        return paths[round_num, match_num]
+
+    teams = {}
+    repeats = {}
+    for slot in sorted(team_refs):
+        refs = list(team_refs[slot])
+        entrants = [candidates(ref) for ref in refs]
+
+        costs = []
+        for possible in entrants:
+            row = [Fraction() for _ in refs]
+            for tla, previous in possible.items():
+                counts = history.get(tla, [0] * NUM_ZONES)
+                for corner in range(len(refs)):
+                    row[corner] += Fraction(
+                        counts[corner] + previous.count(corner),
+                        len(possible),
+                    )
+            costs.append(row)
+
+        if optimise:
+            # Every ordering of four teams is few enough to try them all
+            best: list[tuple[int, ...]] = []
+            lowest = None
+            for corners in itertools.permutations(range(len(refs))):
+                cost = sum((costs[i][x] for i, x in enumerate(corners)), Fraction())
+                if lowest is None or cost < lowest:
+                    lowest, best = cost, [corners]
+                elif cost == lowest:
+                    best.append(corners)
+            chosen = rng.choice(best)
+        else:
+            chosen = tuple(range(len(refs)))
+
+        ordered: list[str | None] = [None] * len(refs)
+        for i, corner in enumerate(chosen):
+            ordered[corner] = refs[i]
+        teams[slot] = ordered
+        repeats[slot] = sum((costs[i][x] for i, x in enumerate(chosen)), Fraction())
+
+        paths[slot] = {
+            tla: previous + (corner,)
+            for possible, corner in zip(entrants, chosen)
+            for tla, previous in possible.items()
+        }
+
+    return CornerAssignment(teams, repeats)
+
+
+def load_seeds(root: Path = COMPSTATE_ROOT) -> list[TLA]:
+    """
+    The knockout seeds as of the league so far, whether or not it's complete.
+    """
+    comp = SRComp(root)
+    # As `BaseKnockoutScheduler._get_seeds`
+    first_knockout_match = MatchNumber(comp.schedule.n_league_matches)
+    return [
+        tla
+        for tla in LeagueTable.load(root).ranked_teams()
+        if comp.teams[tla].is_still_around(first_knockout_match)
+    ]
+
+
+def write_corners(root: Path, teams: Mapping[KnockoutSlot, Sequence[str | None]]) -> None:
+    """
+    Save the corners of each knockout match to the compstate's schedule.
+    """
+    with yaml_round_trip.edit(root / 'schedule.yaml') as schedule:
+        config = schedule['static_knockout']
+        for (round_num, match_num), refs in teams.items():
+            if 'rounds' in config:
+                match_info = config['rounds'][round_num]['matches'][match_num]
+            else:
+                match_info = config['matches'][round_num][match_num]
+            # In place, to keep the list's formatting
+            match_info['teams'][:] = refs
+
+
+def _format_refs(refs: Sequence[str | None]) -> str:
+    return ', '.join('-' if x is None else x for x in refs)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Assign knockout corners to balance the corners teams have had.",
+    )
+    parser.add_argument(
+        '--compstate',
+        type=Path,
+        default=COMPSTATE_ROOT,
+        help="competition state repository (default: %(default)s)",
+    )
+    parser.add_argument(
+        '--seed',
+        type=int,
+        default=0,
+        help="seed for breaking ties between equally good assignments (default: %(default)s)",
+    )
+    parser.add_argument(
+        '--dry-run',
+        action='store_true',
+        help="show the assignment without saving it to the schedule",
+    )
+    return parser.parse_args()
+
+
+def main(args: argparse.Namespace) -> None:
+    team_refs = load_team_refs(args.compstate)
+    seeds = load_seeds(args.compstate)
+    history = corner_history(
+        load_sheet(path) for _, path in find_sheets(args.compstate, kinds=('league',))
+    )
+
+    start = time.perf_counter()
+    assignment = assign_corners(team_refs, seeds, history, seed=args.seed)
+    elapsed = time.perf_counter() - start
+    current = assign_corners(team_refs, seeds, history, optimise=False)
+
+    for slot, refs in assignment.teams.items():
+        print(
+            f"Round {slot[0]} match {slot[1]}: {_format_refs(team_refs[slot]):<24} "
+            f"-> {_format_refs(refs):<24} "
+            f"repeats {float(current.repeats[slot]):5.2f} -> "
+            f"{float(assignment.repeats[slot]):5.2f}",
+        )
+    print(
+        f"Total repeats {float(current.total_repeats):.2f} -> "
+        f"{float(assignment.total_repeats):.2f} (assigned in {elapsed * 1000:.1f}ms)",
+    )
+
+    if not args.dry_run:
+        write_corners(args.compstate, assignment.teams)
+
+
+if __name__ == '__main__':
+    main(parse_args())
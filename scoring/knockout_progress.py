@@ -0,0 +1,347 @@
+"""
+Live resolution of the static knockout as results come in.
+
+SRComp resolves the teams of each knockout match when the whole compstate is
+loaded. During the knockouts we want a match's teams to be known as soon as
+the sheets it depends on land, without reloading everything. `KnockoutResolver`
+holds the static knockout's team references (`S<seed>`, `<r><m><p>` or
+`R<r>M<m>P<p>`) along with which matches refer to each match, so that a new
+or corrected sheet only re-resolves the matches which refer to it.
+
+Positions within a match are computed the same way SRComp does: by game
+points, with ties broken by league position except in the final.
+"""
+
+from __future__ import annotations
+
+import argparse
+import dataclasses
+import time
+from pathlib import Path
+from typing import Any, Iterable, Mapping, Sequence
+
+import yaml
+from sr.comp.comp import SRComp
+from sr.comp.knockout_scheduler import UNKNOWABLE_TEAM
+from sr.comp.knockout_scheduler.static_scheduler import (
+    parse_team_ref,
+    StaticScheduler,
+)
+from sr.comp.match_period import KnockoutMatch, MatchType
+from sr.comp.scores import degroup, KnockoutScores
+from sr.comp.types import GamePoints, MatchNumber, TLA
+
+from sheets import (
+    calculate_scores,
+    COMPSTATE_ROOT,
+    find_sheets,
+    load_sheet,
+    match_id,
+)
+from standings import disqualified_teams, match_league_points
+
+# (round, match within round)
+KnockoutSlot = tuple[int, int]
+
+
+@dataclasses.dataclass(frozen=True)
+class Progression:
+    # Matches whose teams changed, in match order
+    changed: list[KnockoutMatch]
+    # Matches which have already been scored but whose teams have since
+    # changed, so their sheets need re-entering
+    stale: list[KnockoutMatch]
+
+
+def load_team_refs(root: Path = COMPSTATE_ROOT) -> dict[KnockoutSlot, list[str | None]]:
+    """
+    The team references of each match in the static knockout.
+    """
+    with (root / 'schedule.yaml').open() as f:
+        config = StaticScheduler.modernise_config_if_needed(
+            yaml.safe_load(f)['static_knockout'],
+        )
+
+    return {
+        (round_num, match_num): match_info['teams']
+        for round_num, round_info in config['rounds'].items()
+        for match_num, match_info in round_info['matches'].items()
+    }
+
+
+class KnockoutResolver:
+    """
+    The teams in each knockout match, kept up to date as sheets are added.
+    """
+
+    def __init__(
+        self,
+        rounds: Sequence[Sequence[KnockoutMatch]],
+        team_refs: Mapping[KnockoutSlot, Sequence[str | None]],
+        seeds: Sequence[TLA],
+        league_positions: Mapping[TLA, int],
+    ) -> None:
+        self._matches = {
+            (round_num, match_num): match
+            for round_num, matches in enumerate(rounds)
+            for match_num, match in enumerate(matches)
+        }
+        self._slots = {match.num: slot for slot, match in self._matches.items()}
+        self._team_refs = {slot: list(refs) for slot, refs in team_refs.items()}
+        self._seeds = list(seeds)
+        self._league_positions = league_positions
+
+        # The teams each scored match was scored with, and its ranking
+        self._scored_teams: dict[KnockoutSlot, set[TLA]] = {}
+        self._rankings: dict[KnockoutSlot, list[TLA]] = {}
+
+        self._dependants: dict[KnockoutSlot, set[KnockoutSlot]] = {
+            slot: set() for slot in self._matches
+        }
+        # Seed index -> the matches using that seed
+        self._seed_dependants: dict[int, set[KnockoutSlot]] = {}
+        for slot, refs in self._team_refs.items():
+            for ref in refs:
+                if ref is None:
+                    continue
+                if ref.startswith('S'):
+                    self._seed_dependants.setdefault(int(ref[1:]) - 1, set()).add(slot)
+                else:
+                    round_num, match_num, _ = parse_team_ref(ref)
+                    self._dependants[round_num, match_num].add(slot)
+
+        for slot in sorted(self._matches):
+            self._resolve_match(slot)
+
+    @classmethod
+    def load(cls, root: Path = COMPSTATE_ROOT) -> KnockoutResolver:
+        """
+        Build a resolver for the given compstate from its league results and
+        schedule, without any knockout results.
+        """
+        comp = SRComp(root)
+
+        # As `BaseKnockoutScheduler._get_seeds`
+        first_knockout_match = MatchNumber(comp.schedule.n_league_matches)
+        seeds = [
+            tla
+            for tla in comp.scores.league.positions
+            if comp.teams[tla].is_still_around(first_knockout_match)
+        ]
+        league_complete = all(
+            (match.arena, match.num) in comp.scores.league.game_points
+            for slot in comp.schedule.matches
+            for match in slot.values()
+            if match.type == MatchType.league
+        )
+        if not league_complete:
+            seeds = [UNKNOWABLE_TEAM] * len(seeds)
+
+        return cls(
+            comp.schedule.knockout_rounds,
+            load_team_refs(root),
+            seeds,
+            comp.scores.league.positions,
+        )
+
+    @property
+    def matches(self) -> list[KnockoutMatch]:
+        return [self._matches[slot] for slot in sorted(self._matches)]
+
+    def match(self, num: int) -> KnockoutMatch:
+        return self._matches[self._slots[MatchNumber(num)]]
+
+    def _resolve_team(self, ref: str | None) -> TLA | None:
+        if ref is None:
+            return None
+        if ref.startswith('S'):
+            return self._seeds[int(ref[1:]) - 1]
+        round_num, match_num, position = parse_team_ref(ref)
+        ranking = self._rankings.get((round_num, match_num))
+        if ranking is None:
+            return UNKNOWABLE_TEAM
+        return ranking[position]
+
+    def _resolve_match(self, slot: KnockoutSlot) -> bool:
+        match = self._matches[slot]
+        teams = [self._resolve_team(ref) for ref in self._team_refs[slot]]
+        if teams == match.teams:
+            return False
+        self._matches[slot] = dataclasses.replace(match, teams=teams)
+        return True
+
+    def _ranking(
+        self,
+        match: KnockoutMatch,
+        sheet: dict[str, Any],
+        game_points: Mapping[TLA, GamePoints] | None,
+    ) -> list[TLA]:
+        if game_points is None:
+            game_points = calculate_scores(sheet)
+        positions, league_points = match_league_points(
+            (match.arena, match.num),
+            game_points,
+            disqualified_teams(sheet),
+        )
+        if match.use_resolved_ranking:
+            return list(KnockoutScores.calculate_ranking(
+                league_points,
+                self._league_positions,
+            ))
+        return list(dict(degroup(positions)))
+
+    def _progress(self, slot: KnockoutSlot, ranking: list[TLA] | None) -> Progression:
+        if ranking == self._rankings.get(slot):
+            return Progression([], [])
+        if ranking is None:
+            del self._rankings[slot]
+        else:
+            self._rankings[slot] = ranking
+
+        # Only the positions of scored matches are referred to, and those come
+        # from their own sheets, so only direct dependants need re-resolving.
+        return self._re_resolve(self._dependants[slot])
+
+    def _re_resolve(self, slots: Iterable[KnockoutSlot]) -> Progression:
+        changed = [slot for slot in sorted(slots) if self._resolve_match(slot)]
+        return Progression(
+            [self._matches[x] for x in changed],
+            [
+                self._matches[x]
+                for x in changed
+                if x in self._scored_teams
+                and self._scored_teams[x] != set(self._matches[x].teams) - {None}
+            ],
+        )
+
+    @property
+    def seeds(self) -> list[TLA]:
+        return list(self._seeds)
+
+    def set_seeds(
+        self,
+        seeds: Sequence[TLA],
+        league_positions: Mapping[TLA, int],
+    ) -> Progression:
+        """
+        Update the seeding, re-resolving only the matches which use a seed
+        which has changed.
+
+        The league positions are only used to break ties in matches scored
+        after this point; matches which have already been ranked are kept.
+        """
+        if len(seeds) != len(self._seeds):
+            raise ValueError(
+                f"Expected {len(self._seeds)} seeds, got {len(seeds)}",
+            )
+        changed = [
+            index
+            for index, (old, new) in enumerate(zip(self._seeds, seeds))
+            if old != new
+        ]
+        self._seeds = list(seeds)
+        self._league_positions = league_positions
+        return self._re_resolve(
+            slot
+            for index in changed
+            for slot in self._seed_dependants.get(index, ())
+        )
+
+    def add_sheet(
+        self,
+        sheet: dict[str, Any],
+        *,
+        game_points: Mapping[TLA, GamePoints] | None = None,
+    ) -> Progression:
+        """
+        Add (or replace) a knockout match's result.
+
+        The sheet is validated and scored unless its `game_points` are given.
+        """
+        _, num = match_id(sheet)
+        slot = self._slots[MatchNumber(num)]
+        self._scored_teams[slot] = set(sheet['teams'])
+        ranking = self._ranking(self._matches[slot], sheet, game_points)
+        return self._progress(slot, ranking)
+
+    def remove_match(self, num: int) -> Progression:
+        slot = self._slots[MatchNumber(num)]
+        self._scored_teams.pop(slot, None)
+        return self._progress(slot, None)
+
+
+def describe(match: KnockoutMatch) -> str:
+    teams = ', '.join('-' if x is None else x for x in match.teams)
+    return f"{match.display_name}: {teams}"
+
+
+def sync(
+    root: Path,
+    resolver: KnockoutResolver,
+    mtimes: dict[Path, float],
+) -> list[Progression]:
+    """
+    Bring the resolver up to date with the compstate's knockout sheets, given
+    the modification times of the sheets it has already seen.
+    """
+    progressions = []
+    paths = {path for _, path in find_sheets(root, kinds=('knockout',))}
+
+    for path in sorted(mtimes.keys() - paths):
+        del mtimes[path]
+        progressions.append(resolver.remove_match(int(path.stem)))
+
+    for path in sorted(paths):
+        mtime = path.stat().st_mtime
+        if mtimes.get(path) != mtime:
+            mtimes[path] = mtime
+            progressions.append(resolver.add_sheet(load_sheet(path)))
+
+    return progressions
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Resolve the teams in knockout matches from the results so far.",
+    )
+    parser.add_argument(
+        '--compstate',
+        type=Path,
+        default=COMPSTATE_ROOT,
+        help="competition state repository (default: %(default)s)",
+    )
+    parser.add_argument(
+        '--follow',
+        action='store_true',
+        help="keep watching for new knockout sheets",
+    )
+    parser.add_argument(
+        '--interval',
+        type=float,
+        default=1,
+        help="seconds between checks for new sheets when following (default: %(default)s)",
+    )
+    return parser.parse_args()
+
+
+def main(args: argparse.Namespace) -> None:
+    resolver = KnockoutResolver.load(args.compstate)
+    mtimes: dict[Path, float] = {}
+    sync(args.compstate, resolver, mtimes)
+    for match in resolver.matches:
+        print(describe(match))
+
+    while args.follow:
+        time.sleep(args.interval)
+        for progression in sync(args.compstate, resolver, mtimes):
+            for match in progression.changed:
+                print(describe(match))
+            for match in progression.stale:
+                print(f"Warning: {match.display_name} was scored with different teams")
+
+
+if __name__ == '__main__':
+    try:
+        main(parse_args())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,553 @@
+"""
+What each team needs from its remaining league matches to reach or hold a
+rank.
+
+For every team, and every one of its remaining league matches, this works out
+the lowest finishing position in that match which still lets the team reach a
+given rank (if other results go its way), and the lowest which guarantees it
+holds that rank (whatever the other results), assuming it wins its other
+remaining matches. League points come from the `Ranker`, so the doubled
+physical matches are accounted for, and from the external challenges.
+
+Game points in matches yet to be played can't be known, so teams level on
+league points are assumed to be ordered in the team's favour when working out
+what it can reach and against it when working out what it holds. Ties within
+a match aren't considered.
+
+Each bound is found by an exhaustive search over the outcomes of the other
+remaining matches. With 24 finishing orders per match, the combinations for
+even the last session's matches are far too many to enumerate, however
+quickly each could be evaluated. Most of them don't matter, though, so the
+search is heavily pruned: teams which will finish above or below the team whatever happens are
+counted once and dropped, only matches involving the teams left are searched,
+each match's outcomes are reduced to their distinct effects on those teams,
+and states which only differ beyond what matters (a team already past the
+team in question) are merged, and outcomes are tried best first so that the
+rest can be skipped once none of them could do better. Early in the league
+the search can still be too large; once a team has used up its budget of
+outcomes tried, its remaining bounds fall back to ones which ignore how
+results in a match depend on each other, and are marked as approximate.
+
+Results are cached until the next match result is added.
+"""
+
+from __future__ import annotations
+
+import argparse
+import dataclasses
+import functools
+import itertools
+from pathlib import Path
+from typing import Any, Iterable, Mapping, Sequence
+
+from league_ranker import RankedPosition
+from sr.comp.comp import SRComp
+from sr.comp.match_period import MatchType
+from sr.comp.types import MatchId, TLA
+
+from ranker import Ranker
+from sheets import COMPSTATE_ROOT, match_id
+from standings import LeagueTable, NUM_ZONES
+
+DEFAULT_BUDGET = 10_000
+
+
+@dataclasses.dataclass(frozen=True)
+class RemainingMatch:
+    key: MatchId
+    teams: tuple[TLA, ...]
+    # League points for finishing first, second and so on
+    points: tuple[int, ...]
+
+
+def position_points(key: MatchId, num_teams: int) -> tuple[int, ...]:
+    """
+    The league points for each finishing position in a match, without ties.
+    """
+    points = Ranker().calc_ranked_points(
+        {RankedPosition(x + 1): [x] for x in range(num_teams)},
+        disqualifications=(),
+        num_zones=NUM_ZONES,
+        match_id=key,
+    )
+    return tuple(points[x] for x in range(num_teams))
+
+
+@dataclasses.dataclass(frozen=True)
+class RankBounds:
+    best: int
+    worst: int
+    # Whether the search completed within its budget
+    exact: bool
+
+
+@dataclasses.dataclass(frozen=True)
+class TeamOutlook:
+    tla: TLA
+    rank: int
+    # If the team wins all its remaining matches and loses all of them
+    best: RankBounds
+    worst: RankBounds
+    matches: list[MatchId]
+    # Match -> bounds for each finishing position in it, winning the others
+    by_position: dict[MatchId, list[RankBounds]]
+
+    def needed(self, match: MatchId, rank: int, *, hold: bool = False) -> int | None:
+        """
+        The lowest finishing position in the given match which lets the team
+        reach (or with `hold`, guarantees it holds) the given rank, winning its
+        other matches. None if no position does.
+        """
+        found = None
+        for position, bounds in enumerate(self.by_position[match], start=1):
+            if (bounds.worst if hold else bounds.best) <= rank:
+                found = position
+        return found
+
+
+class _TooLarge(Exception):
+    pass
+
+
+class _Budget:
+    """
+    The search steps (outcomes tried) left, shared between searches.
+    """
+
+    def __init__(self, nodes: int) -> None:
+        self.nodes = nodes
+
+    def spend(self) -> None:
+        self.nodes -= 1
+        if self.nodes < 0:
+            raise _TooLarge
+
+
+def _rank_bounds(
+    totals: Mapping[TLA, int],
+    matches: Sequence[RemainingMatch],
+    tla: TLA,
+    positions: Mapping[MatchId, int],
+    budget: _Budget,
+) -> RankBounds:
+    """
+    The best and worst ranks the given team could end up with, given its
+    finishing position (0-based) in each of its remaining matches.
+
+    Once the budget runs out, the bounds are approximate.
+    """
+    final = totals[tla] + sum(
+        match.points[positions[match.key]]
+        for match in matches
+        if match.key in positions
+    )
+
+    # The points on offer to the other teams in each match
+    options = []
+    for match in matches:
+        points = list(match.points)
+        if match.key in positions:
+            del points[positions[match.key]]
+        options.append((match, points))
+
+    def count(*, strict: bool, minimise: bool) -> tuple[int, bool]:
+        try:
+            return _count_above(
+                totals, options, tla, final,
+                strict=strict, minimise=minimise, budget=budget,
+            ), True
+        except _TooLarge:
+            return _count_above(
+                totals, options, tla, final,
+                strict=strict, minimise=minimise, budget=None,
+            ), False
+
+    best, best_exact = count(strict=True, minimise=True)
+    worst, worst_exact = count(strict=False, minimise=False)
+    return RankBounds(best + 1, worst + 1, best_exact and worst_exact)
+
+
+def _count_above(
+    totals: Mapping[TLA, int],
+    options: Sequence[tuple[RemainingMatch, list[int]]],
+    tla: TLA,
+    final: int,
+    *,
+    strict: bool,
+    minimise: bool,
+    budget: _Budget | None,
+) -> int:
+    """
+    The fewest (or most) other teams which can finish above the given final
+    points total, strictly or not.
+
+    Without a budget, the teams are treated independently, which gives a bound
+    which is never worse for the team than the true one (for `minimise`) or
+    never better (otherwise).
+    """
+    def above(points: int) -> bool:
+        return points > final if strict else points >= final
+
+    min_gain = {x: 0 for x in totals if x != tla}
+    max_gain = dict(min_gain)
+    for match, points in options:
+        others = [x for x in match.teams if x != tla]
+        for team in others:
+            max_gain[team] += max(points)
+            # Only the lowest places can be left once others take the rest
+            min_gain[team] += min(points)
+
+    count = 0
+    undecided = []
+    for team, points in totals.items():
+        if team == tla:
+            continue
+        if above(points + min_gain[team]):
+            count += 1
+        elif above(points + max_gain[team]):
+            undecided.append(team)
+
+    if budget is None or not undecided:
+        return count if minimise else count + len(undecided)
+    if budget.nodes <= 0:
+        raise _TooLarge
+
+    # Matches only interact through the teams they have in common, so each
+    # group of connected matches is searched separately
+    group_of = {team: i for i, team in enumerate(undecided)}
+
+    def find(group: int) -> int:
+        while merged[group] != group:
+            group = merged[group]
+        return group
+
+    merged = list(range(len(undecided)))
+    relevant = []
+    for match, points in options:
+        members = [x for x in match.teams if x != tla]
+        groups = {find(group_of[x]) for x in members if x in group_of}
+        if not groups:
+            continue
+        first, *rest = sorted(groups)
+        for group in rest:
+            merged[group] = first
+        relevant.append((members, points))
+
+    grouped: dict[int, list[tuple[list[TLA], list[int]]]] = {}
+    for members, points in relevant:
+        group = find(next(group_of[x] for x in members if x in group_of))
+        grouped.setdefault(group, []).append((members, points))
+
+    cap = final + 1 if strict else final
+    for group_matches in grouped.values():
+        teams = sorted({x for members, _ in group_matches for x in members} & set(undecided))
+        count += _search(
+            {x: totals[x] for x in teams},
+            group_matches,
+            cap,
+            minimise=minimise,
+            budget=budget,
+        )
+    return count
+
+
+def _search(
+    start: Mapping[TLA, int],
+    matches: Sequence[tuple[Sequence[TLA], Sequence[int]]],
+    cap: int,
+    *,
+    minimise: bool,
+    budget: _Budget,
+) -> int:
+    """
+    The fewest (or most) of the given teams which can end with at least `cap`
+    points, over every outcome of the given matches.
+    """
+    teams = list(start)
+    index = {team: i for i, team in enumerate(teams)}
+
+    # Each match's outcomes, reduced to their distinct effects on the teams
+    effects = []
+    for members, points in matches:
+        slots = [index.get(x) for x in members]
+        distinct = set()
+        for outcome in itertools.permutations(points, len(members)):
+            distinct.add(tuple(
+                (slot, gain) for slot, gain in zip(slots, outcome)
+                if slot is not None
+            ))
+        effects.append(sorted(distinct))
+
+    # The most and least each team can still gain from each match onwards
+    most = [[0] * len(teams) for _ in range(len(effects) + 1)]
+    least = [[0] * len(teams) for _ in range(len(effects) + 1)]
+    for i in reversed(range(len(effects))):
+        most[i] = list(most[i + 1])
+        least[i] = list(least[i + 1])
+        for slot in range(len(teams)):
+            gains = [gain for effect in effects[i] for x, gain in effect if x == slot]
+            if gains:
+                most[i][slot] += max(gains)
+                least[i][slot] += min(gains)
+
+    # For each match, the slots of the teams in it and the sums of its best
+    # and worst n places' points
+    members_of = [[index[x] for x in members if x in index] for members, _ in matches]
+    best_places = [
+        list(itertools.accumulate(sorted(points, reverse=True), initial=0))
+        for _, points in matches
+    ]
+    worst_places = [
+        list(itertools.accumulate(sorted(points), initial=0))
+        for _, points in matches
+    ]
+
+    # Teams which have reached the cap stay there, so they're all the same
+    # from then on, as are those which can no longer reach it
+    below = -1
+
+    def ideal(i: int, state: tuple[int, ...]) -> int:
+        """
+        A bound on the result from the given state, from the total points the
+        teams still short of the cap can get (or must get) from the remaining
+        matches.
+        """
+        past = state.count(cap)
+        short = [slot for slot, x in enumerate(state) if below < x < cap]
+        counts = [
+            sum(below < state[x] < cap for x in members_of[j])
+            for j in range(i, len(matches))
+        ]
+        if not minimise:
+            # However the points are shared, each team needs its shortfall
+            supply = sum(best_places[j][n] for j, n in zip(range(i, len(matches)), counts))
+            reached = 0
+            for shortfall in sorted(cap - state[x] for x in short):
+                supply -= shortfall
+                if supply < 0:
+                    break
+                reached += 1
+            return past + reached
+
+        # The points which must go to these teams, of which each can take one
+        # less than its shortfall without reaching the cap; the rest must go to
+        # teams which do reach it
+        forced = sum(worst_places[j][n] for j, n in zip(range(i, len(matches)), counts))
+        forced -= sum(cap - state[x] - 1 for x in short)
+        reached = 0
+        for extra in sorted((most[i][x] - (cap - state[x] - 1) for x in short), reverse=True):
+            if forced <= 0:
+                break
+            forced -= extra
+            reached += 1
+        return past + reached
+
+    def settle(i: int, state: list[int]) -> tuple[int, ...]:
+        for slot, points in enumerate(state):
+            if points == below or points >= cap:
+                continue
+            if points + least[i][slot] >= cap:
+                state[slot] = cap
+            elif points + most[i][slot] < cap:
+                state[slot] = below
+        return tuple(state)
+
+    choose = min if minimise else max
+
+    @functools.lru_cache(maxsize=None)
+    def search(i: int, state: tuple[int, ...]) -> int:
+        past = state.count(cap)
+        if past + state.count(below) == len(state):
+            return past
+        if not minimise and ideal(i, state) == past:
+            return past
+
+        children = set()
+        for effect in effects[i]:
+            budget.spend()
+            new = list(state)
+            for slot, gain in effect:
+                if new[slot] != below:
+                    new[slot] = min(new[slot] + gain, cap)
+            children.add(settle(i + 1, new))
+
+        # Try the most promising outcomes first, and stop once none of the
+        # rest could do better than the best found
+        found = None
+        for target, child in sorted(
+            ((ideal(i + 1, x), x) for x in children),
+            reverse=not minimise,
+        ):
+            if found is not None and choose(found, target) == found:
+                break
+            result = search(i + 1, child)
+            found = result if found is None else choose(found, result)
+        assert found is not None
+        return found
+
+    return search(0, settle(0, [min(start[x], cap) for x in teams]))
+
+
+class RankSensitivity:
+    """
+    The outlook of every team, cached until a result changes.
+    """
+
+    def __init__(
+        self,
+        table: LeagueTable,
+        remaining: Iterable[RemainingMatch],
+        *,
+        budget: int = DEFAULT_BUDGET,
+    ) -> None:
+        self.table = table
+        self.remaining = {x.key: x for x in remaining}
+        self._budget = budget
+        self._outlooks: dict[TLA, TeamOutlook] = {}
+
+    @classmethod
+    def load(
+        cls,
+        root: Path = COMPSTATE_ROOT,
+        *,
+        budget: int = DEFAULT_BUDGET,
+    ) -> RankSensitivity:
+        """
+        Work out the outlook from the league sheets in the given compstate.
+        """
+        comp = SRComp(root)
+        table = LeagueTable.load(root)
+        remaining = []
+        for slot in comp.schedule.matches:
+            for match in slot.values():
+                key = (match.arena, match.num)
+                if match.type != MatchType.league or key in table.game_points:
+                    continue
+                teams = tuple(x for x in match.teams if x is not None)
+                remaining.append(
+                    RemainingMatch(key, teams, position_points(key, len(teams))),
+                )
+        return cls(table, remaining, budget=budget)
+
+    def add_sheet(self, sheet: Mapping[str, Any]) -> None:
+        """
+        Add (or replace) a league match's result.
+        """
+        self.table.add_sheet(sheet)
+        self.remaining.pop(match_id(sheet), None)
+        self._outlooks.clear()
+
+    def outlook(self, tla: TLA) -> TeamOutlook:
+        if tla not in self._outlooks:
+            self._outlooks[tla] = self._compute(tla)
+        return self._outlooks[tla]
+
+    def outlooks(self) -> list[TeamOutlook]:
+        return [self.outlook(x) for x in self.table.ranked_teams()]
+
+    def _compute(self, tla: TLA) -> TeamOutlook:
+        totals = {x: self.table.totals(x).league_points for x in self.table.teams}
+        matches = sorted(self.remaining.values(), key=lambda x: x.key)
+        own = [x for x in matches if tla in x.teams]
+
+        # Shared between all the team's bounds, so that a team whose
+        # searches are all large doesn't take too long
+        budget = _Budget(self._budget)
+
+        def bounds(positions: Mapping[MatchId, int]) -> RankBounds:
+            return _rank_bounds(totals, matches, tla, positions, budget)
+
+        winning = {x.key: 0 for x in own}
+        return TeamOutlook(
+            tla,
+            self.table.ranked_teams().index(tla) + 1,
+            bounds(winning),
+            bounds({x.key: len(x.teams) - 1 for x in own}),
+            [x.key for x in own],
+            {
+                match.key: [
+                    bounds({**winning, match.key: position})
+                    for position in range(len(match.teams))
+                ]
+                for match in own
+            },
+        )
+
+
+def _ordinal(n: int) -> str:
+    suffix = 'th' if 10 <= n % 100 < 20 else {1: 'st', 2: 'nd', 3: 'rd'}.get(n % 10, 'th')
+    return f"{n}{suffix}"
+
+
+def format_outlook(outlook: TeamOutlook, ranks: Sequence[int] | None = None) -> str:
+    approximate = not all(
+        x.exact
+        for x in itertools.chain(
+            [outlook.best, outlook.worst],
+            *outlook.by_position.values(),
+        )
+    )
+    lines = [
+        f"{outlook.tla:<6} now {outlook.rank}, can finish between "
+        f"{outlook.best.best} and {outlook.worst.worst}"
+        f"{' (approximate)' if approximate else ''}",
+    ]
+    if ranks is None:
+        ranks = range(outlook.best.best, outlook.worst.worst)
+    for rank in ranks:
+        for hold in (False, True):
+            needs = []
+            for match in outlook.matches:
+                position = outlook.needed(match, rank, hold=hold)
+                needs.append(
+                    f"match {match[1]}: "
+                    f"{'no' if position is None else _ordinal(position)}",
+                )
+            if needs:
+                verb = 'hold' if hold else 'reach'
+                lines.append(f"  to {verb} {rank}: {', '.join(needs)}")
+    return '\n'.join(lines)
+
+
+def parse_ranks(text: str) -> list[int]:
+    return [int(x) for x in text.split(',')]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Show what each team needs from its remaining league matches.",
+    )
+    parser.add_argument(
+        '--compstate',
+        type=Path,
+        default=COMPSTATE_ROOT,
+        help="competition state repository (default: %(default)s)",
+    )
+    parser.add_argument(
+        '--ranks',
+        type=parse_ranks,
+        help="comma separated ranks to show (default: every rank each team could end on)",
+    )
+    parser.add_argument(
+        '--team',
+        action='append',
+        help="show only this team; may be repeated",
+    )
+    parser.add_argument(
+        '--budget',
+        type=int,
+        default=DEFAULT_BUDGET,
+        help="search steps per team before approximating (default: %(default)s)",
+    )
+    return parser.parse_args()
+
+
+def main(args: argparse.Namespace) -> None:
+    sensitivity = RankSensitivity.load(args.compstate, budget=args.budget)
+    print(f"{len(sensitivity.remaining)} league matches remaining")
+    for tla in args.team or sensitivity.table.ranked_teams():
+        print(format_outlook(sensitivity.outlook(TLA(tla)), args.ranks))
+
+
+if __name__ == '__main__':
+    main(parse_args())
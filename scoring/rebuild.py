@@ -0,0 +1,629 @@
+"""
+Watch a compstate and rebuild the artifacts derived from it as it changes.
+
+Each artifact declares the compstate files it's built from and the other
+artifacts it uses:
+
+    standings       league table, from the league sheets and external scores
+    bracket         teams in each knockout match
+    bracket_render  Graphviz rendering of the bracket, with resolved teams
+    timeline        every match with its times and teams
+    call_lists      which teams each shepherd fetches for each match
+
+When files change, only the artifacts built from them (and those built from
+those) are rebuilt, in dependency order, with independent artifacts built
+concurrently on a pool of worker threads. Changes are debounced so that a
+burst of writes (a `git pull`, say) leads to a single rebuild.
+
+Artifacts are built from the results of those they use rather than each
+loading the whole compstate: only the bracket (which needs the scores to
+place teams in the knockouts) loads it all. The timeline adds the league
+matches, which don't depend on the scores, to the bracket, and the call lists
+are worked out from the timeline.
+
+On Linux changes are picked up with inotify (through `ctypes`, so that no
+extra packages are needed); elsewhere the compstate is polled. If inotify
+drops events, everything is assumed to have changed.
+
+Artifacts are written as `<name>.json` (or `.dot`) to the output directory,
+each replaced atomically.
+"""
+
+from __future__ import annotations
+
+import argparse
+import concurrent.futures
+import ctypes
+import ctypes.util
+import dataclasses
+import datetime
+import fnmatch
+import graphlib
+import json
+import os
+import select
+import struct
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, Mapping, Protocol
+
+from sr.comp import yaml_loader
+from sr.comp.arenas import load_corners
+from sr.comp.comp import SRComp
+from sr.comp.match_period import Match
+from sr.comp.matches import MatchSchedule
+from sr.comp.teams import load_teams
+from sr.comp.venue import Venue
+
+from sheets import COMPSTATE_ROOT
+from standings import LeagueTable
+
+DEFAULT_OUTPUT = Path(tempfile.gettempdir()) / 'sr2025-derived'
+DEFAULT_DEBOUNCE = 0.2
+
+
+class BuildContext:
+    """
+    What an artifact is built from: the compstate and the artifacts it uses.
+    """
+
+    def __init__(self, root: Path, results: Mapping[str, Any]) -> None:
+        self.root = root
+        self.results = results
+        self._comp: SRComp | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def comp(self) -> SRComp:
+        """
+        The loaded compstate, shared by the artifacts built together.
+        """
+        with self._lock:
+            if self._comp is None:
+                self._comp = SRComp(self.root)
+            return self._comp
+
+
+@dataclasses.dataclass(frozen=True)
+class Artifact:
+    name: str
+    # Patterns of compstate paths (relative, `/` separated) it's built from
+    inputs: tuple[str, ...]
+    # Other artifacts it's built from
+    depends: tuple[str, ...]
+    build: Callable[[BuildContext], Any]
+    suffix: str = '.json'
+
+
+def _match_info(match: Match) -> dict[str, Any]:
+    return {
+        'num': match.num,
+        'display_name': match.display_name,
+        'arena': match.arena,
+        'type': match.type.value,
+        'start_time': match.start_time.isoformat(),
+        'end_time': match.end_time.isoformat(),
+        'teams': match.teams,
+    }
+
+
+def build_standings(context: BuildContext) -> Any:
+    table = LeagueTable.load(context.root)
+    return [
+        {
+            'tla': tla,
+            'position': position,
+            'league_points': table.totals(tla).league_points,
+            'game_points': table.totals(tla).game_points,
+        }
+        for tla, position in table.positions.items()
+    ]
+
+
+def build_bracket(context: BuildContext) -> Any:
+    schedule = context.comp.schedule
+    knockout_rounds = list(schedule.knockout_rounds)
+    # Only present if the final was tied
+    tiebreaker = getattr(schedule, 'tiebreaker', None)
+    if tiebreaker is not None:
+        knockout_rounds.append([tiebreaker])
+    return [
+        [_match_info(match) for match in knockout_round]
+        for knockout_round in knockout_rounds
+    ]
+
+
+def build_bracket_render(context: BuildContext) -> Any:
+    lines = ['digraph {', '    rankdir=LR;']
+    for round_num, knockout_round in enumerate(context.results['bracket']):
+        lines.append(f'    subgraph cluster_round_{round_num} {{')
+        for match in knockout_round:
+            teams = '\\n'.join('-' if x is None else x for x in match['teams'])
+            lines.append(
+                f'        match_{match["num"]} '
+                f'[shape=box label="{match["display_name"]}\\n{teams}"];',
+            )
+        lines.append('    }')
+    lines.append('}')
+    return '\n'.join(lines) + '\n'
+
+
+def build_timeline(context: BuildContext) -> Any:
+    # The league matches don't depend on the scores, so are scheduled without
+    # loading them; the knockout matches are from the bracket.
+    root = context.root
+    league_schedule = MatchSchedule(
+        yaml_loader.load(root / 'schedule.yaml'),
+        yaml_loader.load(root / 'league.yaml')['matches'],
+        load_teams(root / 'teams.yaml'),
+        len(load_corners(root / 'arenas.yaml')),
+    )
+    league = [
+        _match_info(match)
+        for slot in league_schedule.matches
+        for match in slot.values()
+    ]
+    knockouts = sorted(
+        (match for knockout_round in context.results['bracket'] for match in knockout_round),
+        key=lambda x: (x['start_time'], x['num']),
+    )
+    return league + knockouts
+
+
+def build_call_lists(context: BuildContext) -> Any:
+    root = context.root
+    venue = Venue(
+        load_teams(root / 'teams.yaml').keys(),
+        root / 'layout.yaml',
+        root / 'shepherding.yaml',
+    )
+    regions = {
+        tla: region['shepherds']['name']
+        for region in venue.locations.values()
+        for tla in region['teams']
+    }
+
+    # As `MatchSchedule.get_staging_times`, relative to the start of the game
+    # rather than of the match slot
+    config = yaml_loader.load(root / 'schedule.yaml')
+    pre = datetime.timedelta(seconds=config['match_slot_lengths']['pre'])
+    closes = datetime.timedelta(seconds=config['staging']['closes'])
+    signal_shepherds = {
+        name: datetime.timedelta(seconds=offset)
+        for name, offset in config['staging']['signal_shepherds'].items()
+    }
+
+    call_lists = []
+    for match in context.results['timeline']:
+        game_start = datetime.datetime.fromisoformat(match['start_time']) + pre
+        shepherds: dict[str, list[str]] = {name: [] for name in signal_shepherds}
+        for tla in match['teams']:
+            if tla is not None and tla in regions:
+                shepherds[regions[tla]].append(tla)
+        call_lists.append({
+            'num': match['num'],
+            'arena': match['arena'],
+            'staging_closes': (game_start - closes).isoformat(),
+            'shepherds': [
+                {
+                    'name': name,
+                    'signal': (game_start - signal_shepherds[name]).isoformat(),
+                    'teams': teams,
+                }
+                for name, teams in shepherds.items()
+            ],
+        })
+    return call_lists
+
+
+ARTIFACTS = (
+    Artifact(
+        'standings',
+        (
+            'league/*/*.yaml',
+            'external/*.yaml',
+            'teams.yaml',
+            'scoring/score.py',
+            'scoring/sr2025.py',
+            'scoring/ranker.py',
+        ),
+        (),
+        build_standings,
+    ),
+    Artifact(
+        'bracket',
+        (
+            # Teams are placed in the knockouts by the league positions, which
+            # include the external (challenge) points
+            'league/*/*.yaml',
+            'external/*.yaml',
+            'knockout/*/*.yaml',
+            'teams.yaml',
+            'schedule.yaml',
+            'league.yaml',
+            'arenas.yaml',
+            'scoring/score.py',
+            'scoring/sr2025.py',
+            'scoring/ranker.py',
+        ),
+        (),
+        build_bracket,
+    ),
+    Artifact('bracket_render', (), ('bracket',), build_bracket_render, '.dot'),
+    Artifact(
+        'timeline',
+        ('schedule.yaml', 'league.yaml', 'arenas.yaml', 'teams.yaml'),
+        ('bracket',),
+        build_timeline,
+    ),
+    Artifact(
+        'call_lists',
+        ('shepherding.yaml', 'layout.yaml', 'teams.yaml', 'schedule.yaml'),
+        ('timeline',),
+        build_call_lists,
+    ),
+)
+
+
+class Pipeline:
+    """
+    The derived artifacts of a compstate and what they're built from.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        output: Path,
+        artifacts: Iterable[Artifact] = ARTIFACTS,
+    ) -> None:
+        self.root = root
+        self.output = output
+        self.artifacts = {x.name: x for x in artifacts}
+        self.results: dict[str, Any] = {}
+
+        self._dependants: dict[str, set[str]] = {x: set() for x in self.artifacts}
+        for artifact in self.artifacts.values():
+            for name in artifact.depends:
+                self._dependants[name].add(artifact.name)
+
+    def affected(self, paths: Iterable[str]) -> set[str]:
+        """
+        The artifacts which need rebuilding after the given (relative) paths
+        change, including those built from the artifacts which do.
+        """
+        paths = list(paths)
+        pending = [
+            artifact.name
+            for artifact in self.artifacts.values()
+            if any(
+                fnmatch.fnmatchcase(path, pattern)
+                for path in paths
+                for pattern in artifact.inputs
+            )
+        ]
+        affected: set[str] = set()
+        while pending:
+            name = pending.pop()
+            if name not in affected:
+                affected.add(name)
+                pending.extend(self._dependants[name])
+        return affected
+
+    def rebuild(
+        self,
+        names: Iterable[str],
+        executor: concurrent.futures.Executor,
+    ) -> list[str]:
+        """
+        Rebuild the given artifacts, each once all the artifacts it uses which
+        are also being rebuilt are done. Returns the artifacts in the order
+        they finished.
+        """
+        names = set(names)
+        sorter = graphlib.TopologicalSorter({
+            name: [x for x in self.artifacts[name].depends if x in names]
+            for name in names
+        })
+        sorter.prepare()
+
+        context = BuildContext(self.root, self.results)
+        finished: list[str] = []
+        futures: dict[concurrent.futures.Future[Any], str] = {}
+        try:
+            while sorter.is_active():
+                for name in sorter.get_ready():
+                    futures[executor.submit(self.artifacts[name].build, context)] = name
+
+                done, _ = concurrent.futures.wait(
+                    futures,
+                    return_when=concurrent.futures.FIRST_COMPLETED,
+                )
+                for future in done:
+                    name = futures.pop(future)
+                    self.results[name] = future.result()
+                    self._write(self.artifacts[name], self.results[name])
+                    finished.append(name)
+                    sorter.done(name)
+        except Exception:
+            # Forget whatever wasn't rebuilt, so that it's retried next time
+            for name in names - set(finished):
+                self.results.pop(name, None)
+            raise
+        return finished
+
+    def _write(self, artifact: Artifact, result: Any) -> None:
+        self.output.mkdir(parents=True, exist_ok=True)
+        path = self.output / (artifact.name + artifact.suffix)
+        tmp_path = path.with_name(path.name + '.tmp')
+        with tmp_path.open('w') as f:
+            if isinstance(result, str):
+                f.write(result)
+            else:
+                json.dump(result, f, indent=2)
+        os.replace(tmp_path, path)
+
+
+class Watcher(Protocol):
+    def wait(self, timeout: float | None) -> set[str]:
+        """
+        Wait up to `timeout` seconds (or indefinitely) for changes, returning
+        the relative paths which changed.
+        """
+
+    def close(self) -> None:
+        ...
+
+
+def _ignored(relative: str) -> bool:
+    return relative == '.git' or relative.startswith('.git/')
+
+
+def _walk(root: Path, relative: str = '') -> Iterator[tuple[Path, list[str]]]:
+    """
+    Walk the directories which aren't ignored under the given one (relative
+    to `root`), yielding each (also relative to `root`) along with the names
+    of the files in it.
+    """
+    for directory, dirnames, filenames in os.walk(root / relative):
+        relative_dir = Path(directory).relative_to(root)
+        dirnames[:] = [
+            x for x in dirnames
+            if not _ignored((relative_dir / x).as_posix())
+        ]
+        yield relative_dir, filenames
+
+
+class PollingWatcher:
+    """
+    Finds changes by comparing the modification times of every file.
+    """
+
+    def __init__(self, root: Path, interval: float = 1) -> None:
+        self.root = root
+        self.interval = interval
+        self._mtimes = self._scan()
+
+    def _scan(self) -> dict[str, float]:
+        mtimes = {}
+        for relative_dir, filenames in _walk(self.root):
+            for filename in filenames:
+                path = self.root / relative_dir / filename
+                try:
+                    mtimes[(relative_dir / filename).as_posix()] = path.stat().st_mtime
+                except FileNotFoundError:
+                    pass
+        return mtimes
+
+    def wait(self, timeout: float | None) -> set[str]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            mtimes = self._scan()
+            changed = {
+                path
+                for path in mtimes.keys() | self._mtimes.keys()
+                if mtimes.get(path) != self._mtimes.get(path)
+            }
+            self._mtimes = mtimes
+            if changed:
+                return changed
+
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return set()
+            time.sleep(self.interval if remaining is None else min(self.interval, remaining))
+
+    def close(self) -> None:
+        pass
+
+
+# From <sys/inotify.h>
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_Q_OVERFLOW = 0x00004000
+_IN_ISDIR = 0x40000000
+_IN_CLOEXEC = os.O_CLOEXEC
+_INOTIFY_MASK = _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+_INOTIFY_EVENT = struct.Struct('iIII')
+
+
+class InotifyWatcher:
+    """
+    Finds changes with inotify, watching every directory in the compstate.
+    """
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self._fd = self._libc.inotify_init1(_IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._directories: dict[int, str] = {}
+        self._watch_tree('')
+
+    @staticmethod
+    def available() -> bool:
+        return sys.platform == 'linux' and ctypes.util.find_library('c') is not None
+
+    def _watch_tree(self, relative: str) -> set[str]:
+        """
+        Watch a directory and those under it, returning the (relative) paths
+        of the files in them. Directories already watched keep their watch.
+        """
+        files = set()
+        for relative_dir, filenames in _walk(self.root, relative):
+            directory = self.root / relative_dir
+            wd = self._libc.inotify_add_watch(
+                self._fd,
+                os.fsencode(directory),
+                _INOTIFY_MASK,
+            )
+            if wd < 0:
+                raise OSError(ctypes.get_errno(), f"Can't watch {directory}")
+            posix_dir = relative_dir.as_posix()
+            self._directories[wd] = '' if posix_dir == '.' else posix_dir
+            files |= {(relative_dir / x).as_posix() for x in filenames}
+        return files
+
+    def wait(self, timeout: float | None) -> set[str]:
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return set()
+
+        changed = set()
+        data = os.read(self._fd, 64 * 1024)
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _INOTIFY_EVENT.unpack_from(data, offset)
+            offset += _INOTIFY_EVENT.size
+            name = data[offset:offset + length].rstrip(b'\0').decode()
+            offset += length
+
+            if mask & _IN_Q_OVERFLOW:
+                # Events were dropped, so it's not known what changed (or
+                # which new directories need watching)
+                changed |= self._watch_tree('')
+                continue
+
+            directory = self._directories.get(wd)
+            if directory is None or not name:
+                continue
+            relative = f'{directory}/{name}' if directory else name
+            if mask & _IN_ISDIR:
+                if mask & (_IN_CREATE | _IN_MOVED_TO):
+                    # Pick up new arena directories, and anything already in them
+                    changed |= self._watch_tree(relative)
+            elif not mask & _IN_CREATE:
+                # Creating a file is followed by closing it once written
+                changed.add(relative)
+        return changed
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+def make_watcher(root: Path, poll_interval: float = 1) -> Watcher:
+    if InotifyWatcher.available():
+        return InotifyWatcher(root)
+    return PollingWatcher(root, poll_interval)
+
+
+def wait_for_changes(watcher: Watcher, debounce: float) -> set[str]:
+    """
+    Wait for a burst of changes, returning once there have been none for the
+    debounce time.
+    """
+    changed = watcher.wait(None)
+    while more := watcher.wait(debounce):
+        changed |= more
+    return changed
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Rebuild the artifacts derived from a compstate as it changes.",
+    )
+    parser.add_argument(
+        '--compstate',
+        type=Path,
+        default=COMPSTATE_ROOT,
+        help="competition state repository (default: %(default)s)",
+    )
+    parser.add_argument(
+        '--output',
+        type=Path,
+        default=DEFAULT_OUTPUT,
+        help="directory to write the artifacts to (default: %(default)s)",
+    )
+    parser.add_argument(
+        '--debounce',
+        type=float,
+        default=DEFAULT_DEBOUNCE,
+        help="seconds without changes before rebuilding (default: %(default)s)",
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=None,
+        help="number of worker threads (default: chosen by Python)",
+    )
+    parser.add_argument(
+        '--once',
+        action='store_true',
+        help="build everything once, then exit",
+    )
+    return parser.parse_args()
+
+
+def _rebuild(
+    pipeline: Pipeline,
+    names: Iterable[str],
+    executor: concurrent.futures.Executor,
+) -> None:
+    start = time.perf_counter()
+    try:
+        built = pipeline.rebuild(names, executor)
+    except Exception as e:
+        # A half-written sheet shouldn't stop the service
+        print(f"{datetime.datetime.now():%H:%M:%S} Rebuild failed: {e!r}", file=sys.stderr)
+        return
+    elapsed = time.perf_counter() - start
+    print(
+        f"{datetime.datetime.now():%H:%M:%S} Rebuilt {', '.join(built)} "
+        f"in {elapsed:.2f}s",
+        file=sys.stderr,
+    )
+
+
+def main(args: argparse.Namespace) -> None:
+    root = args.compstate.resolve()
+    pipeline = Pipeline(root, args.output)
+
+    with concurrent.futures.ThreadPoolExecutor(args.workers) as executor:
+        _rebuild(pipeline, pipeline.artifacts, executor)
+        if args.once:
+            return
+
+        watcher = make_watcher(root)
+        try:
+            while True:
+                changed = wait_for_changes(watcher, args.debounce)
+                affected = pipeline.affected(changed)
+                if affected:
+                    # Anything which failed last time is retried too
+                    affected |= pipeline.artifacts.keys() - pipeline.results.keys()
+                    _rebuild(pipeline, affected, executor)
+        finally:
+            watcher.close()
+
+
+if __name__ == '__main__':
+    try:
+        main(parse_args())
+    except KeyboardInterrupt:
+        pass
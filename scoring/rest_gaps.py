@@ -0,0 +1,467 @@
+"""
+Analysis of the rest teams get between their league matches.
+
+A team which has just left the arena needs to be back in staging before it
+closes (`staging.closes` before the game in their next match starts), so
+matches close together risk teams missing them. For each team this reports:
+
+- the minimum and mean turnaround: the time from the end of the game in one
+  match to staging closing for their next,
+- the number of back-to-back matches: consecutive slots with no gap.
+
+Only matches in the same period count; the time between periods (lunch, or
+overnight) isn't turnaround.
+
+The league is held as a team × match appearance matrix, flattened into
+parallel arrays of the (before, after) match pairs for each team. Those pairs
+are fixed by `league.yaml`; only the start times differ between scenarios, so
+evaluating a schedule is a gather of the start times at each pair and a
+subtraction, done with `map` over the arrays rather than looping per team in
+Python. With a few hundred pairs that's already cheap per scenario.
+The start times themselves are computed with integer seconds, mirroring
+SRComp's `MatchPeriodClock`. Together these evaluate thousands of delay
+scenarios a second, so the effect of each recorded or proposed delay can be
+compared before the day.
+
+The command line interface requires sr.comp.cli.
+"""
+
+from __future__ import annotations
+
+import argparse
+import array
+import bisect
+import dataclasses
+import datetime
+import itertools
+import operator
+import random
+import time
+from pathlib import Path
+from typing import Iterable, Mapping, Sequence
+
+import yaml
+from sr.comp import yaml_loader
+from sr.comp.matches import parse_ranges
+from sr.comp.types import TLA
+
+from sheets import COMPSTATE_ROOT
+
+DEFAULT_MIN_TURNAROUND = datetime.timedelta(minutes=1)
+
+# (time, duration), in seconds
+Delay = tuple[int, int]
+# (start, end, max end), in seconds
+Period = tuple[int, int, int]
+
+
+@dataclasses.dataclass(frozen=True)
+class TeamRest:
+    tla: TLA
+    matches: int
+    # In seconds; None for teams without two matches in the same period
+    min_turnaround: int | None
+    mean_turnaround: float | None
+    back_to_back: int
+
+
+@dataclasses.dataclass(frozen=True)
+class RestReport:
+    teams: dict[TLA, TeamRest]
+    # League matches which no longer fit in any period
+    dropped: list[int]
+
+    def at_risk(self, min_turnaround: datetime.timedelta) -> list[TeamRest]:
+        """
+        Teams with less than the given turnaround before at least one match.
+        """
+        limit = min_turnaround.total_seconds()
+        return [
+            x
+            for x in self.teams.values()
+            if x.min_turnaround is not None and x.min_turnaround < limit
+        ]
+
+
+@dataclasses.dataclass(frozen=True)
+class DelayImpact:
+    label: str
+    report: RestReport
+    # Teams whose rest changed, as (before, after)
+    changed: dict[TLA, tuple[TeamRest, TeamRest]]
+
+
+def league_starts(
+    periods: Sequence[Period],
+    delays: Iterable[Delay],
+    num_matches: int,
+    slot_duration: int,
+    extra_spacing: Mapping[int, int],
+) -> tuple[list[int], list[int]]:
+    """
+    Compute the start times of the league slots, in seconds, as SRComp's
+    `MatchPeriodClock` would, along with the index of the period each is in.
+    Slots which don't fit are left off the end.
+    """
+    delays = sorted(delays)
+    starts: list[int] = []
+    slot_periods: list[int] = []
+    for period, (start, end, max_end) in enumerate(periods):
+        pending = [x for x in delays if x[0] >= start]
+        index = 0
+        current = start
+        total = 0
+        while True:
+            while index < len(pending) and pending[index][0] <= current:
+                current += pending[index][1]
+                total += pending[index][1]
+                index += 1
+
+            if len(starts) == num_matches:
+                return starts, slot_periods
+            if current > max_end or current - total > end:
+                break
+
+            starts.append(current)
+            slot_periods.append(period)
+            current += slot_duration + extra_spacing.get(len(starts), 0)
+    return starts, slot_periods
+
+
+class RestAnalyzer:
+    """
+    The appearances of each team in a league, ready to evaluate schedules of
+    it against.
+    """
+
+    def __init__(
+        self,
+        matches: Sequence[Iterable[TLA | None]],
+        periods: Sequence[Period],
+        *,
+        slot_duration: int,
+        match_duration: int,
+        staging_closes: int,
+        extra_spacing: Mapping[int, int] | None = None,
+        delays: Iterable[Delay] = (),
+    ) -> None:
+        """
+        `matches` gives the teams in each slot (across all arenas),
+        `match_duration` the length of a game and `staging_closes` how long
+        before the start of a game staging closes.
+        """
+        self._periods = list(periods)
+        self._num_matches = len(matches)
+        self._slot_duration = slot_duration
+        # The turnaround is the gap between starts, less these
+        self._overhead = match_duration + staging_closes
+        self._extra_spacing = dict(extra_spacing or {})
+        self.delays = sorted(delays)
+
+        appearances: dict[TLA, list[int]] = {}
+        for num, teams in enumerate(matches):
+            for tla in teams:
+                if tla is not None:
+                    appearances.setdefault(tla, []).append(num)
+        self.appearances = dict(sorted(appearances.items()))
+
+        # The consecutive pairs of each team's matches, grouped by team and in
+        # match order within each team
+        self._before = array.array('i')
+        self._after = array.array('i')
+        self._team_pairs: list[tuple[TLA, int, int]] = []
+        for tla, nums in self.appearances.items():
+            lo = len(self._before)
+            self._before.extend(nums[:-1])
+            self._after.extend(nums[1:])
+            self._team_pairs.append((tla, lo, len(self._before)))
+
+    @classmethod
+    def load(cls, root: Path = COMPSTATE_ROOT) -> RestAnalyzer:
+        """
+        Build an analyzer for the league of the given compstate, with its
+        recorded delays.
+        """
+        config = yaml_loader.load(root / 'schedule.yaml')
+        league = yaml_loader.load(root / 'league.yaml')['matches']
+        with (root / 'teams.yaml').open() as f:
+            teams = yaml.safe_load(f)['teams']
+
+        def still_around(tla: TLA | None, num: int) -> bool:
+            if tla is None:
+                return False
+            dropped_out_after = teams[tla].get('dropped_out_after')
+            return dropped_out_after is None or num <= dropped_out_after
+
+        slots = config['match_slot_lengths']
+        extra_spacing = {}
+        for info in config['league']['extra_spacing'] or []:
+            for num in parse_ranges(info['match_numbers']):
+                extra_spacing[num] = info['duration']
+
+        return cls(
+            [
+                [
+                    tla
+                    for arena_teams in league[num].values()
+                    for tla in arena_teams
+                    if still_around(tla, num)
+                ]
+                for num in sorted(league)
+            ],
+            [
+                (
+                    _seconds(x['start_time']),
+                    _seconds(x['end_time']),
+                    _seconds(x.get('max_end_time', x['end_time'])),
+                )
+                for x in config['match_periods']['league']
+            ],
+            slot_duration=slots['total'],
+            match_duration=slots['match'],
+            staging_closes=config['staging']['closes'],
+            extra_spacing=extra_spacing,
+            delays=[
+                (_seconds(x['time']), x['delay'])
+                for x in config.get('delays') or []
+            ],
+        )
+
+    def starts(self, delays: Iterable[Delay]) -> tuple[list[int], list[int]]:
+        return league_starts(
+            self._periods,
+            delays,
+            self._num_matches,
+            self._slot_duration,
+            self._extra_spacing,
+        )
+
+    def evaluate_starts(
+        self,
+        starts: Sequence[int],
+        periods: Sequence[int] | None = None,
+    ) -> RestReport:
+        """
+        Evaluate the rest given by the given slot start times (in seconds) and
+        the periods the slots are in. Slots beyond the end of `starts` are
+        treated as not being played.
+        """
+        played = len(starts)
+        if periods is None:
+            periods = [0] * played
+        if played < self._num_matches:
+            # Pad so the gaps can be computed in one go; the pairs involving
+            # padding are excluded below
+            padding = [0] * (self._num_matches - played)
+            starts = [*starts, *padding]
+            periods = [*periods, *padding]
+
+        gaps = list(map(
+            operator.sub,
+            map(starts.__getitem__, self._after),
+            map(starts.__getitem__, self._before),
+        ))
+        same_period = list(map(
+            operator.eq,
+            map(periods.__getitem__, self._after),
+            map(periods.__getitem__, self._before),
+        ))
+
+        teams = {}
+        for tla, lo, hi in self._team_pairs:
+            if played < self._num_matches:
+                hi = bisect.bisect_left(self._after, played, lo, hi)
+            team_gaps = list(itertools.compress(gaps[lo:hi], same_period[lo:hi]))
+            teams[tla] = TeamRest(
+                tla,
+                bisect.bisect_left(self.appearances[tla], played),
+                min(team_gaps) - self._overhead if team_gaps else None,
+                sum(team_gaps) / len(team_gaps) - self._overhead if team_gaps else None,
+                sum(1 for x in team_gaps if x <= self._slot_duration),
+            )
+
+        return RestReport(teams, list(range(played, self._num_matches)))
+
+    def evaluate(self, delays: Iterable[Delay] | None = None) -> RestReport:
+        """
+        Evaluate the rest teams get with the given delays (by default, those
+        recorded).
+        """
+        return self.evaluate_starts(*self.starts(self.delays if delays is None else delays))
+
+    def evaluate_many(self, scenarios: Iterable[Iterable[Delay]]) -> list[RestReport]:
+        return [self.evaluate(x) for x in scenarios]
+
+    def delay_impacts(self, proposed: Iterable[Delay] = ()) -> list[DelayImpact]:
+        """
+        Show how each recorded delay, in turn, and then each proposed delay (on
+        top of those recorded) changes the rest teams get.
+        """
+        impacts = []
+        previous = self.evaluate(())
+        applied: list[Delay] = []
+        for delay in self.delays:
+            applied.append(delay)
+            report = self.evaluate(applied)
+            impacts.append(_impact(f"Recorded {_describe(delay)}", previous, report))
+            previous = report
+
+        for delay in proposed:
+            report = self.evaluate([*self.delays, delay])
+            impacts.append(_impact(f"Proposed {_describe(delay)}", previous, report))
+        return impacts
+
+
+def _seconds(when: datetime.datetime) -> int:
+    return int(when.timestamp())
+
+
+def _describe(delay: Delay) -> str:
+    when = datetime.datetime.fromtimestamp(delay[0], datetime.timezone.utc)
+    return f"{datetime.timedelta(seconds=delay[1])} at {when:%a %H:%M} UTC"
+
+
+def _impact(label: str, before: RestReport, after: RestReport) -> DelayImpact:
+    return DelayImpact(
+        label,
+        after,
+        {
+            tla: (before.teams[tla], rest)
+            for tla, rest in after.teams.items()
+            if rest != before.teams[tla]
+        },
+    )
+
+
+def _minutes(seconds: float | None) -> str:
+    if seconds is None:
+        return '-'
+    return f"{seconds / 60:.1f}"
+
+
+def format_report(report: RestReport, min_turnaround: datetime.timedelta) -> str:
+    rows = [('Team', 'Matches', 'Min (mins)', 'Mean (mins)', 'Back-to-back')]
+    rows += [
+        (
+            x.tla,
+            str(x.matches),
+            _minutes(x.min_turnaround),
+            _minutes(x.mean_turnaround),
+            str(x.back_to_back),
+        )
+        for x in sorted(
+            report.teams.values(),
+            key=lambda x: (x.min_turnaround is None, x.min_turnaround, x.tla),
+        )
+    ]
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    lines = [
+        '  '.join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip()
+        for row in rows
+    ]
+
+    at_risk = report.at_risk(min_turnaround)
+    if at_risk:
+        lines += ['', f"Teams with under {min_turnaround} to reach staging:"]
+        lines += [f"  {x.tla}" for x in at_risk]
+    if report.dropped:
+        lines += ['', "League matches which no longer fit: " + ', '.join(
+            str(x) for x in report.dropped
+        )]
+    return '\n'.join(lines)
+
+
+def format_impacts(impacts: Sequence[DelayImpact]) -> str:
+    lines = []
+    for impact in impacts:
+        lines.append(f"{impact.label}:")
+        for before, after in impact.changed.values():
+            lines.append(
+                f"  {after.tla}: min {_minutes(before.min_turnaround)} -> "
+                f"{_minutes(after.min_turnaround)}, mean "
+                f"{_minutes(before.mean_turnaround)} -> "
+                f"{_minutes(after.mean_turnaround)} mins, back-to-back "
+                f"{before.back_to_back} -> {after.back_to_back}",
+            )
+        if impact.report.dropped:
+            lines.append(f"  {len(impact.report.dropped)} league matches no longer fit")
+        if not impact.changed and not impact.report.dropped:
+            lines.append("  No change")
+    return '\n'.join(lines)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Analyse the rest teams get between league matches.",
+    )
+    parser.add_argument(
+        '--compstate',
+        type=Path,
+        default=COMPSTATE_ROOT,
+        help="competition state repository (default: %(default)s)",
+    )
+    parser.add_argument(
+        '--propose',
+        nargs=2,
+        action='append',
+        default=[],
+        metavar=('DURATION', 'WHEN'),
+        help=(
+            "a delay to consider on top of those recorded, in any form accepted "
+            "by `srcomp add-delay`; may be given more than once"
+        ),
+    )
+    parser.add_argument(
+        '--min-turnaround',
+        type=int,
+        default=int(DEFAULT_MIN_TURNAROUND.total_seconds()),
+        help=(
+            "flag teams with less than this long to get back to staging, in "
+            "seconds (default: %(default)s)"
+        ),
+    )
+    parser.add_argument(
+        '--benchmark',
+        type=int,
+        metavar='SCENARIOS',
+        help="time evaluating this many random delay scenarios",
+    )
+    return parser.parse_args()
+
+
+def main(args: argparse.Namespace) -> None:
+    from sr.comp.cli.add_delay import parse_duration, parse_time
+
+    analyzer = RestAnalyzer.load(args.compstate)
+    proposed = [
+        (
+            _seconds(parse_time(args.compstate, when)),
+            int(parse_duration(duration).total_seconds()),
+        )
+        for duration, when in args.propose
+    ]
+
+    print(format_report(
+        analyzer.evaluate([*analyzer.delays, *proposed]),
+        datetime.timedelta(seconds=args.min_turnaround),
+    ))
+    print()
+    print(format_impacts(analyzer.delay_impacts(proposed)))
+
+    if args.benchmark:
+        # Delays of up to 20 minutes at the start of a random league slot
+        slots, _ = analyzer.starts(analyzer.delays)
+        scenarios = [
+            [(random.choice(slots), random.randrange(60, 1200, 60))]
+            for _ in range(args.benchmark)
+        ]
+        start = time.perf_counter()
+        analyzer.evaluate_many(scenarios)
+        elapsed = time.perf_counter() - start
+        print()
+        print(f"Evaluated {len(scenarios)} scenarios in {elapsed:.2f}s "
+              f"({len(scenarios) / elapsed:.0f} per second)")
+
+
+if __name__ == '__main__':
+    main(parse_args())
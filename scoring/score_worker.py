@@ -0,0 +1,320 @@
+"""
+Long-lived scoring worker, avoiding the startup cost of running `score.py`.
+
+Each run of `score.py` pays for interpreter startup and imports before it
+scores a single sheet, which dominates the time taken by tooling which scores
+many sheets. The worker runs the same `libproton` code path as `score.py` but
+stays running, answering requests over a local Unix socket or over its
+stdin/stdout.
+
+Requests and responses are framed as:
+
+    request:  >I length, then the sheet as UTF-8 YAML
+    response: >BII exit status, stdout length, stderr length, then each of
+              stdout and stderr as UTF-8
+
+where the exit status and output are those `score.py` would have produced.
+The one exception is a sheet so malformed that `score.py` crashes, where the
+outermost frames of the traceback differ.
+
+The client half (`score` subcommand, or `score_paths`) falls back to running
+`score.py` directly if no worker is listening.
+
+Anyone who can create the socket can answer in the worker's place, so by
+default it lives in `$XDG_RUNTIME_DIR` or, failing that, a directory in the
+temporary directory which only the current user can access.
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import dataclasses
+import io
+import os
+import signal
+import socket
+import socketserver
+import stat
+import struct
+import subprocess
+import sys
+import tempfile
+import traceback
+from pathlib import Path
+from typing import BinaryIO, Iterable, Iterator
+
+import yaml
+from libproton.program import generate_output
+
+from score import Scorer
+
+SCORE_PY = Path(__file__).parent / 'score.py'
+
+SOCKET_PATH_ENV_VAR = 'SR2025_SCORE_WORKER_SOCKET'
+SOCKET_NAME = 'sr2025-score-worker.sock'
+
+REQUEST_HEADER = struct.Struct('>I')
+RESPONSE_HEADER = struct.Struct('>BII')
+
+
+@dataclasses.dataclass(frozen=True)
+class Result:
+    returncode: int
+    stdout: str
+    stderr: str
+
+
+def _private_dir(path: Path) -> Path:
+    """
+    Create (if needed) a directory only the current user can access, refusing
+    one which anyone else could have created or can write to.
+    """
+    with contextlib.suppress(FileExistsError):
+        path.mkdir(mode=0o700)
+    info = path.lstat()
+    if (
+        not stat.S_ISDIR(info.st_mode)
+        or info.st_uid != os.getuid()
+        or info.st_mode & 0o077
+    ):
+        raise PermissionError(f"{path} is not a private directory of the current user")
+    return path
+
+
+def default_socket_path() -> Path:
+    if SOCKET_PATH_ENV_VAR in os.environ:
+        return Path(os.environ[SOCKET_PATH_ENV_VAR])
+    if os.environ.get('XDG_RUNTIME_DIR'):
+        return Path(os.environ['XDG_RUNTIME_DIR']) / SOCKET_NAME
+    return _private_dir(Path(tempfile.gettempdir()) / f'sr2025-{os.getuid()}') / SOCKET_NAME
+
+
+def _as_main(traceback_text: str) -> str:
+    """
+    Tracebacks from `score.py` come from it running as `__main__`, so name its
+    exceptions without a module. Match that.
+    """
+    prefix = f'{Scorer.__module__}.'
+    return ''.join(
+        line.removeprefix(prefix)
+        for line in traceback_text.splitlines(keepends=True)
+    )
+
+
+def score_document(text: str) -> Result:
+    """
+    Score a sheet as `score.py` would, without leaving the process.
+    """
+    stderr = io.StringIO()
+    try:
+        output = generate_output(io.StringIO(text), Scorer, stderr)
+    except SystemExit as e:
+        code = e.code if isinstance(e.code, int) else 1
+        return Result(code, '', _as_main(stderr.getvalue()))
+    except Exception:
+        # As the interpreter would report an uncaught exception
+        return Result(1, '', traceback.format_exc())
+
+    stdout = io.StringIO()
+    yaml.safe_dump(output, stdout)
+    return Result(0, stdout.getvalue(), stderr.getvalue())
+
+
+def _read_exact(stream: BinaryIO, size: int) -> bytes | None:
+    data = stream.read(size)
+    if not data:
+        return None
+    if len(data) != size:
+        raise EOFError("Connection closed part way through a frame")
+    return data
+
+
+def _write_request(stream: BinaryIO, text: str) -> None:
+    payload = text.encode('utf-8')
+    stream.write(REQUEST_HEADER.pack(len(payload)) + payload)
+    stream.flush()
+
+
+def _read_response(stream: BinaryIO) -> Result:
+    header = _read_exact(stream, RESPONSE_HEADER.size)
+    if header is None:
+        raise EOFError("Worker closed the connection")
+    returncode, stdout_size, stderr_size = RESPONSE_HEADER.unpack(header)
+    stdout = _read_exact(stream, stdout_size) if stdout_size else b''
+    stderr = _read_exact(stream, stderr_size) if stderr_size else b''
+    if stdout is None or stderr is None:
+        raise EOFError("Connection closed part way through a frame")
+    return Result(returncode, stdout.decode('utf-8'), stderr.decode('utf-8'))
+
+
+def serve_stream(rfile: BinaryIO, wfile: BinaryIO) -> None:
+    """
+    Answer framed requests from a stream until it is closed.
+    """
+    while (header := _read_exact(rfile, REQUEST_HEADER.size)) is not None:
+        size, = REQUEST_HEADER.unpack(header)
+        payload = _read_exact(rfile, size) if size else b''
+        if payload is None:
+            raise EOFError("Connection closed part way through a frame")
+
+        result = score_document(payload.decode('utf-8'))
+        stdout = result.stdout.encode('utf-8')
+        stderr = result.stderr.encode('utf-8')
+        wfile.write(
+            RESPONSE_HEADER.pack(result.returncode, len(stdout), len(stderr))
+            + stdout
+            + stderr,
+        )
+        wfile.flush()
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        serve_stream(self.rfile, self.wfile)  # type: ignore[arg-type]
+
+
+def serve_socket(path: Path) -> None:
+    # Make sure the socket is cleaned up when asked to stop
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    path.unlink(missing_ok=True)
+    with socketserver.ThreadingUnixStreamServer(str(path), _Handler) as server:
+        print(f"Listening on {path}", file=sys.stderr)
+        try:
+            server.serve_forever()
+        finally:
+            path.unlink(missing_ok=True)
+
+
+class WorkerClient:
+    """
+    A connection to a running worker.
+    """
+
+    def __init__(self, socket_path: Path) -> None:
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self._socket.connect(str(socket_path))
+        except OSError:
+            self._socket.close()
+            raise
+        self._file = self._socket.makefile('rwb')
+
+    def score(self, text: str) -> Result:
+        _write_request(self._file, text)  # type: ignore[arg-type]
+        return _read_response(self._file)  # type: ignore[arg-type]
+
+    def close(self) -> None:
+        self._file.close()
+        self._socket.close()
+
+    def __enter__(self) -> WorkerClient:
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+
+def score_one_shot(path: Path) -> Result:
+    """
+    Score a sheet by running `score.py`, as the Scorer UI and SRComp do.
+    """
+    process = subprocess.run(
+        [sys.executable, str(SCORE_PY), str(path)],
+        capture_output=True,
+        text=True,
+    )
+    return Result(process.returncode, process.stdout, process.stderr)
+
+
+def score_paths(
+    paths: Iterable[Path],
+    socket_path: Path | None = None,
+) -> Iterator[tuple[Path, Result]]:
+    """
+    Score each of the given sheets, using a running worker if there is one and
+    otherwise (or if the worker goes away) running `score.py` for each.
+    """
+    paths = iter(paths)
+    try:
+        client = WorkerClient(socket_path or default_socket_path())
+    except OSError:
+        client = None
+
+    if client is not None:
+        with client:
+            for path in paths:
+                try:
+                    result = client.score(path.read_text())
+                except (OSError, EOFError):
+                    yield path, score_one_shot(path)
+                    break
+                yield path, result
+
+    for path in paths:
+        yield path, score_one_shot(path)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Long-lived scoring worker.")
+    parser.add_argument(
+        '--socket',
+        type=Path,
+        help=(
+            f"Unix socket to listen on or connect to (default: ${SOCKET_PATH_ENV_VAR}, "
+            f"or {SOCKET_NAME} in $XDG_RUNTIME_DIR or a private temporary directory)"
+        ),
+    )
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = subparsers.add_parser('serve', help="run the worker")
+    serve_parser.add_argument(
+        '--stdio',
+        action='store_true',
+        help="answer requests on stdin/stdout rather than the socket",
+    )
+
+    score_parser = subparsers.add_parser(
+        'score',
+        help=(
+            "score sheets via the worker, as score.py would. With several sheets "
+            "only failures are reported."
+        ),
+    )
+    score_parser.add_argument('sheets', type=Path, nargs='+')
+
+    return parser.parse_args()
+
+
+def main(args: argparse.Namespace) -> int:
+    if args.command == 'serve':
+        if args.stdio:
+            serve_stream(sys.stdin.buffer, sys.stdout.buffer)
+        else:
+            try:
+                socket_path = args.socket or default_socket_path()
+            except PermissionError as e:
+                sys.exit(str(e))
+            serve_socket(socket_path)
+        return 0
+
+    if len(args.sheets) == 1:
+        (_, result), = score_paths(args.sheets, args.socket)
+        sys.stdout.write(result.stdout)
+        sys.stderr.write(result.stderr)
+        return result.returncode
+
+    returncode = 0
+    for path, result in score_paths(args.sheets, args.socket):
+        if result.returncode:
+            print(f"{path}:", file=sys.stderr)
+            sys.stderr.write(result.stderr)
+            returncode = max(returncode, result.returncode)
+    return returncode
+
+
+if __name__ == '__main__':
+    try:
+        sys.exit(main(parse_args()))
+    except KeyboardInterrupt:
+        sys.exit(1)
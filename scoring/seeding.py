@@ -0,0 +1,220 @@
+"""
+Knockout seeding kept up to date from the incremental league table.
+
+The static knockout refers to teams by seed (`S1`, `S2`, ...), which SRComp
+computes from the league positions once the whole league has been scored.
+`KnockoutSeeding` instead keeps the seed list cached alongside a
+`LeagueTable`, and when a league sheet is corrected or the external
+challenge scores change it reports exactly which seeds moved. Passing those
+to a `KnockoutResolver` re-resolves only the knockout matches using them.
+
+As in SRComp, every seed is unknown until all the scheduled league matches
+have been scored, and teams which have dropped out before the knockouts
+aren't seeded.
+"""
+
+from __future__ import annotations
+
+import argparse
+import dataclasses
+import time
+from pathlib import Path
+from typing import Any, Collection, Mapping
+
+from sr.comp.comp import SRComp
+from sr.comp.knockout_scheduler import UNKNOWABLE_TEAM
+from sr.comp.match_period import MatchType
+from sr.comp.scores import TeamScore
+from sr.comp.types import MatchId, MatchNumber, TLA
+
+from knockout_progress import (
+    describe,
+    KnockoutResolver,
+    sync as sync_knockouts,
+)
+from sheets import COMPSTATE_ROOT, find_sheets, load_sheet, match_id
+from standings import LeagueTable, load_external
+
+
+@dataclasses.dataclass(frozen=True)
+class SeedChange:
+    # 1-based, as in `S<seed>`
+    seed: int
+    old: TLA
+    new: TLA
+
+
+class KnockoutSeeding:
+    """
+    The knockout seeds, maintained from a league table.
+    """
+
+    def __init__(
+        self,
+        table: LeagueTable,
+        eligible: Collection[TLA],
+        league_matches: Collection[MatchId],
+    ) -> None:
+        self.table = table
+        self._eligible = set(eligible)
+        self._league_matches = set(league_matches)
+        self._seeds = self._compute()
+
+        # The files seen by `sync`
+        self._sheet_mtimes: dict[Path, float] = {}
+        self._sheet_keys: dict[Path, MatchId] = {}
+        self._external_mtimes: dict[Path, float] = {}
+
+    @classmethod
+    def load(cls, root: Path = COMPSTATE_ROOT) -> KnockoutSeeding:
+        """
+        Build the seeding for the given compstate from its league sheets.
+        """
+        comp = SRComp(root)
+        first_knockout_match = MatchNumber(comp.schedule.n_league_matches)
+        seeding = cls(
+            LeagueTable.for_compstate(root),
+            [
+                tla
+                for tla, team in comp.teams.items()
+                if team.is_still_around(first_knockout_match)
+            ],
+            [
+                (match.arena, match.num)
+                for slot in comp.schedule.matches
+                for match in slot.values()
+                if match.type == MatchType.league
+            ],
+        )
+        seeding.sync(root)
+        return seeding
+
+    @property
+    def seeds(self) -> list[TLA]:
+        return list(self._seeds)
+
+    @property
+    def league_complete(self) -> bool:
+        return self._league_matches <= self.table.game_points.keys()
+
+    def _compute(self) -> list[TLA]:
+        # As `BaseKnockoutScheduler._get_seeds`
+        seeds = [x for x in self.table.ranked_teams() if x in self._eligible]
+        if not self.league_complete:
+            return [UNKNOWABLE_TEAM] * len(seeds)
+        return seeds
+
+    def update(self) -> list[SeedChange]:
+        """
+        Recompute the seeds from the league table, returning those which have
+        changed since the last update.
+        """
+        seeds = self._compute()
+        changes = [
+            SeedChange(seed, old, new)
+            for seed, (old, new) in enumerate(zip(self._seeds, seeds), start=1)
+            if old != new
+        ]
+        self._seeds = seeds
+        return changes
+
+    def add_sheet(self, sheet: Mapping[str, Any]) -> list[SeedChange]:
+        """
+        Add (or replace) a league match's result.
+        """
+        self.table.add_sheet(sheet)
+        return self.update()
+
+    def remove_match(self, key: MatchId) -> list[SeedChange]:
+        self.table.remove_match(key)
+        return self.update()
+
+    def set_external_scores(self, extra: Mapping[TLA, TeamScore]) -> list[SeedChange]:
+        self.table.set_external_scores(extra)
+        return self.update()
+
+    def sync(self, root: Path) -> list[SeedChange]:
+        """
+        Bring the seeding up to date with the league sheets and external scores
+        in the given compstate, loading only the files which have changed since
+        the last sync.
+        """
+        paths = {path for _, path in find_sheets(root, kinds=('league',))}
+
+        for path in sorted(self._sheet_mtimes.keys() - paths):
+            del self._sheet_mtimes[path]
+            self.table.remove_match(self._sheet_keys.pop(path))
+
+        for path in sorted(paths):
+            mtime = path.stat().st_mtime
+            if self._sheet_mtimes.get(path) == mtime:
+                continue
+            sheet = load_sheet(path)
+            key = match_id(sheet)
+            old_key = self._sheet_keys.get(path, key)
+            if old_key != key:
+                self.table.remove_match(old_key)
+            self.table.add_sheet(sheet)
+            self._sheet_mtimes[path] = mtime
+            self._sheet_keys[path] = key
+
+        external_mtimes = {
+            path: path.stat().st_mtime
+            for path in sorted((root / 'external').glob('*.yaml'))
+        }
+        if external_mtimes != self._external_mtimes:
+            self._external_mtimes = external_mtimes
+            self.table.set_external_scores(load_external(root, self.table.teams))
+
+        return self.update()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Follow the knockout seeding as league results are corrected.",
+    )
+    parser.add_argument(
+        '--compstate',
+        type=Path,
+        default=COMPSTATE_ROOT,
+        help="competition state repository (default: %(default)s)",
+    )
+    parser.add_argument(
+        '--interval',
+        type=float,
+        default=1,
+        help="seconds between checks for changes (default: %(default)s)",
+    )
+    return parser.parse_args()
+
+
+def main(args: argparse.Namespace) -> None:
+    seeding = KnockoutSeeding.load(args.compstate)
+    resolver = KnockoutResolver.load(args.compstate)
+    # The knockout sheets are needed to know which matches would become stale
+    knockout_mtimes: dict[Path, float] = {}
+    sync_knockouts(args.compstate, resolver, knockout_mtimes)
+
+    for seed, tla in enumerate(seeding.seeds, start=1):
+        print(f"S{seed}: {tla}")
+
+    while True:
+        time.sleep(args.interval)
+        sync_knockouts(args.compstate, resolver, knockout_mtimes)
+        changes = seeding.sync(args.compstate)
+        if not changes:
+            continue
+        for change in changes:
+            print(f"S{change.seed}: {change.old} -> {change.new}")
+        progression = resolver.set_seeds(seeding.seeds, seeding.table.positions)
+        for match in progression.changed:
+            print(describe(match))
+        for match in progression.stale:
+            print(f"Warning: {match.display_name} was scored with different teams")
+
+
+if __name__ == '__main__':
+    try:
+        main(parse_args())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,205 @@
+"""
+Structural diffs between versions of a score sheet, and partial re-scoring.
+
+Corrections to a sheet usually touch only one or two districts. Since each
+district contributes independently to each zone's score (see
+`Scorer.score_district_for_zone`) a match's scores are kept broken down by
+district and zone, and a correction only recomputes the contributions it can
+affect. The league table is then updated with just that match's result and
+only the resulting changes are reported.
+"""
+
+from __future__ import annotations
+
+import copy
+import dataclasses
+from typing import Any, Mapping
+
+from league_ranker import LeaguePoints
+from sr.comp.scores import LeaguePosition
+from sr.comp.types import TLA
+
+from score import Scorer
+from sheets import match_id
+from sr2025 import ZONE_COLOURS
+from standings import disqualified_teams, LeagueTable
+
+TEAM_FLAGS = ('zone', 'present', 'disqualified', 'left_starting_zone')
+
+
+@dataclasses.dataclass(frozen=True)
+class DistrictChange:
+    # Colours whose pallet count changed
+    colours: frozenset[str]
+    # (old, new) highest pallet, if that changed
+    highest: tuple[str, str] | None = None
+
+    @property
+    def zones(self) -> frozenset[int]:
+        """
+        The zones whose score from this district may have changed.
+        """
+        colours = set(self.colours)
+        if self.highest is not None:
+            colours.update(self.highest)
+        return frozenset(ZONE_COLOURS.index(x) for x in colours if x in ZONE_COLOURS)
+
+
+@dataclasses.dataclass(frozen=True)
+class SheetDiff:
+    districts: dict[str, DistrictChange]
+    # TLA -> flag -> (old, new). Teams added or removed have `None` for the
+    # missing side of each flag.
+    teams: dict[TLA, dict[str, tuple[Any, Any]]]
+
+    def __bool__(self) -> bool:
+        return bool(self.districts or self.teams)
+
+
+def _normalised_district(district: Mapping[str, Any]) -> tuple[dict[str, int], str]:
+    pallets = {k: v for k, v in district.get('pallets', {}).items() if v}
+    return pallets, district.get('highest', '').replace(' ', '')
+
+
+def diff_sheets(old: Mapping[str, Any], new: Mapping[str, Any]) -> SheetDiff:
+    """
+    Describe the changes between two versions of the same match's sheet.
+    """
+    old_districts = old['arena_zones']['other']['districts']
+    new_districts = new['arena_zones']['other']['districts']
+
+    districts = {}
+    for name in old_districts.keys() | new_districts.keys():
+        old_pallets, old_highest = _normalised_district(old_districts.get(name, {}))
+        new_pallets, new_highest = _normalised_district(new_districts.get(name, {}))
+
+        colours = frozenset(
+            colour
+            for colour in old_pallets.keys() | new_pallets.keys()
+            if old_pallets.get(colour, 0) != new_pallets.get(colour, 0)
+        )
+        highest = (old_highest, new_highest) if old_highest != new_highest else None
+        if colours or highest:
+            districts[name] = DistrictChange(colours, highest)
+
+    teams = {}
+    for tla in old['teams'].keys() | new['teams'].keys():
+        old_info = old['teams'].get(tla)
+        new_info = new['teams'].get(tla)
+        changes = {}
+        for flag in TEAM_FLAGS:
+            old_value = None if old_info is None else old_info.get(flag)
+            new_value = None if new_info is None else new_info.get(flag)
+            if old_value != new_value:
+                changes[flag] = (old_value, new_value)
+        if changes:
+            teams[tla] = changes
+
+    return SheetDiff(districts, teams)
+
+
+class MatchBreakdown:
+    """
+    A match's scores, broken down by district and zone.
+    """
+
+    def __init__(self, sheet: Mapping[str, Any]) -> None:
+        self.sheet = copy.deepcopy(sheet)
+        self.contributions: dict[str, list[int]] = {}
+        self._score_districts(self.sheet['arena_zones']['other']['districts'].keys())
+
+    def _score_districts(
+        self,
+        names: Any,
+        zones: frozenset[int] = frozenset(range(len(ZONE_COLOURS))),
+    ) -> None:
+        districts = self.sheet['arena_zones']['other']['districts']
+        # Scorer normalises the districts it is given in place, so pass copies
+        # of only those we need.
+        to_score = {name: copy.deepcopy(districts[name]) for name in names}
+        scorer = Scorer(self.sheet['teams'], {'other': {'districts': to_score}})
+        for name, district in to_score.items():
+            row = self.contributions.setdefault(name, [0] * len(ZONE_COLOURS))
+            for zone in zones:
+                row[zone] = scorer.score_district_for_zone(name, district, zone)
+
+    @property
+    def scores(self) -> dict[TLA, int]:
+        return {
+            tla: (
+                sum(row[info['zone']] for row in self.contributions.values())
+                + (1 if info.get('left_starting_zone') else 0)
+            )
+            for tla, info in self.sheet['teams'].items()
+        }
+
+    def update(self, new_sheet: Mapping[str, Any]) -> SheetDiff:
+        """
+        Move to a new version of the sheet, recomputing only the contributions
+        affected by the changes.
+
+        A district's contribution to a zone doesn't depend on which team is in
+        that zone, so changes to the teams need no recomputation.
+        """
+        diff = diff_sheets(self.sheet, new_sheet)
+        self.sheet = copy.deepcopy(new_sheet)
+
+        new_districts = self.sheet['arena_zones']['other']['districts']
+        for name in diff.districts.keys() - new_districts.keys():
+            del self.contributions[name]
+
+        for name, change in diff.districts.items():
+            if name in new_districts:
+                self._score_districts([name], change.zones)
+
+        return diff
+
+
+@dataclasses.dataclass(frozen=True)
+class Correction:
+    diff: SheetDiff
+    # TLA -> (old, new) game points, for teams whose score changed
+    scores: dict[TLA, tuple[int, int]]
+    # TLA -> change in league points, for teams whose league points changed
+    league_points: dict[TLA, LeaguePoints]
+    # TLA -> (old, new) league position, for teams whose position changed
+    positions: dict[TLA, tuple[LeaguePosition, LeaguePosition]]
+
+
+def apply_correction(
+    breakdown: MatchBreakdown,
+    new_sheet: Mapping[str, Any],
+    table: LeagueTable | None = None,
+) -> Correction:
+    """
+    Apply a corrected sheet to a match's breakdown and, for league matches,
+    the league table.
+    """
+    old_scores = breakdown.scores
+    old_dsq = set(disqualified_teams(breakdown.sheet))
+
+    diff = breakdown.update(new_sheet)
+    new_scores = breakdown.scores
+    new_dsq = set(disqualified_teams(new_sheet))
+
+    score_changes = {
+        tla: (old_scores.get(tla, 0), new_scores.get(tla, 0))
+        for tla in old_scores.keys() | new_scores.keys()
+        if old_scores.get(tla) != new_scores.get(tla)
+    }
+
+    league_changes: dict[TLA, LeaguePoints] = {}
+    position_changes = {}
+    if table is not None and (score_changes or old_dsq != new_dsq):
+        old_positions = dict(table.positions)
+        deltas = table.set_match(match_id(new_sheet), new_scores, new_dsq)
+        league_changes = {tla: delta for tla, delta in deltas.items() if delta}
+
+        if league_changes or score_changes:
+            position_changes = {
+                tla: (old_positions[tla], position)
+                for tla, position in table.positions.items()
+                if old_positions[tla] != position
+            }
+
+    return Correction(diff, score_changes, league_changes, position_changes)
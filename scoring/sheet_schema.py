@@ -0,0 +1,362 @@
+"""
+Structural validation of score sheets, generated from the game definition.
+
+`Scorer.validate` checks that a sheet makes sense for the game, but assumes
+that the sheet has the right shape: a missing `pallets` or a count which
+isn't a number surfaces as a `KeyError` or `TypeError` from deep inside the
+scoring. This module checks the shape against the `RawSheet` definition
+below, so that when the scoring does trip over a sheet it can say what's
+wrong with it. It doesn't judge sheets the `Scorer` copes with, which are left
+to `Scorer.validate` exactly as in SRComp.
+
+Rather than walking the type definitions for every sheet, the definition is
+compiled once (at import) into the source of a specialised function with the
+checks inlined. Changing the definitions is all that's needed for the checks
+to follow. `check_generic` walks the definitions directly and is
+kept as the reference the generated code is tested against.
+"""
+
+from __future__ import annotations
+
+import argparse
+import dataclasses
+import itertools
+import timeit
+import typing
+from typing import Annotated, Any, Callable, TypedDict
+
+from score import InvalidScoresheetException
+from sr2025 import RawDistrict, ZONE_COLOURS
+
+# Path elements from the root of the sheet
+Path = tuple[Any, ...]
+
+_LEAF_TYPES = {
+    str: "expected a string",
+    int: "expected an integer",
+    bool: "expected true or false",
+}
+_MAPPING_MESSAGE = "expected a mapping"
+_MISSING_MESSAGE = "is required"
+_UNEXPECTED_MESSAGE = "is not expected"
+
+
+# The structure of a score sheet. Optional keys are declared in `total=False`
+# bases rather than with `NotRequired`, which needs Python 3.11.
+
+
+class _RawTeamFlags(TypedDict, total=False):
+    present: bool
+    disqualified: bool
+    left_starting_zone: bool
+
+
+class RawTeam(_RawTeamFlags):
+    # The Scorer indexes `ZONE_COLOURS` by zone, so (as far as SRComp is
+    # concerned) negative zones count back from the end
+    zone: Annotated[int, range(-len(ZONE_COLOURS), len(ZONE_COLOURS))]
+
+
+class RawArenaZone(TypedDict):
+    # District name -> district
+    districts: dict[str, RawDistrict]
+
+
+class RawArenaZones(TypedDict):
+    other: RawArenaZone
+
+
+class _RawSheetExtras(TypedDict, total=False):
+    other: Any
+
+
+class RawSheet(_RawSheetExtras):
+    arena_id: str
+    match_number: int
+    # TLA -> team
+    teams: dict[str, RawTeam]
+    arena_zones: RawArenaZones
+
+
+@dataclasses.dataclass(frozen=True)
+class SheetError:
+    path: Path
+    message: str
+
+    def __str__(self) -> str:
+        location = '.'.join(str(x) for x in self.path) or 'sheet'
+        return f"{location}: {self.message}"
+
+
+def _range_message(bounds: range) -> str:
+    return f"must be between {bounds.start} and {bounds[-1]}"
+
+
+def _fields(hint: Any) -> list[tuple[str, Any, bool]]:
+    """
+    The fields of a TypedDict, as (name, type, required).
+    """
+    return [
+        (name, field, name in hint.__required_keys__)
+        for name, field in typing.get_type_hints(hint, include_extras=True).items()
+    ]
+
+
+def _is_typed_dict(hint: Any) -> bool:
+    return isinstance(hint, type) and typing.is_typeddict(hint)
+
+
+def _is_int(value: Any) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+# Generic checking
+
+
+def _check(hint: Any, value: Any, path: Path, errors: list[SheetError]) -> None:
+    origin = typing.get_origin(hint)
+
+    if hint is Any:
+        return
+
+    if origin is typing.Annotated:
+        base, *metadata = typing.get_args(hint)
+        before = len(errors)
+        _check(base, value, path, errors)
+        if len(errors) == before:
+            for bounds in metadata:
+                if value not in bounds:
+                    errors.append(SheetError(path, _range_message(bounds)))
+        return
+
+    if hint in _LEAF_TYPES:
+        valid = _is_int(value) if hint is int else isinstance(value, hint)
+        if not valid:
+            errors.append(SheetError(path, _LEAF_TYPES[hint]))
+        return
+
+    if not isinstance(value, dict):
+        errors.append(SheetError(path, _MAPPING_MESSAGE))
+        return
+
+    if _is_typed_dict(hint):
+        fields = _fields(hint)
+        for name, field, required in fields:
+            if name in value:
+                _check(field, value[name], path + (name,), errors)
+            elif required:
+                errors.append(SheetError(path + (name,), _MISSING_MESSAGE))
+        known = {name for name, _, _ in fields}
+        for key in value:
+            if key not in known:
+                errors.append(SheetError(path + (key,), _UNEXPECTED_MESSAGE))
+        return
+
+    if origin is dict:
+        key_type, value_type = typing.get_args(hint)
+        for key, item in value.items():
+            _check(key_type, key, path + (key,), errors)
+            _check(value_type, item, path + (key,), errors)
+        return
+
+    raise TypeError(f"Unsupported type in sheet definition: {hint!r}")
+
+
+def check_generic(hint: Any, value: Any) -> list[SheetError]:
+    """
+    Check a value against a type definition by walking the definition.
+    """
+    errors: list[SheetError] = []
+    _check(hint, value, (), errors)
+    return errors
+
+
+# Compiled checking
+
+
+class _Compiler:
+    def __init__(self) -> None:
+        self.lines: list[str] = []
+        self.constants: dict[str, Any] = {}
+        self._names = itertools.count()
+
+    def name(self, prefix: str) -> str:
+        return f'{prefix}{next(self._names)}'
+
+    def constant(self, value: Any) -> str:
+        name = self.name('c')
+        self.constants[name] = value
+        return name
+
+    def emit(self, indent: int, line: str) -> None:
+        self.lines.append('    ' * indent + line)
+
+    def error(self, indent: int, path: str, message: str) -> None:
+        self.emit(indent, f'errors.append(SheetError({path}, {message!r}))')
+
+    def compile(self, hint: Any, value: str, path: str, indent: int) -> None:
+        """
+        Emit checks of the variable `value` against `hint`, where `path` is an
+        expression for the value's path.
+        """
+        origin = typing.get_origin(hint)
+
+        if hint is Any:
+            return
+
+        if origin is typing.Annotated:
+            base, *metadata = typing.get_args(hint)
+            self.compile_leaf(base, value, path, indent, metadata)
+            return
+
+        if hint in _LEAF_TYPES:
+            self.compile_leaf(hint, value, path, indent, [])
+            return
+
+        self.emit(indent, f'if not isinstance({value}, dict):')
+        self.error(indent + 1, path, _MAPPING_MESSAGE)
+        self.emit(indent, 'else:')
+        indent += 1
+
+        if _is_typed_dict(hint):
+            fields = _fields(hint)
+            for name, field, required in fields:
+                item = self.name('v')
+                self.emit(indent, f'{item} = {value}.get({name!r}, MISSING)')
+                self.emit(indent, f'if {item} is not MISSING:')
+                self.compile_block(field, item, f'{path} + ({name!r},)', indent + 1)
+                if required:
+                    self.emit(indent, 'else:')
+                    self.error(indent + 1, f'{path} + ({name!r},)', _MISSING_MESSAGE)
+
+            known = self.constant(frozenset(name for name, _, _ in fields))
+            key = self.name('k')
+            self.emit(indent, f'if not {known}.issuperset({value}):')
+            self.emit(indent + 1, f'for {key} in {value}:')
+            self.emit(indent + 2, f'if {key} not in {known}:')
+            self.error(indent + 3, f'{path} + ({key},)', _UNEXPECTED_MESSAGE)
+            return
+
+        if origin is dict:
+            key_type, value_type = typing.get_args(hint)
+            key = self.name('k')
+            item = self.name('v')
+            self.emit(indent, f'for {key}, {item} in {value}.items():')
+            start = len(self.lines)
+            self.compile(key_type, key, f'{path} + ({key},)', indent + 1)
+            self.compile(value_type, item, f'{path} + ({key},)', indent + 1)
+            if len(self.lines) == start:
+                self.emit(indent + 1, 'pass')
+            return
+
+        raise TypeError(f"Unsupported type in sheet definition: {hint!r}")
+
+    def compile_block(self, hint: Any, value: str, path: str, indent: int) -> None:
+        start = len(self.lines)
+        self.compile(hint, value, path, indent)
+        if len(self.lines) == start:
+            self.emit(indent, 'pass')
+
+    def compile_leaf(
+        self,
+        hint: Any,
+        value: str,
+        path: str,
+        indent: int,
+        bounds: list[range],
+    ) -> None:
+        if hint is int:
+            condition = f'isinstance({value}, int) and not isinstance({value}, bool)'
+        else:
+            condition = f'isinstance({value}, {hint.__name__})'
+        self.emit(indent, f'if not ({condition}):')
+        self.error(indent + 1, path, _LEAF_TYPES[hint])
+        for limits in bounds:
+            self.emit(indent, f'elif {value} not in {self.constant(limits)}:')
+            self.error(indent + 1, path, _range_message(limits))
+
+
+def generate_source(hint: Any) -> tuple[str, dict[str, Any]]:
+    """
+    Generate the source of a function checking values against `hint`, along
+    with the constants it refers to.
+    """
+    compiler = _Compiler()
+    compiler.emit(0, 'def check(value):')
+    compiler.emit(1, 'errors = []')
+    compiler.compile(hint, 'value', '()', 1)
+    compiler.emit(1, 'return errors')
+    return '\n'.join(compiler.lines) + '\n', compiler.constants
+
+
+def compile_validator(hint: Any) -> Callable[[Any], list[SheetError]]:
+    """
+    Compile a function which checks values against `hint`.
+    """
+    source, constants = generate_source(hint)
+    namespace: dict[str, Any] = {
+        **constants,
+        'SheetError': SheetError,
+        'MISSING': object(),
+    }
+    exec(compile(source, f'<validator for {hint.__name__}>', 'exec'), namespace)
+    return typing.cast(Callable[[Any], list[SheetError]], namespace['check'])
+
+
+check_sheet = compile_validator(RawSheet)
+
+
+def validate_structure(sheet: Any) -> None:
+    """
+    Raise an `InvalidScoresheetException` if the sheet is the wrong shape.
+    """
+    errors = check_sheet(sheet)
+    if errors:
+        raise InvalidScoresheetException(
+            "Invalid score sheet structure:\n" + '\n'.join(str(x) for x in errors),
+            code='invalid_structure',
+        )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        '--source',
+        action='store_true',
+        help="print the generated validator",
+    )
+    parser.add_argument(
+        '--benchmark',
+        action='store_true',
+        help="compare the speed of the generated and generic validators",
+    )
+    return parser.parse_args()
+
+
+def main(args: argparse.Namespace) -> None:
+    if args.source:
+        source, _ = generate_source(RawSheet)
+        print(source)
+
+    if args.benchmark:
+        # Imported here as `sheets` uses this module
+        from sheets import COMPSTATE_ROOT, find_sheets, load_sheet
+
+        sheets = [load_sheet(path) for _, path in find_sheets(COMPSTATE_ROOT)]
+        number = 10
+        compiled = timeit.timeit(
+            lambda: [check_sheet(x) for x in sheets],
+            number=number,
+        )
+        generic = timeit.timeit(
+            lambda: [check_generic(RawSheet, x) for x in sheets],
+            number=number,
+        )
+        per_sheet = 1e6 / (number * len(sheets))
+        print(f"Generated: {compiled * per_sheet:.1f}µs per sheet")
+        print(f"Generic:   {generic * per_sheet:.1f}µs per sheet")
+        print(f"Speedup:   {generic / compiled:.1f}x")
+
+
+if __name__ == '__main__':
+    main(parse_args())
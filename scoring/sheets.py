@@ -0,0 +1,79 @@
+"""
+Helpers for finding, loading and scoring the score sheets in a compstate.
+
+The layout mirrors what SRComp expects: `<kind>/<arena>/<match number>.yaml`
+where kind is either `league` or `knockout`.
+"""
+
+from __future__ import annotations
+
+import copy
+from pathlib import Path
+from typing import Any, Iterator
+
+import yaml
+
+from score import InvalidScoresheetException, Scorer
+from sheet_schema import validate_structure
+
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader  # type: ignore[assignment]
+
+COMPSTATE_ROOT = Path(__file__).parent.parent
+
+SHEET_KINDS = ('league', 'knockout')
+
+# (arena, match number)
+MatchId = tuple[str, int]
+
+
+def find_sheets(
+    root: Path = COMPSTATE_ROOT,
+    kinds: tuple[str, ...] = SHEET_KINDS,
+) -> Iterator[tuple[str, Path]]:
+    """
+    Find the score sheets in the given compstate, yielding pairs of the kind of
+    match and the path to the sheet. Sheets are yielded in match order within
+    each kind.
+    """
+    for kind in kinds:
+        for path in sorted(
+            (root / kind).glob('*/*.yaml'),
+            key=lambda x: (x.parent.name, x.stem),
+        ):
+            yield kind, path
+
+
+def load_sheet(path: Path) -> dict[str, Any]:
+    with path.open() as f:
+        return yaml.load(f, Loader=SafeLoader)
+
+
+def match_id(sheet: dict[str, Any]) -> MatchId:
+    return sheet['arena_id'], sheet['match_number']
+
+
+def calculate_scores(sheet: dict[str, Any], *, validate: bool = True) -> dict[str, int]:
+    """
+    Score (and optionally validate) a sheet, leaving the sheet itself untouched.
+
+    Validation is exactly that of SRComp. The sheet's structure is only checked
+    if the `Scorer` can't cope with it, so that a malformed sheet is reported
+    as such rather than as whatever the scoring tripped over.
+
+    `Scorer` normalises the district data in place, so it is given a copy.
+    """
+    try:
+        scorer = Scorer(sheet['teams'], copy.deepcopy(sheet.get('arena_zones')))
+        scores = scorer.calculate_scores()
+        if validate:
+            scorer.validate(sheet.get('other'))
+    except InvalidScoresheetException:
+        raise
+    except Exception:
+        if validate:
+            validate_structure(sheet)
+        raise
+    return scores
@@ -0,0 +1,254 @@
+"""
+Versioned binary snapshot of a fully loaded compstate, for fast cold starts.
+
+Loading a compstate (`SRComp(root)`) parses every YAML file and score sheet,
+then derives the schedule, standings, knockout resolution and awards. This
+saves the loaded `SRComp` to a single file so that a restarted display or
+kiosk can restore it with one read instead.
+
+The file starts with a magic string and a length-prefixed JSON header, then a
+pickle of the `SRComp`. The header records the git tree hash of the compstate
+it was built from along with the format, Python and SRComp versions; a
+snapshot which doesn't match all of those is rejected as stale. Snapshots are
+only built from, and only accepted for, a compstate without uncommitted
+changes, since those aren't covered by the tree hash.
+
+The scorer and ranker classes which SRComp loads from `scoring/` aren't
+importable by name, so they're stored by reference and loaded afresh on
+restore.
+
+By default the snapshot lives in the compstate's `.git` directory, so that it
+doesn't itself show up as a change to the compstate.
+"""
+
+from __future__ import annotations
+
+import argparse
+import dataclasses
+import importlib.metadata
+import io
+import json
+import os
+import pickle
+import struct
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any
+
+from sr.comp.comp import load_ranker, load_scorer, SRComp
+
+from sheets import COMPSTATE_ROOT
+
+MAGIC = b'SR25SNP\x01'
+HEADER_LENGTH = struct.Struct('<I')
+FORMAT_VERSION = 1
+SNAPSHOT_NAME = 'srcomp-snapshot.bin'
+
+_SCORER_ID = 'scorer'
+_RANKER_ID = 'ranker'
+
+
+class InvalidSnapshotException(Exception):
+    pass
+
+
+class StaleSnapshotException(InvalidSnapshotException):
+    pass
+
+
+@dataclasses.dataclass(frozen=True)
+class GitState:
+    git_dir: Path
+    commit: str
+    tree: str
+    # Whether there are uncommitted changes (including untracked files)
+    dirty: bool
+
+
+def git_state(root: Path) -> GitState:
+    git_dir, commit, tree = subprocess.check_output(
+        ['git', 'rev-parse', '--absolute-git-dir', 'HEAD', 'HEAD^{tree}'],
+        cwd=root,
+        text=True,
+    ).split()
+    status = subprocess.check_output(
+        ['git', 'status', '--porcelain', '--untracked-files=normal'],
+        cwd=root,
+        text=True,
+    )
+    return GitState(Path(git_dir), commit, tree, bool(status.strip()))
+
+
+def default_snapshot_path(root: Path, state: GitState | None = None) -> Path:
+    return (state or git_state(root)).git_dir / SNAPSHOT_NAME
+
+
+def _versions() -> dict[str, Any]:
+    return {
+        'format': FORMAT_VERSION,
+        'python': list(sys.version_info[:2]),
+        'srcomp': importlib.metadata.version('sr.comp'),
+    }
+
+
+class _Pickler(pickle.Pickler):
+    def __init__(self, file: io.BytesIO, comp: SRComp) -> None:
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        league = comp.scores.league
+        self._references = {
+            id(league._scorer): _SCORER_ID,
+            id(league._ranker): _RANKER_ID,
+        }
+
+    def persistent_id(self, obj: Any) -> str | None:
+        return self._references.get(id(obj))
+
+
+class _Unpickler(pickle.Unpickler):
+    def __init__(self, file: io.BytesIO, root: Path) -> None:
+        super().__init__(file)
+        self._root = root
+
+    def persistent_load(self, pid: Any) -> Any:
+        if pid == _SCORER_ID:
+            return load_scorer(self._root)
+        if pid == _RANKER_ID:
+            return load_ranker(self._root)
+        raise pickle.UnpicklingError(f"Unknown reference {pid!r}")
+
+
+def build_snapshot(root: Path = COMPSTATE_ROOT, path: Path | None = None) -> SRComp:
+    """
+    Load the given compstate and write a snapshot of it, returning the loaded
+    compstate.
+
+    The file is replaced atomically so that a reader never sees part of one.
+    """
+    state = git_state(root)
+    if state.dirty:
+        raise InvalidSnapshotException(
+            f"{root} has uncommitted changes, which a snapshot can't be keyed by",
+        )
+    path = path or default_snapshot_path(root, state)
+
+    comp = SRComp(root)
+
+    payload = io.BytesIO()
+    _Pickler(payload, comp).dump(comp)
+    header = json.dumps({**_versions(), 'tree': state.tree}).encode('utf-8')
+
+    tmp_path = path.with_name(path.name + '.tmp')
+    with tmp_path.open('wb') as f:
+        f.write(MAGIC)
+        f.write(HEADER_LENGTH.pack(len(header)))
+        f.write(header)
+        f.write(payload.getbuffer())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+    return comp
+
+
+def load_snapshot(root: Path = COMPSTATE_ROOT, path: Path | None = None) -> SRComp:
+    """
+    Restore a compstate from its snapshot, raising `StaleSnapshotException` if
+    it doesn't match the compstate as it is now.
+    """
+    state = git_state(root)
+    if state.dirty:
+        raise StaleSnapshotException(f"{root} has uncommitted changes")
+    path = path or default_snapshot_path(root, state)
+
+    try:
+        data = path.read_bytes()
+    except FileNotFoundError:
+        raise StaleSnapshotException(f"No snapshot at {path}") from None
+
+    if data[:len(MAGIC)] != MAGIC:
+        raise InvalidSnapshotException(f"{path} is not a compstate snapshot")
+    start = len(MAGIC) + HEADER_LENGTH.size
+    (length,) = HEADER_LENGTH.unpack_from(data, len(MAGIC))
+    header = json.loads(data[start:start + length])
+
+    expected = {**_versions(), 'tree': state.tree}
+    mismatched = [key for key, value in expected.items() if header.get(key) != value]
+    if mismatched:
+        raise StaleSnapshotException(
+            f"{path} is stale (different {', '.join(mismatched)})",
+        )
+
+    payload = io.BytesIO(memoryview(data)[start + length:])
+    comp: SRComp = _Unpickler(payload, root).load()
+    # The tree matches, but the commit may not
+    comp.root = root
+    comp.state = state.commit
+    return comp
+
+
+def load_comp(root: Path = COMPSTATE_ROOT, path: Path | None = None) -> SRComp:
+    """
+    Load a compstate from its snapshot if that's up to date, otherwise load it
+    from scratch (and update the snapshot, where the compstate is committed).
+    """
+    try:
+        return load_snapshot(root, path)
+    except InvalidSnapshotException:
+        pass
+
+    if git_state(root).dirty:
+        return SRComp(root)
+    return build_snapshot(root, path)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        '--compstate',
+        type=Path,
+        default=COMPSTATE_ROOT,
+        help="competition state repository (default: %(default)s)",
+    )
+    parser.add_argument(
+        '--snapshot',
+        type=Path,
+        help="snapshot file (default: in the compstate's .git directory)",
+    )
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('build', help="build the snapshot")
+    subparsers.add_parser(
+        'check',
+        help="check whether the snapshot is up to date, comparing load times",
+    )
+    return parser.parse_args()
+
+
+def main(args: argparse.Namespace) -> int:
+    root = args.compstate.resolve()
+
+    if args.command == 'build':
+        start = time.perf_counter()
+        build_snapshot(root, args.snapshot)
+        print(f"Built snapshot in {time.perf_counter() - start:.2f}s")
+        return 0
+
+    start = time.perf_counter()
+    try:
+        load_snapshot(root, args.snapshot)
+    except InvalidSnapshotException as e:
+        print(e, file=sys.stderr)
+        return 1
+    restored = time.perf_counter() - start
+
+    start = time.perf_counter()
+    SRComp(root)
+    loaded = time.perf_counter() - start
+
+    print(f"Snapshot is up to date; restored in {restored:.3f}s ({loaded:.3f}s to load)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(parse_args()))
@@ -0,0 +1,221 @@
+"""
+Incrementally maintained league table.
+
+This mirrors how SRComp builds its league scores (see `sr.comp.scores`) but
+keeps the per-match results so that adding or correcting a single match only
+recomputes that match's positions and the (cheap) final ordering.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Iterable, Mapping
+
+import league_ranker
+import yaml
+from league_ranker import LeaguePoints, RankedPosition
+from sr.comp.scores import (
+    LeaguePosition,
+    LeagueScores,
+    load_external_scores,
+    load_external_scores_data,
+    TeamScore,
+)
+from sr.comp.types import GamePoints, MatchId, TLA
+
+from ranker import Ranker
+from sheets import (
+    calculate_scores,
+    COMPSTATE_ROOT,
+    find_sheets,
+    load_sheet,
+    match_id,
+)
+from sr2025 import ZONE_COLOURS
+
+NUM_ZONES = len(ZONE_COLOURS)
+
+
+def disqualified_teams(sheet: Mapping[str, Any]) -> list[TLA]:
+    """
+    Teams which should get no league points from a match.
+
+    As in SRComp, disqualification and non-presence are treated the same.
+    """
+    return [
+        tla
+        for tla, info in sheet['teams'].items()
+        if info.get('disqualified', False) or not info.get('present', True)
+    ]
+
+
+def match_league_points(
+    key: MatchId,
+    game_points: Mapping[TLA, GamePoints],
+    disqualified: Iterable[TLA],
+    *,
+    num_zones: int = NUM_ZONES,
+) -> tuple[dict[RankedPosition, set[TLA]], dict[TLA, LeaguePoints]]:
+    """
+    Compute the game positions and league points for a single match.
+    """
+    dsq = list(disqualified)
+    positions = league_ranker.calc_positions(game_points, dsq)
+    points = Ranker().calc_ranked_points(
+        positions,
+        disqualifications=dsq,
+        num_zones=num_zones,
+        match_id=key,
+    )
+    return positions, points
+
+
+def load_external(root: Path, teams: Iterable[TLA]) -> dict[TLA, TeamScore]:
+    """
+    Load the points teams have from outside of matches (the challenges).
+    """
+    return load_external_scores(
+        load_external_scores_data(root / 'external'),
+        list(teams),
+    )
+
+
+class LeagueTable:
+    """
+    League points, game points and positions for every team.
+    """
+
+    def __init__(
+        self,
+        teams: Iterable[TLA],
+        *,
+        extra: Mapping[TLA, TeamScore] | None = None,
+        num_zones: int = NUM_ZONES,
+    ) -> None:
+        self._num_zones = num_zones
+        self._teams = list(teams)
+
+        self.game_points: dict[MatchId, dict[TLA, GamePoints]] = {}
+        self.league_points: dict[MatchId, dict[TLA, LeaguePoints]] = {}
+
+        self._totals = {tla: TeamScore() for tla in self._teams}
+        self._positions: dict[TLA, LeaguePosition] | None = None
+
+        self._extra: dict[TLA, TeamScore] = {}
+        self.set_external_scores(extra or {})
+
+    @classmethod
+    def for_compstate(cls, root: Path = COMPSTATE_ROOT) -> LeagueTable:
+        """
+        Build a table of the teams and external scores in the given compstate,
+        without any matches.
+        """
+        with (root / 'teams.yaml').open() as f:
+            teams = list(yaml.safe_load(f)['teams'])
+
+        return cls(teams, extra=load_external(root, teams))
+
+    @classmethod
+    def load(cls, root: Path = COMPSTATE_ROOT) -> LeagueTable:
+        """
+        Build the table from the league sheets and external scores in the
+        given compstate.
+        """
+        table = cls.for_compstate(root)
+        for _, path in find_sheets(root, kinds=('league',)):
+            table.add_sheet(load_sheet(path))
+        return table
+
+    @property
+    def teams(self) -> list[TLA]:
+        return list(self._teams)
+
+    def totals(self, tla: TLA) -> TeamScore:
+        return self._totals[tla]
+
+    def add_sheet(self, sheet: Mapping[str, Any]) -> dict[TLA, LeaguePoints]:
+        """
+        Add (or replace) the result of a match from its sheet.
+        """
+        return self.set_match(
+            match_id(sheet),
+            calculate_scores(sheet),
+            disqualified_teams(sheet),
+        )
+
+    def set_match(
+        self,
+        key: MatchId,
+        game_points: Mapping[TLA, GamePoints],
+        disqualified: Iterable[TLA],
+    ) -> dict[TLA, LeaguePoints]:
+        """
+        Add (or replace) the result of a match, returning the change in league
+        points for each team in it.
+        """
+        old_game = self.game_points.get(key, {})
+        old_league = self.league_points.get(key, {})
+
+        _, league_points = match_league_points(
+            key,
+            game_points,
+            disqualified,
+            num_zones=self._num_zones,
+        )
+        self._apply(key, old_game, old_league, -1)
+        self.game_points[key] = dict(game_points)
+        self.league_points[key] = league_points
+        self._apply(key, game_points, league_points, +1)
+
+        return {
+            tla: LeaguePoints(league_points.get(tla, 0) - old_league.get(tla, 0))
+            for tla in league_points.keys() | old_league.keys()
+        }
+
+    def set_external_scores(self, extra: Mapping[TLA, TeamScore]) -> None:
+        """
+        Replace the points teams have from outside of matches.
+        """
+        for tla, score in self._extra.items():
+            self._totals[tla].add_game_points(GamePoints(-score.game_points))
+            self._totals[tla].add_league_points(LeaguePoints(-score.league_points))
+        self._extra = dict(extra)
+        for tla, score in self._extra.items():
+            self._totals[tla].add_game_points(score.game_points)
+            self._totals[tla].add_league_points(score.league_points)
+        self._positions = None
+
+    def remove_match(self, key: MatchId) -> None:
+        self._apply(
+            key,
+            self.game_points.pop(key, {}),
+            self.league_points.pop(key, {}),
+            -1,
+        )
+
+    def _apply(
+        self,
+        key: MatchId,
+        game_points: Mapping[TLA, int],
+        league_points: Mapping[TLA, int],
+        sign: int,
+    ) -> None:
+        for tla, points in game_points.items():
+            self._totals[tla].add_game_points(GamePoints(sign * points))
+        for tla, points in league_points.items():
+            self._totals[tla].add_league_points(LeaguePoints(sign * points))
+        if game_points or league_points:
+            self._positions = None
+
+    @property
+    def positions(self) -> Mapping[TLA, LeaguePosition]:
+        """
+        League positions, in ranked order (ties broken by TLA), as SRComp
+        computes them.
+        """
+        if self._positions is None:
+            self._positions = dict(LeagueScores.rank_league(self._totals))
+        return self._positions
+
+    def ranked_teams(self) -> list[TLA]:
+        return list(self.positions.keys())
@@ -0,0 +1,239 @@
+"""
+Per-team performance statistics, for commentators and judges.
+
+Statistics are accumulated as running totals so that adding (or correcting) a
+match costs only that match's sheet rather than a pass over every sheet, and
+queries are answered from the totals directly. There's therefore no pass over
+the sheets to vectorise while results are coming in: each new result updates
+the totals of the teams in its match, and only building the totals from
+scratch reads every sheet.
+
+Matches in which a team was absent or disqualified don't count towards its
+statistics, just as they earn it nothing in the league.
+"""
+
+from __future__ import annotations
+
+import argparse
+import collections
+import dataclasses
+from pathlib import Path
+from typing import Any, Iterable
+
+from sheets import (
+    calculate_scores,
+    COMPSTATE_ROOT,
+    find_sheets,
+    load_sheet,
+    match_id,
+    MatchId,
+)
+from sr2025 import DISTRICTS, ZONE_COLOURS
+from standings import disqualified_teams
+
+# District name prefix -> tier, e.g: 'inner_ne' -> 'inner'
+TIERS = ('outer', 'inner', 'central')
+DISTRICT_TIERS = {name: name.split('_')[0] for name in DISTRICTS}
+
+NUM_CORNERS = len(ZONE_COLOURS)
+
+
+@dataclasses.dataclass
+class TeamStats:
+    """
+    Totals for a single team. Derived figures are computed on access.
+    """
+    matches: int = 0
+    score_total: int = 0
+    score_squares_total: int = 0
+    pallets_by_tier: collections.Counter[str] = dataclasses.field(
+        default_factory=collections.Counter,
+    )
+    # Number of districts in which the team held the highest pallet
+    highest_pallets: int = 0
+    # Number of matches in which the team held at least one highest pallet
+    matches_with_highest: int = 0
+    left_starting_zone: int = 0
+    matches_by_corner: collections.Counter[int] = dataclasses.field(
+        default_factory=collections.Counter,
+    )
+    score_by_corner: collections.Counter[int] = dataclasses.field(
+        default_factory=collections.Counter,
+    )
+
+    def _update(self, contribution: MatchContribution, sign: int) -> None:
+        self.matches += sign
+        self.score_total += sign * contribution.score
+        self.score_squares_total += sign * contribution.score ** 2
+        for tier, count in contribution.pallets_by_tier.items():
+            self.pallets_by_tier[tier] += sign * count
+        self.highest_pallets += sign * contribution.highest_pallets
+        self.matches_with_highest += sign * bool(contribution.highest_pallets)
+        self.left_starting_zone += sign * contribution.left_starting_zone
+        self.matches_by_corner[contribution.corner] += sign
+        self.score_by_corner[contribution.corner] += sign * contribution.score
+
+    @property
+    def mean_score(self) -> float:
+        return self.score_total / self.matches if self.matches else 0.0
+
+    @property
+    def score_variance(self) -> float:
+        """
+        Population variance of the team's match scores.
+        """
+        if not self.matches:
+            return 0.0
+        mean = self.mean_score
+        return max(self.score_squares_total / self.matches - mean ** 2, 0.0)
+
+    @property
+    def highest_rate(self) -> float:
+        """
+        Fraction of matches in which the team held at least one highest pallet.
+        """
+        return self.matches_with_highest / self.matches if self.matches else 0.0
+
+    @property
+    def left_starting_zone_rate(self) -> float:
+        return self.left_starting_zone / self.matches if self.matches else 0.0
+
+    def mean_score_by_corner(self) -> dict[int, float]:
+        return {
+            corner: self.score_by_corner[corner] / count
+            for corner, count in sorted(self.matches_by_corner.items())
+            if count
+        }
+
+
+@dataclasses.dataclass(frozen=True)
+class MatchContribution:
+    """
+    What a single match adds to a team's totals.
+    """
+    score: int
+    corner: int
+    pallets_by_tier: dict[str, int]
+    highest_pallets: int
+    left_starting_zone: bool
+
+
+def match_contributions(sheet: dict[str, Any]) -> dict[str, MatchContribution]:
+    """
+    Break down a sheet into per-team contributions, leaving out teams which
+    were absent or disqualified.
+    """
+    scores = calculate_scores(sheet, validate=False)
+    districts = sheet['arena_zones']['other']['districts']
+    disqualified = set(disqualified_teams(sheet))
+
+    contributions = {}
+    for tla, info in sheet['teams'].items():
+        if tla in disqualified:
+            continue
+        colour = ZONE_COLOURS[info['zone']]
+
+        pallets_by_tier = dict.fromkeys(TIERS, 0)
+        highest_pallets = 0
+        for name, district in districts.items():
+            pallets_by_tier[DISTRICT_TIERS[name]] += district['pallets'].get(colour, 0)
+            if colour in district['highest']:
+                highest_pallets += 1
+
+        contributions[tla] = MatchContribution(
+            score=scores[tla],
+            corner=info['zone'],
+            pallets_by_tier=pallets_by_tier,
+            highest_pallets=highest_pallets,
+            left_starting_zone=bool(info.get('left_starting_zone')),
+        )
+
+    return contributions
+
+
+class TeamStatistics:
+    """
+    Incrementally maintained statistics for every team.
+
+    Adding a sheet for a match which has already been seen replaces the
+    earlier version's contribution, so corrections are handled too.
+    """
+
+    def __init__(self, sheets: Iterable[dict[str, Any]] = ()) -> None:
+        self._teams: dict[str, TeamStats] = collections.defaultdict(TeamStats)
+        self._matches: dict[MatchId, dict[str, MatchContribution]] = {}
+
+        for sheet in sheets:
+            self.add_sheet(sheet)
+
+    @classmethod
+    def load(cls, root: Path = COMPSTATE_ROOT) -> TeamStatistics:
+        return cls(load_sheet(path) for _, path in find_sheets(root))
+
+    def add_sheet(self, sheet: dict[str, Any]) -> None:
+        key = match_id(sheet)
+        self.remove_match(key)
+
+        contributions = match_contributions(sheet)
+        for tla, contribution in contributions.items():
+            self._teams[tla]._update(contribution, +1)
+        self._matches[key] = contributions
+
+    def remove_match(self, key: MatchId) -> None:
+        for tla, contribution in self._matches.pop(key, {}).items():
+            self._teams[tla]._update(contribution, -1)
+
+    def __contains__(self, tla: str) -> bool:
+        return tla in self._teams
+
+    def __getitem__(self, tla: str) -> TeamStats:
+        """
+        The team's statistics; empty (but not added) if it has played no
+        matches.
+        """
+        return self._teams.get(tla, TeamStats())
+
+    @property
+    def teams(self) -> dict[str, TeamStats]:
+        return dict(self._teams)
+
+
+def format_table(statistics: TeamStatistics) -> str:
+    header = (
+        "TLA  Matches   Mean    Var  "
+        + ' '.join(f'{x:>7}' for x in TIERS)
+        + "  Highest  Moved  "
+        + ' '.join(f'C{x:<5}' for x in range(NUM_CORNERS))
+    )
+    lines = [header]
+    for tla, stats in sorted(
+        statistics.teams.items(),
+        key=lambda x: (-x[1].mean_score, x[0]),
+    ):
+        by_corner = stats.mean_score_by_corner()
+        lines.append(
+            f"{tla:<4} {stats.matches:>7} "
+            f"{stats.mean_score:>6.1f} {stats.score_variance:>6.1f}  "
+            + ' '.join(f'{stats.pallets_by_tier[x]:>7}' for x in TIERS)
+            + f"  {stats.highest_rate:>7.0%}  {stats.left_starting_zone_rate:>5.0%}  "
+            + ' '.join(
+                f'{by_corner[x]:<6.1f}' if x in by_corner else '-     '
+                for x in range(NUM_CORNERS)
+            ),
+        )
+    return '\n'.join(lines)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Show per-team performance statistics.")
+    parser.add_argument(
+        '--compstate',
+        type=Path,
+        default=COMPSTATE_ROOT,
+        help="competition state repository (default: %(default)s)",
+    )
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    print(format_table(TeamStatistics.load(parse_args().compstate)))
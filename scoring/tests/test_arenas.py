@@ -0,0 +1,141 @@
+"""
+Tests for scoring several arenas concurrently.
+"""
+
+from __future__ import annotations
+
+import concurrent.futures
+import copy
+import os
+import pathlib
+import sys
+import tempfile
+import unittest
+from typing import Any
+
+import yaml
+
+# Path hackery
+ROOT = pathlib.Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+from arenas import (  # type: ignore[import-not-found]  # noqa: E402
+    find_arena_sheets,
+    MultiArenaScorer,
+)
+from score import (  # type: ignore[import-not-found]  # noqa: E402
+    InvalidScoresheetException,
+)
+from standings import (  # type: ignore[import-not-found]  # noqa: E402
+    LeagueTable,
+)
+
+TEAMS = ['TLA0', 'TLA1', 'TLA2', 'TLA3']
+
+
+class MultiArenaScorerTests(unittest.TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        with (ROOT / 'template.yaml').open() as f:
+            self.template = yaml.safe_load(f)
+
+        tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tempdir.cleanup)
+        self.root = pathlib.Path(tempdir.name)
+
+        (self.root / 'teams.yaml').write_text(
+            yaml.safe_dump({'teams': {x: {'name': x} for x in TEAMS}}),
+        )
+        (self.root / 'arenas.yaml').write_text(
+            yaml.safe_dump({'arenas': {'A': {}, 'B': {}}}),
+        )
+
+        self.executor = concurrent.futures.ThreadPoolExecutor(2)
+        self.addCleanup(self.executor.shutdown)
+
+    def write_sheet(self, arena: str, num: int, winner: str) -> pathlib.Path:
+        sheet: dict[str, Any] = copy.deepcopy(self.template)
+        sheet['arena_id'] = arena
+        sheet['match_number'] = num
+        zone = sheet['teams'][winner]['zone']
+        districts = sheet['arena_zones']['other']['districts']
+        districts['outer_nw']['pallets']['GOPY'[zone]] = 2
+
+        path = self.root / 'league' / arena / f'{num:03}.yaml'
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(yaml.safe_dump(sheet))
+        # Make sure rewrites are seen as changes
+        os.utime(path, ns=(0, num * 1000 + TEAMS.index(winner)))
+        return path
+
+    def assertMatchesSerial(self, scorer: MultiArenaScorer) -> None:
+        expected = LeagueTable.load(self.root)
+        self.assertEqual(
+            list(expected.positions.items()),
+            list(scorer.table.positions.items()),
+        )
+        self.assertEqual(
+            [expected.totals(x) for x in TEAMS],
+            [scorer.table.totals(x) for x in TEAMS],
+        )
+
+    def test_merges_arenas(self) -> None:
+        self.write_sheet('A', 0, 'TLA0')
+        self.write_sheet('A', 1, 'TLA1')
+        self.write_sheet('B', 0, 'TLA0')
+
+        scorer = MultiArenaScorer(self.root)
+        self.assertEqual(['A', 'B'], scorer.refresh(self.executor))
+        self.assertEqual(
+            [('A', 0), ('A', 1), ('B', 0)],
+            [x.key for x in scorer.results()],
+        )
+        self.assertEqual('TLA0', scorer.table.ranked_teams()[0])
+        self.assertMatchesSerial(scorer)
+
+    def test_only_changed_arenas_rescored(self) -> None:
+        self.write_sheet('A', 0, 'TLA0')
+        b_sheet = self.write_sheet('B', 0, 'TLA0')
+
+        scorer = MultiArenaScorer(self.root)
+        scorer.refresh(self.executor)
+        self.assertEqual([], scorer.refresh(self.executor))
+
+        self.write_sheet('B', 0, 'TLA2')
+        self.assertEqual(['B'], scorer.refresh(self.executor))
+        self.assertMatchesSerial(scorer)
+
+        b_sheet.unlink()
+        self.assertEqual(['B'], scorer.refresh(self.executor))
+        self.assertEqual([('A', 0)], [x.key for x in scorer.results()])
+        self.assertMatchesSerial(scorer)
+
+    def test_invalid_sheet_in_one_arena(self) -> None:
+        self.write_sheet('A', 0, 'TLA0')
+        self.write_sheet('B', 0, 'TLA0')
+        scorer = MultiArenaScorer(self.root)
+        scorer.refresh(self.executor)
+
+        self.write_sheet('A', 0, 'TLA1')
+        bad_sheet = self.write_sheet('B', 1, 'TLA1')
+        sheet = yaml.safe_load(bad_sheet.read_text())
+        sheet['arena_zones']['other']['districts']['central']['pallets']['G'] = 7
+        bad_sheet.write_text(yaml.safe_dump(sheet))
+
+        with self.assertRaises(InvalidScoresheetException):
+            scorer.refresh(self.executor)
+
+        # Nothing was recorded, so the change in the other arena isn't lost
+        self.write_sheet('B', 1, 'TLA1')
+        self.assertEqual(['A', 'B'], scorer.refresh(self.executor))
+        self.assertMatchesSerial(scorer)
+
+    def test_sheet_in_wrong_arena(self) -> None:
+        self.write_sheet('C', 0, 'TLA0')
+
+        with self.assertRaisesRegex(ValueError, "arena 'C'"):
+            find_arena_sheets(self.root)
+
+
+if __name__ == '__main__':
+    unittest.main()
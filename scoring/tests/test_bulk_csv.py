@@ -0,0 +1,131 @@
+"""
+Tests for the bulk CSV import & export of score sheets.
+"""
+
+from __future__ import annotations
+
+import csv
+import datetime
+import io
+import pathlib
+import sys
+import tempfile
+import unittest
+
+import yaml
+from sr.comp.match_period import Match, MatchType
+from sr.comp.raw_compstate import RawCompstate
+from sr.comp.types import ArenaName, MatchNumber, TLA
+
+# Path hackery
+ROOT = pathlib.Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+from bulk_csv import (  # type: ignore[import-not-found]  # noqa: E402
+    fieldnames,
+    import_csv,
+    score_to_row,
+)
+from converter import Converter  # type: ignore[import-not-found]  # noqa: E402
+
+UTC = datetime.timezone.utc
+
+
+class BulkCsvTests(unittest.TestCase):
+    maxDiff = None
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.match = Match(
+            MatchNumber(3),
+            "Match 3",
+            ArenaName('main'),
+            [TLA('TLA0'), TLA('TLA1'), TLA('TLA2'), TLA('TLA3')],
+            datetime.datetime(2025, 4, 12, 11, 0, tzinfo=UTC),
+            datetime.datetime(2025, 4, 12, 11, 5, tzinfo=UTC),
+            MatchType.league,
+            use_resolved_ranking=False,
+        )
+        self.matches = {(ArenaName('main'), MatchNumber(3)): self.match}
+
+        with (ROOT / 'template.yaml').open() as f:
+            self.sheet = yaml.safe_load(f)
+        self.sheet['arena_id'] = 'main'
+        self.sheet['match_number'] = 3
+
+        tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tempdir.cleanup)
+        self.root = pathlib.Path(tempdir.name)
+        self.compstate = RawCompstate(self.root, local_only=True)
+
+    def build_csv(self, *rows: dict[str, object]) -> io.StringIO:
+        stream = io.StringIO()
+        writer = csv.DictWriter(stream, fieldnames())
+        writer.writeheader()
+        writer.writerows(rows)
+        stream.seek(0)
+        return stream
+
+    def test_round_trip(self) -> None:
+        row = score_to_row(Converter(), self.sheet)
+
+        result = import_csv(self.build_csv(row), self.compstate, self.matches)
+
+        self.assertEqual([], result.errors)
+        path = self.root / 'league' / 'main' / '003.yaml'
+        self.assertEqual([path], result.written)
+        with path.open() as f:
+            self.assertEqual(self.sheet, yaml.safe_load(f))
+
+    def test_boolean_spellings(self) -> None:
+        row = score_to_row(Converter(), self.sheet)
+        row['present_3'] = 'Y'
+        row['left_starting_zone_3'] = 'x'
+        row['present_0'] = '0'
+
+        result = import_csv(self.build_csv(row), self.compstate, self.matches)
+
+        self.assertEqual([], result.errors)
+        with result.written[0].open() as f:
+            teams = yaml.safe_load(f)['teams']
+        self.assertTrue(teams['TLA3']['present'])
+        self.assertTrue(teams['TLA3']['left_starting_zone'])
+        self.assertFalse(teams['TLA0']['present'])
+
+    def test_reports_every_error(self) -> None:
+        good = score_to_row(Converter(), self.sheet)
+
+        too_many = dict(good, district_central_pallets_G=7)
+        not_a_number = dict(good, district_central_pallets_G='lots')
+        wrong_team = dict(good, tla_0='ABC')
+        no_match = dict(good, match_number=99)
+
+        result = import_csv(
+            self.build_csv(good, too_many, not_a_number, wrong_team, no_match),
+            self.compstate,
+            self.matches,
+        )
+
+        self.assertEqual([3, 4, 5, 6], [x.line for x in result.errors])
+        self.assertEqual('too_many_pallets', result.errors[0].code)
+        self.assertEqual([], result.written, "Nothing should be written")
+        self.assertEqual([], list(self.root.glob('**/*.yaml*')))
+
+    def test_existing_sheet(self) -> None:
+        row = score_to_row(Converter(), self.sheet)
+        import_csv(self.build_csv(row), self.compstate, self.matches)
+
+        result = import_csv(self.build_csv(row), self.compstate, self.matches)
+        self.assertEqual(1, len(result.errors))
+
+        result = import_csv(
+            self.build_csv(row),
+            self.compstate,
+            self.matches,
+            overwrite=True,
+        )
+        self.assertEqual([], result.errors)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+"""
+Tests for the columnar store of score sheets.
+"""
+
+from __future__ import annotations
+
+import pathlib
+import sys
+import tempfile
+import unittest
+
+import yaml
+
+# Path hackery
+ROOT = pathlib.Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+from columnar import (  # type: ignore[import-not-found]  # noqa: E402
+    ColumnarStore,
+    InvalidStoreException,
+    write_store,
+)
+from sr2025 import (  # type: ignore[import-not-found]  # noqa: E402
+    DISTRICTS,
+    ZONE_COLOURS,
+)
+
+
+class ColumnarStoreTests(unittest.TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        with (ROOT / 'template.yaml').open() as f:
+            self.sheet = yaml.safe_load(f)
+        self.sheet['arena_id'] = 'main'
+        self.sheet['match_number'] = 42
+
+        districts = self.sheet['arena_zones']['other']['districts']
+        districts['inner_ne']['pallets']['P'] = 3
+        districts['inner_ne']['highest'] = 'P'
+        self.sheet['teams']['TLA2']['left_starting_zone'] = True
+        del self.sheet['teams']['TLA3']
+
+        tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tempdir.cleanup)
+        self.path = pathlib.Path(tempdir.name) / 'scores.columns'
+
+    def open_store(self) -> ColumnarStore:
+        store = ColumnarStore(self.path)
+        self.addCleanup(store.close)
+        return store
+
+    def test_round_trip(self) -> None:
+        count = write_store([('knockout', self.sheet)], self.path)
+        self.assertEqual(1, count)
+
+        store = self.open_store()
+        self.assertEqual(1, store.num_matches)
+        self.assertEqual(['main'], store.arenas)
+
+        self.assertEqual([42], store.column('match_number').tolist())
+        self.assertEqual([1], store.column('kind').tolist())
+        self.assertEqual(
+            ['TLA0', 'TLA1', 'TLA2', None],
+            [store.tla(0, zone) for zone in range(4)],
+        )
+        self.assertEqual([[1, 0, 1, 0]], store.column('present').tolist())
+        self.assertEqual([[0, 1, 0, 0]], store.column('disqualified').tolist())
+        self.assertEqual([[0, 0, 1, 0]], store.column('left_starting_zone').tolist())
+
+        inner_ne = list(DISTRICTS).index('inner_ne')
+        central = list(DISTRICTS).index('central')
+        purple = ZONE_COLOURS.index('P')
+
+        pallets = store.column('pallets').tolist()[0]
+        self.assertEqual(3, pallets[inner_ne][purple])
+        self.assertEqual(0, pallets[central][purple])
+
+        highest = store.column('highest').tolist()[0]
+        self.assertEqual(purple, highest[inner_ne])
+        self.assertEqual(-1, highest[central])
+
+    def test_present_by_default(self) -> None:
+        del self.sheet['teams']['TLA0']['present']
+        write_store([('league', self.sheet)], self.path)
+
+        store = self.open_store()
+        self.assertEqual([[1, 0, 1, 0]], store.column('present').tolist())
+
+    def test_too_many_pallets(self) -> None:
+        self.sheet['arena_zones']['other']['districts']['central']['pallets']['G'] = 256
+
+        with self.assertRaisesRegex(ValueError, "256 G pallets in district central"):
+            write_store([('league', self.sheet)], self.path)
+        self.assertFalse(self.path.exists())
+
+    def test_tla_too_long(self) -> None:
+        self.sheet['teams']['TLA10'] = self.sheet['teams'].pop('TLA0')
+
+        with self.assertRaisesRegex(ValueError, "TLA 'TLA10'"):
+            write_store([('league', self.sheet)], self.path)
+        self.assertFalse(self.path.exists())
+
+    def test_empty(self) -> None:
+        write_store([], self.path)
+
+        store = self.open_store()
+        self.assertEqual(0, store.num_matches)
+        self.assertEqual([], store.column('match_number').tolist())
+
+    def test_not_a_store(self) -> None:
+        self.path.write_bytes(b'bees')
+
+        with self.assertRaises(InvalidStoreException):
+            ColumnarStore(self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -14,7 +14,10 @@ from sr.comp.types import ArenaName, MatchNumber, TLA
 ROOT = pathlib.Path(__file__).parent.parent
 sys.path.insert(0, str(ROOT))
 
-from converter import Converter  # type: ignore[import-not-found]  # noqa: E402
+from converter import (  # type: ignore[import-not-found]  # noqa: E402
+    Converter,
+    InvalidFormError,
+)
 
 UTC = datetime.timezone.utc
 
@@ -91,3 +94,99 @@ class ConverterSmokeTests(unittest.TestCase):
         )
 
         self.assertEqual(data, parsed_score)
+
+
+class ConverterValidationTests(unittest.TestCase):
+    maxDiff = None
+
+    def setUp(self):
+        super().setUp()
+        self.match = build_match(teams=[TLA('TLA0'), TLA('TLA1'), None, None])
+        self.converter = Converter()
+        self.form = htmlify(self.converter.match_to_form(self.match))
+
+    def assertFormErrors(
+        self,
+        expected: dict[str | None, list[str]],
+        code: str,
+    ) -> None:
+        with self.assertRaises(InvalidFormError) as cm:
+            self.converter.form_to_score(self.match, self.form)
+        self.assertIsInstance(cm.exception, ValueError)
+        self.assertEqual(expected, cm.exception.errors)
+        self.assertEqual(code, cm.exception.code)
+
+    def test_valid(self) -> None:
+        self.form['district_central_pallets_G'] = '2'
+        self.form['district_central_highest'] = 'G'
+        score = self.converter.form_to_score(self.match, self.form)
+        self.assertEqual(
+            {'highest': 'G', 'pallets': {'G': 2, 'O': 0, 'P': 0, 'Y': 0}},
+            score['arena_zones']['other']['districts']['central'],
+        )
+
+    def test_bad_counts(self) -> None:
+        self.form['district_central_pallets_G'] = 'two'
+        self.form['district_outer_ne_pallets_Y'] = '-1'
+        self.assertFormErrors(
+            {
+                'district_outer_ne_pallets_Y': ["must not be negative"],
+                'district_central_pallets_G': ["must be a whole number"],
+            },
+            'invalid_count',
+        )
+
+    def test_invalid_highest(self) -> None:
+        self.form['district_inner_sw_pallets_G'] = '1'
+        self.form['district_inner_sw_highest'] = 'GO'
+        self.assertFormErrors(
+            {'district_inner_sw_highest': ["must be one of G, O, P, Y"]},
+            'invalid_highest_pallet',
+        )
+
+    def test_impossible_highest(self) -> None:
+        self.form['district_inner_sw_pallets_G'] = '1'
+        self.form['district_inner_sw_highest'] = 'O'
+        self.assertFormErrors(
+            {'district_inner_sw_highest': ["there are no O pallets in this district"]},
+            'impossible_highest_pallet',
+        )
+
+    def test_too_many_pallets(self) -> None:
+        self.form['district_outer_nw_pallets_P'] = '4'
+        self.form['district_central_pallets_P'] = '3'
+        self.form['district_central_pallets_G'] = '6'
+        message = "there are 7 P pallets in total, but only 6 in the arena"
+        self.assertFormErrors(
+            {
+                'district_outer_nw_pallets_P': [message],
+                'district_central_pallets_P': [message],
+            },
+            'too_many_pallets',
+        )
+
+    def test_forced(self) -> None:
+        # The head judge can override the rules with "Save anyway"
+        self.form['district_central_pallets_G'] = '7'
+        self.form['district_central_highest'] = 'O'
+        self.form['force'] = 'on'
+        score = self.converter.form_to_score(self.match, self.form)
+        self.assertEqual(
+            {'highest': 'O', 'pallets': {'G': 7, 'O': 0, 'P': 0, 'Y': 0}},
+            score['arena_zones']['other']['districts']['central'],
+        )
+
+        # But not what can't be made into a sheet
+        self.form['district_central_pallets_G'] = 'seven'
+        self.assertFormErrors(
+            {'district_central_pallets_G': ["must be a whole number"]},
+            'invalid_count',
+        )
+
+    def test_unknown_team(self) -> None:
+        self.form['tla_1'] = 'ABC'
+        self.form['force'] = 'on'
+        self.assertFormErrors(
+            {'tla_1': ["is not one of the teams in this match"]},
+            'unknown_team',
+        )
@@ -0,0 +1,113 @@
+"""
+Tests for the time-compressed competition replay.
+"""
+
+from __future__ import annotations
+
+import datetime
+import pathlib
+import sys
+import unittest
+from unittest import mock
+
+from sr.comp.comp import SRComp
+from sr.comp.knockout_scheduler import UNKNOWABLE_TEAM
+
+# Path hackery
+ROOT = pathlib.Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+from day_replay import (  # type: ignore[import-not-found]  # noqa: E402
+    _time_compressor,
+    DayReplay,
+    percentiles,
+    Sample,
+)
+from score import Scorer  # type: ignore[import-not-found]  # noqa: E402
+from sheets import (  # type: ignore[import-not-found]  # noqa: E402
+    COMPSTATE_ROOT,
+)
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+        self.slept = 0.0
+
+    def __call__(self) -> float:
+        # Each look at the clock takes a little time
+        self.now += 0.001
+        return self.now
+
+    def sleep(self, duration: float) -> None:
+        self.slept += duration
+        self.now += duration
+
+
+class DayReplayTests(unittest.TestCase):
+    def run_replay(self, replay: DayReplay) -> list[Sample]:
+        clock = FakeClock()
+        samples = replay.run(1000, clock=clock, sleep=clock.sleep)
+        self.assertEqual(len(replay.saves), len(samples))
+        self.assertGreater(clock.slept, 0)
+        # Nothing falls behind, so every save is handled promptly
+        self.assertLess(max(x.latency for x in samples), 0.01)
+        return samples
+
+    def test_committed_sheets(self) -> None:
+        comp = SRComp(COMPSTATE_ROOT)
+        replay = DayReplay.load(COMPSTATE_ROOT)
+
+        with mock.patch.object(
+            Scorer,
+            'validate',
+            autospec=True,
+            side_effect=Scorer.validate,
+        ) as validate:
+            samples = self.run_replay(replay)
+
+        # Only by the converter
+        self.assertEqual(len(samples), validate.call_count)
+        self.assertFalse(any(x.synthesised for x in samples))
+        self.assertEqual(
+            list(comp.scores.league.positions.items()),
+            list(replay.table.positions.items()),
+        )
+        self.assertEqual(
+            [x.teams for x in comp.schedule.knockout_rounds[-1]],
+            [x.teams for x in replay.resolver.matches[-1:]],
+        )
+
+    def test_synthesised_sheets(self) -> None:
+        replay = DayReplay.load(COMPSTATE_ROOT, synthesise=True, seed=42)
+
+        samples = self.run_replay(replay)
+
+        self.assertTrue(all(x.synthesised for x in samples))
+        self.assertTrue(replay.seeding.league_complete)
+        for match in replay.resolver.matches:
+            self.assertNotIn(UNKNOWABLE_TEAM, match.teams, match.display_name)
+
+    def test_helpers(self) -> None:
+        start = datetime.datetime(2025, 4, 12, 10)
+        minutes = [0, 5, 10, 600, 605]
+        self.assertEqual(
+            [0, 300, 600, 900, 1200],
+            list(_time_compressor(
+                (start + datetime.timedelta(minutes=x) for x in reversed(minutes)),
+                datetime.timedelta(minutes=5),
+            ).values()),
+        )
+
+        self.assertEqual(
+            {'p50': 50.5, 'p95': 95.05, 'p99': 99.01, 'max': 100},
+            {k: round(v, 2) for k, v in percentiles(range(1, 101)).items()},
+        )
+        self.assertEqual(
+            {'p50': 3, 'p95': 3, 'p99': 3, 'max': 3},
+            percentiles([3]),
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+"""
+Tests for delay projection.
+"""
+
+from __future__ import annotations
+
+import datetime
+import pathlib
+import sys
+import unittest
+
+from sr.comp.match_period import MatchType
+from sr.comp.types import TLA
+
+# Path hackery
+ROOT = pathlib.Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+from delay_projection import (  # type: ignore[import-not-found]  # noqa: E402
+    find_rest_violations,
+    ProjectedMatch,
+    RestViolation,
+    shift_knockouts,
+)
+
+UTC = datetime.timezone.utc
+START = datetime.datetime(2025, 4, 13, 13, 0, tzinfo=UTC)
+SLOT = datetime.timedelta(minutes=5)
+
+
+def minutes(*values: int) -> list[datetime.timedelta]:
+    return [datetime.timedelta(minutes=x) for x in values]
+
+
+def build_match(num: int, start: int, teams: str) -> ProjectedMatch:
+    start_time = START + datetime.timedelta(minutes=start)
+    return ProjectedMatch(
+        num,
+        MatchType.knockout,
+        tuple(TLA(x * 3) for x in teams),
+        start_time,
+        start_time + SLOT,
+        START + datetime.timedelta(hours=1),
+    )
+
+
+class ShiftKnockoutsTests(unittest.TestCase):
+    # Two rounds with 2 minutes of slack within the first and a 10 minute
+    # gap before the second.
+    START_TIMES = [START + x for x in minutes(0, 7, 12, 27, 32)]
+    ROUND_STARTS = [True, False, False, True, False]
+
+    def shift(self, delay: int, *, squash_slack: bool) -> list[datetime.timedelta]:
+        return shift_knockouts(
+            self.START_TIMES,
+            self.ROUND_STARTS,
+            datetime.timedelta(minutes=delay),
+            slot_duration=SLOT,
+            squash_slack=squash_slack,
+        )
+
+    def test_plain_shift(self) -> None:
+        self.assertEqual(minutes(6, 6, 6, 6, 6), self.shift(6, squash_slack=False))
+
+    def test_squash_slack(self) -> None:
+        # 2 minutes absorbed within the round, then 5 minutes before the
+        # second round (keeping 5 minutes of round spacing)
+        self.assertEqual(minutes(8, 6, 6, 1, 1), self.shift(8, squash_slack=True))
+        self.assertEqual(minutes(6, 4, 4, 0, 0), self.shift(6, squash_slack=True))
+
+
+class RestViolationTests(unittest.TestCase):
+    def test_rest_violations(self) -> None:
+        matches = [
+            build_match(0, 0, 'AB'),
+            build_match(1, 5, 'CD'),
+            build_match(2, 10, 'AC'),
+            build_match(3, 20, 'BD'),
+        ]
+        self.assertEqual(
+            [
+                RestViolation(TLA('AAA'), 0, 2, datetime.timedelta(minutes=5)),
+                RestViolation(TLA('CCC'), 1, 2, datetime.timedelta(0)),
+            ],
+            find_rest_violations(matches, datetime.timedelta(minutes=6)),
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
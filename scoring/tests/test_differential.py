@@ -0,0 +1,95 @@
+"""
+Tests for the differential scoring harness.
+"""
+
+from __future__ import annotations
+
+import concurrent.futures
+import pathlib
+import sys
+import unittest
+from typing import Any
+
+# Path hackery
+ROOT = pathlib.Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+from differential import (  # type: ignore[import-not-found]  # noqa: E402
+    agrees,
+    check_sheet,
+    generated_sheet,
+    outcome,
+    reference,
+    run,
+    shrink,
+)
+from sr2025 import DISTRICTS  # type: ignore[import-not-found]  # noqa: E402
+
+
+def ignores_movement(sheet: dict[str, Any]) -> dict[str, int]:
+    scores = reference(sheet)
+    for tla, info in sheet['teams'].items():
+        if info.get('left_starting_zone'):
+            scores[tla] -= 1
+    return scores
+
+
+class DifferentialTests(unittest.TestCase):
+    def test_reference_agrees_with_itself(self) -> None:
+        with concurrent.futures.ThreadPoolExecutor(2) as executor:
+            checked, found, mismatches = run(
+                'differential:reference',
+                executor,
+                count=500,
+                shard_size=200,
+            )
+        self.assertGreater(checked, 500)
+        self.assertEqual(0, found)
+        self.assertEqual([], mismatches)
+
+    def test_sheets_agrees(self) -> None:
+        with concurrent.futures.ThreadPoolExecutor(2) as executor:
+            _, found, mismatches = run('sheets', executor, count=5000, shard_size=2500)
+        self.assertEqual([], mismatches)
+        self.assertEqual(0, found)
+
+    def test_outcomes(self) -> None:
+        self.assertEqual(generated_sheet(3, 14), generated_sheet(3, 14))
+        self.assertNotEqual(generated_sheet(3, 14), generated_sheet(3, 15))
+
+        outcomes = {
+            outcome(reference, generated_sheet(0, x))[0]
+            for x in range(200)
+        }
+        self.assertEqual({'scores', 'invalid', 'crash'}, outcomes)
+
+        self.assertTrue(agrees(('invalid', 'invalid_pallets'), ('invalid', 'invalid_pallets')))
+        self.assertFalse(agrees(('invalid', 'invalid_pallets'), ('invalid', 'other')))
+        self.assertFalse(agrees(('scores', {'AAA': 1}), ('scores', {'AAA': 2})))
+        # Sheets which crash the reference may be rejected in any way
+        self.assertTrue(agrees(('crash', 'KeyError'), ('invalid', 'invalid_structure')))
+        self.assertTrue(agrees(('crash', 'KeyError'), ('crash', 'TypeError')))
+        self.assertFalse(agrees(('crash', 'KeyError'), ('scores', {})))
+
+    def test_shrink(self) -> None:
+        mismatch = None
+        for index in range(100):
+            mismatch = check_sheet(ignores_movement, str(index), generated_sheet(0, index))
+            if mismatch is not None and len(mismatch.sheet['teams']) > 1:
+                break
+        assert mismatch is not None
+
+        shrunk = shrink(ignores_movement, mismatch)
+
+        self.assertEqual(mismatch.source, shrunk.source)
+        (info,) = shrunk.sheet['teams'].values()
+        self.assertEqual({'zone', 'left_starting_zone'}, info.keys())
+        districts = shrunk.sheet['arena_zones']['other']['districts']
+        # Removing any district would make the sheet invalid for both
+        self.assertEqual(DISTRICTS, districts.keys())
+        for district in districts.values():
+            self.assertEqual({'highest': '', 'pallets': {}}, district)
+
+
+if __name__ == '__main__':
+    unittest.main()
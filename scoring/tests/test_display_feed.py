@@ -0,0 +1,174 @@
+"""
+Tests for the push feed of changes to the derived competition state.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import pathlib
+import sys
+import unittest
+from typing import Any
+
+# Path hackery
+ROOT = pathlib.Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+from display_feed import (  # type: ignore[import-not-found]  # noqa: E402
+    feed_state,
+    FeedMirror,
+    FeedPublisher,
+)
+
+
+def make_results(**start_times: str) -> dict[str, Any]:
+    return {
+        'standings': [
+            {'tla': 'ABC', 'position': 1, 'league_points': 12, 'game_points': 20},
+            {'tla': 'DEF', 'position': 2, 'league_points': 8, 'game_points': 14},
+        ],
+        'timeline': [
+            {'arena': 'main', 'num': num, 'start_time': start_time}
+            for num, start_time in enumerate(start_times.values())
+        ],
+    }
+
+
+class FeedPublisherTests(unittest.TestCase):
+    def test_deltas(self) -> None:
+        publisher = FeedPublisher(feed_id='feed')
+        results = make_results(a='10:00', b='10:05', c='10:10')
+        first = publisher.publish(feed_state(results))
+        assert first is not None
+        self.assertEqual(1, first['seq'])
+        self.assertEqual({'standings', 'matches'}, first['set'].keys())
+        self.assertIsNone(publisher.publish(feed_state(results)))
+
+        # A delay moves the later matches, and a match is removed
+        results = make_results(a='10:00', b='10:08')
+        results['standings'][1] = {**results['standings'][1], 'league_points': 9}
+        self.assertEqual(
+            {
+                'type': 'delta',
+                'feed': 'feed',
+                'seq': 2,
+                'set': {
+                    'standings': {'DEF': results['standings'][1]},
+                    'matches': {'main:1': results['timeline'][1]},
+                },
+                'remove': {'matches': ['main:2']},
+            },
+            publisher.publish(feed_state(results)),
+        )
+
+        # Sections which weren't built are left alone
+        del results['timeline']
+        self.assertIsNone(publisher.publish(feed_state(results)))
+        self.assertEqual(2, len(publisher.state['matches']))
+
+    def test_subscribe(self) -> None:
+        publisher = FeedPublisher(history=2, feed_id='feed')
+        publisher.publish(feed_state(make_results(a='10:00')))
+        publisher.publish(feed_state(make_results(a='10:01')))
+        publisher.publish(feed_state(make_results(a='10:02')))
+        publisher.publish(feed_state(make_results(a='10:03')))
+
+        def seqs(feed_id: str | None, seq: int | None) -> list[tuple[str, int]]:
+            catch_up, _ = publisher.subscribe(feed_id, seq)
+            return [(x['type'], x['seq']) for x in map(json.loads, catch_up)]
+
+        self.assertEqual([('snapshot', 4)], seqs(None, None))
+        self.assertEqual([('delta', 3), ('delta', 4)], seqs('feed', 2))
+        self.assertEqual([], seqs('feed', 4))
+        # Too long ago, from before a restart, or from the future
+        self.assertEqual([('snapshot', 4)], seqs('feed', 1))
+        self.assertEqual([('snapshot', 4)], seqs('other', 3))
+        self.assertEqual([('snapshot', 4)], seqs('feed', 5))
+
+    def test_mirror(self) -> None:
+        publisher = FeedPublisher(feed_id='feed')
+        publisher.publish(feed_state(make_results(a='10:00', b='10:05')))
+        catch_up, queue = publisher.subscribe()
+        publisher.publish(feed_state(make_results(a='10:00')))
+        publisher.publish(feed_state(make_results(a='10:01', b='10:06')))
+
+        mirror = FeedMirror()
+        for line in catch_up:
+            self.assertTrue(mirror.apply(json.loads(line)))
+        self.assertTrue(mirror.apply(json.loads(queue.get_nowait())))
+        latest = json.loads(queue.get_nowait())
+        self.assertTrue(mirror.apply(latest))
+        self.assertEqual(publisher.state, mirror.state)
+        self.assertEqual({'op': 'subscribe', 'feed': 'feed', 'seq': 3}, mirror.subscription())
+
+        # A repeated or missed delta isn't applied
+        self.assertFalse(mirror.apply(latest))
+        self.assertFalse(mirror.apply({**latest, 'seq': 5}))
+        self.assertEqual(publisher.state, mirror.state)
+
+    def test_slow_subscriber_dropped(self) -> None:
+        publisher = FeedPublisher(backlog=2)
+        _, queue = publisher.subscribe()
+        for minute in range(4):
+            publisher.publish(feed_state(make_results(a=f'10:0{minute}')))
+
+        self.assertEqual(0, publisher.subscribers)
+        self.assertEqual(3, queue.qsize())
+        *_, last = (queue.get_nowait() for _ in range(3))
+        self.assertIsNone(last)
+
+
+class FeedConnectionTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        await super().asyncSetUp()
+        self.publisher = FeedPublisher(feed_id='feed')
+        self.publisher.publish(feed_state(make_results(a='10:00')))
+
+        server = await asyncio.start_server(
+            self.publisher.handle_connection,
+            '127.0.0.1',
+            0,
+        )
+        self.addAsyncCleanup(server.wait_closed)
+        self.addCleanup(server.close)
+        self.port = server.sockets[0].getsockname()[1]
+
+    async def subscribe(self, request: dict[str, Any]) -> asyncio.StreamReader:
+        reader, writer = await asyncio.open_connection('127.0.0.1', self.port)
+        self.addCleanup(writer.close)
+        writer.write(json.dumps(request).encode() + b'\n')
+        await writer.drain()
+        return reader
+
+    async def receive(self, reader: asyncio.StreamReader) -> dict[str, Any]:
+        return json.loads(await asyncio.wait_for(reader.readline(), 5))
+
+    async def test_follow(self) -> None:
+        mirror = FeedMirror()
+        reader = await self.subscribe(mirror.subscription())
+        self.assertTrue(mirror.apply(await self.receive(reader)))
+        self.assertEqual(1, mirror.seq)
+
+        self.publisher.publish(feed_state(make_results(a='10:05')))
+        message = await self.receive(reader)
+        self.assertEqual('delta', message['type'])
+        self.assertTrue(mirror.apply(message))
+
+        # Resuming after a dropped connection sends only what was missed
+        self.publisher.publish(feed_state(make_results(a='10:10')))
+        reader = await self.subscribe(mirror.subscription())
+        message = await self.receive(reader)
+        self.assertEqual(('delta', 3), (message['type'], message['seq']))
+        self.assertTrue(mirror.apply(message))
+        self.assertEqual(self.publisher.state, mirror.state)
+
+    async def test_bad_request(self) -> None:
+        reader = await self.subscribe({'op': 'load'})
+        message = await self.receive(reader)
+        self.assertEqual('bad_request', message['error'])
+        self.assertEqual(b'', await reader.readline())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,245 @@
+"""
+Tests for the local score-entry service.
+"""
+
+from __future__ import annotations
+
+import datetime
+import pathlib
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import yaml
+from sr.comp.match_period import Match, MatchType
+from sr.comp.raw_compstate import RawCompstate
+from sr.comp.scorer.converter import InputForm
+from sr.comp.types import ArenaName, MatchNumber, TLA
+
+# Path hackery
+ROOT = pathlib.Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+from converter import Converter  # type: ignore[import-not-found]  # noqa: E402
+from entry_service import (  # type: ignore[import-not-found]  # noqa: E402
+    ScoreEntryService,
+    ServiceError,
+)
+from journal import (  # type: ignore[import-not-found]  # noqa: E402
+    JournalWriter,
+    replay,
+)
+
+UTC = datetime.timezone.utc
+MATCH_ID = (ArenaName('main'), MatchNumber(3))
+
+
+def htmlify(form: dict[str, str | int | bool | None]) -> InputForm:
+    return InputForm({
+        k: str(v)
+        for k, v in form.items()
+        if v not in (False, None)
+    })
+
+
+class ScoreEntryServiceTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        await super().asyncSetUp()
+        match = Match(
+            MatchNumber(3),
+            "Match 3",
+            ArenaName('main'),
+            [TLA('TLA0'), TLA('TLA1'), TLA('TLA2'), TLA('TLA3')],
+            datetime.datetime(2025, 4, 12, 11, 0, tzinfo=UTC),
+            datetime.datetime(2025, 4, 12, 11, 5, tzinfo=UTC),
+            MatchType.league,
+            use_resolved_ranking=False,
+        )
+
+        tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tempdir.cleanup)
+        self.root = pathlib.Path(tempdir.name)
+        self.path = self.root / 'league' / 'main' / '003.yaml'
+
+        self.matches = {MATCH_ID: match}
+        self.service = ScoreEntryService(
+            RawCompstate(self.root, local_only=True),
+            self.matches,
+            Converter(),
+            coalesce_delay=60,
+            commit=False,
+        )
+
+    async def get_form(self) -> tuple[int, dict[str, str]]:
+        version, form = await self.service.load(MATCH_ID)
+        return version, dict(htmlify(form))
+
+    async def test_saves_are_coalesced(self) -> None:
+        version, form = await self.get_form()
+        self.assertEqual(0, version)
+
+        for count in range(1, 4):
+            form['district_central_pallets_G'] = str(count)
+            version = await self.service.save(MATCH_ID, InputForm(form), version=version)
+
+        self.assertEqual(3, version)
+        self.assertFalse(self.path.exists(), "Should not have written yet")
+
+        # Pending saves are visible to readers before being written
+        _, reloaded = await self.get_form()
+        self.assertEqual('3', reloaded['district_central_pallets_G'])
+
+        await self.service.flush()
+
+        self.assertEqual(3, self.service.saves)
+        self.assertEqual(1, self.service.writes)
+        with self.path.open() as f:
+            sheet = yaml.safe_load(f)
+        districts = sheet['arena_zones']['other']['districts']
+        self.assertEqual(3, districts['central']['pallets']['G'])
+
+    async def test_failed_write_kept(self) -> None:
+        version, form = await self.get_form()
+        form['district_central_pallets_G'] = '2'
+        await self.service.save(MATCH_ID, InputForm(form), version=version)
+
+        with mock.patch.object(
+            RawCompstate,
+            'save_score',
+            side_effect=OSError("Disk full"),
+        ), self.assertRaises(OSError):
+            await self.service.flush()
+
+        self.assertEqual(0, self.service.writes)
+        self.assertEqual(1, self.service.failures)
+        self.assertFalse(self.path.exists())
+        _, reloaded = await self.get_form()
+        self.assertEqual('2', reloaded['district_central_pallets_G'])
+
+        # Written once it can be
+        await self.service.flush()
+        self.assertEqual(1, self.service.writes)
+        with self.path.open() as f:
+            sheet = yaml.safe_load(f)
+        districts = sheet['arena_zones']['other']['districts']
+        self.assertEqual(2, districts['central']['pallets']['G'])
+
+    async def test_failed_commit_retried(self) -> None:
+        self.service = ScoreEntryService(
+            RawCompstate(self.root, local_only=True),
+            self.matches,
+            Converter(),
+            coalesce_delay=60,
+        )
+
+        version, form = await self.get_form()
+        form['district_central_pallets_G'] = '2'
+        await self.service.save(MATCH_ID, InputForm(form), version=version)
+
+        with mock.patch.object(RawCompstate, 'stage'), mock.patch.object(
+            RawCompstate,
+            'commit',
+            side_effect=subprocess.CalledProcessError(1, 'git'),
+        ):
+            with self.assertRaises(subprocess.CalledProcessError):
+                await self.service.flush()
+
+            self.assertEqual(1, self.service.writes)
+            self.assertEqual(0, self.service.commits)
+            self.assertEqual(1, self.service.failures)
+            self.assertTrue(self.path.exists())
+
+        with mock.patch.object(RawCompstate, 'stage') as stage, mock.patch.object(
+            RawCompstate,
+            'commit',
+        ) as commit:
+            # Committed once it can be, without writing the file again
+            await self.service.flush()
+            await self.service.flush()
+
+        self.assertEqual(1, self.service.writes)
+        self.assertEqual(1, self.service.commits)
+        stage.assert_called_once_with(str(self.path))
+        commit.assert_called_once()
+
+    async def test_journal(self) -> None:
+        journal = JournalWriter(self.root / 'scores.journal')
+        self.addCleanup(journal.close)
+        self.service = ScoreEntryService(
+            RawCompstate(self.root, local_only=True),
+            self.matches,
+            Converter(),
+            coalesce_delay=60,
+            commit=False,
+            journal=journal,
+        )
+
+        version, form = await self.get_form()
+        form['district_central_pallets_G'] = '2'
+        await self.service.save(MATCH_ID, InputForm(form), version=version)
+        self.assertEqual({}, replay(self.root / 'scores.journal'))
+
+        # Only what's written is recorded
+        with mock.patch.object(
+            RawCompstate,
+            'save_score',
+            side_effect=OSError("Disk full"),
+        ), self.assertRaises(OSError):
+            await self.service.flush()
+        self.assertEqual({}, replay(self.root / 'scores.journal'))
+
+        await self.service.flush()
+        with self.path.open() as f:
+            sheet = yaml.safe_load(f)
+        self.assertEqual({MATCH_ID: sheet}, replay(self.root / 'scores.journal'))
+
+    async def test_stale_version(self) -> None:
+        version, form = await self.get_form()
+        await self.service.save(MATCH_ID, InputForm(form), version=version)
+
+        with self.assertRaises(ServiceError) as cm:
+            await self.service.save(MATCH_ID, InputForm(form), version=version)
+
+        self.assertEqual('conflict', cm.exception.code)
+        self.assertEqual({'version': 1}, cm.exception.extra)
+
+    async def test_invalid_sheet(self) -> None:
+        version, form = await self.get_form()
+        form['district_central_pallets_G'] = '7'
+
+        with self.assertRaises(ServiceError) as cm:
+            await self.service.save(MATCH_ID, InputForm(form), version=version)
+
+        self.assertEqual('too_many_pallets', cm.exception.code)
+        self.assertEqual(['district_central_pallets_G'], list(cm.exception.extra['fields']))
+        self.assertEqual(0, self.service.saves)
+
+    async def test_request_protocol(self) -> None:
+        response = await self.service.handle_request({
+            'op': 'load',
+            'arena': 'main',
+            'match': 99,
+        })
+        self.assertEqual(
+            {
+                'ok': False,
+                'error': 'unknown_match',
+                'message': "No such match 99 in arena main",
+            },
+            response,
+        )
+
+        response = await self.service.handle_request({
+            'op': 'load',
+            'arena': 'main',
+            'match': 3,
+        })
+        self.assertTrue(response['ok'])
+        self.assertEqual(0, response['version'])
+        self.assertEqual('TLA0', response['form']['tla_0'])
+
+
+if __name__ == '__main__':
+    unittest.main()
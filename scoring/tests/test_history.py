@@ -0,0 +1,178 @@
+"""
+Tests for replaying standings through the compstate's git history.
+"""
+
+from __future__ import annotations
+
+import datetime
+import os
+import pathlib
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import yaml
+
+# Path hackery
+ROOT = pathlib.Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+from history import (  # type: ignore[import-not-found]  # noqa: E402
+    GitObjectReader,
+    iter_standings,
+    standings_at,
+)
+from sheets import (  # type: ignore[import-not-found]  # noqa: E402
+    COMPSTATE_ROOT,
+)
+from standings import (  # type: ignore[import-not-found]  # noqa: E402
+    LeagueTable,
+)
+
+START = datetime.datetime(2025, 4, 12, 10, tzinfo=datetime.timezone.utc)
+
+
+class HistoryTests(unittest.TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tempdir.cleanup)
+        self.root = pathlib.Path(tempdir.name) / 'compstate'
+        subprocess.run(
+            ['git', 'clone', '--quiet', str(COMPSTATE_ROOT), str(self.root)],
+            check=True,
+        )
+        self.commits = 0
+
+    def commit(self, message: str) -> str:
+        self.commits += 1
+        when = START + datetime.timedelta(minutes=self.commits)
+        subprocess.run(['git', 'add', '--all'], cwd=self.root, check=True)
+        subprocess.run(
+            [
+                'git',
+                '-c', 'user.name=Test',
+                '-c', 'user.email=test@example.com',
+                'commit', '--quiet', '--message', message,
+            ],
+            cwd=self.root,
+            env={**os.environ, 'GIT_COMMITTER_DATE': when.isoformat()},
+            check=True,
+        )
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'],
+            cwd=self.root,
+            text=True,
+        ).strip()
+
+    def edit_sheet(self, name: str, colour: str, highest: str) -> None:
+        sheet = self.root / 'league' / 'main' / name
+        data = yaml.safe_load(sheet.read_text())
+        central = data['arena_zones']['other']['districts']['central']
+        central['pallets'][colour] += 1
+        central['highest'] = highest
+        sheet.write_text(yaml.safe_dump(data))
+
+    def test_matches_checkouts(self) -> None:
+        sheets_dir = pathlib.Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, sheets_dir)
+        league = self.root / 'league'
+        shutil.move(league / 'main', sheets_dir / 'main')
+        (league / 'main').mkdir()
+        commits = [self.commit("Remove the league sheets")]
+
+        sheets = sorted((sheets_dir / 'main').iterdir())
+        for start in range(0, len(sheets), 20):
+            for path in sheets[start:start + 20]:
+                shutil.copy(path, league / 'main' / path.name)
+            commits.append(self.commit(f"Add sheets from {start}"))
+
+        # A correction
+        self.edit_sheet('003.yaml', 'G', 'G')
+        # A removal
+        (league / 'main' / '005.yaml').unlink()
+        commits.append(self.commit("Correct some sheets"))
+
+        # A new team
+        teams_yaml = self.root / 'teams.yaml'
+        teams = yaml.safe_load(teams_yaml.read_text())
+        teams['teams']['NEW'] = {'name': "New team"}
+        teams_yaml.write_text(yaml.safe_dump(teams))
+        commits.append(self.commit("Add a team"))
+
+        history = list(iter_standings(self.root))
+
+        # The baseline commit has the full league
+        self.assertEqual(len(commits) + 1, len(history))
+        self.assertEqual(commits, [x.commit for x in history[1:]])
+
+        for standings in history:
+            subprocess.run(
+                ['git', 'checkout', '--quiet', standings.commit],
+                cwd=self.root,
+                check=True,
+            )
+            expected = LeagueTable.load(self.root)
+            self.assertEqual(
+                list(expected.positions.items()),
+                list(standings.positions.items()),
+                standings.subject,
+            )
+            self.assertEqual(
+                {
+                    tla: (x.league_points, x.game_points)
+                    for tla in expected.teams
+                    for x in [expected.totals(tla)]
+                },
+                {
+                    tla: (x.league_points, x.game_points)
+                    for tla, x in standings.totals.items()
+                },
+            )
+            self.assertEqual({}, standings.problems)
+
+        self.assertIn('NEW', history[-1].positions)
+
+        self.assertIsNone(standings_at(history[1:], START))
+        self.assertEqual(
+            commits[1],
+            standings_at(history, START + datetime.timedelta(minutes=2, seconds=30)).commit,
+        )
+
+    def test_problems(self) -> None:
+        self.edit_sheet('003.yaml', 'G', 'X')
+        self.commit("Break a sheet")
+        league = self.root / 'league' / 'main'
+        shutil.copy(league / '000.yaml', league / '100.yaml')
+        self.commit("Duplicate a sheet")
+
+        *_, broken, duplicate = iter_standings(self.root)
+
+        self.assertEqual(['league/main/003.yaml'], list(broken.problems))
+        self.assertIn('Invalid pallets', broken.problems['league/main/003.yaml'])
+        self.assertEqual(
+            {
+                'league/main/003.yaml': broken.problems['league/main/003.yaml'],
+                'league/main/100.yaml': "Duplicate of league/main/000.yaml",
+            },
+            duplicate.problems,
+        )
+
+    def test_object_reader(self) -> None:
+        blob = subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD:teams.yaml'],
+            cwd=self.root,
+            text=True,
+        ).strip()
+        with GitObjectReader(self.root) as reader:
+            self.assertEqual((self.root / 'teams.yaml').read_bytes(), reader.read(blob))
+            with self.assertRaises(KeyError):
+                reader.read('0' * 40)
+            # The stream is still usable after a missing object
+            self.assertEqual((self.root / 'teams.yaml').read_bytes(), reader.read(blob))
+
+
+if __name__ == '__main__':
+    unittest.main()
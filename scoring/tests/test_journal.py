@@ -0,0 +1,240 @@
+"""
+Tests for the score journal.
+"""
+
+from __future__ import annotations
+
+import copy
+import os
+import pathlib
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import yaml
+
+# Path hackery
+ROOT = pathlib.Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+from journal import (  # type: ignore[import-not-found]  # noqa: E402
+    apply_delta,
+    CorruptJournalException,
+    EventKind,
+    FILE_HEADER,
+    install_hook,
+    iter_events,
+    JournalWriter,
+    record_commit,
+    replay,
+    replay_scores,
+    sheet_delta,
+)
+
+
+class JournalTests(unittest.TestCase):
+    maxDiff = None
+
+    def setUp(self) -> None:
+        super().setUp()
+        with (ROOT / 'template.yaml').open() as f:
+            self.sheet = yaml.safe_load(f)
+        self.sheet['arena_id'] = 'main'
+
+        tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tempdir.cleanup)
+        self.path = pathlib.Path(tempdir.name) / 'scores.journal'
+
+    def modified_sheet(self, colour: str, count: int) -> dict:
+        sheet = copy.deepcopy(self.sheet)
+        sheet['arena_zones']['other']['districts']['central']['pallets'][colour] = count
+        return sheet
+
+    def test_delta_round_trip(self) -> None:
+        new = self.modified_sheet('G', 2)
+        del new['teams']['TLA3']
+        new['teams']['TLA0']['left_starting_zone'] = True
+
+        delta = sheet_delta(self.sheet, new)
+
+        self.assertEqual(
+            [
+                (('arena_zones', 'other', 'districts', 'central', 'pallets', 'G'), 2),
+                (('teams', 'TLA0', 'left_starting_zone'), True),
+            ],
+            sorted(delta['set']),
+        )
+        self.assertEqual([('teams', 'TLA3')], delta['unset'])
+        self.assertEqual(new, apply_delta(self.sheet, delta))
+
+    def test_full_then_delta(self) -> None:
+        with JournalWriter(self.path) as journal:
+            first = journal.record(self.sheet, timestamp=1)
+            second = journal.record(self.modified_sheet('G', 1), timestamp=2)
+            unchanged = journal.record(self.modified_sheet('G', 1), timestamp=3)
+
+        assert first is not None
+        assert second is not None
+        self.assertEqual(EventKind.FULL, first.kind)
+        self.assertEqual(EventKind.DELTA, second.kind)
+        self.assertIsNone(unchanged, "Unchanged sheets should not be recorded")
+        self.assertEqual([0, 1], [x.sequence for x in iter_events(self.path)])
+
+    def test_replay(self) -> None:
+        with JournalWriter(self.path) as journal:
+            journal.record(self.sheet, timestamp=1)
+            journal.record(self.modified_sheet('G', 1), timestamp=2)
+
+        # Re-open to check that the writer resumes from the existing state
+        with JournalWriter(self.path) as journal:
+            event = journal.record(self.modified_sheet('G', 2), timestamp=3)
+            assert event is not None
+            self.assertEqual(EventKind.DELTA, event.kind)
+
+        key = ('main', 0)
+        self.assertEqual({key: self.modified_sheet('G', 2)}, replay(self.path))
+        self.assertEqual(
+            {key: self.modified_sheet('G', 1)},
+            replay(self.path, until_timestamp=2.5),
+        )
+        self.assertEqual({key: self.sheet}, replay(self.path, until_sequence=0))
+
+        self.assertEqual(
+            {key: {'TLA0': 6, 'TLA1': 0, 'TLA2': 0, 'TLA3': 0}},
+            replay_scores(self.path),
+        )
+
+    def test_replay_clock_went_backwards(self) -> None:
+        with JournalWriter(self.path) as journal:
+            journal.record(self.sheet, timestamp=1)
+            journal.record(self.modified_sheet('G', 1), timestamp=5)
+            journal.record(self.modified_sheet('G', 2), timestamp=3)
+
+        # The last save is included despite following a later one, and is
+        # complete despite being a delta against it
+        self.assertEqual(
+            {('main', 0): self.modified_sheet('G', 2)},
+            replay(self.path, until_timestamp=4),
+        )
+        self.assertEqual(
+            {('main', 0): self.sheet},
+            replay(self.path, until_timestamp=2),
+        )
+
+    def test_concurrent_writers(self) -> None:
+        with JournalWriter(self.path) as first, JournalWriter(self.path) as second:
+            first.record(self.sheet, timestamp=1)
+            event = second.record(self.modified_sheet('G', 1), timestamp=2)
+            assert event is not None
+            self.assertEqual((1, EventKind.DELTA), (event.sequence, event.kind))
+
+            self.assertIsNone(first.record(self.modified_sheet('G', 1), timestamp=3))
+
+        self.assertEqual(
+            {('main', 0): self.modified_sheet('G', 1)},
+            replay(self.path),
+        )
+
+    def test_torn_final_frame(self) -> None:
+        with JournalWriter(self.path) as journal:
+            journal.record(self.sheet, timestamp=1)
+            journal.record(self.modified_sheet('G', 1), timestamp=2)
+
+        data = self.path.read_bytes()
+        self.path.write_bytes(data[:-3])
+
+        self.assertEqual(1, len(list(iter_events(self.path))))
+
+        with JournalWriter(self.path) as journal:
+            event = journal.record(self.modified_sheet('G', 3), timestamp=3)
+            assert event is not None
+            self.assertEqual(1, event.sequence)
+
+        self.assertEqual(
+            {('main', 0): self.modified_sheet('G', 3)},
+            replay(self.path),
+        )
+
+    def test_checksum_mismatch(self) -> None:
+        with JournalWriter(self.path) as journal:
+            journal.record(self.sheet, timestamp=1)
+
+        data = bytearray(self.path.read_bytes())
+        data[-2] ^= 0xff
+        self.path.write_bytes(bytes(data))
+
+        with self.assertRaises(CorruptJournalException) as cm:
+            list(iter_events(self.path))
+
+        self.assertEqual(len(FILE_HEADER), cm.exception.offset)
+
+
+class CommitJournalTests(unittest.TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        with (ROOT / 'template.yaml').open() as f:
+            self.sheet = yaml.safe_load(f)
+        self.sheet['arena_id'] = 'main'
+
+        tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tempdir.cleanup)
+        self.root = pathlib.Path(tempdir.name) / 'compstate'
+        self.path = pathlib.Path(tempdir.name) / 'scores.journal'
+
+        self.git('init', '--quiet', str(self.root), cwd=tempdir.name)
+        (self.root / 'README').write_text("Not a sheet\n")
+
+    def git(self, *args: str, cwd: str | pathlib.Path | None = None) -> None:
+        env = dict(
+            os.environ,
+            GIT_AUTHOR_NAME='Test',
+            GIT_AUTHOR_EMAIL='test@example.com',
+            GIT_COMMITTER_NAME='Test',
+            GIT_COMMITTER_EMAIL='test@example.com',
+            GIT_COMMITTER_DATE='1700000000 +0000',
+        )
+        subprocess.check_call(['git', *args], cwd=cwd or self.root, env=env)
+
+    def commit_sheet(self, sheet: dict) -> None:
+        path = self.root / 'league' / 'main' / '000.yaml'
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open(mode='w') as f:
+            yaml.dump(sheet, f)
+        self.git('add', '--all')
+        self.git('commit', '--quiet', '--message', "Update scores")
+
+    def test_record_commit(self) -> None:
+        self.commit_sheet(self.sheet)
+
+        with JournalWriter(self.path) as journal:
+            events = record_commit(journal, self.root)
+            self.assertEqual([EventKind.FULL], [x.kind for x in events])
+            self.assertEqual(1700000000, events[0].timestamp)
+
+            # Recording the same commit again changes nothing
+            self.assertEqual([], record_commit(journal, self.root))
+
+        self.assertEqual({('main', 0): self.sheet}, replay(self.path))
+
+    def test_hook(self) -> None:
+        install_hook(self.root, self.path)
+
+        self.commit_sheet(self.sheet)
+        self.assertEqual({('main', 0): self.sheet}, replay(self.path))
+
+        modified = copy.deepcopy(self.sheet)
+        modified['arena_zones']['other']['districts']['central']['pallets']['G'] = 3
+        self.commit_sheet(modified)
+        self.assertEqual({('main', 0): modified}, replay(self.path))
+
+        # Re-installing our own hook is fine, but others aren't overwritten
+        install_hook(self.root, self.path)
+        hook = self.root / '.git' / 'hooks' / 'post-commit'
+        hook.write_text("#!/bin/sh\n")
+        with self.assertRaises(FileExistsError):
+            install_hook(self.root, self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
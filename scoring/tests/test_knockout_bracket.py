@@ -0,0 +1,137 @@
+"""
+Tests for generating double elimination knockout brackets.
+"""
+
+from __future__ import annotations
+
+import collections
+import datetime
+import pathlib
+import shutil
+import sys
+import tempfile
+import unittest
+
+from sr.comp.cli import yaml_round_trip
+from sr.comp.knockout_scheduler.static_scheduler import parse_team_ref
+
+# Path hackery
+ROOT = pathlib.Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+from knockout_bracket import (  # type: ignore[import-not-found]  # noqa: E402
+    BracketShape,
+    build,
+    scheduled_rest,
+    search,
+    shortest_rest,
+    to_config,
+)
+from knockout_progress import (  # type: ignore[import-not-found]  # noqa: E402
+    load_team_refs,
+)
+from sheets import (  # type: ignore[import-not-found]  # noqa: E402
+    COMPSTATE_ROOT,
+)
+
+SHAPE = BracketShape(4)
+SLOT = 300
+
+
+class KnockoutBracketTests(unittest.TestCase):
+    def test_matches_hand_built_bracket(self) -> None:
+        # The bracket in the schedule was built by hand for 28 teams
+        layout = search(SHAPE, 28, slot=SLOT, spacing=0)
+        self.assertEqual((4, 2, 4, 2, 1), layout.upper)
+        self.assertEqual((16, 0, 12, 0, 0), layout.entering)
+        self.assertEqual(26, layout.matches)
+        self.assertEqual(0, layout.empty_corners)
+
+    def test_brackets_are_complete(self) -> None:
+        for num_teams in range(5, 70):
+            with self.subTest(num_teams=num_teams):
+                layout = search(SHAPE, num_teams, slot=SLOT, spacing=0)
+                rounds = build(SHAPE, layout, num_teams)
+                self.assertEqual(layout.matches, sum(len(x.matches) for x in rounds))
+                self.assertEqual('Grand Final', rounds[-1].name)
+
+                refs: collections.Counter[str] = collections.Counter()
+                for round_num, round_ in enumerate(rounds):
+                    for match in round_.matches:
+                        self.assertEqual(4, len(match))
+                        teams = [x for x in match if x is not None]
+                        self.assertGreaterEqual(len(teams), 3, match)
+                        refs.update(teams)
+                        for ref in teams:
+                            if not ref.startswith('S'):
+                                self.assertLess(parse_team_ref(ref)[0], round_num)
+
+                self.assertEqual([1], list(set(refs.values())), "Teams used twice")
+                self.assertEqual(
+                    {f'S{x}' for x in range(1, num_teams + 1)},
+                    {x for x in refs if x.startswith('S')},
+                )
+
+    def test_min_rest(self) -> None:
+        for num_teams in range(5, 70):
+            with self.subTest(num_teams=num_teams):
+                layout = search(SHAPE, num_teams, slot=SLOT, spacing=0, min_rest=420)
+                rounds = build(SHAPE, layout, num_teams)
+                self.assertGreaterEqual(
+                    shortest_rest(rounds, slot=SLOT, spacing=0, min_rest=420),
+                    420,
+                )
+                self.assertGreaterEqual(
+                    layout.duration,
+                    search(SHAPE, num_teams, slot=SLOT, spacing=0).duration,
+                )
+
+    def test_scheduled_rest(self) -> None:
+        schedule = yaml_round_trip.load(COMPSTATE_ROOT / 'schedule.yaml')
+        # The hand-built bracket gives at least 7 minutes between matches
+        self.assertEqual(420, scheduled_rest(schedule['static_knockout'], slot=SLOT))
+
+    def test_too_few_teams(self) -> None:
+        with self.assertRaises(ValueError):
+            search(SHAPE, 3, slot=SLOT, spacing=0)
+
+    def test_written_schedule(self) -> None:
+        with tempfile.TemporaryDirectory() as tempdir:
+            root = pathlib.Path(tempdir)
+            shutil.copy(COMPSTATE_ROOT / 'schedule.yaml', root)
+
+            layout = search(SHAPE, 25, slot=SLOT, spacing=60, min_rest=420)
+            rounds = build(SHAPE, layout, 25)
+            with yaml_round_trip.edit(root / 'schedule.yaml') as schedule:
+                start = schedule['match_periods']['knockout'][0]['start_time']
+                schedule['static_knockout'] = to_config(
+                    SHAPE,
+                    rounds,
+                    arena='main',
+                    start=start,
+                    slot=SLOT,
+                    spacing=60,
+                    min_rest=420,
+                )
+
+            self.assertEqual(
+                {
+                    (round_num, match_num): list(refs)
+                    for round_num, round_ in enumerate(rounds)
+                    for match_num, refs in enumerate(round_.matches)
+                },
+                load_team_refs(root),
+            )
+
+            config = yaml_round_trip.load(root / 'schedule.yaml')['static_knockout']
+            final = config['matches'][len(rounds) - 1][0]
+            self.assertEqual("Grand Final", final['display_name'])
+            self.assertEqual(
+                start + datetime.timedelta(seconds=layout.duration - SLOT),
+                final['start_time'],
+            )
+            self.assertEqual(start, config['matches'][0][0]['start_time'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+"""
+Tests for live knockout resolution.
+"""
+
+from __future__ import annotations
+
+import copy
+import datetime
+import pathlib
+import sys
+import unittest
+from typing import Any
+
+import yaml
+from sr.comp.match_period import KnockoutMatch, MatchType
+from sr.comp.types import ArenaName, MatchNumber, TLA
+
+# Path hackery
+ROOT = pathlib.Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+from converter import Converter  # type: ignore[import-not-found]  # noqa: E402
+from knockout_progress import (  # type: ignore[import-not-found]  # noqa: E402
+    KnockoutResolver,
+)
+from sr2025 import ZONE_COLOURS  # type: ignore[import-not-found]  # noqa: E402
+
+UTC = datetime.timezone.utc
+
+SEEDS = [TLA(x * 3) for x in 'ABCDEFGH']
+
+
+def build_match(num: int, *, final: bool = False) -> KnockoutMatch:
+    start = datetime.datetime(2025, 4, 13, 12, num * 5, tzinfo=UTC)
+    return KnockoutMatch(
+        MatchNumber(num),
+        f"Match {num}",
+        ArenaName('main'),
+        [],
+        start,
+        start + datetime.timedelta(minutes=5),
+        MatchType.knockout,
+        use_resolved_ranking=not final,
+        knockout_bracket='default',
+    )
+
+
+class KnockoutResolverTests(unittest.TestCase):
+    maxDiff = None
+
+    def setUp(self) -> None:
+        super().setUp()
+        with (ROOT / 'template.yaml').open() as f:
+            self.template = yaml.safe_load(f)
+
+        self.resolver = KnockoutResolver(
+            [[build_match(0), build_match(1)], [build_match(2, final=True)]],
+            {
+                (0, 0): ['S1', 'S4', 'S5', 'S8'],
+                (0, 1): ['S2', 'S3', 'S6', 'S7'],
+                (1, 0): ['000', 'R0M1P0', '001', None],
+            },
+            SEEDS,
+            {tla: position for position, tla in enumerate(SEEDS, start=1)},
+        )
+
+    def build_sheet(self, num: int, scores: dict[str, int]) -> dict[str, Any]:
+        """
+        Build a sheet for a match where each team scores the given points, from
+        pallets of their colour in an outer district.
+        """
+        sheet = copy.deepcopy(self.template)
+        sheet['match_number'] = num
+        sheet['teams'] = {
+            tla: {
+                'zone': zone,
+                'present': True,
+                'disqualified': False,
+                'left_starting_zone': False,
+            }
+            for zone, tla in enumerate(scores)
+        }
+        pallets = sheet['arena_zones']['other']['districts']['outer_nw']['pallets']
+        for colour, score in zip(ZONE_COLOURS, scores.values()):
+            pallets[colour] = score
+        return sheet
+
+    def test_unresolved(self) -> None:
+        self.assertEqual(['AAA', 'DDD', 'EEE', 'HHH'], self.resolver.match(0).teams)
+        self.assertEqual(['???', '???', '???', None], self.resolver.match(2).teams)
+
+    def test_result_fills_later_match(self) -> None:
+        progression = self.resolver.add_sheet(
+            self.build_sheet(0, {'AAA': 1, 'DDD': 3, 'EEE': 2, 'HHH': 0}),
+        )
+
+        final = self.resolver.match(2)
+        self.assertEqual([final], progression.changed)
+        self.assertEqual([], progression.stale)
+        self.assertEqual(['DDD', '???', 'EEE', None], final.teams)
+
+        form = Converter().match_to_form(final)
+        self.assertEqual('DDD', form['tla_0'])
+        self.assertEqual('EEE', form['tla_2'])
+
+    def test_ties_broken_by_league_position(self) -> None:
+        self.resolver.add_sheet(
+            self.build_sheet(1, {'BBB': 1, 'CCC': 2, 'FFF': 2, 'GGG': 0}),
+        )
+        self.assertEqual(['???', 'CCC', '???', None], self.resolver.match(2).teams)
+
+    def test_correction(self) -> None:
+        self.resolver.add_sheet(
+            self.build_sheet(0, {'AAA': 1, 'DDD': 3, 'EEE': 2, 'HHH': 0}),
+        )
+        self.resolver.add_sheet(
+            self.build_sheet(1, {'BBB': 1, 'CCC': 2, 'FFF': 0, 'GGG': 0}),
+        )
+        self.resolver.add_sheet(
+            self.build_sheet(2, {'DDD': 1, 'CCC': 2, 'EEE': 0}),
+        )
+
+        # A correction which doesn't change the ranking changes nothing
+        progression = self.resolver.add_sheet(
+            self.build_sheet(0, {'AAA': 1, 'DDD': 4, 'EEE': 2, 'HHH': 0}),
+        )
+        self.assertEqual([], progression.changed)
+
+        progression = self.resolver.add_sheet(
+            self.build_sheet(0, {'AAA': 3, 'DDD': 4, 'EEE': 2, 'HHH': 0}),
+        )
+        final = self.resolver.match(2)
+        self.assertEqual(['DDD', 'CCC', 'AAA', None], final.teams)
+        self.assertEqual([final], progression.changed)
+        self.assertEqual([final], progression.stale)
+
+        self.resolver.remove_match(0)
+        self.assertEqual(['???', 'CCC', '???', None], self.resolver.match(2).teams)
+
+
+if __name__ == '__main__':
+    unittest.main()
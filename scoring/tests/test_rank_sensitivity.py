@@ -0,0 +1,153 @@
+"""
+Tests for what teams need from their remaining league matches.
+"""
+
+from __future__ import annotations
+
+import itertools
+import pathlib
+import sys
+import unittest
+
+# Path hackery
+ROOT = pathlib.Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+from rank_sensitivity import (  # type: ignore[import-not-found]  # noqa: E402
+    format_outlook,
+    position_points,
+    RankBounds,
+    RankSensitivity,
+    RemainingMatch,
+    TeamOutlook,
+)
+from sheets import (  # type: ignore[import-not-found]  # noqa: E402
+    COMPSTATE_ROOT,
+    find_sheets,
+    load_sheet,
+    match_id,
+)
+from standings import (  # type: ignore[import-not-found]  # noqa: E402
+    LeagueTable,
+)
+
+
+def withheld(count: int) -> tuple[RankSensitivity, list[dict]]:
+    """
+    The sensitivity of the league with its last few matches not yet played.
+    """
+    sheets = [load_sheet(path) for _, path in find_sheets(COMPSTATE_ROOT, ('league',))]
+    sheets.sort(key=match_id)
+    played, remaining = sheets[:-count], sheets[-count:]
+
+    table = LeagueTable.for_compstate(COMPSTATE_ROOT)
+    for sheet in played:
+        table.add_sheet(sheet)
+
+    matches = []
+    for sheet in remaining:
+        key = match_id(sheet)
+        teams = tuple(sorted(sheet['teams'], key=lambda x: sheet['teams'][x]['zone']))
+        matches.append(RemainingMatch(key, teams, position_points(key, len(teams))))
+    return RankSensitivity(table, matches), remaining
+
+
+def brute_force(
+    sensitivity: RankSensitivity,
+    tla: str,
+    positions: dict,
+) -> tuple[int, int]:
+    """
+    The best and worst rank the team could get, trying every outcome.
+    """
+    totals = {x: sensitivity.table.totals(x).league_points for x in sensitivity.table.teams}
+    matches = list(sensitivity.remaining.values())
+    best, worst = len(totals), 1
+    for orders in itertools.product(
+        *(itertools.permutations(match.teams) for match in matches),
+    ):
+        if any(
+            order.index(tla) != positions[match.key]
+            for match, order in zip(matches, orders)
+            if match.key in positions
+        ):
+            continue
+        final = dict(totals)
+        for match, order in zip(matches, orders):
+            for team, points in zip(order, match.points):
+                final[team] += points
+        above = sum(x > final[tla] for x in final.values())
+        level = sum(x == final[tla] for x in final.values()) - 1
+        best = min(best, above + 1)
+        worst = max(worst, above + level + 1)
+    return best, worst
+
+
+class RankSensitivityTests(unittest.TestCase):
+    def test_bounds_match_brute_force(self) -> None:
+        sensitivity, _ = withheld(2)
+        for outlook in sensitivity.outlooks():
+            with self.subTest(tla=outlook.tla):
+                winning = {x: 0 for x in outlook.matches}
+                self.assertEqual(
+                    (outlook.best.best, outlook.best.worst),
+                    brute_force(sensitivity, outlook.tla, winning),
+                )
+                for match, bounds in outlook.by_position.items():
+                    for position, found in enumerate(bounds):
+                        self.assertTrue(found.exact)
+                        self.assertEqual(
+                            (found.best, found.worst),
+                            brute_force(
+                                sensitivity,
+                                outlook.tla,
+                                {**winning, match: position},
+                            ),
+                            f"{position + 1} in {match}",
+                        )
+
+    def test_needed(self) -> None:
+        key = ('main', 1)
+        outlook = TeamOutlook(
+            'ABC',
+            3,
+            RankBounds(1, 2, True),
+            RankBounds(4, 6, True),
+            [key],
+            {key: [
+                RankBounds(1, 2, True),
+                RankBounds(2, 3, True),
+                RankBounds(3, 5, True),
+                RankBounds(4, 6, True),
+            ]},
+        )
+        self.assertEqual(1, outlook.needed(key, 1))
+        self.assertEqual(3, outlook.needed(key, 3))
+        self.assertEqual(2, outlook.needed(key, 3, hold=True))
+        self.assertIsNone(outlook.needed(key, 1, hold=True))
+
+        self.assertEqual(
+            "ABC    now 3, can finish between 1 and 6\n"
+            "  to reach 2: match 1: 2nd\n"
+            "  to hold 2: match 1: 1st",
+            format_outlook(outlook, [2]),
+        )
+
+    def test_cached_until_result_added(self) -> None:
+        sensitivity, remaining = withheld(1)
+        tla, *_ = remaining[0]['teams']
+        before = sensitivity.outlook(tla)
+        self.assertIs(before, sensitivity.outlook(tla))
+        self.assertEqual([match_id(remaining[0])], before.matches)
+
+        sensitivity.add_sheet(remaining[0])
+        after = sensitivity.outlook(tla)
+        self.assertEqual([], after.matches)
+        rank = sensitivity.table.ranked_teams().index(tla) + 1
+        self.assertEqual(rank, after.rank)
+        self.assertLessEqual(after.best.best, rank)
+        self.assertLessEqual(rank, after.worst.worst)
+
+
+if __name__ == '__main__':
+    unittest.main()
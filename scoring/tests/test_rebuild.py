@@ -0,0 +1,194 @@
+"""
+Tests for the derived artifact rebuild pipeline.
+"""
+
+from __future__ import annotations
+
+import concurrent.futures
+import pathlib
+import sys
+import tempfile
+import unittest
+from typing import Any
+from unittest import mock
+
+from sr.comp.comp import SRComp
+
+# Path hackery
+ROOT = pathlib.Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+from rebuild import (  # type: ignore[import-not-found]  # noqa: E402
+    _IN_Q_OVERFLOW,
+    _INOTIFY_EVENT,
+    Artifact,
+    BuildContext,
+    InotifyWatcher,
+    Pipeline,
+    PollingWatcher,
+    Watcher,
+)
+
+
+class PipelineTests(unittest.TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tempdir.cleanup)
+        self.output = pathlib.Path(tempdir.name)
+
+        self.executor = concurrent.futures.ThreadPoolExecutor(4)
+        self.addCleanup(self.executor.shutdown)
+
+    def test_affected(self) -> None:
+        pipeline = Pipeline(ROOT.parent, self.output)
+        self.assertEqual(
+            {'bracket', 'bracket_render', 'timeline', 'call_lists'},
+            pipeline.affected(['knockout/main/080.yaml']),
+        )
+        self.assertEqual({'call_lists'}, pipeline.affected(['shepherding.yaml']))
+        # Challenge points move teams in the league, and so in the knockouts
+        self.assertEqual(
+            pipeline.artifacts.keys(),
+            pipeline.affected(['external/first-challenge.yaml']),
+        )
+        self.assertEqual(
+            pipeline.artifacts.keys(),
+            pipeline.affected(['README.md', 'league/main/000.yaml']),
+        )
+        self.assertEqual(set(), pipeline.affected(['README.md']))
+
+    def test_rebuild_order(self) -> None:
+        def build(name: str) -> Any:
+            def build(context: BuildContext) -> Any:
+                return [name, *(context.results.get(x) for x in artifacts[name].depends)]
+            return build
+
+        artifacts = {
+            x.name: x
+            for x in (
+                Artifact('a', ('a.yaml',), (), build('a')),
+                Artifact('b', (), ('a',), build('b')),
+                Artifact('c', ('c.yaml',), ('a',), build('c')),
+                Artifact('d', (), ('b', 'c'), build('d')),
+            )
+        }
+        pipeline = Pipeline(ROOT.parent, self.output, artifacts.values())
+
+        built = pipeline.rebuild(pipeline.artifacts, self.executor)
+        self.assertEqual('a', built[0])
+        self.assertEqual('d', built[-1])
+        self.assertEqual(
+            ['d', ['b', ['a']], ['c', ['a']]],
+            pipeline.results['d'],
+        )
+        self.assertTrue((self.output / 'd.json').exists())
+
+        # Only the things built from `c` are rebuilt
+        built = pipeline.rebuild(pipeline.affected(['c.yaml']), self.executor)
+        self.assertEqual(['c', 'd'], built)
+
+    def test_built_from_dependencies(self) -> None:
+        pipeline = Pipeline(ROOT.parent, self.output)
+        pipeline.rebuild(pipeline.artifacts, self.executor)
+
+        # As if they'd been built from the whole compstate
+        comp = SRComp(ROOT.parent)
+        matches = [match for slot in comp.schedule.matches for match in slot.values()]
+        self.assertEqual(
+            [(x.arena, x.num, x.start_time.isoformat(), x.teams) for x in matches],
+            [
+                (x['arena'], x['num'], x['start_time'], x['teams'])
+                for x in pipeline.results['timeline']
+            ],
+        )
+        self.assertEqual(
+            [
+                {
+                    'closes': comp.schedule.get_staging_times(x)['closes'].isoformat(),
+                    'signal': {
+                        name: time.isoformat()
+                        for name, time in
+                        comp.schedule.get_staging_times(x)['signal_shepherds'].items()
+                    },
+                }
+                for x in matches
+            ],
+            [
+                {
+                    'closes': x['staging_closes'],
+                    'signal': {y['name']: y['signal'] for y in x['shepherds']},
+                }
+                for x in pipeline.results['call_lists']
+            ],
+        )
+
+    def test_failure_forgets_unbuilt(self) -> None:
+        def fail(context: BuildContext) -> Any:
+            raise ValueError("Broken sheet")
+
+        pipeline = Pipeline(ROOT.parent, self.output, [
+            Artifact('a', (), (), lambda _: 'a'),
+            Artifact('b', (), ('a',), lambda _: 'b'),
+        ])
+        pipeline.rebuild(['a', 'b'], self.executor)
+
+        pipeline.artifacts['a'] = Artifact('a', (), (), fail)
+        with self.assertRaises(ValueError):
+            pipeline.rebuild(['a', 'b'], self.executor)
+        self.assertEqual({}, pipeline.results)
+
+
+class WatcherTests(unittest.TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tempdir.cleanup)
+        self.root = pathlib.Path(tempdir.name)
+        (self.root / 'league' / 'main').mkdir(parents=True)
+        (self.root / '.git').mkdir()
+
+    def check_watcher(self, watcher: Watcher) -> None:
+        self.addCleanup(watcher.close)
+        self.assertEqual(set(), watcher.wait(0))
+
+        (self.root / 'league' / 'main' / '000.yaml').write_text('a')
+        (self.root / '.git' / 'index').write_text('a')
+        self.assertEqual({'league/main/000.yaml'}, watcher.wait(1))
+
+        (self.root / 'league' / 'other').mkdir()
+        (self.root / 'league' / 'other' / '001.yaml').write_text('a')
+        changed = watcher.wait(1)
+        # The polling watcher may see the directory before the file
+        changed |= watcher.wait(0.1)
+        self.assertEqual({'league/other/001.yaml'}, changed)
+
+    def test_polling(self) -> None:
+        self.check_watcher(PollingWatcher(self.root, interval=0.01))
+
+    @unittest.skipUnless(InotifyWatcher.available(), "inotify is not available")
+    def test_inotify(self) -> None:
+        self.check_watcher(InotifyWatcher(self.root))
+
+    @unittest.skipUnless(InotifyWatcher.available(), "inotify is not available")
+    def test_inotify_overflow(self) -> None:
+        watcher = InotifyWatcher(self.root)
+        self.addCleanup(watcher.close)
+        (self.root / 'league' / 'main' / '000.yaml').write_text('a')
+        (self.root / 'league' / 'other').mkdir()
+        (self.root / 'league' / 'other' / '001.yaml').write_text('a')
+
+        # The events were dropped
+        overflow = _INOTIFY_EVENT.pack(-1, _IN_Q_OVERFLOW, 0, 0)
+        with mock.patch('os.read', return_value=overflow):
+            changed = watcher.wait(1)
+        self.assertEqual({'league/main/000.yaml', 'league/other/001.yaml'}, changed)
+
+        # Including that of the new directory, which is now watched
+        watcher.wait(0.1)
+        (self.root / 'league' / 'other' / '002.yaml').write_text('a')
+        self.assertEqual({'league/other/002.yaml'}, watcher.wait(1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+"""
+Tests for the rest gap analysis.
+"""
+
+from __future__ import annotations
+
+import datetime
+import pathlib
+import sys
+import unittest
+
+from sr.comp import yaml_loader
+from sr.comp.comp import SRComp
+from sr.comp.matches import MatchSchedule
+from sr.comp.types import TLA
+
+# Path hackery
+ROOT = pathlib.Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+from rest_gaps import (  # type: ignore[import-not-found]  # noqa: E402
+    RestAnalyzer,
+    TeamRest,
+)
+from sheets import (  # type: ignore[import-not-found]  # noqa: E402
+    COMPSTATE_ROOT,
+)
+
+SLOT = 300
+
+
+def teams(names: str) -> list[TLA]:
+    return [TLA(x * 3) for x in names]
+
+
+class RestAnalyzerTests(unittest.TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        # Two periods of three slots each
+        self.analyzer = RestAnalyzer(
+            [teams('AB'), teams('AC'), teams('BD'), teams('AD'), teams('BC'), teams('D')],
+            [(0, 2 * SLOT, 2 * SLOT), (10_000, 10_000 + 2 * SLOT, 10_000 + 2 * SLOT)],
+            slot_duration=SLOT,
+            match_duration=150,
+            staging_closes=150,
+        )
+
+    def test_rest(self) -> None:
+        report = self.analyzer.evaluate()
+        self.assertEqual([], report.dropped)
+        self.assertEqual(
+            {
+                # Back to back in the first period; the gap to the second
+                # period doesn't count
+                'AAA': TeamRest(TLA('AAA'), 3, 0, 0, 1),
+                'BBB': TeamRest(TLA('BBB'), 3, 300, 300, 0),
+                'CCC': TeamRest(TLA('CCC'), 2, None, None, 0),
+                'DDD': TeamRest(TLA('DDD'), 3, 300, 300, 0),
+            },
+            report.teams,
+        )
+        self.assertEqual(
+            ['AAA'],
+            [x.tla for x in report.at_risk(datetime.timedelta(minutes=1))],
+        )
+
+    def test_delay(self) -> None:
+        # A delay before the second slot moves the rest of the period along,
+        # so the last slot no longer fits and everything after moves later
+        impact, = self.analyzer.delay_impacts([(SLOT, 60)])
+        self.assertEqual([5], impact.report.dropped)
+        self.assertEqual(
+            TeamRest(TLA('AAA'), 3, 60, 60, 0),
+            impact.report.teams['AAA'],
+        )
+        self.assertEqual({'AAA', 'DDD'}, impact.changed.keys())
+
+    def test_matches_srcomp(self) -> None:
+        analyzer = RestAnalyzer.load(COMPSTATE_ROOT)
+        comp = SRComp(COMPSTATE_ROOT)
+        config = yaml_loader.load(COMPSTATE_ROOT / 'schedule.yaml')
+        league = yaml_loader.load(COMPSTATE_ROOT / 'league.yaml')['matches']
+
+        # A long delay during the Saturday afternoon pushes matches into the
+        # following periods
+        when = datetime.datetime(2025, 4, 12, 13, 30, tzinfo=datetime.timezone.utc)
+        config['delays'] = [*config['delays'], {'delay': 1800, 'time': when}]
+        schedule = MatchSchedule(config, league, comp.teams, comp.num_teams_per_arena)
+
+        starts, _ = analyzer.starts([*analyzer.delays, (int(when.timestamp()), 1800)])
+        self.assertEqual(
+            [int(slot['main'].start_time.timestamp()) for slot in schedule.matches],
+            starts,
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
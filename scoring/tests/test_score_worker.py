@@ -0,0 +1,136 @@
+"""
+Tests for the long-lived scoring worker.
+"""
+
+from __future__ import annotations
+
+import os
+import pathlib
+import socket
+import sys
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import yaml
+
+# Path hackery
+ROOT = pathlib.Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+from score_worker import (  # type: ignore[import-not-found]  # noqa: E402
+    _read_response,
+    _write_request,
+    default_socket_path,
+    score_document,
+    score_one_shot,
+    score_paths,
+    serve_stream,
+)
+
+
+class ScoreWorkerTests(unittest.TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        with (ROOT / 'template.yaml').open() as f:
+            sheet = yaml.safe_load(f)
+        districts = sheet['arena_zones']['other']['districts']
+        districts['central']['pallets']['G'] = 2
+        self.valid = yaml.safe_dump(sheet)
+
+        districts['central']['pallets']['G'] = 7
+        self.invalid = yaml.safe_dump(sheet)
+
+        tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tempdir.cleanup)
+        self.root = pathlib.Path(tempdir.name)
+
+    def write(self, name: str, text: str) -> pathlib.Path:
+        path = self.root / name
+        path.write_text(text)
+        return path
+
+    def test_matches_score_py(self) -> None:
+        for name, text in (('valid.yaml', self.valid), ('invalid.yaml', self.invalid)):
+            with self.subTest(name):
+                expected = score_one_shot(self.write(name, text))
+                self.assertEqual(expected, score_document(text))
+
+        self.assertEqual(2, score_document(self.invalid).returncode)
+
+    def test_framing(self) -> None:
+        server, client = socket.socketpair()
+        self.addCleanup(server.close)
+        self.addCleanup(client.close)
+
+        thread = threading.Thread(
+            target=serve_stream,
+            args=(server.makefile('rb'), server.makefile('wb')),
+        )
+        thread.start()
+
+        with client.makefile('rwb') as stream:
+            for text in (self.valid, self.invalid, self.valid):
+                _write_request(stream, text)
+                self.assertEqual(score_document(text), _read_response(stream))
+
+        client.shutdown(socket.SHUT_WR)
+        thread.join(timeout=5)
+        self.assertFalse(thread.is_alive(), "Worker should stop when the stream closes")
+
+    def test_falls_back_without_worker(self) -> None:
+        path = self.write('valid.yaml', self.valid)
+        results = list(score_paths([path], self.root / 'no-such-worker.sock'))
+        self.assertEqual([(path, score_document(self.valid))], results)
+
+
+class DefaultSocketPathTests(unittest.TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tempdir.cleanup)
+        self.root = pathlib.Path(tempdir.name)
+
+        patcher = mock.patch.object(tempfile, 'tempdir', str(self.root))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        environ = mock.patch.dict(os.environ)
+        environ.start()
+        self.addCleanup(environ.stop)
+        os.environ.pop('SR2025_SCORE_WORKER_SOCKET', None)
+        os.environ.pop('XDG_RUNTIME_DIR', None)
+
+        self.private = self.root / f'sr2025-{os.getuid()}'
+
+    def test_environment(self) -> None:
+        os.environ['XDG_RUNTIME_DIR'] = str(self.root)
+        self.assertEqual(self.root / 'sr2025-score-worker.sock', default_socket_path())
+
+        os.environ['SR2025_SCORE_WORKER_SOCKET'] = str(self.root / 'worker.sock')
+        self.assertEqual(self.root / 'worker.sock', default_socket_path())
+
+    def test_private_directory(self) -> None:
+        path = default_socket_path()
+        self.assertEqual(self.private / 'sr2025-score-worker.sock', path)
+        self.assertEqual(0o700, self.private.stat().st_mode & 0o777)
+
+        # Reused once created
+        self.assertEqual(path, default_socket_path())
+
+    def test_shared_directory_refused(self) -> None:
+        self.private.mkdir(mode=0o777)
+        self.private.chmod(0o777)
+        with self.assertRaises(PermissionError):
+            default_socket_path()
+
+    def test_symlink_refused(self) -> None:
+        (self.root / 'elsewhere').mkdir(mode=0o700)
+        self.private.symlink_to(self.root / 'elsewhere')
+        with self.assertRaises(PermissionError):
+            default_socket_path()
+
+
+if __name__ == '__main__':
+    unittest.main()
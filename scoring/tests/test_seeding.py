@@ -0,0 +1,129 @@
+"""
+Tests for the incrementally maintained knockout seeding.
+"""
+
+from __future__ import annotations
+
+import datetime
+import pathlib
+import sys
+import unittest
+
+from sr.comp.match_period import KnockoutMatch, MatchType
+from sr.comp.scores import TeamScore
+from sr.comp.types import ArenaName, GamePoints, LeaguePoints, MatchNumber, TLA
+
+# Path hackery
+ROOT = pathlib.Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+from knockout_progress import (  # type: ignore[import-not-found]  # noqa: E402
+    KnockoutResolver,
+)
+from seeding import (  # type: ignore[import-not-found]  # noqa: E402
+    KnockoutSeeding,
+    SeedChange,
+)
+from standings import (  # type: ignore[import-not-found]  # noqa: E402
+    LeagueTable,
+)
+
+TEAMS = [TLA(x * 3) for x in 'ABCDE']
+
+
+def build_match(num: int) -> KnockoutMatch:
+    start = datetime.datetime(2025, 4, 13, 12, num * 5, tzinfo=datetime.timezone.utc)
+    return KnockoutMatch(
+        MatchNumber(num),
+        f"Match {num}",
+        ArenaName('main'),
+        [],
+        start,
+        start + datetime.timedelta(minutes=5),
+        MatchType.knockout,
+        use_resolved_ranking=True,
+        knockout_bracket='default',
+    )
+
+
+class KnockoutSeedingTests(unittest.TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        # EEE has dropped out, so isn't seeded
+        self.seeding = KnockoutSeeding(
+            LeagueTable(TEAMS),
+            TEAMS[:4],
+            [('main', 0), ('main', 1)],
+        )
+
+    def play(self, num: int, *ranking: TLA) -> list[SeedChange]:
+        """
+        Record a match in which the teams finish in the given order.
+        """
+        self.seeding.table.set_match(
+            ('main', num),
+            {tla: GamePoints(10 - i) for i, tla in enumerate(ranking)},
+            [],
+        )
+        return self.seeding.update()
+
+    def test_unknown_until_league_complete(self) -> None:
+        self.assertEqual(['???'] * 4, self.seeding.seeds)
+        self.assertEqual([], self.play(0, 'AAA', 'BBB', 'CCC', 'DDD'))
+
+        changes = self.play(1, 'AAA', 'BBB', 'CCC', 'EEE')
+        self.assertEqual(['AAA', 'BBB', 'CCC', 'DDD'], self.seeding.seeds)
+        self.assertEqual(
+            [SeedChange(n, '???', tla) for n, tla in enumerate(self.seeding.seeds, 1)],
+            changes,
+        )
+
+    def test_correction_reports_moved_seeds(self) -> None:
+        self.play(0, 'AAA', 'BBB', 'CCC', 'DDD')
+        self.play(1, 'AAA', 'BBB', 'CCC', 'EEE')
+
+        self.assertEqual([], self.play(1, 'AAA', 'BBB', 'CCC', 'EEE'))
+        self.assertEqual(
+            [SeedChange(2, 'BBB', 'CCC'), SeedChange(3, 'CCC', 'BBB')],
+            self.play(1, 'AAA', 'CCC', 'BBB', 'EEE'),
+        )
+
+        score = TeamScore(league=LeaguePoints(20))
+        self.assertEqual(
+            [
+                SeedChange(1, 'AAA', 'DDD'),
+                SeedChange(2, 'CCC', 'AAA'),
+                SeedChange(3, 'BBB', 'CCC'),
+                SeedChange(4, 'DDD', 'BBB'),
+            ],
+            self.seeding.set_external_scores({TLA('DDD'): score}),
+        )
+
+    def test_only_matches_using_changed_seeds_resolved(self) -> None:
+        self.play(0, 'AAA', 'BBB', 'CCC', 'DDD')
+        self.play(1, 'AAA', 'BBB', 'CCC', 'EEE')
+
+        resolver = KnockoutResolver(
+            [[build_match(0), build_match(1)]],
+            {(0, 0): ['S1', 'S4'], (0, 1): ['S2', 'S3']},
+            self.seeding.seeds,
+            self.seeding.table.positions,
+        )
+        progression = resolver.set_seeds(
+            self.seeding.seeds,
+            self.seeding.table.positions,
+        )
+        self.assertEqual([], progression.changed)
+
+        self.play(1, 'AAA', 'CCC', 'BBB', 'EEE')
+        progression = resolver.set_seeds(
+            self.seeding.seeds,
+            self.seeding.table.positions,
+        )
+        self.assertEqual([resolver.match(1)], progression.changed)
+        self.assertEqual(['CCC', 'BBB'], resolver.match(1).teams)
+        self.assertEqual(['AAA', 'DDD'], resolver.match(0).teams)
+
+
+if __name__ == '__main__':
+    unittest.main()
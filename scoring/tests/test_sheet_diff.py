@@ -0,0 +1,119 @@
+"""
+Tests for sheet diffs and partial re-scoring.
+"""
+
+from __future__ import annotations
+
+import copy
+import pathlib
+import sys
+import unittest
+
+import yaml
+from sr.comp.types import TLA
+
+# Path hackery
+ROOT = pathlib.Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+from sheet_diff import (  # type: ignore[import-not-found]  # noqa: E402
+    apply_correction,
+    diff_sheets,
+    DistrictChange,
+    MatchBreakdown,
+)
+from sheets import (  # type: ignore[import-not-found]  # noqa: E402
+    calculate_scores,
+)
+from standings import (  # type: ignore[import-not-found]  # noqa: E402
+    LeagueTable,
+)
+
+
+class SheetDiffTests(unittest.TestCase):
+    maxDiff = None
+
+    def setUp(self) -> None:
+        super().setUp()
+        with (ROOT / 'template.yaml').open() as f:
+            self.sheet = yaml.safe_load(f)
+        self.sheet['arena_id'] = 'main'
+        self.sheet['match_number'] = 50
+        for info in self.sheet['teams'].values():
+            info['present'] = True
+            info['disqualified'] = False
+        self.districts(self.sheet)['central']['pallets']['G'] = 1
+
+    def corrected(self) -> dict:
+        return copy.deepcopy(self.sheet)
+
+    def districts(self, sheet: dict) -> dict:
+        return sheet['arena_zones']['other']['districts']
+
+    def test_no_changes(self) -> None:
+        self.assertFalse(diff_sheets(self.sheet, self.corrected()))
+
+    def test_changed_district(self) -> None:
+        new = self.corrected()
+        self.districts(new)['inner_ne']['pallets']['O'] = 2
+        self.districts(new)['inner_ne']['highest'] = 'O'
+        new['teams']['TLA1']['left_starting_zone'] = True
+
+        diff = diff_sheets(self.sheet, new)
+
+        self.assertEqual(
+            {'inner_ne': DistrictChange(frozenset('O'), ('', 'O'))},
+            diff.districts,
+        )
+        self.assertEqual({1}, diff.districts['inner_ne'].zones)
+        self.assertEqual(
+            {'TLA1': {'left_starting_zone': (False, True)}},
+            diff.teams,
+        )
+
+    def test_explicit_zero_is_no_change(self) -> None:
+        new = self.corrected()
+        del self.districts(new)['outer_nw']['pallets']['Y']
+
+        self.assertFalse(diff_sheets(self.sheet, new))
+
+    def test_partial_rescore_matches_full(self) -> None:
+        breakdown = MatchBreakdown(self.sheet)
+        self.assertEqual(calculate_scores(self.sheet), breakdown.scores)
+
+        new = self.corrected()
+        self.districts(new)['central']['pallets']['P'] = 2
+        self.districts(new)['central']['highest'] = 'P'
+        self.districts(new)['outer_se']['pallets']['G'] = 1
+        new['teams']['TLA3']['left_starting_zone'] = True
+
+        breakdown.update(new)
+
+        self.assertEqual(calculate_scores(new), breakdown.scores)
+
+    def test_correction_updates_table(self) -> None:
+        teams = [TLA(x) for x in self.sheet['teams']]
+        table = LeagueTable(teams)
+        table.add_sheet(self.sheet)
+        self.assertEqual('TLA0', table.ranked_teams()[0])
+
+        new = self.corrected()
+        self.districts(new)['central']['pallets']['P'] = 3
+
+        correction = apply_correction(MatchBreakdown(self.sheet), new, table)
+
+        self.assertEqual({'TLA2': (0, 9)}, correction.scores)
+        # Physical league match, so points are doubled
+        self.assertEqual(
+            {'TLA0': -4, 'TLA1': -2, 'TLA2': 8, 'TLA3': -2},
+            correction.league_points,
+        )
+        self.assertEqual(
+            {'TLA0': (1, 2), 'TLA1': (2, 3), 'TLA2': (2, 1), 'TLA3': (2, 3)},
+            correction.positions,
+        )
+        self.assertEqual('TLA2', table.ranked_teams()[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
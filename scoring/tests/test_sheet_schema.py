@@ -0,0 +1,124 @@
+"""
+Tests for the generated score sheet structure validator.
+"""
+
+from __future__ import annotations
+
+import copy
+import pathlib
+import sys
+import unittest
+from typing import Any
+
+import yaml
+
+# Path hackery
+ROOT = pathlib.Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+from score import (  # type: ignore[import-not-found]  # noqa: E402
+    InvalidScoresheetException,
+)
+from sheet_schema import (  # type: ignore[import-not-found]  # noqa: E402
+    check_generic,
+    check_sheet,
+    RawSheet,
+    SheetError,
+    validate_structure,
+)
+from sheets import (  # type: ignore[import-not-found]  # noqa: E402
+    calculate_scores,
+)
+
+
+class SheetSchemaTests(unittest.TestCase):
+    maxDiff = None
+
+    def setUp(self) -> None:
+        super().setUp()
+        with (ROOT / 'template.yaml').open() as f:
+            self.template = yaml.safe_load(f)
+
+    def mutations(self) -> dict[str, dict[str, Any]]:
+        def mutate(path: tuple[Any, ...], value: Any) -> dict[str, Any]:
+            sheet = copy.deepcopy(self.template)
+            target = sheet
+            for key in path[:-1]:
+                target = target[key]
+            if value is KeyError:
+                del target[path[-1]]
+            else:
+                target[path[-1]] = value
+            return sheet
+
+        districts = ('arena_zones', 'other', 'districts')
+        return {
+            'missing pallets': mutate((*districts, 'central', 'pallets'), KeyError),
+            'string count': mutate((*districts, 'central', 'pallets', 'G'), '2'),
+            'bool count': mutate((*districts, 'central', 'pallets', 'G'), True),
+            'unknown team key': mutate(('teams', 'TLA0', 'speed'), 3),
+            'zone out of range': mutate(('teams', 'TLA0', 'zone'), 4),
+            'teams not a mapping': mutate(('teams',), ['TLA0']),
+            'missing match number': mutate(('match_number',), KeyError),
+        }
+
+    def test_template(self) -> None:
+        self.assertEqual([], check_sheet(self.template))
+        validate_structure(self.template)
+
+    def test_errors(self) -> None:
+        mutations = self.mutations()
+        pallets = ('arena_zones', 'other', 'districts', 'central', 'pallets')
+        self.assertEqual(
+            [SheetError(pallets, 'is required')],
+            check_sheet(mutations['missing pallets']),
+        )
+        self.assertEqual(
+            [SheetError(('teams', 'TLA0', 'speed'), 'is not expected')],
+            check_sheet(mutations['unknown team key']),
+        )
+        self.assertEqual(
+            [SheetError(('teams', 'TLA0', 'zone'), 'must be between -4 and 3')],
+            check_sheet(mutations['zone out of range']),
+        )
+        self.assertEqual(
+            "teams.TLA0.zone: must be between -4 and 3",
+            str(check_sheet(mutations['zone out of range'])[0]),
+        )
+
+    def test_matches_generic(self) -> None:
+        for name, sheet in self.mutations().items():
+            with self.subTest(name):
+                errors = check_sheet(sheet)
+                self.assertNotEqual([], errors)
+                self.assertEqual(check_generic(RawSheet, sheet), errors)
+
+    def test_validate_structure(self) -> None:
+        with self.assertRaises(InvalidScoresheetException) as cm:
+            validate_structure(self.mutations()['string count'])
+
+        self.assertEqual('invalid_structure', cm.exception.code)
+        self.assertIn(
+            "arena_zones.other.districts.central.pallets.G: expected an integer",
+            str(cm.exception),
+        )
+
+    def test_only_checked_when_scoring_fails(self) -> None:
+        mutations = self.mutations()
+        # The Scorer copes with these, so they're judged as SRComp would
+        calculate_scores(mutations['unknown team key'])
+        calculate_scores(mutations['bool count'])
+
+        sheet = copy.deepcopy(self.template)
+        sheet['arena_zones']['other']['districts']['central']['pallets']['X'] = '1'
+        with self.assertRaises(InvalidScoresheetException) as cm:
+            calculate_scores(sheet)
+        self.assertEqual('invalid_pallets', cm.exception.code)
+
+        with self.assertRaises(InvalidScoresheetException) as cm:
+            calculate_scores(mutations['missing pallets'])
+        self.assertEqual('invalid_structure', cm.exception.code)
+
+
+if __name__ == '__main__':
+    unittest.main()
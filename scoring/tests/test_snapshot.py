@@ -0,0 +1,97 @@
+"""
+Tests for compstate snapshots.
+"""
+
+from __future__ import annotations
+
+import pathlib
+import subprocess
+import sys
+import tempfile
+import unittest
+
+# Path hackery
+ROOT = pathlib.Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+from sheets import (  # type: ignore[import-not-found]  # noqa: E402
+    COMPSTATE_ROOT,
+)
+from snapshot import (  # type: ignore[import-not-found]  # noqa: E402
+    build_snapshot,
+    git_state,
+    InvalidSnapshotException,
+    load_comp,
+    load_snapshot,
+    StaleSnapshotException,
+)
+
+
+class SnapshotTests(unittest.TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tempdir.cleanup)
+        self.root = pathlib.Path(tempdir.name) / 'compstate'
+        subprocess.run(
+            ['git', 'clone', '--quiet', str(COMPSTATE_ROOT), str(self.root)],
+            check=True,
+        )
+
+    def commit(self, message: str) -> None:
+        subprocess.run(
+            [
+                'git',
+                '-c', 'user.name=Test',
+                '-c', 'user.email=test@example.com',
+                'commit', '--quiet', '--all', '--message', message,
+            ],
+            cwd=self.root,
+            check=True,
+        )
+
+    def test_round_trip(self) -> None:
+        built = build_snapshot(self.root)
+        restored = load_snapshot(self.root)
+
+        self.assertEqual(built.scores.league.positions, restored.scores.league.positions)
+        self.assertEqual(
+            [match.teams for match in built.schedule.knockout_rounds[-1]],
+            [match.teams for match in restored.schedule.knockout_rounds[-1]],
+        )
+        self.assertEqual(built.state, restored.state)
+
+        # The scorer is usable after restoring
+        scorer = restored.scores.league._scorer
+        self.assertEqual('Scorer', scorer.__name__)
+
+    def test_stale(self) -> None:
+        build_snapshot(self.root)
+
+        with (self.root / 'league.yaml').open('a') as f:
+            f.write('\n# Comment\n')
+        with self.assertRaisesRegex(StaleSnapshotException, "uncommitted"):
+            load_snapshot(self.root)
+
+        self.commit("Change the league")
+        with self.assertRaisesRegex(StaleSnapshotException, "different tree"):
+            load_snapshot(self.root)
+
+        # Falls back to loading, updating the snapshot
+        comp = load_comp(self.root)
+        self.assertEqual(git_state(self.root).commit, comp.state)
+        load_snapshot(self.root)
+
+    def test_invalid(self) -> None:
+        path = self.root / 'snapshot.bin'
+        with self.assertRaises(StaleSnapshotException):
+            load_snapshot(self.root, path)
+
+        path.write_bytes(b'not a snapshot')
+        (self.root / '.git' / 'info' / 'exclude').write_text('snapshot.bin\n')
+        with self.assertRaises(InvalidSnapshotException):
+            load_snapshot(self.root, path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+"""
+Tests for the per-team statistics.
+"""
+
+from __future__ import annotations
+
+import copy
+import pathlib
+import sys
+import unittest
+
+import yaml
+
+# Path hackery
+ROOT = pathlib.Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+from stats import (  # type: ignore[import-not-found]  # noqa: E402
+    TeamStatistics,
+)
+
+
+class TeamStatisticsTests(unittest.TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        with (ROOT / 'template.yaml').open() as f:
+            self.sheet = yaml.safe_load(f)
+        self.sheet['arena_id'] = 'main'
+
+    def build_sheet(self, match_number: int, **pallets: int) -> dict:
+        sheet = copy.deepcopy(self.sheet)
+        sheet['match_number'] = match_number
+        districts = sheet['arena_zones']['other']['districts']
+        for name, count in pallets.items():
+            districts[name]['pallets']['G'] = count
+        return sheet
+
+    def test_single_match(self) -> None:
+        sheet = self.build_sheet(1, outer_nw=1, inner_ne=2, central=1)
+        sheet['arena_zones']['other']['districts']['central']['highest'] = 'G'
+        sheet['teams']['TLA0']['left_starting_zone'] = True
+
+        statistics = TeamStatistics([sheet])
+        stats = statistics['TLA0']
+
+        self.assertEqual(1, stats.matches)
+        # 1 + 2 * 2 + 1 * 3 * 2 + 1
+        self.assertEqual(12, stats.mean_score)
+        self.assertEqual(0, stats.score_variance)
+        self.assertEqual(
+            {'outer': 1, 'inner': 2, 'central': 1},
+            dict(stats.pallets_by_tier),
+        )
+        self.assertEqual(1, stats.highest_pallets)
+        self.assertEqual(1, stats.highest_rate)
+        self.assertEqual(1, stats.left_starting_zone_rate)
+        self.assertEqual({0: 12}, stats.mean_score_by_corner())
+
+        # Disqualified and absent teams are left out, and looking them up
+        # doesn't add them
+        self.assertEqual(0, statistics['TLA1'].mean_score)
+        self.assertEqual(0, statistics['TLA3'].matches)
+        self.assertEqual({'TLA0', 'TLA2'}, statistics.teams.keys())
+        self.assertNotIn('TLA1', statistics)
+
+    def test_mean_and_variance(self) -> None:
+        statistics = TeamStatistics([
+            self.build_sheet(1, outer_nw=2),
+            self.build_sheet(2, outer_nw=4),
+        ])
+        stats = statistics['TLA0']
+
+        self.assertEqual(2, stats.matches)
+        self.assertEqual(3, stats.mean_score)
+        self.assertEqual(1, stats.score_variance)
+
+    def test_absent_matches_ignored(self) -> None:
+        absent = self.build_sheet(2, outer_nw=4)
+        absent['teams']['TLA0']['present'] = False
+        statistics = TeamStatistics([self.build_sheet(1, outer_nw=2), absent])
+        stats = statistics['TLA0']
+
+        self.assertEqual(1, stats.matches)
+        self.assertEqual(2, stats.mean_score)
+        self.assertEqual(0, stats.score_variance)
+
+    def test_correction_replaces_match(self) -> None:
+        statistics = TeamStatistics([
+            self.build_sheet(1, outer_nw=2),
+            self.build_sheet(2, outer_nw=4),
+        ])
+        statistics.add_sheet(self.build_sheet(2, outer_nw=2))
+        stats = statistics['TLA0']
+
+        self.assertEqual(2, stats.matches)
+        self.assertEqual(2, stats.mean_score)
+        self.assertEqual(0, stats.score_variance)
+        self.assertEqual(4, stats.pallets_by_tier['outer'])
+
+
+if __name__ == '__main__':
+    unittest.main()
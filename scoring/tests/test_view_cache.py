@@ -0,0 +1,213 @@
+"""
+Tests for the cache of views derived from a compstate.
+"""
+
+from __future__ import annotations
+
+import concurrent.futures
+import json
+import os
+import pathlib
+import sys
+import tempfile
+import threading
+import unittest
+import urllib.error
+import urllib.request
+from typing import Any
+
+# Path hackery
+ROOT = pathlib.Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+from rebuild import (  # type: ignore[import-not-found]  # noqa: E402
+    Artifact,
+    BuildContext,
+)
+from view_cache import (  # type: ignore[import-not-found]  # noqa: E402
+    etag_matches,
+    FileHasher,
+    ViewCache,
+    ViewServer,
+)
+
+
+class ViewCacheTests(unittest.TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tempdir.cleanup)
+        self.root = pathlib.Path(tempdir.name)
+        (self.root / 'a').mkdir()
+        self.write('a/1.yaml', 'one')
+        self.write('b.yaml', 'two')
+
+        self.builds: list[str] = []
+
+    def write(self, path: str, content: str) -> None:
+        (self.root / path).write_text(content)
+
+    def build(self, name: str) -> Any:
+        def build(context: BuildContext) -> Any:
+            self.builds.append(name)
+            return {
+                'files': sorted(
+                    x.read_text()
+                    for pattern in artifacts[name].inputs
+                    for x in self.root.glob(pattern)
+                ),
+                'uses': [context.results[x] for x in artifacts[name].depends],
+            }
+
+        artifacts = {
+            'a': Artifact('a', ('a/*.yaml',), (), build),
+            'b': Artifact('b', ('b.yaml',), ('a',), build),
+        }
+        return artifacts[name]
+
+    def make_cache(self, **kwargs: Any) -> ViewCache:
+        return ViewCache(self.root, [self.build('a'), self.build('b')], **kwargs)
+
+    def test_keyed_on_inputs(self) -> None:
+        cache = self.make_cache()
+        b = cache.get('b')
+        self.assertEqual(
+            {'files': ['two'], 'uses': [{'files': ['one'], 'uses': []}]},
+            json.loads(b.body),
+        )
+        self.assertEqual(['a', 'b'], self.builds)
+        self.assertIs(b, cache.get('b'))
+        self.assertEqual(['a', 'b'], self.builds)
+
+        # Only what's built from the changed file is rebuilt
+        self.write('b.yaml', 'three')
+        self.assertNotEqual(b.etag, cache.get('b').etag)
+        self.assertEqual(['a', 'b', 'b'], self.builds)
+
+        # Including through the views it uses
+        self.write('a/2.yaml', 'four')
+        self.assertEqual(['four', 'one'], json.loads(cache.get('a').body)['files'])
+        cache.get('b')
+        self.assertEqual(['a', 'b', 'b', 'a', 'b'], self.builds)
+
+        # Changing back finds the earlier views
+        self.write('b.yaml', 'two')
+        (self.root / 'a' / '2.yaml').unlink()
+        self.assertIs(b, cache.get('b'))
+        self.assertEqual(5, len(self.builds))
+        self.assertEqual(4, cache.hits)
+        self.assertEqual(5, cache.misses)
+
+    def test_evicts_least_recently_used(self) -> None:
+        cache = self.make_cache()
+        a = cache.get('a')
+        b = cache.get('b')
+        cache.max_bytes = len(a.body) + len(b.body)
+        cache.get('a')
+
+        self.write('b.yaml', 'owt')
+        cache.get('b')
+        self.assertEqual(1, cache.evictions)
+        self.assertEqual(2, len(cache))
+        self.assertLessEqual(cache.size, cache.max_bytes)
+        # The old `b` went, not `a` which was used since
+        self.assertIs(a, cache.get('a'))
+
+    def test_concurrent_misses_build_once(self) -> None:
+        started = threading.Event()
+        release = threading.Event()
+
+        def build(context: BuildContext) -> Any:
+            self.builds.append('slow')
+            started.set()
+            release.wait(5)
+            return 'slow'
+
+        cache = ViewCache(self.root, [Artifact('slow', ('b.yaml',), (), build, '.dot')])
+        with concurrent.futures.ThreadPoolExecutor(8) as executor:
+            futures = [executor.submit(cache.get, 'slow') for _ in range(8)]
+            started.wait(5)
+            release.set()
+            views = [x.result() for x in futures]
+
+        self.assertEqual(['slow'], self.builds)
+        self.assertEqual({b'slow'}, {x.body for x in views})
+        self.assertEqual('text/vnd.graphviz; charset=utf-8', views[0].content_type)
+
+    def test_default_views_keyed_on_external_scores(self) -> None:
+        # Challenge points decide the knockout seeds, so everything built
+        # from the bracket is out of date when they change
+        cache = ViewCache(self.root)
+        (self.root / 'external').mkdir()
+        self.write('external/first-challenge.yaml', 'one')
+        keys = {x: cache.key(x) for x in ('bracket', 'timeline', 'call_lists')}
+
+        self.write('external/first-challenge.yaml', 'two')
+        for name, key in keys.items():
+            self.assertNotEqual(key, cache.key(name), name)
+
+    def test_files_reread_when_changed(self) -> None:
+        hasher = FileHasher(self.root)
+        # Only files old enough for their modification times to be trusted
+        # are remembered
+        os.utime(self.root / 'b.yaml', (0, 0))
+        first = hasher.hashes(['*.yaml'])
+        self.assertEqual(first, hasher.hashes(['*.yaml']))
+        self.assertEqual(1, hasher.reads)
+
+        self.write('b.yaml', 'owt')
+        self.assertNotEqual(first, hasher.hashes(['*.yaml']))
+        self.assertEqual(['a/1.yaml', 'b.yaml'], [x for x, _ in hasher.hashes(['**/*.yaml'])])
+
+
+class ViewServerTests(unittest.TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tempdir.cleanup)
+        root = pathlib.Path(tempdir.name)
+        (root / 'a.yaml').write_text('one')
+
+        cache = ViewCache(root, [Artifact('a', ('a.yaml',), (), lambda _: [1, 2])])
+        server = ViewServer(('127.0.0.1', 0), cache)
+        self.addCleanup(server.server_close)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.shutdown)
+        self.url = 'http://127.0.0.1:{}/'.format(server.server_address[1])
+
+    def request(self, path: str, **headers: str) -> tuple[int, dict[str, str], bytes]:
+        request = urllib.request.Request(self.url + path, headers=headers)
+        try:
+            with urllib.request.urlopen(request, timeout=5) as response:
+                return response.status, dict(response.headers), response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, dict(e.headers), e.read()
+
+    def test_conditional_requests(self) -> None:
+        status, headers, body = self.request('a')
+        self.assertEqual(200, status)
+        self.assertEqual([1, 2], json.loads(body))
+        self.assertEqual('application/json', headers['Content-Type'])
+
+        status, _, body = self.request('a', **{'If-None-Match': headers['ETag']})
+        self.assertEqual(304, status)
+        self.assertEqual(b'', body)
+        status, _, _ = self.request('a', **{'If-None-Match': '"other"'})
+        self.assertEqual(200, status)
+
+        status, _, _ = self.request('b')
+        self.assertEqual(404, status)
+        status, _, body = self.request('')
+        self.assertEqual(200, status)
+        self.assertEqual(['a'], json.loads(body)['views'])
+        self.assertEqual(2, json.loads(body)['cache']['hits'])
+
+    def test_etag_matches(self) -> None:
+        self.assertTrue(etag_matches('"a", W/"b"', '"b"'))
+        self.assertTrue(etag_matches('*', '"b"'))
+        self.assertFalse(etag_matches('"a"', '"b"'))
+        self.assertFalse(etag_matches(None, '"b"'))
+
+
+if __name__ == '__main__':
+    unittest.main()
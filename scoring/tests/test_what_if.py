@@ -0,0 +1,102 @@
+"""
+Tests for what-if scoring.
+"""
+
+from __future__ import annotations
+
+import copy
+import pathlib
+import sys
+import unittest
+
+import yaml
+
+# Path hackery
+ROOT = pathlib.Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+from sheets import (  # type: ignore[import-not-found]  # noqa: E402
+    calculate_scores,
+)
+from what_if import (  # type: ignore[import-not-found]  # noqa: E402
+    AddPallets,
+    LiveMatch,
+    parse_change,
+    SetHighest,
+    SetLeftStartingZone,
+)
+
+
+class WhatIfTests(unittest.TestCase):
+    maxDiff = None
+
+    def setUp(self) -> None:
+        super().setUp()
+        with (ROOT / 'template.yaml').open() as f:
+            self.sheet = yaml.safe_load(f)
+        for info in self.sheet['teams'].values():
+            info['present'] = True
+            info['disqualified'] = False
+        districts = self.sheet['arena_zones']['other']['districts']
+        districts['central']['pallets'].update(G=2, O=1)
+        districts['central']['highest'] = 'G'
+        districts['inner_ne']['pallets']['Y'] = 1
+        self.match = LiveMatch(self.sheet)
+
+    def test_current_matches_scorer(self) -> None:
+        self.assertEqual(calculate_scores(self.sheet), self.match.current.scores)
+
+    def test_hypotheticals_match_scorer(self) -> None:
+        changes = [
+            SetHighest('central', 'O'),
+            AddPallets('inner_ne', 'Y', 2),
+            SetLeftStartingZone(1),
+        ]
+        outcome = self.match.evaluate(changes)
+
+        expected = copy.deepcopy(self.sheet)
+        districts = expected['arena_zones']['other']['districts']
+        districts['central']['highest'] = 'O'
+        districts['inner_ne']['pallets']['Y'] = 3
+        expected['teams']['TLA1']['left_starting_zone'] = True
+
+        self.assertTrue(outcome.valid)
+        self.assertEqual(calculate_scores(expected), outcome.scores)
+        self.assertEqual(
+            {'TLA1': 1, 'TLA0': 2, 'TLA3': 2, 'TLA2': 4},
+            outcome.positions,
+        )
+        # The match itself is unchanged
+        self.assertEqual(calculate_scores(self.sheet), self.match.current.scores)
+
+    def test_invalid_hypotheticals(self) -> None:
+        no_highest, too_many = self.match.evaluate_many([
+            [SetHighest('inner_sw', 'P')],
+            [AddPallets('outer_nw', 'G', 5)],
+        ])
+        self.assertEqual(
+            ("inner_sw would have no P pallet to be highest",),
+            no_highest.problems,
+        )
+        self.assertEqual(("There would be 7 G pallets in play",), too_many.problems)
+
+    def test_apply(self) -> None:
+        self.match.apply([AddPallets('central', 'G', -1), SetHighest('central', 'O')])
+
+        expected = copy.deepcopy(self.sheet)
+        districts = expected['arena_zones']['other']['districts']
+        districts['central']['pallets']['G'] = 1
+        districts['central']['highest'] = 'O'
+        self.assertEqual(calculate_scores(expected), self.match.current.scores)
+
+        outcome = self.match.evaluate([AddPallets('outer_se', 'G', 5)])
+        self.assertTrue(outcome.valid)
+
+    def test_parse_change(self) -> None:
+        self.assertEqual(AddPallets('inner_ne', 'Y', 2), parse_change('add inner_ne y 2'))
+        self.assertEqual(SetHighest('central', ''), parse_change('highest central'))
+        self.assertEqual(SetLeftStartingZone(3, False), parse_change('moved 3 no'))
+
+
+if __name__ == '__main__':
+    unittest.main()
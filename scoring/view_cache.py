@@ -0,0 +1,353 @@
+"""
+Cache of the views derived from a compstate, keyed on what they're built from.
+
+Each of the views built by `rebuild` (and the display feed's scores) is a pure
+function of the compstate files it's built from, so this keys each on the
+content hashes of those files, including those of the views it uses. Repeated
+requests for a view of the same state are then served from memory, and a
+client which quotes the view's ETag is told it hasn't changed rather than
+being sent it again.
+
+Views are keyed on their files' contents rather than the git tree hash since
+scores are written before they're committed, and so that (say) a change to
+the shepherding doesn't invalidate the standings. Files are only re-read when
+their size or modification time changes, or if they were modified too
+recently for their modification time to be trusted (as git does).
+
+The cache is bounded by the total size of the serialised views, evicting
+those used least recently. Concurrent requests for a view which isn't cached
+wait for a single build of it.
+
+Views are served over HTTP as `/<name>`, with an index of them (and the
+cache's statistics) at `/`.
+"""
+
+from __future__ import annotations
+
+import argparse
+import collections
+import concurrent.futures
+import dataclasses
+import hashlib
+import http
+import http.server
+import json
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Iterable
+
+from display_feed import FEED_ARTIFACTS
+from rebuild import Artifact, BuildContext
+from sheets import COMPSTATE_ROOT
+
+DEFAULT_PORT = 5127
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+# Files modified more recently than this could be modified again without
+# their modification time changing, so are always re-read
+RACY_SECONDS = 2
+
+CONTENT_TYPES = {
+    '.json': 'application/json',
+    '.dot': 'text/vnd.graphviz; charset=utf-8',
+}
+
+
+@dataclasses.dataclass(frozen=True)
+class CachedView:
+    name: str
+    etag: str
+    body: bytes
+    content_type: str
+
+
+class FileHasher:
+    """
+    Content hashes of the files in a compstate.
+    """
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        # Relative path -> (size, modification time), hash
+        self._hashes: dict[str, tuple[tuple[int, int], str]] = {}
+        self.reads = 0
+
+    def _hash(self, relative: str) -> str | None:
+        path = self.root / relative
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+        signature = (stat.st_size, stat.st_mtime_ns)
+        known = self._hashes.get(relative)
+        if known is not None and known[0] == signature:
+            return known[1]
+
+        try:
+            digest = hashlib.sha256(path.read_bytes()).hexdigest()
+        except FileNotFoundError:
+            return None
+        self.reads += 1
+        if stat.st_mtime < time.time() - RACY_SECONDS:
+            self._hashes[relative] = (signature, digest)
+        return digest
+
+    def hashes(self, patterns: Iterable[str]) -> list[tuple[str, str]]:
+        """
+        The hash of each file matching the given patterns, sorted by path.
+        """
+        paths = sorted({
+            path.relative_to(self.root).as_posix()
+            for pattern in patterns
+            for path in self.root.glob(pattern)
+        })
+        return [
+            (path, digest)
+            for path in paths
+            if (digest := self._hash(path)) is not None
+        ]
+
+
+class ViewCache:
+    """
+    Views of a compstate, cached by the hashes of what they're built from.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        artifacts: Iterable[Artifact] = FEED_ARTIFACTS,
+        *,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ) -> None:
+        self.root = root
+        self.artifacts = {x.name: x for x in artifacts}
+        self.max_bytes = max_bytes
+        self.hasher = FileHasher(root)
+
+        # Artifact -> the patterns of everything it's built from
+        self._inputs: dict[str, tuple[str, ...]] = {}
+        for name in self.artifacts:
+            patterns = set()
+            pending = [name]
+            while pending:
+                artifact = self.artifacts[pending.pop()]
+                patterns.update(artifact.inputs)
+                pending.extend(artifact.depends)
+            self._inputs[name] = tuple(sorted(patterns))
+
+        # Key -> view, least recently used first
+        self._views: collections.OrderedDict[str, CachedView] = collections.OrderedDict()
+        self._size = 0
+        self._building: dict[str, concurrent.futures.Future[CachedView]] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def __len__(self) -> int:
+        return len(self._views)
+
+    def key(self, name: str) -> str:
+        """
+        The key of the view as of the current state of the compstate.
+        """
+        digest = hashlib.sha256(name.encode() + b'\0')
+        for path, file_hash in self.hasher.hashes(self._inputs[name]):
+            digest.update(f'{path}\0{file_hash}\n'.encode())
+        return digest.hexdigest()
+
+    def get(self, name: str) -> CachedView:
+        """
+        The view as of the current state of the compstate, built if it isn't
+        already cached.
+        """
+        key = self.key(name)
+        with self._lock:
+            view = self._views.get(key)
+            if view is not None:
+                self._views.move_to_end(key)
+                self.hits += 1
+                return view
+
+            future = self._building.get(key)
+            if future is None:
+                future = self._building[key] = concurrent.futures.Future()
+                building = True
+                self.misses += 1
+            else:
+                building = False
+
+        if not building:
+            return future.result()
+
+        try:
+            view = self._build(name, key)
+        except BaseException as e:
+            with self._lock:
+                del self._building[key]
+            future.set_exception(e)
+            raise
+
+        # Something it's built from may have changed while it was being built,
+        # in which case it's not known which state it's a view of
+        cacheable = self.key(name) == key
+        with self._lock:
+            del self._building[key]
+            if cacheable:
+                self._store(key, view)
+        future.set_result(view)
+        return view
+
+    def _build(self, name: str, key: str) -> CachedView:
+        artifact = self.artifacts[name]
+        results = {x: json.loads(self.get(x).body) for x in artifact.depends}
+        result = artifact.build(BuildContext(self.root, results))
+        if isinstance(result, str):
+            body = result.encode()
+        else:
+            body = json.dumps(result, separators=(',', ':')).encode()
+        return CachedView(
+            name,
+            f'"{key[:32]}"',
+            body,
+            CONTENT_TYPES.get(artifact.suffix, 'application/octet-stream'),
+        )
+
+    def _store(self, key: str, view: CachedView) -> None:
+        if len(view.body) > self.max_bytes:
+            return
+        self._views[key] = view
+        self._size += len(view.body)
+        while self._size > self.max_bytes:
+            _, evicted = self._views.popitem(last=False)
+            self._size -= len(evicted.body)
+            self.evictions += 1
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                'views': len(self._views),
+                'bytes': self._size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'file_reads': self.hasher.reads,
+            }
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    Whether an `If-None-Match` header matches the given ETag.
+    """
+    if if_none_match is None:
+        return False
+    tags = [x.strip().removeprefix('W/') for x in if_none_match.split(',')]
+    return '*' in tags or etag in tags
+
+
+class ViewServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: tuple[str, int],
+        cache: ViewCache,
+        *,
+        verbose: bool = False,
+    ) -> None:
+        super().__init__(address, ViewRequestHandler)
+        self.cache = cache
+        self.verbose = verbose
+
+
+class ViewRequestHandler(http.server.BaseHTTPRequestHandler):
+    server: ViewServer
+
+    def _send(self, body: bytes, content_type: str, etag: str | None = None) -> None:
+        self.send_response(http.HTTPStatus.OK)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        if etag is not None:
+            self.send_header('ETag', etag)
+            # Clients may keep it, but must check it's still current
+            self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        cache = self.server.cache
+        name = self.path.partition('?')[0].strip('/')
+        if not name:
+            index = {'views': sorted(cache.artifacts), 'cache': cache.stats()}
+            self._send(json.dumps(index).encode(), 'application/json')
+            return
+        if name not in cache.artifacts:
+            self.send_error(http.HTTPStatus.NOT_FOUND, f"No view {name!r}")
+            return
+
+        try:
+            view = cache.get(name)
+        except Exception as e:
+            # A half-written sheet shouldn't stop the other views being served
+            self.send_error(http.HTTPStatus.INTERNAL_SERVER_ERROR, repr(e))
+            return
+
+        if etag_matches(self.headers.get('If-None-Match'), view.etag):
+            self.send_response(http.HTTPStatus.NOT_MODIFIED)
+            self.send_header('ETag', view.etag)
+            self.end_headers()
+            return
+
+        self._send(view.body, view.content_type, view.etag)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Serve the views derived from a compstate, cached until they change.",
+    )
+    parser.add_argument(
+        '--compstate',
+        type=Path,
+        default=COMPSTATE_ROOT,
+        help="competition state repository (default: %(default)s)",
+    )
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument(
+        '--max-bytes',
+        type=int,
+        default=DEFAULT_MAX_BYTES,
+        help="total size of the views to keep (default: %(default)s)",
+    )
+    parser.add_argument(
+        '--verbose',
+        action='store_true',
+        help="log every request",
+    )
+    return parser.parse_args()
+
+
+def main(args: argparse.Namespace) -> None:
+    cache = ViewCache(args.compstate.resolve(), max_bytes=args.max_bytes)
+    with ViewServer((args.host, args.port), cache, verbose=args.verbose) as server:
+        print(f"Listening on {args.host}:{args.port}", file=sys.stderr)
+        server.serve_forever()
+
+
+if __name__ == '__main__':
+    try:
+        main(parse_args())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,280 @@
+"""
+What-if scoring for a live match.
+
+A match's score is a sum of independent per-district terms: each pallet is
+worth its district's value from `DISTRICT_SCORE_MAP` to the zone of its colour,
+doubled if that colour holds the highest pallet in the district, plus a point
+for leaving the starting zone. `LiveMatch` holds a match in that decomposed
+form so that hypothetical changes ("what if orange took the highest pallet in
+central?") are answered by adjusting only the affected terms, in time
+proportional to the number of changes rather than the size of the sheet.
+"""
+
+from __future__ import annotations
+
+import argparse
+import collections
+import dataclasses
+from pathlib import Path
+from typing import Any, Iterable, Mapping, Sequence, Union
+
+import league_ranker
+from league_ranker import RankedPosition
+from sr.comp.scores import degroup
+from sr.comp.types import TLA
+
+from score import TOKENS_PER_ZONE
+from sheets import load_sheet
+from sr2025 import DISTRICT_SCORE_MAP, ZONE_COLOURS
+from standings import disqualified_teams
+
+
+@dataclasses.dataclass(frozen=True)
+class AddPallets:
+    district: str
+    colour: str
+    # May be negative, to remove pallets
+    count: int = 1
+
+
+@dataclasses.dataclass(frozen=True)
+class SetHighest:
+    district: str
+    # Empty for no highest pallet
+    colour: str
+
+
+@dataclasses.dataclass(frozen=True)
+class SetLeftStartingZone:
+    zone: int
+    value: bool = True
+
+
+Change = Union[AddPallets, SetHighest, SetLeftStartingZone]
+
+
+@dataclasses.dataclass(frozen=True)
+class Outcome:
+    scores: dict[TLA, int]
+    positions: dict[TLA, RankedPosition]
+    # Why the resulting sheet would be invalid, if it would be
+    problems: tuple[str, ...] = ()
+
+    @property
+    def valid(self) -> bool:
+        return not self.problems
+
+
+class InvalidChangeException(ValueError):
+    pass
+
+
+class _Overlay:
+    """
+    Changes layered over a match's state, touching only what they modify.
+    """
+
+    def __init__(self, match: LiveMatch) -> None:
+        self.match = match
+        self.zone_scores = list(match._zone_scores)
+        self.pallets: dict[tuple[str, str], int] = {}
+        self.highest: dict[str, str] = {}
+        self.moved: dict[int, bool] = {}
+        self.colour_totals: dict[str, int] = {}
+
+    def get_pallets(self, district: str, colour: str) -> int:
+        key = (district, colour)
+        return self.pallets.get(key, self.match._pallets[key])
+
+    def get_highest(self, district: str) -> str:
+        return self.highest.get(district, self.match._highest[district])
+
+    def apply(self, change: Change) -> None:
+        if isinstance(change, SetLeftStartingZone):
+            old = self.moved.get(change.zone, self.match._moved[change.zone])
+            self.moved[change.zone] = change.value
+            self.zone_scores[change.zone] += change.value - old
+            return
+
+        if change.district not in DISTRICT_SCORE_MAP:
+            raise InvalidChangeException(f"Unknown district {change.district!r}")
+        if change.colour and change.colour not in ZONE_COLOURS:
+            raise InvalidChangeException(f"Unknown colour {change.colour!r}")
+
+        value = DISTRICT_SCORE_MAP[change.district]
+
+        if isinstance(change, AddPallets):
+            zone = ZONE_COLOURS.index(change.colour)
+            multiplier = 2 if self.get_highest(change.district) == change.colour else 1
+            old = self.get_pallets(change.district, change.colour)
+            self.pallets[change.district, change.colour] = old + change.count
+            self.colour_totals[change.colour] = (
+                self.colour_totals.get(change.colour, self.match._colour_totals[change.colour])
+                + change.count
+            )
+            self.zone_scores[zone] += change.count * value * multiplier
+
+        else:
+            # Only the bonus for the highest pallet moves between zones
+            old_highest = self.get_highest(change.district)
+            if old_highest:
+                bonus = self.get_pallets(change.district, old_highest) * value
+                self.zone_scores[ZONE_COLOURS.index(old_highest)] -= bonus
+            if change.colour:
+                bonus = self.get_pallets(change.district, change.colour) * value
+                self.zone_scores[ZONE_COLOURS.index(change.colour)] += bonus
+            self.highest[change.district] = change.colour
+
+    def problems(self) -> tuple[str, ...]:
+        problems = []
+        for (district, colour), count in self.pallets.items():
+            if count < 0:
+                problems.append(f"{district} would have {count} {colour} pallets")
+        for district in {x for x, _ in self.pallets} | self.highest.keys():
+            highest = self.get_highest(district)
+            if highest and not self.get_pallets(district, highest):
+                problems.append(f"{district} would have no {highest} pallet to be highest")
+        for colour, total in self.colour_totals.items():
+            if total > TOKENS_PER_ZONE:
+                problems.append(f"There would be {total} {colour} pallets in play")
+        return tuple(problems)
+
+
+class LiveMatch:
+    """
+    A match's score state, decomposed for cheap hypothetical queries.
+    """
+
+    def __init__(self, sheet: Mapping[str, Any]) -> None:
+        self._zones = {TLA(tla): info['zone'] for tla, info in sheet['teams'].items()}
+        self._disqualified = disqualified_teams(sheet)
+
+        districts = sheet['arena_zones']['other']['districts']
+        self._pallets = {
+            (name, colour): district['pallets'].get(colour, 0)
+            for name, district in districts.items()
+            for colour in ZONE_COLOURS
+        }
+        self._highest = {
+            name: district['highest'].replace(' ', '')
+            for name, district in districts.items()
+        }
+        self._moved = [False] * len(ZONE_COLOURS)
+        for tla, info in sheet['teams'].items():
+            self._moved[info['zone']] = bool(info.get('left_starting_zone'))
+
+        self._colour_totals: collections.Counter[str] = collections.Counter()
+        self._zone_scores = [int(x) for x in self._moved]
+        for (name, colour), count in self._pallets.items():
+            self._colour_totals[colour] += count
+            multiplier = 2 if self._highest[name] == colour else 1
+            self._zone_scores[ZONE_COLOURS.index(colour)] += (
+                count * DISTRICT_SCORE_MAP[name] * multiplier
+            )
+
+    def _outcome(self, zone_scores: Sequence[int], problems: tuple[str, ...]) -> Outcome:
+        scores = {tla: zone_scores[zone] for tla, zone in self._zones.items()}
+        positions = league_ranker.calc_positions(scores, self._disqualified)
+        return Outcome(scores, dict(degroup(positions)), problems)
+
+    @property
+    def current(self) -> Outcome:
+        return self._outcome(self._zone_scores, ())
+
+    def evaluate(self, changes: Iterable[Change]) -> Outcome:
+        """
+        The outcome were the given changes to happen, leaving the match as it
+        is.
+        """
+        overlay = _Overlay(self)
+        for change in changes:
+            overlay.apply(change)
+        return self._outcome(overlay.zone_scores, overlay.problems())
+
+    def evaluate_many(self, hypotheticals: Iterable[Iterable[Change]]) -> list[Outcome]:
+        return [self.evaluate(changes) for changes in hypotheticals]
+
+    def apply(self, changes: Iterable[Change]) -> Outcome:
+        """
+        Make the given changes to the match, for example as pallets land.
+        """
+        overlay = _Overlay(self)
+        for change in changes:
+            overlay.apply(change)
+
+        self._zone_scores = overlay.zone_scores
+        self._pallets.update(overlay.pallets)
+        self._highest.update(overlay.highest)
+        for zone, value in overlay.moved.items():
+            self._moved[zone] = value
+        self._colour_totals.update({
+            colour: total - self._colour_totals[colour]
+            for colour, total in overlay.colour_totals.items()
+        })
+
+        return self._outcome(self._zone_scores, overlay.problems())
+
+
+def parse_change(text: str) -> Change:
+    """
+    Parse a change from a short textual form:
+
+        add <district> <colour> [count]
+        highest <district> [colour]
+        moved <zone> [yes|no]
+    """
+    verb, *args = text.split()
+    try:
+        if verb == 'add' and len(args) in (2, 3):
+            return AddPallets(args[0], args[1].upper(), int(args[2]) if len(args) == 3 else 1)
+        if verb == 'highest' and len(args) in (1, 2):
+            return SetHighest(args[0], args[1].upper() if len(args) == 2 else '')
+        if verb == 'moved' and len(args) in (1, 2):
+            value = args[1].lower() in ('y', 'yes', 'true') if len(args) == 2 else True
+            return SetLeftStartingZone(int(args[0]), value)
+    except ValueError:
+        pass
+    raise InvalidChangeException(f"Unable to parse change {text!r}")
+
+
+def format_outcome(outcome: Outcome) -> str:
+    lines = [
+        f"{position}. {tla} {outcome.scores[tla]}"
+        for tla, position in outcome.positions.items()
+    ]
+    lines += [f"Invalid: {x}" for x in outcome.problems]
+    return '\n'.join(lines)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Ask what-if questions about a match.")
+    parser.add_argument('sheet', type=Path, help="score sheet for the match")
+    parser.add_argument(
+        'changes',
+        nargs='*',
+        help=(
+            "Changes to evaluate together, e.g. 'add inner_ne Y 2', "
+            "'highest central O', 'moved 3'. Separate hypotheticals with 'or'."
+        ),
+    )
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    match = LiveMatch(load_sheet(args.sheet))
+    print("Current:")
+    print(format_outcome(match.current))
+
+    hypotheticals: list[list[Change]] = [[]]
+    for text in args.changes:
+        if text == 'or':
+            hypotheticals.append([])
+        else:
+            hypotheticals[-1].append(parse_change(text))
+
+    for changes, outcome in zip(hypotheticals, match.evaluate_many(hypotheticals)):
+        if changes:
+            print()
+            print("If " + ", ".join(str(x) for x in changes) + ":")
+            print(format_outcome(outcome))
@@ -117,6 +117,11 @@ def parse_args():
         default=5*60,
         help="Set the minimum time that will be maintained between matches, in seconds (default: %(default)s).",
     )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Show the new start times without saving them (see also scoring/delay_projection.py)",
+    )
 
     return parser.parse_args()
 
@@ -150,6 +155,12 @@ def main():
 
     shift_schedule(knockout, how_long, round_num, match_num, slot_duration, args.squash_slack, args.round_spacing)
 
+    if args.dry_run:
+        for matches in knockout.values():
+            for match in matches.values():
+                print(f"{match['display_name']}: {match['start_time']}")
+        return
+
     # Save the updated schedule
     yaml.dump(schedule, dest=schedule_file)
 